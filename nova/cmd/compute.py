@@ -31,6 +31,7 @@ from nova.conductor import rpcapi as conductor_rpcapi
 import nova.conf
 from nova import config
 import nova.db.main.api
+from nova import instrumentation
 from nova import objects
 from nova.objects import base as objects_base
 from nova import service
@@ -50,6 +51,8 @@ def main():
     # Ensure os-vif objects are registered and plugins loaded
     os_vif.initialize()
 
+    gmr.TextGuruMeditation.register_section(
+        'Compute latency', instrumentation.report_section)
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
 
     # disable database access for this service
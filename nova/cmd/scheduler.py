@@ -25,6 +25,7 @@ from oslo_reports import opts as gmr_opts
 
 import nova.conf
 from nova import config
+from nova import instrumentation
 from nova import objects
 from nova.scheduler import rpcapi
 from nova import service
@@ -41,6 +42,8 @@ def main():
     gmr_opts.set_defaults(CONF)
     objects.Service.enable_min_version_cache()
 
+    gmr.TextGuruMeditation.register_section(
+        'Scheduler latency', instrumentation.report_section)
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
 
     server = service.Service.create(
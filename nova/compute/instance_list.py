@@ -132,16 +132,18 @@ def get_instance_list_cells_batch_size(limit, cells):
     return max(min(batch_size, limit), 100)
 
 
-def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
-                                sort_keys, sort_dirs, cell_down_support=False):
-    """Return a list of instances and information about down cells.
-
-    This returns a tuple of (objects.InstanceList, list(of down cell
-    uuids) for the requested operation. The instances returned are
-    those that were collected from the cells that responded. The uuids
-    of any cells that did not respond (or raised an error) are included
-    in the list as the second element of the tuple. That list is empty
-    if all cells responded.
+def get_instance_objects_sorted_generator(ctx, filters, limit, marker,
+                                          expected_attrs, sort_keys,
+                                          sort_dirs, cell_down_support=False):
+    """Return a lister and a generator of instances.
+
+    This is the streaming flavor of get_instance_objects_sorted(). The
+    generator yields Instance objects as the cross-cell merge proceeds
+    instead of building a whole InstanceList first, so that callers which
+    only need to walk the results do not hold them all in memory.
+
+    The cells_failed and cells_timed_out properties of the returned lister
+    are only complete once the generator is exhausted.
     """
     query_cell_subset = CONF.api.instance_list_per_project_cells
     # NOTE(danms): Replicated in part from instance_get_all_by_sort_filters(),
@@ -160,19 +162,44 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
     batch_size = get_instance_list_cells_batch_size(limit, cell_mappings)
 
     columns_to_join = instance_obj._expected_cols(expected_attrs)
-    instance_lister, instance_generator = get_instances_sorted(ctx, filters,
-        limit, marker, columns_to_join, sort_keys, sort_dirs,
+    instance_lister, db_instance_generator = get_instances_sorted(ctx,
+        filters, limit, marker, columns_to_join, sort_keys, sort_dirs,
         cell_mappings=cell_mappings, batch_size=batch_size,
         cell_down_support=cell_down_support)
 
     if 'fault' in expected_attrs:
         # We join fault above, so we need to make sure we don't ask
-        # make_instance_list to do it again for us
+        # _from_db_object() to do it again for us
         expected_attrs = copy.copy(expected_attrs)
         expected_attrs.remove('fault')
 
-    instance_list = instance_obj._make_instance_list(ctx,
-        objects.InstanceList(), instance_generator, expected_attrs)
+    def instance_generator():
+        for db_inst in db_instance_generator:
+            yield objects.Instance._from_db_object(
+                ctx, objects.Instance(ctx), db_inst,
+                expected_attrs=expected_attrs)
+
+    return instance_lister, instance_generator()
+
+
+def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
+                                sort_keys, sort_dirs, cell_down_support=False):
+    """Return a list of instances and information about down cells.
+
+    This returns a tuple of (objects.InstanceList, list(of down cell
+    uuids) for the requested operation. The instances returned are
+    those that were collected from the cells that responded. The uuids
+    of any cells that did not respond (or raised an error) are included
+    in the list as the second element of the tuple. That list is empty
+    if all cells responded.
+    """
+    instance_lister, instance_generator = (
+        get_instance_objects_sorted_generator(
+            ctx, filters, limit, marker, expected_attrs, sort_keys,
+            sort_dirs, cell_down_support=cell_down_support))
+
+    instance_list = objects.InstanceList(objects=list(instance_generator))
+    instance_list.obj_reset_changes()
     down_cell_uuids = (instance_lister.cells_failed +
                        instance_lister.cells_timed_out)
     return instance_list, down_cell_uuids
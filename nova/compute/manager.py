@@ -27,6 +27,7 @@ terminating it.
 
 import base64
 import binascii
+import collections
 import contextlib
 import copy
 import functools
@@ -843,7 +844,7 @@ class ComputeManager(manager.Manager):
                                      for inst in local_instances
                                      if inst.uuid in evacuations}
 
-        for instance in evacuated_local_instances.values():
+        def _destroy_evacuated_instance(context, instance):
             LOG.info('Destroying instance as it has been evacuated from '
                      'this host but still exists in the hypervisor',
                      instance=instance)
@@ -867,6 +868,16 @@ class ComputeManager(manager.Manager):
                                 network_info,
                                 bdi, destroy_disks)
 
+        errors = self._run_on_instances(
+            _destroy_evacuated_instance, context,
+            list(evacuated_local_instances.values()))
+        if errors:
+            # NOTE: The guests of the other evacuated instances have been
+            # destroyed meanwhile, but the evacuated instances must not be left
+            # running on this host, so abort the startup like when the guests
+            # are destroyed one at a time.
+            raise next(iter(errors.values()))
+
         hostname_to_cn_uuid = {
             cn.hypervisor_hostname: cn.uuid
             for cn in node_cache.values()}
@@ -1696,13 +1707,15 @@ class ComputeManager(manager.Manager):
         # background on startup
         try:
             # checking that instance was not already evacuated to other host
-            evacuated_instances = self._destroy_evacuated_instances(
-                context, nodes_by_uuid)
+            with timeutils.StopWatch() as evacuated_timer:
+                evacuated_instances = self._destroy_evacuated_instances(
+                    context, nodes_by_uuid)
 
             # Initialise instances on the host that are not evacuating
-            for instance in instances:
-                if instance.uuid not in evacuated_instances:
-                    self._init_instance(context, instance)
+            init_instances = [instance for instance in instances
+                              if instance.uuid not in evacuated_instances]
+            with timeutils.StopWatch() as init_timer:
+                self._init_instances(context, init_instances)
 
             # NOTE(gibi): collect all the instance uuids that is in some way
             # was already handled above. Either by init_instance or by
@@ -1712,8 +1725,25 @@ class ComputeManager(manager.Manager):
             # handled by the above calls.
             already_handled = {instance.uuid for instance in instances}.union(
                 evacuated_instances)
-            self._error_out_instances_whose_build_was_interrupted(
-                context, already_handled, nodes_by_uuid.keys())
+            with timeutils.StopWatch() as interrupted_timer:
+                self._error_out_instances_whose_build_was_interrupted(
+                    context, already_handled, nodes_by_uuid.keys())
+
+            LOG.info('Recovered %(instances)d instances and %(evacuated)d '
+                     'evacuated instances with up to %(concurrency)d at a '
+                     'time in %(total).2f seconds: evacuated instances '
+                     'cleanup %(evacuated_time).2f seconds, instances '
+                     'initialization %(init_time).2f seconds, interrupted '
+                     'builds cleanup %(interrupted_time).2f seconds',
+                     {'instances': len(init_instances),
+                      'evacuated': len(evacuated_instances),
+                      'concurrency': CONF.max_concurrent_init_instances,
+                      'total': (evacuated_timer.elapsed() +
+                                init_timer.elapsed() +
+                                interrupted_timer.elapsed()),
+                      'evacuated_time': evacuated_timer.elapsed(),
+                      'init_time': init_timer.elapsed(),
+                      'interrupted_time': interrupted_timer.elapsed()})
 
         finally:
             if instances:
@@ -1725,6 +1755,61 @@ class ComputeManager(manager.Manager):
                 # _sync_scheduler_instance_info periodic task will.
                 self._update_scheduler_instance_info(context, instances)
 
+    def _run_on_instances(self, func, context, instances):
+        """Calls func(context, instance) for each of the instances, on up to
+        [DEFAULT]max_concurrent_init_instances threads.
+
+        When the instances are handled one at a time, the exception raised by
+        func for an instance is propagated right away. Otherwise func is still
+        called for the other instances, and the exceptions are returned.
+
+        :param func: The function to call for each instance
+        :param context: The request context
+        :param instances: The list of instances
+        :returns: A dict, keyed by instance UUID, of the exceptions raised by
+            func
+        """
+        if CONF.max_concurrent_init_instances == 1:
+            for instance in instances:
+                func(context, instance)
+            return {}
+
+        if utils.concurrency_mode_threading():
+            executor = futurist.ThreadPoolExecutor(
+                CONF.max_concurrent_init_instances)
+        else:
+            executor = futurist.GreenThreadPoolExecutor(
+                max_workers=CONF.max_concurrent_init_instances)
+        executor.name = 'init_host'
+        try:
+            futures = [
+                (instance, utils.spawn_on(executor, func, context, instance))
+                for instance in instances]
+            errors = {}
+            for instance, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[instance.uuid] = e
+            return errors
+        finally:
+            executor.shutdown()
+
+    def _init_instances(self, context, instances):
+        """Initializes the instances of the host, on up to
+        [DEFAULT]max_concurrent_init_instances threads.
+
+        When the instances are initialized concurrently, a failure to
+        initialize an instance is logged without stopping the initialization
+        of the other instances.
+        """
+        errors = self._run_on_instances(self._init_instance, context,
+                                        instances)
+        for instance in instances:
+            if instance.uuid in errors:
+                LOG.error('Failed to initialize instance',
+                          instance=instance, exc_info=errors[instance.uuid])
+
     def _error_out_instances_whose_build_was_interrupted(
             self, context, already_handled_instances, node_uuids):
         """If there are instances in BUILDING state that are not
@@ -2829,7 +2914,53 @@ class ComputeManager(manager.Manager):
                 self.host, phase=fields.NotificationPhase.END,
                 bdms=block_device_mapping)
 
-    def _build_resources_cleanup(self, instance, network_info):
+    def _prefetch_image(self, context, instance, block_device_mapping):
+        """Starts downloading the image of an instance being built into the
+        image cache of the driver, if [image_cache]prefetch_on_build is
+        enabled and the instance is booted from an image.
+
+        :returns: The future of the download, or None
+        """
+        if not CONF.image_cache.prefetch_on_build or not instance.image_ref:
+            return None
+        root_bdm = block_device.get_root_bdm(block_device_mapping or [])
+        if root_bdm is not None and root_bdm.is_volume:
+            return None
+        # The image is not verified against the trusted certificates when it
+        # is cached, and spawn would not verify it anymore once it is.
+        if instance.trusted_certs:
+            return None
+        LOG.debug('Start prefetching image %s for instance.',
+                  instance.image_ref, instance=instance)
+        return utils.spawn(self.driver.cache_image, context,
+                           instance.image_ref)
+
+    def _wait_for_image_prefetch(self, instance, image_prefetch):
+        """Waits for the image of an instance to be prefetched. The failures
+        are only logged, since the image is downloaded on spawn anyway.
+        """
+        try:
+            with timeutils.StopWatch() as timer:
+                image_prefetch.result()
+        except NotImplementedError:
+            LOG.debug('The driver does not support caching images, not '
+                      'prefetching image %s.', instance.image_ref,
+                      instance=instance)
+        except Exception as e:
+            LOG.warning('Failed to prefetch image %(image)s, it will be '
+                        'downloaded on spawn: %(error)s',
+                        {'image': instance.image_ref, 'error': e},
+                        instance=instance)
+        else:
+            LOG.debug('Waited %.2f seconds for image %s to be prefetched.',
+                      timer.elapsed(), instance.image_ref, instance=instance)
+
+    def _build_resources_cleanup(self, instance, network_info,
+                                 image_prefetch=None):
+        # The image download is not needed anymore, but it cannot be
+        # interrupted once started.
+        if image_prefetch is not None:
+            image_prefetch.cancel()
         # Make sure the async call finishes
         if network_info is not None:
             network_info.wait(do_raise=False)
@@ -2843,6 +2974,7 @@ class ComputeManager(manager.Manager):
                          resource_provider_mapping, accel_uuids):
         resources = {}
         network_info = None
+        image_prefetch = None
         spec_arqs = {}
         network_arqs = {}
 
@@ -2888,6 +3020,11 @@ class ComputeManager(manager.Manager):
                     reason=msg)
 
         try:
+            # Download the image while the networks and the block devices are
+            # prepared, instead of when the instance is spawned.
+            image_prefetch = self._prefetch_image(context, instance,
+                                                  block_device_mapping)
+
             # Perform any driver preparation work for the driver.
             self.driver.prepare_for_spawn(instance)
 
@@ -2914,21 +3051,27 @@ class ComputeManager(manager.Manager):
                 exception.UnexpectedDeletingTaskStateError,
                 exception.ComputeResourcesUnavailable):
             with excutils.save_and_reraise_exception():
-                self._build_resources_cleanup(instance, network_info)
+                self._build_resources_cleanup(instance, network_info,
+                                              image_prefetch)
         except (exception.UnexpectedTaskStateError,
                 exception.InstanceUnacceptable,
                 exception.OverQuota, exception.InvalidBDM) as e:
-            self._build_resources_cleanup(instance, network_info)
+            self._build_resources_cleanup(instance, network_info,
+                                          image_prefetch)
             raise exception.BuildAbortException(instance_uuid=instance.uuid,
                     reason=e.format_message())
         except Exception:
             LOG.exception('Failure prepping block device',
                           instance=instance)
-            self._build_resources_cleanup(instance, network_info)
+            self._build_resources_cleanup(instance, network_info,
+                                          image_prefetch)
             msg = _('Failure prepping block device.')
             raise exception.BuildAbortException(instance_uuid=instance.uuid,
                     reason=msg)
 
+        if image_prefetch is not None:
+            self._wait_for_image_prefetch(instance, image_prefetch)
+
         resources['accel_info'] = list(spec_arqs.values())
         try:
             yield resources
@@ -10553,10 +10696,13 @@ class ComputeManager(manager.Manager):
             action=fields.NotificationAction.LIVE_MIGRATION_ROLLBACK_DEST,
             phase=fields.NotificationPhase.END)
 
-    def _require_nw_info_update(self, context, instance):
+    def _require_nw_info_update(self, context, instance, ports=None):
         """Detect whether there is a mismatch in binding:host_id, or
         binding_failed or unbound binding:vif_type for any of the instances
         ports.
+
+        :param ports: The ports of the instance with their binding:host_id
+            and binding:vif_type, if already listed.
         """
         # Only update port bindings if compute manager does manage port
         # bindings instead of the compute driver. For example IronicDriver
@@ -10565,10 +10711,12 @@ class ComputeManager(manager.Manager):
         if self.driver.manages_network_binding_host_id():
             return False
 
-        search_opts = {'device_id': instance.uuid,
-                       'fields': ['binding:host_id', 'binding:vif_type']}
-        ports = self.network_api.list_ports(context, **search_opts)
-        for p in ports['ports']:
+        if ports is None:
+            search_opts = {'device_id': instance.uuid,
+                           'fields': ['binding:host_id', 'binding:vif_type']}
+            ports = self.network_api.list_ports(
+                context, **search_opts)['ports']
+        for p in ports:
             if p.get('binding:host_id') != self.host:
                 return True
             vif_type = p.get('binding:vif_type')
@@ -10591,9 +10739,14 @@ class ComputeManager(manager.Manager):
         list, pull the DB record, and try the call to the network API.
         If anything errors don't fail, as it's possible the instance
         has been deleted, etc.
+
+        With ``heal_instance_info_cache_batch_size`` greater than 1, that
+        many instances are popped off of the list on each call and refreshed
+        together.
         """
+        batch_size = CONF.heal_instance_info_cache_batch_size
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
-        instance = None
+        instances = []
 
         LOG.debug('Starting heal instance info cache')
 
@@ -10616,17 +10769,17 @@ class ComputeManager(manager.Manager):
                               'because it is being deleted.', instance=inst)
                     continue
 
-                if not instance:
-                    # Save the first one we find so we don't
-                    # have to get it again
-                    instance = inst
+                if len(instances) < batch_size:
+                    # Save the first ones we find so we don't
+                    # have to get them again
+                    instances.append(inst)
                 else:
                     instance_uuids.append(inst['uuid'])
 
             self._instance_uuids_to_heal = instance_uuids
         else:
-            # Find the next valid instance on the list
-            while instance_uuids:
+            # Find the next valid instances on the list
+            while instance_uuids and len(instances) < batch_size:
                 try:
                     inst = objects.Instance.get_by_uuid(
                             context, instance_uuids.pop(0),
@@ -10647,42 +10800,95 @@ class ComputeManager(manager.Manager):
                     LOG.debug('Skipping network cache update for instance '
                               'because it is being deleted.', instance=inst)
                 else:
-                    instance = inst
-                    break
+                    instances.append(inst)
 
-        if instance:
-            # We have an instance now to refresh
+        if not instances:
+            LOG.debug("Didn't find any instances for network info cache "
+                      "update.")
+        elif batch_size == 1:
+            self._heal_instance_nw_info(context, instances[0])
+        else:
+            self._heal_instances_nw_info(context, instances)
+
+    def _heal_instance_nw_info(self, context, instance):
+        """Refresh the network info cache of an instance."""
+        try:
+            # Fix potential mismatch in port binding if evacuation failed
+            # after reassigning the port binding to the dest host but
+            # before the instance host is changed.
+            # Do this only when instance has no pending task.
+            if instance.task_state is None and \
+                    self._require_nw_info_update(context, instance):
+                LOG.info("Updating ports in neutron", instance=instance)
+                self.network_api.setup_instance_network_on_host(
+                    context, instance, self.host)
+            # Call to network API to get instance info.. this will
+            # force an update to the instance's info_cache
+            self.network_api.get_instance_nw_info(
+                context, instance, force_refresh=True)
+            LOG.debug('Updated the network info_cache for instance',
+                      instance=instance)
+        except Exception as e:
+            self._log_heal_instance_nw_info_error(instance, e)
+
+    def _heal_instances_nw_info(self, context, instances):
+        """Refresh the network info cache of a batch of instances, sharing
+        the queries to the network API between them.
+        """
+        ports = collections.defaultdict(list)
+        if not self.driver.manages_network_binding_host_id():
+            search_opts = {'device_id': [inst.uuid for inst in instances],
+                           'fields': ['device_id', 'binding:host_id',
+                                      'binding:vif_type']}
+            try:
+                for port in self.network_api.list_ports(
+                        context, **search_opts)['ports']:
+                    ports[port['device_id']].append(port)
+            except Exception:
+                LOG.error('An error occurred while listing the ports of the '
+                          'instances to refresh the network cache of.',
+                          exc_info=True)
+                return
+
+        to_refresh = []
+        for instance in instances:
             try:
-                # Fix potential mismatch in port binding if evacuation failed
-                # after reassigning the port binding to the dest host but
-                # before the instance host is changed.
-                # Do this only when instance has no pending task.
+                # Fix potential mismatch in port binding, see
+                # _heal_instance_nw_info()
                 if instance.task_state is None and \
-                        self._require_nw_info_update(context, instance):
+                        self._require_nw_info_update(
+                            context, instance, ports=ports[instance.uuid]):
                     LOG.info("Updating ports in neutron", instance=instance)
                     self.network_api.setup_instance_network_on_host(
                         context, instance, self.host)
-                # Call to network API to get instance info.. this will
-                # force an update to the instance's info_cache
-                self.network_api.get_instance_nw_info(
-                    context, instance, force_refresh=True)
+            except Exception as e:
+                self._log_heal_instance_nw_info_error(instance, e)
+            else:
+                to_refresh.append(instance)
+
+        if not to_refresh:
+            return
+        results = self.network_api.get_instances_nw_info(context, to_refresh)
+        for instance in to_refresh:
+            result = results[instance.uuid]
+            if isinstance(result, Exception):
+                self._log_heal_instance_nw_info_error(instance, result)
+            else:
                 LOG.debug('Updated the network info_cache for instance',
                           instance=instance)
-            except exception.InstanceNotFound:
-                # Instance is gone.
-                LOG.debug('Instance no longer exists. Unable to refresh',
-                          instance=instance)
-                return
-            except exception.InstanceInfoCacheNotFound:
-                # InstanceInfoCache is gone.
-                LOG.debug('InstanceInfoCache no longer exists. '
-                          'Unable to refresh', instance=instance)
-            except Exception:
-                LOG.error('An error occurred while refreshing the network '
-                          'cache.', instance=instance, exc_info=True)
+
+    def _log_heal_instance_nw_info_error(self, instance, error):
+        if isinstance(error, exception.InstanceNotFound):
+            # Instance is gone.
+            LOG.debug('Instance no longer exists. Unable to refresh',
+                      instance=instance)
+        elif isinstance(error, exception.InstanceInfoCacheNotFound):
+            # InstanceInfoCache is gone.
+            LOG.debug('InstanceInfoCache no longer exists. '
+                      'Unable to refresh', instance=instance)
         else:
-            LOG.debug("Didn't find any instances for network info cache "
-                      "update.")
+            LOG.error('An error occurred while refreshing the network '
+                      'cache.', instance=instance, exc_info=error)
 
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
@@ -10958,6 +11164,10 @@ class ComputeManager(manager.Manager):
         number of virtual machines known by the database, we proceed in a lazy
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
+
+        If the virt driver can return the power states of all its instances at
+        once, they are compared with the database first and only the instances
+        which are out of sync are checked one by one.
         """
         db_instances = objects.InstanceList.get_by_host(context, self.host,
                                                         expected_attrs=[],
@@ -10981,6 +11191,31 @@ class ComputeManager(manager.Manager):
                         {'num_db_instances': num_db_instances,
                          'num_vm_instances': num_vm_instances})
 
+        try:
+            vm_power_states = self.driver.get_power_states()
+        except NotImplementedError:
+            vm_power_states = None
+        except Exception:
+            LOG.exception('Failed to get the power states of all the '
+                          'instances, checking them one by one.')
+            vm_power_states = None
+
+        if vm_power_states is not None:
+            # The driver is queried again for the instances out of sync, with
+            # their lock held, before their power state is changed.
+            out_of_sync = [
+                db_instance for db_instance in db_instances
+                if db_instance.task_state is None and
+                not self._is_power_state_in_sync(
+                    db_instance.vm_state, db_instance.power_state,
+                    vm_power_states.get(db_instance.uuid,
+                                        power_state.NOSTATE))]
+            LOG.debug('Found %(out_of_sync)d of %(num_db_instances)d '
+                      'instances with their power state out of sync',
+                      {'out_of_sync': len(out_of_sync),
+                       'num_db_instances': num_db_instances})
+            db_instances = out_of_sync
+
         def _sync(db_instance):
             # NOTE(melwitt): This must be synchronized as we query state from
             #                two separate sources, the driver and the database.
@@ -11010,6 +11245,29 @@ class ComputeManager(manager.Manager):
                 nova.utils.spawn_on(
                     self._sync_power_executor, _sync, db_instance)
 
+    @staticmethod
+    def _is_power_state_in_sync(vm_state, db_power_state, vm_power_state):
+        """Whether _sync_instance_power_state() would leave an instance alone.
+
+        That is when the power state in the database is the one of the
+        hypervisor and is expected for the vm_state of the instance.
+        """
+        if vm_power_state != db_power_state:
+            return False
+        if vm_state == vm_states.ACTIVE:
+            return vm_power_state == power_state.RUNNING
+        if vm_state == vm_states.STOPPED:
+            return vm_power_state in (power_state.NOSTATE,
+                                      power_state.SHUTDOWN,
+                                      power_state.CRASHED)
+        if vm_state == vm_states.PAUSED:
+            return vm_power_state not in (power_state.SHUTDOWN,
+                                          power_state.CRASHED)
+        if vm_state in (vm_states.SOFT_DELETED, vm_states.DELETED):
+            return vm_power_state in (power_state.NOSTATE,
+                                      power_state.SHUTDOWN)
+        return True
+
     def _query_driver_power_state_and_sync(self, context, db_instance):
         if db_instance.task_state is not None:
             LOG.info("During sync_power_state the instance has a "
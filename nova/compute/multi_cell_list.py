@@ -13,6 +13,7 @@
 import abc
 import copy
 import heapq
+import operator
 
 import eventlet
 from oslo_log import log as logging
@@ -27,10 +28,41 @@ LOG = logging.getLogger(__name__)
 CONF = nova.conf.CONF
 
 
+class _ReversedSortKey(object):
+    """Wrap a value so that it sorts in reverse order.
+
+    This is used for the values of the keys sorted in descending order in
+    the sort keys built by RecordSortContext.sort_key().
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
 class RecordSortContext(object):
     def __init__(self, sort_keys, sort_dirs):
         self.sort_keys = sort_keys
         self.sort_dirs = sort_dirs
+        self._reversed = [sdir == 'desc' for sdir in sort_dirs]
+
+    def sort_key(self, rec):
+        """Return a key for rec which sorts as per compare_records().
+
+        The key is a tuple with the value of each of the sort keys, which is
+        built once per record so that records are compared as plain tuples
+        instead of calling compare_records() for each comparison.
+        """
+        return tuple(
+            _ReversedSortKey(rec[skey]) if reverse else rec[skey]
+            for skey, reverse in zip(self.sort_keys, self._reversed))
 
     def compare_records(self, rec1, rec2):
         """Implements cmp(rec1, rec2) for the first key that is different.
@@ -56,13 +88,21 @@ class RecordWrapper(object):
     instances from the database (and depends on the sort keys/dirs),
     we need this wrapper class to provide that.
 
-    Implementing __lt__ is enough for heapq.merge() to do its work.
+    Implementing __lt__ is enough for heapq.merge() to do its work, but the
+    sort key of the record is also computed once up front, so that
+    get_records_sorted() can have heapq.merge() compare those keys directly.
     """
 
     def __init__(self, ctx, sort_ctx, db_record):
         self.cell_uuid = ctx.cell_uuid
         self._sort_ctx = sort_ctx
         self._db_record = db_record
+        # NOTE: Failure sentinels sort before any actual result, see the note
+        # in __lt__().
+        if context.is_cell_failure_sentinel(db_record):
+            self.sort_key = (0,)
+        else:
+            self.sort_key = (1, sort_ctx.sort_key(db_record))
 
     def __lt__(self, other):
         # NOTE(danms): This makes us always sort failure sentinels
@@ -79,10 +119,7 @@ class RecordWrapper(object):
         elif context.is_cell_failure_sentinel(other._db_record):
             return False
 
-        r = self._sort_ctx.compare_records(self._db_record,
-                                           other._db_record)
-        # cmp(x, y) returns -1 if x < y
-        return r == -1
+        return self.sort_key < other.sort_key
 
 
 def query_wrapper(ctx, fn, *args, **kwargs):
@@ -402,8 +439,12 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
         # Generate results from heapq so we can return the inner
         # instance instead of the wrapper. This is basically free
-        # as it works as our caller iterates the results.
-        feeder = heapq.merge(*results.values())
+        # as it works as our caller iterates the results. The merge
+        # compares the precomputed sort keys of the wrappers rather than
+        # the wrappers themselves, which avoids a call to
+        # RecordWrapper.__lt__() for each comparison.
+        feeder = heapq.merge(*results.values(),
+                             key=operator.attrgetter('sort_key'))
         while True:
             try:
                 item = next(feeder)
@@ -20,6 +20,7 @@ no remoteable methods nor is there any interaction with the nova.db modules.
 
 import collections
 import copy
+import hashlib
 
 import os_traits
 from oslo_concurrency import lockutils
@@ -68,6 +69,13 @@ class _Provider(object):
         # dict of resource records, keyed by resource class
         # the value is the set of objects.Resource
         self.resources = {}
+        # The parent _Provider, if any, so that a change in this provider can
+        # invalidate the subtree hashes of its ancestors.
+        self._parent = None
+        # Lazily computed content hashes of this provider and of the subtree
+        # rooted at it. See content_hash() and subtree_hash().
+        self._content_hash = None
+        self._subtree_hash = None
 
     @classmethod
     def from_dict(cls, pdict):
@@ -116,12 +124,60 @@ class _Provider(object):
                     return subchild
         return None
 
+    def _invalidate_hashes(self, content=True):
+        if content:
+            self._content_hash = None
+        provider = self
+        while provider is not None and provider._subtree_hash is not None:
+            provider._subtree_hash = None
+            provider = provider._parent
+
+    def content_hash(self):
+        """Returns a hash of the data of this provider which is flushed to
+        placement: its position in the tree, inventory, traits and aggregates.
+        The generation is deliberately not part of it.
+        """
+        if self._content_hash is None:
+            content = (
+                self.uuid, self.parent_uuid,
+                sorted((rc, sorted(rec.items()))
+                       for rc, rec in self.inventory.items()),
+                sorted(self.traits), sorted(self.aggregates))
+            self._content_hash = hashlib.sha256(
+                repr(content).encode('utf-8')).hexdigest()
+        return self._content_hash
+
+    def subtree_hash(self):
+        """Returns a hash of the content hashes of this provider and all its
+        descendants.
+        """
+        if self._subtree_hash is None:
+            content = [self.content_hash()]
+            content.extend(sorted(
+                child.subtree_hash() for child in self.children.values()))
+            self._subtree_hash = hashlib.sha256(
+                ' '.join(content).encode('utf-8')).hexdigest()
+        return self._subtree_hash
+
+    def get_content_hashes(self):
+        """Returns a dict, keyed by UUID, of (content hash, subtree hash)
+        tuples for this provider and all its descendants.
+        """
+        ret = {self.uuid: (self.content_hash(), self.subtree_hash())}
+        for child in self.children.values():
+            ret.update(child.get_content_hashes())
+        return ret
+
     def add_child(self, provider):
         self.children[provider.uuid] = provider
+        provider._parent = self
+        self._invalidate_hashes(content=False)
 
     def remove_child(self, provider):
         if provider.uuid in self.children:
             del self.children[provider.uuid]
+            provider._parent = None
+            self._invalidate_hashes(content=False)
 
     def has_inventory(self):
         """Returns whether the provider has any inventory records at all. """
@@ -176,6 +232,7 @@ class _Provider(object):
             LOG.debug('Updating inventory in ProviderTree for provider %s '
                       'with inventory: %s', self.uuid, inventory)
             self.inventory = copy.deepcopy(inventory)
+            self._invalidate_hashes()
             return True
         LOG.debug('Inventory has not changed in ProviderTree for provider: %s',
                   self.uuid)
@@ -193,6 +250,7 @@ class _Provider(object):
         self._update_generation(generation, 'update_traits')
         if self.have_traits_changed(new):
             self.traits = set(new)  # create a copy of the new traits
+            self._invalidate_hashes()
             return True
         return False
 
@@ -218,6 +276,7 @@ class _Provider(object):
         self._update_generation(generation, 'update_aggregates')
         if self.have_aggregates_changed(new):
             self.aggregates = set(new)  # create a copy of the new aggregates
+            self._invalidate_hashes()
             return True
         return False
 
@@ -289,6 +348,31 @@ class ProviderTree(object):
             return self._find_with_lock(
                 name_or_uuid, return_root=True).get_provider_uuids()
 
+    def get_content_hashes(self, name_or_uuid=None):
+        """Return a dict, keyed by UUID, of (content hash, subtree hash)
+        tuples of all providers (in a (sub)tree).
+
+        The content hash of a provider covers the data which is flushed to
+        placement, i.e. its parent, inventory, traits and aggregates, but not
+        its generation. The subtree hash of a provider covers the content
+        hashes of the provider and of all its descendants, so that two
+        (sub)trees with the same subtree hash are known to hold the same data
+        without comparing their providers. Hashes are only recomputed after
+        the data of a provider changed.
+
+        :param name_or_uuid: Provider name or UUID representing the root of a
+                             (sub)tree for which to return hashes.  If not
+                             specified, the method returns the hashes of all
+                             providers in the ProviderTree.
+        """
+        with self.lock:
+            if name_or_uuid is not None:
+                return self._find_with_lock(name_or_uuid).get_content_hashes()
+            ret = {}
+            for root in self.roots:
+                ret.update(root.get_content_hashes())
+            return ret
+
     def populate_from_iterable(self, provider_dicts):
         """Populates this ProviderTree from an iterable of provider dicts.
 
@@ -19,13 +19,18 @@ scheduler with useful information about availability through the ComputeNode
 model.
 """
 import collections
+import contextlib
 import copy
+import functools
+import inspect
 
 from keystoneauth1 import exceptions as ks_exc
 import os_traits
+from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import excutils
+from oslo_utils import timeutils
 import retrying
 
 from nova.compute import claims
@@ -39,6 +44,7 @@ from nova.compute import vm_states
 import nova.conf
 from nova import exception
 from nova.i18n import _
+from nova import instrumentation
 from nova import objects
 from nova.objects import base as obj_base
 from nova.objects import fields
@@ -58,6 +64,29 @@ LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
 
 
+def _synchronized(get_nodename=None):
+    """Serializes a ResourceTracker method on the lock of a compute node.
+
+    :param get_nodename: Function returning the name of the compute node the
+        method operates on, from the dict of the arguments of the method keyed
+        by name. If it is not set, or if it returns None, the method is
+        serialized on the lock of the host.
+    """
+    def decorator(f):
+        signature = inspect.signature(f)
+
+        @functools.wraps(f)
+        def wrapper(self, *args, **kwargs):
+            nodename = None
+            if get_nodename is not None:
+                nodename = get_nodename(
+                    signature.bind(self, *args, **kwargs).arguments)
+            with self._lock(nodename, f.__qualname__):
+                return f(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 def _instance_in_resize_state(instance):
     """Returns True if the instance is in one of the resizing states.
 
@@ -99,8 +128,10 @@ class ResourceTracker(object):
         self.compute_nodes = {}
         # Dict of Stats objects, keyed by nodename
         self.stats = collections.defaultdict(compute_stats.Stats)
-        # Set of UUIDs of instances tracked on this host.
-        self.tracked_instances = set()
+        # Dict of nodenames, keyed by the UUIDs of the instances tracked on
+        # this host.
+        self.tracked_instances = {}
+        # Dict of objects.Migration objects, keyed by instance UUID
         self.tracked_migrations = {}
         self.is_bfv = {}  # dict, keyed by instance uuid, to is_bfv boolean
         monitor_handler = monitors.MonitorHandler(self)
@@ -138,6 +169,47 @@ class ResourceTracker(object):
                 'not match host')
         self.service_ref = service_ref
 
+    @contextlib.contextmanager
+    def _lock(self, nodename=None, owner=None):
+        """Acquires the lock of a compute node, or the lock of the host if
+        nodename is None.
+
+        The lock of the host is used for every compute node unless
+        [compute]resource_tracker_lock_scope is node. The lock of a compute
+        node is held along with the lock of the host in shared mode, so that
+        the operations on the compute node exclude the operations on the host,
+        but not the operations on the other compute nodes.
+        """
+        if (CONF.compute.resource_tracker_lock_scope != 'node' or
+                (self.pci_tracker and self.pci_tracker.pci_devs)):
+            # The PCI devices are shared by all the compute nodes
+            nodename = None
+        host_lock = lockutils.internal_fair_lock(COMPUTE_RESOURCE_SEMAPHORE)
+        name = COMPUTE_RESOURCE_SEMAPHORE
+        with contextlib.ExitStack() as stack:
+            timer = timeutils.StopWatch()
+            timer.start()
+            if nodename is None:
+                stack.enter_context(host_lock.write_lock())
+            else:
+                name = '%s-%s' % (COMPUTE_RESOURCE_SEMAPHORE, nodename)
+                stack.enter_context(host_lock.read_lock())
+                stack.enter_context(
+                    lockutils.internal_fair_lock(name).write_lock())
+            waited = timer.elapsed()
+            instrumentation.record(instrumentation.LOCK, name, waited)
+            LOG.debug('Lock "%(name)s" acquired by "%(owner)s" :: waited '
+                      '%(waited).3fs',
+                      {'name': name, 'owner': owner, 'waited': waited})
+            timer.restart()
+            try:
+                yield
+            finally:
+                LOG.debug('Lock "%(name)s" released by "%(owner)s" :: held '
+                          '%(held).3fs',
+                          {'name': name, 'owner': owner,
+                           'held': timer.elapsed()})
+
     def _invalidate_pci_in_placement_cached_rps(self, allocs):
         """Invalidate cache for PCI-in-placement providers.
 
@@ -158,7 +230,7 @@ class ResourceTracker(object):
                 self.reportclient.invalidate_resource_provider(
                     rp, cacheonly=True)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def instance_claim(self, context, instance, nodename, allocations,
                        limits=None):
         """Indicate that some resources are needed for an upcoming compute
@@ -241,7 +313,7 @@ class ResourceTracker(object):
 
         return claim
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def rebuild_claim(self, context, instance, nodename, allocations,
                       limits=None, image_meta=None, migration=None):
         """Create a claim for a rebuild operation."""
@@ -250,7 +322,7 @@ class ResourceTracker(object):
             allocations, move_type=fields.MigrationType.EVACUATION,
             image_meta=image_meta, limits=limits)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def resize_claim(
         self, context, instance, flavor, nodename, migration, allocations,
         image_meta=None, limits=None,
@@ -264,7 +336,7 @@ class ResourceTracker(object):
             context, instance, flavor, nodename, migration,
             allocations, image_meta=image_meta, limits=limits)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def live_migration_claim(
         self, context, instance, nodename, migration, limits, allocs,
     ):
@@ -496,7 +568,8 @@ class ResourceTracker(object):
             self._add_assigned_resources(claimed_resources)
             return objects.ResourceList(objects=claimed_resources)
 
-    def _populate_assigned_resources(self, context, instance_by_uuid):
+    def _populate_assigned_resources(self, context, nodename,
+                                     instance_by_uuid):
         """Populate self.assigned_resources organized by resource class and
         reource provider uuid, which is as following format:
         {
@@ -504,32 +577,55 @@ class ResourceTracker(object):
             $RESOURCE_CLASS: [objects.Resource, ...],
             $RESOURCE_CLASS: [...]},
         ...}
+
+        Only the resources of the providers of the given node are replaced,
+        the resources assigned on the other nodes of this host are left alone.
+
+        :returns: The set of UUIDs of the providers of the given node.
         """
         resources = []
 
         # Get resources assigned to migrations
-        for mig in self.tracked_migrations.values():
+        for mig in list(self.tracked_migrations.values()):
+            outbound = (mig.source_compute == self.host and
+                        mig.source_node == nodename)
+            incoming = (mig.dest_compute == self.host and
+                        mig.dest_node == nodename)
+            if not (outbound or incoming):
+                continue
             mig_ctx = mig.instance.migration_context
             # We might have a migration whose instance hasn't arrived here yet.
             # Ignore it.
             if not mig_ctx:
                 continue
-            if mig.source_compute == self.host and 'old_resources' in mig_ctx:
+            if outbound and 'old_resources' in mig_ctx:
                 resources.extend(mig_ctx.old_resources or [])
-            if mig.dest_compute == self.host and 'new_resources' in mig_ctx:
+            if incoming and 'new_resources' in mig_ctx:
                 resources.extend(mig_ctx.new_resources or [])
 
         # Get resources assigned to instances
-        for uuid in self.tracked_instances:
-            resources.extend(instance_by_uuid[uuid].resources or [])
-
-        self.assigned_resources.clear()
+        for uuid, instance_node in list(self.tracked_instances.items()):
+            if instance_node == nodename and uuid in instance_by_uuid:
+                resources.extend(instance_by_uuid[uuid].resources or [])
+
+        rp_uuids = {res.provider_uuid for res in resources}
+        cn_uuid = self.compute_nodes[nodename].uuid
+        if self.provider_tree and self.provider_tree.exists(cn_uuid):
+            rp_uuids.update(self.provider_tree.get_provider_uuids(cn_uuid))
+        for rp_uuid in rp_uuids:
+            self.assigned_resources.pop(rp_uuid, None)
         self._add_assigned_resources(resources)
+        return rp_uuids
+
+    def _check_resources(self, context, rp_uuids):
+        """Check if there are assigned resources not found in provider tree
 
-    def _check_resources(self, context):
-        """Check if there are assigned resources not found in provider tree"""
+        :param rp_uuids: The UUIDs of the providers to check.
+        """
         notfound = set()
-        for rp_uuid in self.assigned_resources:
+        for rp_uuid in rp_uuids:
+            if rp_uuid not in self.assigned_resources:
+                continue
             provider_data = self.provider_tree.data(rp_uuid)
             for rc, assigned in self.assigned_resources[rp_uuid].items():
                 notfound |= (assigned - provider_data.resources[rc])
@@ -604,7 +700,7 @@ class ResourceTracker(object):
         instance.compute_id = None
         instance.save()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def abort_instance_claim(self, context, instance, nodename):
         """Remove usage from the given instance."""
         self._update_usage_from_instance(context, instance, nodename,
@@ -627,7 +723,7 @@ class ResourceTracker(object):
                 dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
                 self.compute_nodes[nodename].pci_device_pools = dev_pools_obj
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['migration'].source_node)
     def drop_move_claim_at_source(self, context, instance, migration):
         """Drop a move claim after confirming a resize or cold migration."""
         migration.status = 'confirmed'
@@ -643,7 +739,7 @@ class ResourceTracker(object):
         # though.
         instance.drop_migration_context()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['migration'].dest_node)
     def drop_move_claim_at_dest(self, context, instance, migration):
         """Drop a move claim after reverting a resize or cold migration."""
 
@@ -661,7 +757,7 @@ class ResourceTracker(object):
         instance.revert_migration_context()
         instance.save(expected_task_state=[task_states.RESIZE_REVERTING])
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def drop_move_claim(self, context, instance, nodename,
                         flavor=None, prefix='new_'):
         self._drop_move_claim(
@@ -713,9 +809,10 @@ class ResourceTracker(object):
         # as on the source node after a migration).
         # NOTE(lbeliveau): On resize on the same node, the instance is
         # included in both tracked_migrations and tracked_instances.
-        self.tracked_instances.discard(instance['uuid'])
+        if self.tracked_instances.get(instance['uuid']) == nodename:
+            del self.tracked_instances[instance['uuid']]
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['nodename'])
     def update_usage(self, context, instance, nodename):
         """Update the resource usage and stats after a change in an
         instance
@@ -727,7 +824,7 @@ class ResourceTracker(object):
 
         # don't update usage for this instance unless it submitted a resource
         # claim first:
-        if uuid in self.tracked_instances:
+        if self.tracked_instances.get(uuid) == nodename:
             self._update_usage_from_instance(context, instance, nodename)
             self._update(context.elevated(), self.compute_nodes[nodename])
 
@@ -1000,7 +1097,7 @@ class ResourceTracker(object):
                 # the instance had other pending changes
                 instance.save()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['resources']['hypervisor_hostname'])
     def _update_available_resource(self, context, resources, startup=False):
 
         # initialize the compute node object, creating it
@@ -1090,7 +1187,8 @@ class ResourceTracker(object):
         cn.metrics = jsonutils.dumps(metrics)
 
         # Update assigned resources to self.assigned_resources
-        self._populate_assigned_resources(context, instance_by_uuid)
+        rp_uuids = self._populate_assigned_resources(
+            context, nodename, instance_by_uuid)
 
         # update the compute_node
         self._update(context, cn, startup=startup)
@@ -1100,7 +1198,7 @@ class ResourceTracker(object):
         # Check if there is any resource assigned but not found
         # in provider tree
         if startup:
-            self._check_resources(context)
+            self._check_resources(context, rp_uuids)
 
     def _get_compute_node(self, context, node_uuid):
         """Returns compute node for the host and nodename."""
@@ -1349,7 +1447,7 @@ class ResourceTracker(object):
 
         instances_under_same_host_resize = [
             migration.instance_uuid
-            for migration in self.tracked_migrations.values()
+            for migration in list(self.tracked_migrations.values())
             if migration.is_same_host_resize
         ]
         # NOTE(gibi): Tracking PCI in placement is different from other
@@ -1495,7 +1593,7 @@ class ResourceTracker(object):
                     migration.source_node == nodename)
         same_node = (incoming and outbound)
 
-        tracked = uuid in self.tracked_instances
+        tracked = self.tracked_instances.get(uuid) == nodename
         itype = None
         numa_topology = None
         sign = 0
@@ -1566,7 +1664,14 @@ class ResourceTracker(object):
     def _update_usage_from_migrations(self, context, migrations, nodename):
         filtered = {}
         instances = {}
-        self.tracked_migrations.clear()
+        # Only forget about the migrations of this node, the other nodes of
+        # this host may be updated concurrently.
+        for uuid, migration in list(self.tracked_migrations.items()):
+            if ((migration.source_compute == self.host and
+                    migration.source_node == nodename) or
+                    (migration.dest_compute == self.host and
+                     migration.dest_node == nodename)):
+                del self.tracked_migrations[uuid]
 
         # do some defensive filtering against bad migrations records in the
         # database:
@@ -1637,7 +1742,7 @@ class ResourceTracker(object):
         """Update usage for a single instance."""
 
         uuid = instance['uuid']
-        is_new_instance = uuid not in self.tracked_instances
+        is_new_instance = self.tracked_instances.get(uuid) != nodename
         # NOTE(sfinucan): Both brand new instances as well as instances that
         # are being unshelved will have is_new_instance == True
         is_removed_instance = not is_new_instance and (is_removed or
@@ -1645,11 +1750,11 @@ class ResourceTracker(object):
                 vm_state=instance['vm_state'], task_state=instance.task_state))
 
         if is_new_instance:
-            self.tracked_instances.add(uuid)
+            self.tracked_instances[uuid] = nodename
             sign = 1
 
         if is_removed_instance:
-            self.tracked_instances.remove(uuid)
+            del self.tracked_instances[uuid]
             self._release_assigned_resources(instance.resources)
             sign = -1
 
@@ -1687,7 +1792,11 @@ class ResourceTracker(object):
         instances assigned to the local compute host, even if they are not
         currently powered on.
         """
-        self.tracked_instances.clear()
+        # Only forget about the instances of this node, the other nodes of
+        # this host may be updated concurrently.
+        for uuid, instance_node in list(self.tracked_instances.items()):
+            if instance_node == nodename:
+                del self.tracked_instances[uuid]
 
         cn = self.compute_nodes[nodename]
         # set some initial values, reserve room for host/hypervisor:
@@ -1733,7 +1842,8 @@ class ResourceTracker(object):
             return
         read_deleted_context = context.elevated(read_deleted='yes')
         for consumer_uuid, alloc in allocations.items():
-            if consumer_uuid in self.tracked_instances:
+            if (self.tracked_instances.get(consumer_uuid) ==
+                    cn.hypervisor_hostname):
                 LOG.debug("Instance %s actively managed on this compute host "
                           "and has allocations in placement: %s.",
                           consumer_uuid, alloc)
@@ -2081,7 +2191,7 @@ class ResourceTracker(object):
         """Resets the failed_builds stats for the given node."""
         self.stats[nodename].build_succeeded()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized()
     def claim_pci_devices(self, context, pci_requests, instance_numa_topology):
         """Claim instance PCI resources
 
@@ -2097,7 +2207,7 @@ class ResourceTracker(object):
         self.pci_tracker.save(context)
         return result
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized()
     def unclaim_pci_devices(self, context, pci_device, instance):
         """Deallocate PCI devices
 
@@ -2109,7 +2219,7 @@ class ResourceTracker(object):
         self.pci_tracker.free_device(pci_device, instance)
         self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized()
     def allocate_pci_devices_for_instance(self, context, instance):
         """Allocate instance claimed PCI resources
 
@@ -2119,7 +2229,7 @@ class ResourceTracker(object):
         self.pci_tracker.allocate_instance(instance)
         self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized()
     def free_pci_device_allocations_for_instance(self, context, instance):
         """Free instance allocated PCI resources
 
@@ -2129,7 +2239,7 @@ class ResourceTracker(object):
         self.pci_tracker.free_instance_allocations(context, instance)
         self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized()
     def free_pci_device_claims_for_instance(self, context, instance):
         """Free instance claimed PCI resources
 
@@ -2139,7 +2249,7 @@ class ResourceTracker(object):
         self.pci_tracker.free_instance_claims(context, instance)
         self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized(lambda args: args['node'])
     def finish_evacuation(self, instance, node, migration):
         instance.apply_migration_context()
         # NOTE (ndipanov): This save will now update the host and node
@@ -2160,7 +2270,7 @@ class ResourceTracker(object):
             migration.status = 'done'
             migration.save()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized()
     def clean_compute_node_cache(self, compute_nodes_in_db):
         """Clean the compute node cache of any nodes that no longer exist.
 
@@ -697,6 +697,32 @@ Possible values:
 * 0 : treated as unlimited.
 * Any positive integer representing maximum number of live migrations
   to run concurrently.
+"""),
+    cfg.IntOpt('max_concurrent_init_instances',
+        default=1,
+        min=1,
+        help="""
+Maximum number of instances to initialize concurrently when nova-compute
+starts.
+
+On startup, nova-compute destroys the local guests of the instances that were
+evacuated from the host and recovers the state of the other instances of the
+host, which can involve calls to the hypervisor, to Neutron to plug the VIFs
+of the instances and to the database. Recovering the instances concurrently
+reduces the time the service takes to start on hosts with many instances, at
+the cost of more concurrent load on the hypervisor and on the other services.
+When instances are initialized concurrently, a failure to initialize an
+instance is logged without stopping the initialization of the others.
+
+Possible values:
+
+* 1 : the instances are initialized one at a time.
+* Any positive integer representing the maximum number of instances to
+  initialize concurrently.
+
+Related options:
+
+* ``resume_guests_state_on_host_boot``
 """),
     cfg.IntOpt('block_device_allocate_retries',
         default=60,
@@ -818,6 +844,29 @@ process, causing it to be repopulated the next time the data is accessed.
 Possible values:
 
 * Any positive integer in seconds, or zero to disable refresh.
+"""),
+    cfg.IntOpt('resource_provider_sync_workers',
+        default=1,
+        min=1,
+        help="""
+Number of resource providers whose inventories, traits and aggregates are
+synced to placement concurrently.
+
+When the resource provider tree of a compute node has changed, for instance at
+startup or after devices were added to the host, the inventories, traits and
+aggregates of each changed resource provider of the tree are pushed to the
+placement service. By default this is done one provider at a time. On hosts
+with many nested resource providers, e.g. for vGPUs or PCI devices, setting
+this option to a higher value pushes the changes of several providers in
+parallel. In this mode, a provider whose generation changed in the placement
+service in the meantime is refreshed and its changes are pushed again once,
+instead of redriving the update of the whole tree.
+
+Possible values:
+
+* 1 to sync resource providers one at a time.
+* Any integer greater than 1 to sync up to that number of resource providers
+  concurrently.
 """),
    cfg.StrOpt('cpu_shared_set',
         help="""
@@ -1055,6 +1104,35 @@ Possible values:
 * ``True``: Packing VM's NUMA cell on most used host NUMA cell.
 * ``False``: Spreading VM's NUMA cell on host's NUMA cells with more resources
   available.
+"""),
+    cfg.StrOpt('resource_tracker_lock_scope',
+        default='host',
+        choices=[
+            ('host', 'The resource claims and the updates of the resource '
+             'usage of all the compute nodes of the host are serialized'),
+            ('node', 'The resource claims and the updates of the resource '
+             'usage of different compute nodes of the host run concurrently'),
+        ],
+        help="""
+The scope of the lock serializing the resource claims and the updates of the
+resource usage in the resource tracker of the compute service.
+
+With the ``host`` scope, a single lock is used for all the compute nodes
+managed by the compute service, so that the periodic update of the resources
+of a compute node, which can take a while, delays the resource claims of the
+instances built on the other compute nodes of the service. With the ``node``
+scope, each compute node has its own lock, and only the operations which are
+not specific to a compute node, like the claims of PCI devices, are serialized
+with the operations on every compute node.
+
+The ``node`` scope is meant for the virt drivers managing many compute nodes,
+like the ironic driver. It makes no difference for the virt drivers managing a
+single compute node. The ``host`` scope is always used when the compute service
+tracks PCI passthrough devices, as they are shared by its compute nodes.
+
+The time waited to acquire the lock of the host and the lock of each compute
+node is recorded in latency histograms, which are part of the Guru Meditation
+Report of the compute service.
 """),
 ]
 
@@ -1106,6 +1184,25 @@ Possible values:
 
 * Any positive integer in seconds.
 * Any value <=0 will disable the sync.
+"""),
+    cfg.IntOpt('heal_instance_info_cache_batch_size',
+        default=1,
+        min=1,
+        max=50,
+        help="""
+Number of instances whose network information cache is updated at each run of
+the periodic task.
+
+With a value greater than 1, the ports and floating IPs of the instances of a
+batch are listed with a single query to Neutron each, and the networks and
+subnets they share are only looked up once, so that the caches of all the
+instances of the host are updated in fewer runs and with fewer queries to
+Neutron. The IDs of the instances and of their ports are passed in the URL of
+these queries, which limits the size of a batch.
+
+Related options:
+
+* ``heal_instance_info_cache_interval``
 """),
     cfg.IntOpt('reclaim_instance_interval',
         default=0,
@@ -91,6 +91,26 @@ will happen in parallel. Higher numbers will cause more computes to work
 in parallel and may result in reduced time to complete the operation, but
 may also DDoS the image service. Lower numbers will result in more sequential
 operation, lower image service load, but likely longer runtime to completion.
+"""),
+    cfg.BoolOpt('prefetch_on_build',
+        default=False,
+        help="""
+Download the image of an instance being built into the image cache while its
+block devices are prepared.
+
+When enabled, the compute service starts downloading the image of an instance
+booted from an image into the image cache of the virt driver as soon as the
+networking of the instance is being allocated, so that the download overlaps
+with the preparation of the block devices of the instance instead of starting
+when the instance is spawned. A failure to prefetch the image is logged and the
+image is then downloaded when the instance is spawned, as usual. The image of
+an instance with trusted image certificates is not prefetched, so that it is
+verified against the certificates when the instance is spawned.
+
+This only helps the virt drivers which keep an image cache that is used when
+spawning the instances, like the libvirt driver. It should not be enabled with
+the ``rbd`` image type of the libvirt driver, as the images would be downloaded
+for nothing.
 """),
 ]
 
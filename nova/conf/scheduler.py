@@ -201,6 +201,176 @@ Possible values:
 Related options:
 
 - ``[compute] compute_driver``
+"""),
+    cfg.BoolOpt("host_state_cache",
+        default=False,
+        help="""
+Keep compute node and service records cached between scheduling requests.
+
+By default every scheduling request loads the compute node and service
+records of the candidate hosts from the cell databases and builds a new host
+state for each of them. When this option is enabled the scheduler keeps these
+records, and the host states built from them, in memory and only reads the
+records created, updated or deleted since the previous request. Host states
+are then only rebuilt for the compute nodes which changed.
+
+Each request is given its own copy of the cached host states. The resources
+consumed by the instances of a request are only deducted from that copy, so
+that they are accounted for when selecting the hosts of its next instances,
+and are dropped with it once the request is handled. Other requests, including
+concurrent ones, do not see them until the compute node reports its updated
+usage, as when this option is disabled; the claims made in the placement
+service still prevent the hosts from being overcommitted.
+
+Possible values:
+
+- A boolean value.
+
+Related options:
+
+- ``[scheduler] host_state_cache_full_refresh_interval``
+"""),
+    cfg.IntOpt("host_state_cache_full_refresh_interval",
+        default=300,
+        min=1,
+        help="""
+Interval in seconds between full reloads of the host state cache.
+
+Changes are detected using the timestamps of the compute node and service
+records, which are set by the services writing them. A full reload of every
+cell is done at this interval to recover from any change missed because of
+clock skew between those services. The resources consumed by the requests
+are never kept in the cached host states, each request consuming them from its
+own copy, so they are not affected by this interval.
+
+Possible values:
+
+- A positive integer, where the integer corresponds to the interval in
+  seconds.
+
+Related options:
+
+- ``[scheduler] host_state_cache``
+"""),
+    cfg.FloatOpt("batch_window",
+        default=0.0,
+        min=0.0,
+        help="""
+Time in seconds during which concurrent scheduling requests are pooled.
+
+When set to a positive value, the scheduling requests received by a scheduler
+worker within this window are scheduled together as a batch. The hosts of
+every instance of the batch are selected first against a single view of the
+hosts, the resources selected for an instance being consumed from that view
+before selecting the hosts of the next one. The resources of all the instances
+of the batch are then claimed in the placement service concurrently. A request
+for which claiming fails is scheduled again on its own.
+
+This can increase the number of instances scheduled per second, and decrease
+the number of conflicting claims, when many instances are created at once, at
+the cost of delaying every request by up to this window.
+
+Possible values:
+
+* 0 (the default), which disables the batching of scheduling requests.
+* A positive number of seconds, usually a fraction of a second.
+
+Related options:
+
+* ``[scheduler] batch_max_requests``
+"""),
+    cfg.IntOpt("batch_max_requests",
+        default=32,
+        min=1,
+        help="""
+Maximum number of scheduling requests pooled into a batch.
+
+A batch is scheduled as soon as it holds this number of requests, without
+waiting for the end of ``[scheduler] batch_window``.
+
+Possible values:
+
+* A positive integer.
+
+Related options:
+
+* ``[scheduler] batch_window``
+"""),
+    cfg.FloatOpt("allocation_candidates_cache_ttl",
+        default=0.0,
+        min=0.0,
+        help="""
+Time in seconds during which allocation candidates are reused.
+
+When set to a positive value, the allocation candidates returned by the
+placement service are cached by the scheduler, keyed by the query made for the
+resources requested. Identical requests made within this time, such as when
+many instances of the same flavor are created at once, reuse the cached
+allocation candidates instead of querying placement again.
+
+The resources claimed by the scheduler are consumed from the cached allocation
+candidates, dropping the candidates which no longer fit. The cache is
+invalidated when a claim fails with a conflict, since the resource providers
+were changed by another process, and the entries involving a resource provider
+are invalidated when the scheduler sees the generation of that provider change.
+
+Possible values:
+
+* 0 (the default), which disables the caching of allocation candidates.
+* A positive number of seconds, usually a few seconds at most. Higher values
+  increase the likelihood of selecting hosts whose resources were consumed by
+  other schedulers in the meantime, and then having to retry the claim.
+"""),
+    cfg.StrOpt("shard_by",
+        default="none",
+        choices=[
+            ("none", "Every scheduler considers every host."),
+            ("cell", "The hosts are partitioned by cell."),
+            ("aggregate", "The hosts are partitioned by availability zone, "
+                          "that is by availability zone aggregate. Every "
+                          "scheduler still loads every host."),
+        ],
+        help="""
+Partition the hosts between the schedulers.
+
+The cells, or the availability zones, are spread over the ``nova-scheduler``
+services which are up using a consistent hash ring. Each scheduler then
+prefers the hosts of its own partition, the hosts of the other partitions only
+being used when none of its own hosts fit. Concurrent requests handled by
+different schedulers therefore select different hosts, which decreases the
+number of conflicting claims in the placement service.
+
+With ``cell``, the host state cache of each scheduler only keeps the hosts of
+its own cells, and the hosts of the other cells are only loaded, without being
+cached, for the requests which none of its own hosts fit. With ``aggregate``,
+every scheduler still loads and filters the hosts of every availability zone
+for each request, since the availability zone of a host is only known once its
+aggregates are, so it neither reduces the memory used by the schedulers nor
+the number of hosts they load.
+
+The requests whose target cell, for a move operation restricted to a cell, or
+whose availability zone, with ``aggregate``, is known are sent to the
+scheduler owning it. This option therefore has to be set the same way for the
+``nova-conductor`` and ``nova-scheduler`` services.
+
+Related options:
+
+* ``[scheduler] shard_refresh_interval``
+* ``[scheduler] host_state_cache``
+"""),
+    cfg.IntOpt("shard_refresh_interval",
+        default=60,
+        min=1,
+        help="""
+Interval in seconds between the refreshes of the list of the schedulers the
+hosts are partitioned between.
+
+The ``nova-scheduler`` services which are up are looked up in the database at
+this interval, and the partitions are computed again when they changed.
+
+Related options:
+
+* ``[scheduler] shard_by``
 """),
 ]
 
@@ -270,6 +440,35 @@ Possible values:
 
 Related options:
 
+- ``[filter_scheduler] enabled_filters``
+"""),
+    cfg.IntOpt("numa_fit_cache_size",
+        default=0,
+        min=0,
+        help="""
+Maximum number of results of fitting an instance NUMA topology onto a host
+NUMA topology cached by the ``NUMATopologyFilter``.
+
+Fitting the NUMA topology of an instance onto a host is expensive, in
+particular for instances with pinned CPUs. In large deployments, many hosts
+often have the same hardware and the same free resources on each of their NUMA
+nodes. When this option is greater than zero, the filter remembers the result
+of each fit, keyed by the state of the host NUMA topology and PCI devices and
+by the NUMA, PCI and network requirements of the instance, so that hosts in
+the same state as a host already checked are not checked again. Up to this
+number of results are kept, the least recently used results being discarded
+first. Results are never reused once the NUMA topology of the host changes.
+
+Note that this setting only affects scheduling if the ``NUMATopologyFilter``
+filter is enabled.
+
+Possible values:
+
+* 0 to disable the cache.
+* Any positive integer, the number of results to cache.
+
+Related options:
+
 - ``[filter_scheduler] enabled_filters``
 """),
     cfg.BoolOpt("track_instance_changes",
@@ -912,6 +1111,49 @@ and all nova-conductor services.
 * ``[pci] report_in_placement``
 * ``[pci] alias``
 * ``[pci] device_spec``
+"""),
+    cfg.BoolOpt(
+        "vectorized_filtering",
+        default=False,
+        help="""
+Evaluate host filters over arrays of host state values.
+
+When enabled, the numeric fields of every candidate host (free RAM and disk,
+vCPU usage, I/O operations, instance counts, ...) are laid out in arrays once
+per request and filters that support it, such as ``ComputeFilter``,
+``IoOpsFilter`` and ``NumInstancesFilter``, evaluate all hosts at once instead
+of one host at a time. Filters without such support, including out-of-tree
+filters, are still run host by host.
+
+This requires the ``numpy`` library. If it cannot be imported, the scheduler
+logs a warning and falls back to filtering hosts one at a time.
+
+Related options:
+
+* ``[filter_scheduler] enabled_filters``
+"""),
+    cfg.BoolOpt(
+        "vectorized_weighing",
+        default=False,
+        help="""
+Compute host weights over arrays of host state values.
+
+When enabled, weighers that support it, such as ``RAMWeigher``,
+``CPUWeigher``, ``DiskWeigher``, ``IoOpsWeigher``, ``NumInstancesWeigher`` and
+``MetricsWeigher``, return the raw weights of all hosts at once, and the
+weights are normalized and combined as arrays. Only the best hosts needed to
+pick a destination and its alternates are then sorted into weighed host
+objects. Weighers without such support, including out-of-tree weighers, are
+still run host by host.
+
+This requires the ``numpy`` library. If it cannot be imported, the scheduler
+logs a warning and falls back to weighing hosts one at a time.
+
+Related options:
+
+* ``[filter_scheduler] weight_classes``
+* ``[filter_scheduler] host_subset_size``
+* ``[scheduler] max_attempts``
 """),
 ]
 
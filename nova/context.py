@@ -19,6 +19,7 @@
 
 from contextlib import contextmanager
 import copy
+import time
 
 import futurist.waiters
 from keystoneauth1.access import service_catalog as ksa_service_catalog
@@ -30,6 +31,7 @@ from oslo_utils import timeutils
 
 from nova import exception
 from nova.i18n import _
+from nova import instrumentation
 from nova import objects
 from nova import policy
 from nova import utils
@@ -47,6 +49,41 @@ CELLS = []
 CELL_TIMEOUT = 60
 
 
+def _record_cell_latency(cell_uuid, queued=None, run=None):
+    """Record the latency of a call to a cell, or a timeout if no latency
+    is given.
+    """
+    if run is None:
+        instrumentation.record_timeout(instrumentation.CELL, cell_uuid)
+    else:
+        instrumentation.record(instrumentation.CELL_QUEUE, cell_uuid, queued)
+        instrumentation.record(instrumentation.CELL, cell_uuid, run)
+
+
+def get_cell_latency_stats():
+    """Return the latency histograms of the calls made to each cell by
+    scatter_gather_cells().
+
+    :returns: A dict, keyed by cell uuid, of dicts with the number of calls
+              and timeouts, the histograms of the time spent waiting for a
+              cell worker and running the call, keyed by upper bound of their
+              bucket, and the average and maximum time running the calls.
+    """
+    stats = instrumentation.get_stats()
+    queue_stats = stats.get(instrumentation.CELL_QUEUE, {})
+    empty = instrumentation.LatencyHistogram().to_dict()
+    return {
+        cell_uuid: {
+            'count': run['count'],
+            'timeouts': run['timeouts'],
+            'queued': queue_stats.get(cell_uuid, empty)['buckets'],
+            'run': run['buckets'],
+            'run_avg': run['avg'],
+            'run_max': run['max'],
+        }
+        for cell_uuid, run in stats.get(instrumentation.CELL, {}).items()}
+
+
 class _ContextAuthPlugin(plugin.BaseAuthPlugin):
     """A keystoneauth auth plugin that uses the values from the Context.
 
@@ -415,7 +452,8 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     tasks = {}
     results = {}
 
-    def gather_result(cell_uuid, fn, *args, **kwargs):
+    def gather_result(cell_uuid, submitted, fn, *args, **kwargs):
+        started = time.monotonic()
         try:
             result = fn(*args, **kwargs)
         except Exception as e:
@@ -423,6 +461,8 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
             if not isinstance(e, exception.NovaException):
                 LOG.exception('Error gathering result from cell %s', cell_uuid)
             result = e
+        _record_cell_latency(cell_uuid, queued=started - submitted,
+                             run=time.monotonic() - started)
 
         return result
 
@@ -432,7 +472,8 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
         with target_cell(context, cell_mapping) as cctxt:
             future = utils.spawn_on(
                 executor,
-                gather_result, cell_mapping.uuid, fn, cctxt, *args, **kwargs)
+                gather_result, cell_mapping.uuid, time.monotonic(), fn, cctxt,
+                *args, **kwargs)
             tasks[cell_mapping.uuid] = future
 
     futurist.waiters.wait_for_all(tasks.values(), timeout)
@@ -440,6 +481,7 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     for cell_uuid, future in tasks.items():
         if not future.done():
             results[cell_uuid] = did_not_respond_sentinel
+            _record_cell_latency(cell_uuid)
             cancelled = future.cancel()
             if cancelled:
                 if utils.concurrency_mode_threading():
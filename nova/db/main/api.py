@@ -471,6 +471,24 @@ def service_get_all_by_binary(context, binary, include_disabled=False):
     return query.all()
 
 
+@pick_context_manager_reader
+def service_get_all_by_binary_changed_since(context, binary, changed_since):
+    """Get services for a given binary changed since a point in time.
+
+    Services created, updated or deleted at or after 'changed_since' are
+    returned, including deleted ones, so that callers caching services can
+    evict them.
+    """
+    changed_since = timeutils.normalize_time(changed_since)
+    query = model_query(context, models.Service, read_deleted="yes").\
+                    filter_by(binary=binary).\
+                    filter(sql.or_(
+                        models.Service.created_at >= changed_since,
+                        models.Service.updated_at >= changed_since,
+                        models.Service.deleted_at >= changed_since))
+    return query.all()
+
+
 @pick_context_manager_reader
 def service_get_all_computes_by_hv_type(context, hv_type,
                                         include_disabled=False):
@@ -4759,6 +4777,24 @@ def pci_device_update(context, node_id, address, values):
     return query.one()
 
 
+@pick_context_manager_writer
+def pci_device_update_all(context, node_id, updates, destroyed):
+    """Update and delete PCI devices of one host in a single transaction.
+
+    :param node_id: The id of the compute node of the devices.
+    :param updates: A dict, keyed by device address, of the values to update.
+        Devices which do not exist are created, as with pci_device_update().
+    :param destroyed: A list of the addresses of the devices to delete.
+    :returns: A dict, keyed by device address, of the updated devices.
+    :raises: PciDeviceNotFound if a device to delete does not exist, in which
+        case no change is made.
+    """
+    for address in destroyed:
+        pci_device_destroy(context, node_id, address)
+    return {address: pci_device_update(context, node_id, address, values)
+            for address, values in updates.items()}
+
+
 ####################
 
 
@@ -18,7 +18,9 @@ Filter support
 """
 
 from oslo_log import log as logging
+from oslo_utils import timeutils
 
+from nova import instrumentation
 from nova import loadables
 
 LOG = logging.getLogger(__name__)
@@ -44,6 +46,15 @@ class BaseFilter(object):
             if self._filter_one(obj, spec_obj):
                 yield obj
 
+    def filter_all_vectorized(self, columns, spec_obj):
+        """Return a boolean mask of the objects passing the filter.
+
+        ``columns`` is the columnar view of the objects returned by the
+        handler's get_columns(). Return None, which is the default, if the
+        filter can't be evaluated that way; filter_all() is then used instead.
+        """
+        return None
+
     # Set to true in a subclass if a filter only needs to be run once
     # for each request rather than for each instance
     run_filter_once_per_request = False
@@ -65,9 +76,22 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
-    def get_filtered_objects(self, filters, objs, spec_obj, index=0):
+    def get_columns(self, objs):
+        """Return a columnar view of objs for vectorized filtering.
+
+        Return None if the objects can't be filtered that way. Override this
+        in a subclass.
+        """
+        return None
+
+    def get_filtered_objects(self, filters, objs, spec_obj, index=0,
+                             vectorized=False):
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
+        # When vectorized, filters able to evaluate all objects at once are
+        # given a columnar view of them, which is narrowed down alongside
+        # list_objs as objects are removed.
+        columns = self.get_columns(list_objs) if vectorized else None
         # Track the hosts as they are removed. The 'full_filter_results' list
         # contains the host/nodename info for every host that passes each
         # filter, while the 'part_filter_results' list just tracks the number
@@ -82,12 +106,30 @@ class BaseFilterHandler(loadables.BaseLoader):
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
-                objs = filter_.filter_all(list_objs, spec_obj)
-                if objs is None:
-                    LOG.debug("Filter %s says to stop filtering", cls_name)
-                    return
-                list_objs = list(objs)
+                timer = timeutils.StopWatch()
+                timer.start()
+                mask = None
+                if columns is not None:
+                    mask = filter_.filter_all_vectorized(columns, spec_obj)
+                if mask is not None:
+                    columns = columns.compress(mask)
+                    list_objs = list(columns.objs)
+                else:
+                    objs = filter_.filter_all(list_objs, spec_obj)
+                    if objs is None:
+                        instrumentation.record(
+                            instrumentation.FILTER, cls_name,
+                            timer.elapsed(), objs_in=start_count, objs_out=0)
+                        LOG.debug("Filter %s says to stop filtering",
+                                  cls_name)
+                        return
+                    list_objs = list(objs)
+                    if columns is not None:
+                        columns = columns.select(list_objs)
                 end_count = len(list_objs)
+                instrumentation.record(
+                    instrumentation.FILTER, cls_name, timer.elapsed(),
+                    objs_in=start_count, objs_out=end_count)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
                 if list_objs:
@@ -0,0 +1,153 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-process registry of latency histograms.
+
+The scheduler records here how long each filter, weigher and request filter
+takes for each request, how many objects go in and out of them, and how long
+the calls to placement take. The calls made to the cells by
+scatter_gather_cells() are recorded here too, split between the time spent
+waiting for a cell worker and running the call, as well as the time the
+compute service waits to acquire the locks of its resource tracker. The
+histograms can be scraped
+with get_stats() or dumped with dump(), and are part of the Guru Meditation
+Report of the services registering report_section().
+"""
+
+import bisect
+import threading
+
+from oslo_reports.models import with_default_views
+from oslo_serialization import jsonutils
+
+# Kinds of the recorded operations
+FILTER = 'filter'
+WEIGHER = 'weigher'
+REQUEST_FILTER = 'request_filter'
+PLACEMENT = 'placement'
+CELL = 'cell'
+CELL_QUEUE = 'cell_queue'
+LOCK = 'lock'
+
+# Latency histograms, keyed by (kind, name)
+LATENCY = {}
+_LATENCY_LOCK = threading.Lock()
+
+
+class LatencyHistogram(object):
+    """Histogram of the latency of an operation.
+
+    For operations processing a list of objects, like the filters, the total
+    number of objects going in and out of the operation is counted too. The
+    runs of the operation which timed out are counted separately, their
+    latency being recorded if they complete afterwards.
+    """
+
+    # Upper bounds, in seconds, of the buckets of the histograms
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10,
+               30, 60)
+
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.objs_in = 0
+        self.objs_out = 0
+
+    def record(self, elapsed, objs_in=None, objs_out=None):
+        self.count += 1
+        self.buckets[bisect.bisect_left(self.BUCKETS, elapsed)] += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        if objs_in is not None:
+            self.objs_in += objs_in
+        if objs_out is not None:
+            self.objs_out += objs_out
+
+    def to_dict(self):
+        bounds = [str(bound) for bound in self.BUCKETS] + ['+Inf']
+        return {
+            'count': self.count,
+            'timeouts': self.timeouts,
+            'buckets': dict(zip(bounds, self.buckets)),
+            'avg': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'total': self.total,
+            'objs_in': self.objs_in,
+            'objs_out': self.objs_out,
+        }
+
+
+def record(kind, name, elapsed, objs_in=None, objs_out=None):
+    """Record the latency, in seconds, of a run of an operation.
+
+    :param kind: The kind of the operation, like FILTER or WEIGHER.
+    :param name: The name of the operation, like the class name of a filter.
+    :param elapsed: How long the operation took, in seconds.
+    :param objs_in: The number of objects the operation was given, if any.
+    :param objs_out: The number of objects the operation returned, if any.
+    """
+    with _LATENCY_LOCK:
+        _get_histogram(kind, name).record(
+            elapsed, objs_in=objs_in, objs_out=objs_out)
+
+
+def record_timeout(kind, name):
+    """Record that a run of an operation timed out.
+
+    :param kind: The kind of the operation, like CELL.
+    :param name: The name of the operation, like the uuid of a cell.
+    """
+    with _LATENCY_LOCK:
+        _get_histogram(kind, name).timeouts += 1
+
+
+def _get_histogram(kind, name):
+    histogram = LATENCY.get((kind, name))
+    if histogram is None:
+        histogram = LATENCY[(kind, name)] = LatencyHistogram()
+    return histogram
+
+
+def get_stats():
+    """Return the recorded latency histograms.
+
+    :returns: A dict, keyed by kind of operation, of dicts keyed by name of
+              operation of the number of runs and of timeouts, the
+              histogram of their latency keyed by upper bound of their
+              bucket, the average, maximum and total latency, and the total
+              number of objects going in and out of the operation.
+    """
+    stats = {}
+    with _LATENCY_LOCK:
+        for (kind, name), histogram in LATENCY.items():
+            stats.setdefault(kind, {})[name] = histogram.to_dict()
+    return stats
+
+
+def reset():
+    """Drop all the recorded latency histograms."""
+    with _LATENCY_LOCK:
+        LATENCY.clear()
+
+
+def dump():
+    """Return the recorded latency histograms as a JSON document."""
+    return jsonutils.dumps(get_stats(), indent=2, sort_keys=True)
+
+
+def report_section():
+    """Generate the Guru Meditation Report section of the histograms."""
+    return with_default_views.ModelWithDefaultViews(get_stats())
@@ -18,6 +18,8 @@
 API and utilities for nova-network interactions.
 """
 
+import collections
+import contextlib
 import copy
 import functools
 import inspect
@@ -218,6 +220,75 @@ class ClientWrapper:
         return wrapper
 
 
+class BatchClientWrapper:
+    """A Neutron client wrapper sharing queries between several instances.
+
+    Used to refresh the network info of several instances at once: the ports
+    and the floating IPs of all the instances are listed beforehand, and the
+    other queries needed to build their network info, like the lookups of
+    their networks and subnets, are only sent once for the same parameters.
+    """
+
+    def __init__(self, client, ports, floating_ips):
+        self.client = client
+        # Lists of ports keyed by device ID
+        self._ports = collections.defaultdict(list)
+        for port in ports:
+            self._ports[port['device_id']].append(port)
+        # Lists of floating IPs keyed by port ID, for all the prefetched ports
+        self._floating_ips = {port['id']: [] for port in ports}
+        for fip in floating_ips:
+            if fip.get('port_id') in self._floating_ips:
+                self._floating_ips[fip['port_id']].append(fip)
+        # Results of the queries, keyed by method and parameters
+        self._results = {}
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    @staticmethod
+    def _freeze(value):
+        if isinstance(value, (list, tuple, set)):
+            return tuple(sorted(value))
+        return value
+
+    def _memoized(self, name, *args, **kwargs):
+        key = (name, args, tuple(sorted(
+            (key, self._freeze(value)) for key, value in kwargs.items())))
+        if key not in self._results:
+            self._results[key] = getattr(self.client, name)(*args, **kwargs)
+        # Callers may change the results
+        return copy.deepcopy(self._results[key])
+
+    def list_ports(self, **kwargs):
+        device_id = kwargs.get('device_id')
+        if (set(kwargs) == {'tenant_id', 'device_id'} and
+                device_id in self._ports):
+            return {'ports': copy.deepcopy(
+                [port for port in self._ports[device_id]
+                 if port['tenant_id'] == kwargs['tenant_id']])}
+        return self._memoized('list_ports', **kwargs)
+
+    def list_floatingips(self, **kwargs):
+        port_id = kwargs.get('port_id')
+        if (set(kwargs) == {'fixed_ip_address', 'port_id'} and
+                port_id in self._floating_ips):
+            return {'floatingips': copy.deepcopy(
+                [fip for fip in self._floating_ips[port_id]
+                 if fip['fixed_ip_address'] ==
+                 kwargs['fixed_ip_address']])}
+        return self.client.list_floatingips(**kwargs)
+
+    def list_networks(self, **kwargs):
+        return self._memoized('list_networks', **kwargs)
+
+    def list_subnets(self, **kwargs):
+        return self._memoized('list_subnets', **kwargs)
+
+    def show_network(self, network, **kwargs):
+        return self._memoized('show_network', network, **kwargs)
+
+
 def _get_auth_plugin(context, admin=False):
     # NOTE(dprince): In the case where no auth_token is present we allow use of
     # neutron admin tenant credentials if it is an admin context.  This is to
@@ -2052,6 +2123,52 @@ class API:
                                                nw_info=result)
         return result
 
+    def get_instances_nw_info(self, context, instances):
+        """Refreshes the network info of several instances from Neutron.
+
+        Like calling get_instance_nw_info() with force_refresh=True for each
+        instance, except that the ports and floating IPs of all the instances
+        are listed with a single query each, and that the networks and
+        subnets the instances share are only looked up once.
+
+        :param context: The request context.
+        :param instances: The list of instances to refresh.
+        :returns: A dict, keyed by instance UUID, of the NetworkInfo of each
+            instance, or of the exception raised while refreshing it.
+        """
+        with contextlib.ExitStack() as stack:
+            # NOTE: The refresh_cache locks of all the instances are held
+            # while their ports are listed, so that a port attached to or
+            # detached from an instance after the listing is only reflected in
+            # its cache by the refresh following that change, which waits for
+            # the lock, and is not overwritten by the stale listing.
+            for instance_uuid in sorted({inst.uuid for inst in instances}):
+                stack.enter_context(
+                    lockutils.lock('refresh_cache-%s' % instance_uuid))
+
+            client = get_client(context, admin=True)
+            ports = client.list_ports(
+                device_id=[instance.uuid for instance in instances]).get(
+                    'ports', [])
+            floating_ips = []
+            if ports:
+                floating_ips = self._safe_get_floating_ips(
+                    client, port_id=[port['id'] for port in ports])
+            batch_client = BatchClientWrapper(client, ports, floating_ips)
+
+            results = {}
+            for instance in instances:
+                try:
+                    result = self._get_instance_nw_info(
+                        context, instance, admin_client=batch_client,
+                        force_refresh=True)
+                    update_instance_cache_with_nw_info(
+                        self, context, instance, nw_info=result)
+                    results[instance.uuid] = result
+                except Exception as e:
+                    results[instance.uuid] = e
+        return results
+
     def _get_instance_nw_info(self, context, instance, networks=None,
                               port_ids=None, admin_client=None,
                               preexisting_port_ids=None,
@@ -3301,9 +3418,9 @@ class API:
                              if fixed_ip.is_in_subnet(subnet)]
         return subnets
 
-    def _nw_info_build_network(self, context, port, networks, subnets):
-        # TODO(stephenfin): Pass in an existing admin client if available.
-        neutron = get_client(context, admin=True)
+    def _nw_info_build_network(self, context, port, networks, subnets,
+                               client=None):
+        neutron = client or get_client(context, admin=True)
         network_name = None
         network_mtu = None
         for net in networks:
@@ -3419,7 +3536,7 @@ class API:
 
         network, ovs_interfaceid = (
             self._nw_info_build_network(context, current_neutron_port,
-                                        networks, subnets))
+                                        networks, subnets, client=client))
         preserve_on_delete = (current_neutron_port['id'] in
                               preexisting_port_ids)
 
@@ -14,6 +14,7 @@
 
 from oslo_db import exception as db_exc
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 from oslo_utils import versionutils
 import sqlalchemy as sa
@@ -428,7 +429,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.15 Added get_by_pagination()
     # Version 1.16: Added get_all_by_uuids()
     # Version 1.17: Added get_all_by_not_mapped()
-    VERSION = '1.17'
+    # Version 1.18: Added get_all_changed_since()
+    VERSION = '1.18'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -501,6 +503,32 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @staticmethod
+    @db.select_db_reader_mode
+    def _db_compute_node_get_all_changed_since(context, changed_since,
+                                               use_slave=False):
+        changed_since = timeutils.normalize_time(changed_since)
+        db_computes = db.model_query(
+            context, models.ComputeNode, read_deleted='yes').filter(
+            sql.or_(models.ComputeNode.created_at >= changed_since,
+                    models.ComputeNode.updated_at >= changed_since,
+                    models.ComputeNode.deleted_at >= changed_since)).all()
+        return db_computes
+
+    @base.remotable_classmethod
+    def get_all_changed_since(cls, context, changed_since, use_slave=False):
+        """Return the compute nodes changed since a point in time.
+
+        Compute nodes created, updated or deleted at or after changed_since
+        are returned. Deleted compute nodes are included, with their
+        ``deleted`` field set, so that callers caching compute nodes can
+        evict them.
+        """
+        db_computes = cls._db_compute_node_get_all_changed_since(
+            context, changed_since, use_slave=use_slave)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @staticmethod
     @db.select_db_reader_mode
     def _db_compute_node_get_by_hv_type(context, hv_type):
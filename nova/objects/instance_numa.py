@@ -123,8 +123,16 @@ class InstanceNUMACell(base.NovaEphemeralObject,
         self.cpu_pinning = pinning_dict
 
     def pin_vcpus(self, *cpu_pairs):
-        for vcpu, pcpu in cpu_pairs:
-            self.pin(vcpu, pcpu)
+        # Set the field once rather than for each pair, since setting it
+        # coerces the whole dict.
+        pcpuset = self.pcpuset
+        cpu_pairs = [(vcpu, pcpu) for vcpu, pcpu in cpu_pairs
+                     if vcpu in pcpuset]
+        if not cpu_pairs:
+            return
+        pinning_dict = self.cpu_pinning or {}
+        pinning_dict.update(cpu_pairs)
+        self.cpu_pinning = pinning_dict
 
     def clear_host_pinning(self):
         """Clear any data related to how this cell is pinned to the host.
@@ -69,7 +69,8 @@ class NUMACell(base.NovaObject):
     @property
     def free_siblings(self):
         """Return available dedicated CPUs in their sibling set form."""
-        return [sibling_set & self.free_pcpus for sibling_set in self.siblings]
+        free_pcpus = self.free_pcpus
+        return [sibling_set & free_pcpus for sibling_set in self.siblings]
 
     @property
     def avail_pcpus(self):
@@ -325,6 +325,19 @@ class PciDevice(base.NovaPersistentObject, base.NovaObject):
         pci_device._context = context
         return pci_device
 
+    def _get_db_updates(self):
+        # TODO(jaypipes): Remove in 2.0 version of object. This does an
+        # inline migration to populate the uuid field. A similar migration
+        # is done in the _from_db_object() method to migrate objects as
+        # they are read from the DB.
+        if 'uuid' not in self:
+            self.uuid = uuidutils.generate_uuid()
+        updates = self.obj_get_changes()
+
+        if 'extra_info' in updates:
+            updates['extra_info'] = jsonutils.dumps(updates['extra_info'])
+        return updates
+
     @base.remotable
     def save(self):
         if self.status == fields.PciDeviceStatus.REMOVED:
@@ -332,16 +345,7 @@ class PciDevice(base.NovaPersistentObject, base.NovaObject):
             db.pci_device_destroy(self._context, self.compute_node_id,
                                   self.address)
         elif self.status != fields.PciDeviceStatus.DELETED:
-            # TODO(jaypipes): Remove in 2.0 version of object. This does an
-            # inline migration to populate the uuid field. A similar migration
-            # is done in the _from_db_object() method to migrate objects as
-            # they are read from the DB.
-            if 'uuid' not in self:
-                self.uuid = uuidutils.generate_uuid()
-            updates = self.obj_get_changes()
-
-            if 'extra_info' in updates:
-                updates['extra_info'] = jsonutils.dumps(updates['extra_info'])
+            updates = self._get_db_updates()
             if updates:
                 db_pci = db.pci_device_update(self._context,
                                               self.compute_node_id,
@@ -612,7 +616,8 @@ class PciDeviceList(base.ObjectListBase, base.NovaObject):
     # Version 1.1: PciDevice 1.2
     # Version 1.2: PciDevice 1.3
     # Version 1.3: Adds get_by_parent_address
-    VERSION = '1.3'
+    # Version 1.4: Adds save_devices
+    VERSION = '1.4'
 
     fields = {
         'objects': fields.ListOfObjectsField('PciDevice'),
@@ -644,5 +649,39 @@ class PciDeviceList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.PciDevice,
                                   db_dev_list)
 
+    @base.remotable_classmethod
+    def save_devices(cls, context, compute_node_id, devices):
+        """Save the changes of PCI devices of a compute node at once.
+
+        This does what PciDevice.save() does for each of the devices, but in
+        a single transaction, so that saving many devices only takes one
+        round trip to the conductor.
+
+        :param compute_node_id: The id of the compute node of the devices
+        :param devices: The list of PciDevice objects to save
+        :returns: A PciDeviceList of the saved devices, in the same order
+        """
+        updates = {}
+        destroyed = []
+        for dev in devices:
+            if dev.status == fields.PciDeviceStatus.REMOVED:
+                destroyed.append(dev.address)
+            elif dev.status != fields.PciDeviceStatus.DELETED:
+                dev_updates = dev._get_db_updates()
+                if dev_updates:
+                    updates[dev.address] = dev_updates
+
+        db_devs = db.pci_device_update_all(
+            context, compute_node_id, updates, destroyed)
+
+        for dev in devices:
+            if dev.status == fields.PciDeviceStatus.REMOVED:
+                dev.status = fields.PciDeviceStatus.DELETED
+                dev.obj_reset_changes()
+            elif dev.address in db_devs:
+                objects.PciDevice._from_db_object(
+                    context, dev, db_devs[dev.address])
+        return cls(context, objects=list(devices))
+
     def __repr__(self):
         return f"PciDeviceList(objects={[repr(obj) for obj in self.objects]})"
@@ -691,7 +691,8 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
     # Version 1.17: Service version 1.19
     # Version 1.18: Added include_disabled parameter to get_by_binary()
     # Version 1.19: Added get_all_computes_by_hv_type()
-    VERSION = '1.19'
+    # Version 1.20: Added get_by_binary_changed_since()
+    VERSION = '1.20'
 
     fields = {
         'objects': fields.ListOfObjectsField('Service'),
@@ -712,6 +713,17 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.Service,
                                   db_services)
 
+    @base.remotable_classmethod
+    def get_by_binary_changed_since(cls, context, binary, changed_since):
+        """Return the services of a binary changed since a point in time.
+
+        Deleted services are included, with their ``deleted`` field set.
+        """
+        db_services = db.service_get_all_by_binary_changed_since(
+            context, binary, changed_since)
+        return base.obj_make_list(context, cls(context), objects.Service,
+                                  db_services)
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host):
         db_services = db.service_get_all_by_host(context, host)
@@ -97,12 +97,25 @@ class PciDevTracker(object):
                 self.stats.add_device(dev)
 
     def save(self, context: ctx.RequestContext) -> None:
-        for dev in self.pci_devs:
-            if dev.obj_what_changed():
-                with dev.obj_alternate_context(context):
-                    dev.save()
-                    if dev.status == fields.PciDeviceStatus.DELETED:
-                        self.pci_devs.objects.remove(dev)
+        changed = [dev for dev in self.pci_devs if dev.obj_what_changed()]
+        if not changed:
+            return
+
+        # Save all the changed devices with a single call, rather than one
+        # per device, as there can be hundreds of them with SR-IOV.
+        saved = objects.PciDeviceList.save_devices(
+            context, self.node_id, changed)
+        for dev, saved_dev in zip(changed, saved):
+            if saved_dev is not dev:
+                # The devices were saved remotely by the conductor, so the
+                # result needs to be copied to the devices we track, which
+                # are also referenced by the claims, allocations and stats.
+                for field in saved_dev.fields:
+                    if saved_dev.obj_attr_is_set(field):
+                        setattr(dev, field, getattr(saved_dev, field))
+                dev.obj_reset_changes()
+            if dev.status == fields.PciDeviceStatus.DELETED:
+                self.pci_devs.objects.remove(dev)
 
     @property
     def pci_stats(self) -> stats.PciDeviceStats:
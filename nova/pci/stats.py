@@ -91,6 +91,151 @@ class PciDeviceStats(object):
         self.pools.sort(key=lambda item: len(item))
         self.dev_filter = dev_filter or whitelist.Whitelist(
             CONF.pci.device_spec)
+        self._reset_indexes()
+
+    def _reset_indexes(self) -> None:
+        """Drop the indexes kept over the pools, they are rebuilt on demand.
+
+        * ``_pool_index`` maps the keys of a pool, as used by ``_find_pool``,
+          to the pool itself.
+        * ``_spec_index`` maps the lowercase (vendor_id, product_id) of the
+          pools to their positions in ``pools``, so that the pools matching
+          a request spec can be found without checking every pool.
+        * ``_free_devs_index`` maps the address of every free device to the
+          pool holding it and to the device itself.
+
+        Each index remembers the number of pools it was built for, so that
+        it gets rebuilt if the pool list was changed behind our back.
+        """
+        self._pool_index: ty.Optional[ty.Dict[ty.Tuple, Pool]] = None
+        self._pool_index_len = 0
+        self._spec_index: ty.Optional[
+            ty.Dict[ty.Tuple[ty.Any, ty.Any], ty.List[int]]] = None
+        self._spec_index_len = 0
+        self._free_devs_index: ty.Optional[
+            ty.Dict[str, ty.Tuple[Pool, 'objects.PciDevice']]] = None
+        self._free_devs_index_len = 0
+
+    def _get_pool_key(self, pool: Pool) -> ty.Optional[ty.Tuple]:
+        """Return the hashable key identifying the pool a device belongs to.
+
+        None is returned if one of the values of the pool is not hashable, in
+        which case the pool can only be found by scanning the pools.
+        """
+        ignored = self.ignored_pool_tags + ['count', 'devices']
+        key = tuple(sorted(
+            (k, v) for k, v in pool.items() if k not in ignored))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _get_pool_index(self) -> ty.Dict[ty.Tuple, Pool]:
+        if (self._pool_index is None or
+                self._pool_index_len != len(self.pools)):
+            self._pool_index = {}
+            for pool in self.pools:
+                key = self._get_pool_key(pool)
+                if key is not None:
+                    self._pool_index.setdefault(key, pool)
+            self._pool_index_len = len(self.pools)
+        return self._pool_index
+
+    @staticmethod
+    def _get_spec_key(
+        props: ty.Dict[str, ty.Any],
+    ) -> ty.Tuple[ty.Any, ty.Any]:
+        # NOTE: this follows pci_device_prop_match that compares the strings
+        # case-insensitively.
+        return tuple(  # type: ignore
+            v.lower() if isinstance(v, str) else v
+            for v in (props.get('vendor_id'), props.get('product_id')))
+
+    def _get_spec_index(
+        self,
+    ) -> ty.Dict[ty.Tuple[ty.Any, ty.Any], ty.List[int]]:
+        if (self._spec_index is None or
+                self._spec_index_len != len(self.pools)):
+            # NOTE: copies made by support_requests share this index with
+            # their original as they have the pools at the same positions, so
+            # it is never updated in place but replaced.
+            spec_index: ty.Dict[ty.Tuple[ty.Any, ty.Any], ty.List[int]] = (
+                collections.defaultdict(list))
+            for i, pool in enumerate(self.pools):
+                spec_index[self._get_spec_key(pool)].append(i)
+            self._spec_index = dict(spec_index)
+            self._spec_index_len = len(self.pools)
+        return self._spec_index
+
+    def _get_free_devs_index(
+        self,
+    ) -> ty.Dict[str, ty.Tuple[Pool, 'objects.PciDevice']]:
+        if (self._free_devs_index is None or
+                self._free_devs_index_len != len(self.pools)):
+            self._free_devs_index = {}
+            for pool in self.pools:
+                for dev in pool.get('devices', []):
+                    self._free_devs_index.setdefault(dev.address, (pool, dev))
+            self._free_devs_index_len = len(self.pools)
+        return self._free_devs_index
+
+    def _add_pool(self, pool: Pool) -> None:
+        """Add a new pool and keep the indexes in sync."""
+        pool_index = self._get_pool_index()
+        free_devs_index = self._get_free_devs_index()
+        self.pools.append(pool)
+        self.pools.sort(key=lambda item: len(item))
+        key = self._get_pool_key(pool)
+        if key is not None:
+            pool_index.setdefault(key, pool)
+        self._pool_index_len = len(self.pools)
+        for dev in pool.get('devices', []):
+            free_devs_index.setdefault(dev.address, (pool, dev))
+        self._free_devs_index_len = len(self.pools)
+        self._spec_index = None
+
+    def _remove_pool(self, pool_list: ty.List[Pool], pool: Pool) -> None:
+        """Remove a pool from pool_list and keep the indexes in sync."""
+        if pool_list is not self.pools:
+            pool_list.remove(pool)
+            return
+
+        pool_index = self._get_pool_index()
+        free_devs_index = self._get_free_devs_index()
+        self.pools.remove(pool)
+        key = self._get_pool_key(pool)
+        if key is not None and pool_index.get(key) is pool:
+            # another pool might have the same keys, let the index be rebuilt
+            # to find it
+            self._pool_index = None
+        self._pool_index_len = len(self.pools)
+        for dev in pool.get('devices', []):
+            if free_devs_index.get(dev.address, (None,))[0] is pool:
+                del free_devs_index[dev.address]
+        self._free_devs_index_len = len(self.pools)
+        self._spec_index = None
+
+    def _add_free_dev(self, pool: Pool, dev: 'objects.PciDevice') -> None:
+        pool['devices'].append(dev)
+        self._get_free_devs_index().setdefault(dev.address, (pool, dev))
+
+    def _remove_free_dev(self, pool: Pool, dev: 'objects.PciDevice') -> None:
+        pool['devices'].remove(dev)
+        self._unindex_free_dev(dev)
+
+    def _unindex_free_dev(self, dev: 'objects.PciDevice') -> None:
+        free_devs_index = self._get_free_devs_index()
+        if free_devs_index.get(dev.address, (None, None))[1] is dev:
+            del free_devs_index[dev.address]
+
+    def _is_free_dev(self, dev: ty.Optional['objects.PciDevice']) -> bool:
+        """Return True if dev is one of the free devices of the pools."""
+        if dev is None:
+            return False
+        _, free_dev = self._get_free_devs_index().get(
+            dev.address, (None, None))
+        return free_dev is not None and free_dev == dev
 
     def _equal_properties(
         self, dev: Pool, entry: Pool, matching_keys: ty.List[str],
@@ -100,6 +245,14 @@ class PciDeviceStats(object):
 
     def _find_pool(self, dev_pool: Pool) -> ty.Optional[Pool]:
         """Return the first pool that matches dev."""
+        key = self._get_pool_key(dev_pool)
+        if key is not None:
+            pool = self._get_pool_index().get(key)
+            if pool is not None:
+                return pool
+
+        # NOTE: the index has no entry for pools with unhashable values, so
+        # fall back to scanning the pools.
         for pool in self.pools:
             pool_keys = pool.copy()
             del pool_keys['count']
@@ -187,14 +340,11 @@ class PciDeviceStats(object):
         Return (pool, device) if device type does not match or a single None
         if the device type matches.
         """
-        for pool in self.pools:
-            for device in pool['devices']:
-                if device.address == dev.address:
-                    if dev.dev_type != pool["dev_type"]:
-                        return pool, device
-                    return None
-
-        return None
+        pool, device = self._get_free_devs_index().get(
+            dev.address, (None, None))
+        if pool is None or dev.dev_type == pool["dev_type"]:
+            return None
+        return pool, device
 
     def update_device(self, dev: 'objects.PciDevice') -> None:
         """Update a device to its matching pool."""
@@ -203,7 +353,7 @@ class PciDeviceStats(object):
             return None
 
         pool, device = pool_device_info
-        pool['devices'].remove(device)
+        self._remove_free_dev(pool, device)
         self._decrease_pool_count(self.pools, pool)
         self.add_device(dev)
 
@@ -215,15 +365,13 @@ class PciDeviceStats(object):
             if not pool:
                 dev_pool['count'] = 0
                 dev_pool['devices'] = []
-                self.pools.append(dev_pool)
-                self.pools.sort(key=lambda item: len(item))
+                self._add_pool(dev_pool)
                 pool = dev_pool
             pool['count'] += 1
-            pool['devices'].append(dev)
+            self._add_free_dev(pool, dev)
 
-    @staticmethod
     def _decrease_pool_count(
-        pool_list: ty.List[Pool], pool: Pool, count: int = 1,
+        self, pool_list: ty.List[Pool], pool: Pool, count: int = 1,
     ) -> int:
         """Decrement pool's size by count.
 
@@ -234,7 +382,7 @@ class PciDeviceStats(object):
             count = 0
         else:
             count -= pool['count']
-            pool_list.remove(pool)
+            self._remove_pool(pool_list, pool)
         return count
 
     def remove_device(self, dev: 'objects.PciDevice') -> None:
@@ -245,7 +393,7 @@ class PciDeviceStats(object):
             if not pool:
                 raise exception.PciDevicePoolEmpty(
                     compute_node_id=dev.compute_node_id, address=dev.address)
-            pool['devices'].remove(dev)
+            self._remove_free_dev(pool, dev)
             self._decrease_pool_count(self.pools, pool)
 
     def get_free_devs(self) -> ty.List['objects.PciDevice']:
@@ -260,6 +408,7 @@ class PciDeviceStats(object):
         alloc_devices = []
         for _ in range(num):
             pci_dev = pool['devices'].pop()
+            self._unindex_free_dev(pci_dev)
             self._handle_device_dependents(pci_dev)
             pci_dev.request_id = request_id
             alloc_devices.append(pci_dev)
@@ -340,11 +489,10 @@ class PciDeviceStats(object):
         if pci_dev.dev_type == fields.PciDeviceType.SRIOV_PF:
             vfs_list = pci_dev.child_devices
             if vfs_list:
-                free_devs = self.get_free_devs()
                 for vf in vfs_list:
                     # NOTE(gibi): do not try to remove a device that are
                     # already removed
-                    if vf in free_devs:
+                    if self._is_free_dev(vf):
                         self.remove_device(vf)
         elif pci_dev.dev_type in (
             fields.PciDeviceType.SRIOV_VF,
@@ -354,7 +502,7 @@ class PciDeviceStats(object):
                 parent = pci_dev.parent_device
                 # Make sure not to decrease PF pool count if this parent has
                 # been already removed from pools
-                if parent in self.get_free_devs():
+                if self._is_free_dev(parent):
                     self.remove_device(parent)
             except exception.PciDeviceNotFound:
                 return
@@ -383,6 +531,20 @@ class PciDeviceStats(object):
             }
 
         request_specs = [ignore_keys(spec) for spec in request.spec]
+        if pools is self.pools and all(
+            isinstance(spec.get('vendor_id'), str) and
+            isinstance(spec.get('product_id'), str)
+            for spec in request_specs
+        ):
+            # only look at the pools having the requested vendor_id and
+            # product_id, in the same order as in the pool list
+            spec_index = self._get_spec_index()
+            positions = set()
+            for spec in request_specs:
+                positions.update(
+                    spec_index.get(self._get_spec_key(spec), []))
+            pools = [pools[i] for i in sorted(positions)]
+
         return [
             pool for pool in pools
             if utils.pci_device_prop_match(pool, request_specs)
@@ -823,7 +985,14 @@ class PciDeviceStats(object):
         # selected host. The compute will call consume_request during PCI claim
         # to consume not just from the pools but also consume PciDevice
         # objects.
-        stats = copy.deepcopy(self)
+        # NOTE: only the pool dicts are changed by apply_requests so there is
+        # no need to deep copy the devices, the device spec and the NUMA
+        # topology along with them. The copy keeps the pools at the same
+        # positions so it can reuse our spec index.
+        stats = copy.copy(self)
+        stats.pools = [dict(pool) for pool in self.pools]
+        stats._pool_index = None
+        stats._free_devs_index = None
         try:
             stats.apply_requests(requests, provider_mapping, numa_cells)
         except exception.PciDeviceRequestFailed:
@@ -889,7 +1058,7 @@ class PciDeviceStats(object):
                 requested_devs_per_pool_rp.pop(pool['rp_uuid'], None)
 
                 if pool['count'] == 0:
-                    pools.remove(pool)
+                    self._remove_pool(pools, pool)
 
         return True
 
@@ -983,6 +1152,7 @@ class PciDeviceStats(object):
     def clear(self) -> None:
         """Clear all the stats maintained."""
         self.pools = []
+        self._reset_indexes()
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, PciDeviceStats):
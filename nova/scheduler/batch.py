@@ -0,0 +1,89 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Pooling of concurrent scheduling requests into batches.
+"""
+
+import threading
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class _Request(object):
+    """A request waiting for its batch to be processed."""
+
+    def __init__(self, args):
+        self.args = args
+        self.result = None
+        self.done = threading.Event()
+
+
+class RequestBatcher(object):
+    """Pools the requests submitted concurrently into batches.
+
+    The first request submitted while no batch is being collected starts a new
+    batch and waits for ``window`` seconds, or until ``max_size`` requests are
+    part of the batch. It then processes the whole batch by calling
+    ``process`` with the list of the arguments of each request of the batch,
+    and hands its result to each of them. ``process`` must return a list with
+    one result per request, in the same order.
+
+    If ``process`` fails, every request of the batch gets None as result.
+    """
+
+    def __init__(self, process, window, max_size):
+        self._process = process
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # The requests of the batch being collected, and the event set once
+        # it is full, or None if no batch is being collected.
+        self._pending = None
+        self._full = None
+
+    def submit(self, *args):
+        """Submit a request and wait for the result of its batch."""
+        request = _Request(args)
+        with self._lock:
+            leader = self._pending is None
+            if leader:
+                self._pending = []
+                self._full = threading.Event()
+            self._pending.append(request)
+            full = self._full
+            if len(self._pending) >= self.max_size:
+                full.set()
+
+        if not leader:
+            request.done.wait()
+            return request.result
+
+        full.wait(self.window)
+        with self._lock:
+            batch = self._pending
+            self._pending = self._full = None
+
+        results = [None] * len(batch)
+        try:
+            LOG.debug('Processing a batch of %d requests', len(batch))
+            results = self._process([queued.args for queued in batch])
+        except Exception:
+            LOG.exception('Failed to process a batch of %d requests',
+                          len(batch))
+        finally:
+            for queued, result in zip(batch, results):
+                queued.result = result
+                queued.done.set()
+        return request.result
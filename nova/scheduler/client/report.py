@@ -18,6 +18,7 @@ import contextlib
 import copy
 import functools
 import random
+import threading
 import time
 import typing as ty
 
@@ -35,6 +36,7 @@ import nova.conf
 from nova import context as nova_context
 from nova import exception
 from nova.i18n import _
+from nova import instrumentation
 from nova import objects
 from nova.objects import fields
 from nova import utils
@@ -211,6 +213,108 @@ def get_placement_request_id(response):
         return response.headers.get(request_id.HTTP_RESP_HEADER_REQUEST_ID)
 
 
+def _fits(alloc_request, provider_summaries):
+    """Return True if the resources of an allocation request still fit in the
+    capacity left on its providers, as per the provider summaries.
+    """
+    for rp_uuid, alloc in alloc_request['allocations'].items():
+        resources = provider_summaries.get(rp_uuid, {}).get('resources', {})
+        for rc, amount in alloc['resources'].items():
+            summary = resources.get(rc)
+            if summary is None:
+                continue
+            if summary['used'] + amount > summary['capacity']:
+                return False
+    return True
+
+
+class _AllocationCandidatesCache(object):
+    """Short lived cache of the GET /allocation_candidates responses.
+
+    Entries are keyed by the microversion and the query string of the request,
+    which is normalized by ResourceRequest.to_querystring(), and expire after
+    ``ttl`` seconds.
+
+    Allocations made by this client for a new consumer are consumed from the
+    provider summaries of the cached entries, and the allocation requests which
+    no longer fit are dropped. Any other change of the generation of a
+    provider seen by this client invalidates the entries involving that
+    provider, and a conflict while allocating, which means the providers were
+    changed by another process, invalidates the whole cache.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Dict, keyed by (version, querystring), of (expires_at,
+        # allocation_requests, provider_summaries)
+        self._entries = {}
+
+    def get(self, key):
+        """Return a copy of the (allocation_requests, provider_summaries) of
+        the entry for the given key, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, alloc_reqs, provider_summaries = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            # The callers are free to modify what they are handed.
+            return copy.deepcopy((alloc_reqs, provider_summaries))
+
+    def set(self, key, alloc_reqs, provider_summaries):
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, entry in self._entries.items()
+                            if entry[0] <= now]:
+                del self._entries[expired]
+            self._entries[key] = (
+                now + self.ttl, copy.deepcopy(alloc_reqs),
+                copy.deepcopy(provider_summaries))
+
+    def consume(self, allocations):
+        """Consume the given allocations, keyed by resource provider UUID,
+        from the provider summaries of the cached entries.
+        """
+        with self._lock:
+            for key, (expires_at, alloc_reqs, provider_summaries) in list(
+                    self._entries.items()):
+                consumed = False
+                for rp_uuid, alloc in allocations.items():
+                    resources = provider_summaries.get(
+                        rp_uuid, {}).get('resources', {})
+                    for rc, amount in alloc['resources'].items():
+                        if rc in resources:
+                            resources[rc]['used'] += amount
+                            consumed = True
+                if not consumed:
+                    continue
+                alloc_reqs = [ar for ar in alloc_reqs
+                              if _fits(ar, provider_summaries)]
+                if alloc_reqs:
+                    self._entries[key] = (
+                        expires_at, alloc_reqs, provider_summaries)
+                else:
+                    # Let the next request query placement once the cached
+                    # candidates are exhausted.
+                    del self._entries[key]
+
+    def invalidate(self, rp_uuid=None):
+        """Drop the entries involving the given provider, or all the entries
+        if no provider is given.
+        """
+        with self._lock:
+            if rp_uuid is None:
+                self._entries.clear()
+                return
+            for key in [k for k, entry in self._entries.items()
+                        if rp_uuid in entry[2]]:
+                del self._entries[key]
+
+
 # TODO(mriedem): Consider making SchedulerReportClient a global singleton so
 # that things like the compute API do not have to lazy-load it. That would
 # likely require inspecting methods that use a ProviderTree cache to see if
@@ -237,6 +341,14 @@ class SchedulerReportClient(object):
         self._client = self._create_client()
         # NOTE(danms): Keep track of how naggy we've been
         self._warn_count = 0
+        # Counts of the providers flushed to placement, or skipped as
+        # unchanged, by update_from_provider_tree
+        self.provider_sync_stats = {'updated': 0, 'skipped': 0}
+        # A scheduler-side cache of allocation candidates, if enabled
+        self._alloc_candidates_cache = None
+        if CONF.scheduler.allocation_candidates_cache_ttl > 0:
+            self._alloc_candidates_cache = _AllocationCandidatesCache(
+                CONF.scheduler.allocation_candidates_cache_ttl)
 
     def clear_provider_cache(self, init=False):
         if not init:
@@ -244,6 +356,13 @@ class SchedulerReportClient(object):
         self._provider_tree = provider_tree.ProviderTree()
         self._association_refresh_time = {}
 
+    def _provider_generation_changed(self, rp_uuid):
+        """Invalidate the cached allocation candidates involving a resource
+        provider whose generation changed.
+        """
+        if self._alloc_candidates_cache is not None:
+            self._alloc_candidates_cache.invalidate(rp_uuid)
+
     def _clear_provider_cache_for_tree(self, rp_uuid):
         """Clear the provider cache for only the tree containing rp_uuid.
 
@@ -285,8 +404,16 @@ class SchedulerReportClient(object):
         return client
 
     def get(self, url, version=None, global_request_id=None):
-        return self._client.get(url, microversion=version,
-                                global_request_id=global_request_id)
+        # Only keep the collection, i.e. /resource_providers, and not the
+        # uuids or the query string, to bound the number of histograms.
+        name = 'GET /%s' % url.split('?', 1)[0].split('/')[1]
+        started = time.monotonic()
+        try:
+            return self._client.get(url, microversion=version,
+                                    global_request_id=global_request_id)
+        finally:
+            instrumentation.record(
+                instrumentation.PLACEMENT, name, time.monotonic() - started)
 
     def post(self, url, data, version=None, global_request_id=None):
         # NOTE(sdague): using json= instead of data= sets the
@@ -345,11 +472,21 @@ class SchedulerReportClient(object):
         # make allocations by `PUT /allocations/{consumer_uuid}`
         version = SAME_SUBTREE_VERSION
         qparams = resources.to_querystring()
+        cache = self._alloc_candidates_cache
+        if cache is not None:
+            cached = cache.get((version, qparams))
+            if cached is not None:
+                LOG.debug('Using cached allocation candidates for filters: '
+                          '%s', resources)
+                return cached + (version,)
         url = "/allocation_candidates?%s" % qparams
         resp = self.get(url, version=version,
                         global_request_id=context.global_id)
         if resp.status_code == 200:
             data = resp.json()
+            if cache is not None:
+                cache.set((version, qparams), data['allocation_requests'],
+                          data['provider_summaries'])
             return (data['allocation_requests'], data['provider_summaries'],
                     version)
 
@@ -979,6 +1116,7 @@ class SchedulerReportClient(object):
             self._provider_tree.update_inventory(
                 rp_uuid, json['inventories'],
                 generation=json['resource_provider_generation'])
+            self._provider_generation_changed(rp_uuid)
             return
 
         # Some error occurred; log it
@@ -1004,6 +1142,7 @@ class SchedulerReportClient(object):
                 # The error detail includes the resource class and provider.
                 raise exception.InventoryInUse(err['detail'])
             # Other conflicts are generation mismatch: raise conflict exception
+            self._provider_generation_changed(rp_uuid)
             raise exception.ResourceProviderUpdateConflict(
                 uuid=rp_uuid, generation=generation, error=resp.text)
 
@@ -1113,6 +1252,7 @@ class SchedulerReportClient(object):
             self._provider_tree.update_traits(
                 rp_uuid, json['traits'],
                 generation=json['resource_provider_generation'])
+            self._provider_generation_changed(rp_uuid)
             return
 
         # Some error occurred; log it
@@ -1130,6 +1270,7 @@ class SchedulerReportClient(object):
 
         # If a conflict, raise special conflict exception
         if resp.status_code == 409:
+            self._provider_generation_changed(rp_uuid)
             raise exception.ResourceProviderUpdateConflict(
                 uuid=rp_uuid, generation=generation, error=resp.text)
 
@@ -1187,6 +1328,7 @@ class SchedulerReportClient(object):
                         global_request_id=context.global_id)
 
         if resp.status_code == 200:
+            self._provider_generation_changed(rp_uuid)
             # Try to update the cache regardless.  If use_cache=False, ignore
             # any failures.
             try:
@@ -1222,6 +1364,7 @@ class SchedulerReportClient(object):
             except ValueError:
                 pass
             self._association_refresh_time.pop(rp_uuid, None)
+            self._provider_generation_changed(rp_uuid)
 
             LOG.warning(msg, args)
             raise exception.ResourceProviderUpdateConflict(
@@ -1496,14 +1639,107 @@ class SchedulerReportClient(object):
         # order ensures we at least try to process all of the providers. (We
         # get the UUIDs in bottom-up order by reversing new_uuids, which was
         # given to us in top-down order per ProviderTree.get_provider_uuids().)
-        for uuid in reversed(new_uuids):
-            pd = new_tree.data(uuid)
-            with catch_all(pd.uuid):
-                self.set_inventory_for_provider(
-                    context, pd.uuid, pd.inventory)
-                self.set_aggregates_for_provider(
-                    context, pd.uuid, pd.aggregates)
-                self.set_traits_for_provider(context, pd.uuid, pd.traits)
+        # Providers, and whole subtrees, whose content hash did not change
+        # from the one in the local cache are already in sync and skipped.
+        unchanged = self._get_unchanged_provider_uuids(new_tree, new_uuids)
+        self.provider_sync_stats['skipped'] += len(unchanged)
+        self.provider_sync_stats['updated'] += len(new_uuids) - len(unchanged)
+        LOG.debug("Flushing %(updated)d changed providers to placement, "
+                  "skipping %(skipped)d unchanged providers.",
+                  {'updated': len(new_uuids) - len(unchanged),
+                   'skipped': len(unchanged)})
+        to_flush = [uuid for uuid in reversed(new_uuids)
+                    if uuid not in unchanged]
+        workers = CONF.compute.resource_provider_sync_workers
+        if workers > 1 and len(to_flush) > 1:
+            self._flush_providers_concurrently(
+                context, new_tree, to_flush, workers, catch_all)
+        else:
+            for uuid in to_flush:
+                with catch_all(uuid):
+                    self._flush_provider(context, new_tree, uuid)
+
+    def _flush_provider(self, context, new_tree, rp_uuid):
+        """Flush the inventory, aggregates and traits of a provider of
+        new_tree back to placement.
+        """
+        pd = new_tree.data(rp_uuid)
+        self.set_inventory_for_provider(context, pd.uuid, pd.inventory)
+        self.set_aggregates_for_provider(context, pd.uuid, pd.aggregates)
+        self.set_traits_for_provider(context, pd.uuid, pd.traits)
+
+    def _flush_providers_concurrently(self, context, new_tree, rp_uuids,
+                                      workers, catch_all):
+        """Flush the specified providers of new_tree back to placement, using
+        up to `workers` concurrent workers.
+
+        A provider whose generation changed in placement is refreshed and
+        flushed once more. Once a provider failed to be flushed, no more
+        providers are flushed and the error of the first provider which failed
+        is raised once all the workers are done.
+
+        :param context: The security context
+        :param new_tree: A ProviderTree instance representing the desired state
+                         of providers in placement.
+        :param rp_uuids: List of UUIDs of the providers to flush
+        :param workers: Maximum number of providers to flush concurrently
+        :param catch_all: Context manager converting the errors raised while
+                          flushing a provider, see update_from_provider_tree.
+        """
+        pending = collections.deque(rp_uuids)
+        errors = []
+
+        def flush_provider(rp_uuid):
+            try:
+                self._flush_provider(context, new_tree, rp_uuid)
+            except exception.ResourceProviderUpdateConflict:
+                LOG.debug("Generation conflict while flushing resource "
+                          "provider %s, refreshing it and retrying.", rp_uuid)
+                self._refresh_associations(
+                    context, rp_uuid, force=True, refresh_sharing=False)
+                self._flush_provider(context, new_tree, rp_uuid)
+
+        def worker():
+            while not errors:
+                try:
+                    rp_uuid = pending.popleft()
+                except IndexError:
+                    return
+                try:
+                    with catch_all(rp_uuid):
+                        flush_provider(rp_uuid)
+                except Exception as e:
+                    errors.append(e)
+
+        futures = [utils.spawn(worker)
+                   for _ in range(min(workers, len(rp_uuids)))]
+        for future in futures:
+            future.result()
+        if errors:
+            raise errors[0]
+
+    def _get_unchanged_provider_uuids(self, new_tree, new_uuids):
+        """Return the set of UUIDs of the providers of new_tree whose data
+        is the same in the local cache.
+
+        :param new_tree: A ProviderTree instance representing the desired state
+                         of providers in placement.
+        :param new_uuids: List, in top-down order, of the UUIDs of all
+                          providers in new_tree.
+        """
+        old_hashes = self._provider_tree.get_content_hashes()
+        new_hashes = new_tree.get_content_hashes()
+        unchanged = set()
+        for uuid in new_uuids:
+            if uuid in unchanged or uuid not in old_hashes:
+                continue
+            old_hash, old_subtree_hash = old_hashes[uuid]
+            new_hash, new_subtree_hash = new_hashes[uuid]
+            if new_subtree_hash == old_subtree_hash:
+                unchanged.update(new_tree.get_provider_uuids(uuid))
+            elif new_hash == old_hash:
+                unchanged.add(uuid)
+        return unchanged
 
     # TODO(efried): Cut users of this method over to get_allocs_for_consumer
     def get_allocations_for_consumer(self, context, consumer):
@@ -1672,6 +1908,20 @@ class SchedulerReportClient(object):
             consumer_uuid,
             payload,
             version=allocation_request_version)
+        cache = self._alloc_candidates_cache
+        if cache is not None:
+            if r.status_code == 409:
+                # The providers were changed by another process, so that any
+                # cached candidate may no longer be valid.
+                cache.invalidate()
+            elif r.status_code == 204:
+                if payload is ar:
+                    cache.consume(ar['allocations'])
+                else:
+                    # The allocations of a move operation replace the existing
+                    # ones of the consumer.
+                    for rp_uuid in payload['allocations']:
+                        cache.invalidate(rp_uuid)
         if r.status_code != 204:
             err = r.json()['errors'][0]
             if err['code'] == 'placement.concurrent_update':
@@ -19,6 +19,7 @@ Scheduler host filters
 from oslo_log import log as logging
 
 from nova import filters
+from nova.scheduler import host_columns
 
 LOG = logging.getLogger(__name__)
 
@@ -56,6 +57,24 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def filter_all_vectorized(self, columns, spec):
+        """Return a boolean mask of the hosts passing the filter."""
+        from nova.scheduler import utils
+        if not self.RUN_ON_REBUILD and utils.request_is_rebuild(spec):
+            # If we don't filter, default to passing all the hosts.
+            return columns.full(True)
+        return self.hosts_pass(columns, spec)
+
+    def hosts_pass(self, host_columns, spec_obj):
+        """Return a boolean array telling which hosts pass the filter.
+
+        host_columns is a HostStateColumns object. Return None, which is the
+        default, if the filter has no vectorized implementation, in which case
+        host_passes() is called for every host instead. Override this in a
+        subclass.
+        """
+        return None
+
 
 class CandidateFilterMixin:
     """Mixing that helps to implement a Filter that needs to filter host by
@@ -98,6 +117,11 @@ class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_columns(self, objs):
+        if not host_columns.is_available():
+            return None
+        return host_columns.HostStateColumns(objs)
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
@@ -46,3 +46,19 @@ class ComputeFilter(filters.BaseHostFilter):
                             "while", {'host_state': host_state})
                 return False
         return True
+
+    def hosts_pass(self, host_columns, spec_obj):
+        passes = ~host_columns['disabled']
+        for host_state in host_columns.objs[~passes]:
+            LOG.debug("%(host_state)s is disabled, reason: %(reason)s",
+                      {'host_state': host_state,
+                       'reason': host_state.service.get('disabled_reason')})
+        # Whether a service is up depends on the servicegroup driver, so it
+        # is still asked for every enabled host.
+        for idx in passes.nonzero()[0]:
+            host_state = host_columns.objs[idx]
+            if not self.servicegroup_api.service_is_up(host_state.service):
+                LOG.warning("%(host_state)s has not been heard from in a "
+                            "while", {'host_state': host_state})
+                passes[idx] = False
+        return passes
@@ -47,6 +47,21 @@ class IoOpsFilter(filters.BaseHostFilter):
                        'max_io_ops': max_io_ops})
         return passes
 
+    def _get_max_io_ops_per_hosts(self, host_columns, spec_obj):
+        return host_columns.full(self._get_max_io_ops_per_host(None, spec_obj),
+                                 dtype=int)
+
+    def hosts_pass(self, host_columns, spec_obj):
+        max_io_ops = self._get_max_io_ops_per_hosts(host_columns, spec_obj)
+        passes = host_columns['num_io_ops'] < max_io_ops
+        if LOG.isEnabledFor(logging.DEBUG):
+            for idx in (~passes).nonzero()[0]:
+                LOG.debug("%(host_state)s fails I/O ops check: Max IOs per "
+                          "host is set to %(max_io_ops)s",
+                          {'host_state': host_columns.objs[idx],
+                           'max_io_ops': max_io_ops[idx]})
+        return passes
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -68,3 +83,9 @@ class AggregateIoOpsFilter(IoOpsFilter):
             value = max_io_ops_per_host
 
         return value
+
+    def _get_max_io_ops_per_hosts(self, host_columns, spec_obj):
+        return host_columns.map(
+            lambda host_state: self._get_max_io_ops_per_host(
+                host_state, spec_obj),
+            dtype=int)
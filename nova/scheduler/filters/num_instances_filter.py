@@ -44,6 +44,22 @@ class NumInstancesFilter(filters.BaseHostFilter):
                        'max_instances': max_instances})
         return passes
 
+    def _get_max_instances_per_hosts(self, host_columns, spec_obj):
+        return host_columns.full(
+            self._get_max_instances_per_host(None, spec_obj), dtype=int)
+
+    def hosts_pass(self, host_columns, spec_obj):
+        max_instances = self._get_max_instances_per_hosts(
+            host_columns, spec_obj)
+        passes = host_columns['num_instances'] < max_instances
+        if LOG.isEnabledFor(logging.DEBUG):
+            for idx in (~passes).nonzero()[0]:
+                LOG.debug("%(host_state)s fails num_instances check: Max "
+                          "instances per host is set to %(max_instances)s",
+                          {'host_state': host_columns.objs[idx],
+                           'max_instances': max_instances[idx]})
+        return passes
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -66,3 +82,9 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
             value = max_instances_per_host
 
         return value
+
+    def _get_max_instances_per_hosts(self, host_columns, spec_obj):
+        return host_columns.map(
+            lambda host_state: self._get_max_instances_per_host(
+                host_state, spec_obj),
+            dtype=int)
@@ -10,16 +10,53 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import threading
+
 from oslo_log import log as logging
 
+import nova.conf
 from nova import objects
 from nova.objects import fields
 from nova.scheduler import filters
+from nova.scheduler import utils
 from nova.virt import hardware
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
 
+class _NUMAFitCache(object):
+    """Bounded cache of the results of fitting instance NUMA topologies onto
+    host NUMA topologies, discarding the least recently used results first.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached result for key, or None if there is none."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def set(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+
 class NUMATopologyFilter(
     filters.BaseHostFilter,
     filters.CandidateFilterMixin,
@@ -32,6 +69,49 @@ class NUMATopologyFilter(
     # request and therefore do not need to run this filter on rebuild.
     RUN_ON_REBUILD = False
 
+    def __init__(self):
+        self._fit_cache = None
+        if CONF.filter_scheduler.numa_fit_cache_size:
+            self._fit_cache = _NUMAFitCache(
+                CONF.filter_scheduler.numa_fit_cache_size)
+        # The requirements of the last request seen, and their fingerprint
+        self._request_fingerprint = (None, None)
+
+    def _get_request_fingerprint(self, spec_obj):
+        """Return a string identifying the NUMA, PCI and network requirements
+        of the request.
+
+        The fingerprint is only computed again once any of these requirements
+        is replaced, e.g. when the resources of an instance are consumed before
+        filtering hosts for the next instance of the request.
+        """
+        requirements = (
+            spec_obj.numa_topology, spec_obj.pci_requests,
+            spec_obj.network_metadata if 'network_metadata' in spec_obj
+            else None)
+        last_requirements, fingerprint = self._request_fingerprint
+        if (last_requirements is None or
+                any(a is not b for a, b in zip(
+                    requirements, last_requirements))):
+            fingerprint = utils.get_fingerprint(
+                list(requirements) +
+                [CONF.compute.packing_host_numa_cells_allocation_strategy])
+            self._request_fingerprint = (requirements, fingerprint)
+        return fingerprint
+
+    def _get_host_fingerprint(self, host_state):
+        """Return a string identifying the NUMA and PCI state of the host."""
+        pools = None
+        if host_state.pci_stats:
+            # The PCI pools are updated in place when resources are consumed,
+            # so their fingerprint can't be cached.
+            pools = [{k: v for k, v in pool.items() if k != 'devices'}
+                     for pool in host_state.pci_stats.pools]
+        return (host_state.get_numa_topology_fingerprint(),
+                utils.get_fingerprint(pools),
+                host_state.cpu_allocation_ratio,
+                host_state.ram_allocation_ratio)
+
     def _satisfies_cpu_policy(self, host_state, extra_specs, image_props):
         """Check that the host_state provided satisfies any available
         CPU policy requirements.
@@ -71,6 +151,7 @@ class NUMATopologyFilter(
         # doing this. That's a large, non-backportable cleanup however, so for
         # now we just duplicate spec_obj to prevent changes propagating to
         # future filter calls.
+        request_spec = spec_obj
         spec_obj = spec_obj.obj_clone()
 
         ram_ratio = host_state.ram_allocation_ratio
@@ -100,17 +181,35 @@ class NUMATopologyFilter(
             if network_metadata:
                 limits.network_metadata = network_metadata
 
-            good_candidates = self.filter_candidates(
-                host_state,
-                lambda candidate: hardware.numa_fit_instance_to_host(
+            def fits(candidate):
+                return bool(hardware.numa_fit_instance_to_host(
                     host_topology,
                     requested_topology,
                     limits=limits,
                     pci_requests=pci_requests,
                     pci_stats=host_state.pci_stats,
                     provider_mapping=candidate["mappings"],
-                ),
-            )
+                ))
+
+            if self._fit_cache is not None:
+                fit_cache = self._fit_cache
+                key = (self._get_host_fingerprint(host_state),
+                       self._get_request_fingerprint(request_spec))
+                uncached_fits = fits
+
+                def fits(candidate):
+                    # The allocation candidate only matters for PCI requests
+                    candidate_key = key
+                    if pci_requests:
+                        candidate_key += (
+                            utils.get_fingerprint(candidate["mappings"]),)
+                    result = fit_cache.get(candidate_key)
+                    if result is None:
+                        result = uncached_fits(candidate)
+                        fit_cache.set(candidate_key, result)
+                    return result
+
+            good_candidates = self.filter_candidates(host_state, fits)
 
             if not good_candidates:
                 LOG.debug("%(host)s, %(node)s fails NUMA topology "
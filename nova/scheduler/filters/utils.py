@@ -21,8 +21,53 @@ from oslo_log import log as logging
 LOG = logging.getLogger(__name__)
 
 
+class AggregatesMetadata(object):
+    """Merged metadata of the aggregates of a host.
+
+    Built by the HostManager for each distinct set of aggregates, so that the
+    filters and weighers reading the metadata of the aggregates of a host do
+    dict lookups instead of iterating the aggregates. The metadata is merged
+    when first read. The sets of values must not be modified.
+    """
+
+    __slots__ = ('_aggregates', '_values', '_split_values')
+
+    def __init__(self, aggregates):
+        self._aggregates = list(aggregates)
+        self._values = None
+        self._split_values = None
+
+    def _merge(self):
+        values = collections.defaultdict(set)
+        split_values = collections.defaultdict(set)
+        for aggr in self._aggregates:
+            for k, v in aggr.metadata.items():
+                values[k].add(v)
+                split_values[k].update(x.strip() for x in v.split(','))
+        self._values = {k: frozenset(v) for k, v in values.items()}
+        self._split_values = {k: frozenset(v)
+                              for k, v in split_values.items()}
+
+    @property
+    def values(self):
+        """Set of values keyed by metadata key."""
+        if self._values is None:
+            self._merge()
+        return self._values
+
+    @property
+    def split_values(self):
+        """Set of the comma separated values keyed by metadata key."""
+        if self._split_values is None:
+            self._merge()
+        return self._split_values
+
+
 def aggregate_values_from_key(host_state, key_name):
     """Returns a set of values based on a metadata key for a specific host."""
+    metadata = getattr(host_state, 'aggregates_metadata', None)
+    if metadata is not None:
+        return metadata.values.get(key_name, frozenset())
     aggrlist = host_state.aggregates
     return {aggr.metadata[key_name]
               for aggr in aggrlist
@@ -34,6 +79,9 @@ def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata based on a metadata key for a specific
     host. If the key is not provided, returns a dict of all metadata.
     """
+    metadata = getattr(host_state, 'aggregates_metadata', None)
+    if key is None and metadata is not None:
+        return metadata.split_values
     aggrlist = host_state.aggregates
     metadata = collections.defaultdict(set)
     for aggr in aggrlist:
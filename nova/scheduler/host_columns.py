@@ -0,0 +1,127 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of HostState objects used for vectorized filtering.
+"""
+
+from oslo_utils import importutils
+
+np = importutils.try_import('numpy')
+
+# HostState attributes which can be laid out as integer columns. Unset (None)
+# values are stored as 0.
+INT_FIELDS = (
+    'free_ram_mb',
+    'free_disk_mb',
+    'disk_mb_used',
+    'total_usable_ram_mb',
+    'total_usable_disk_gb',
+    'vcpus_total',
+    'vcpus_used',
+    'num_instances',
+    'num_io_ops',
+    'failed_builds',
+)
+
+# HostState attributes which can be laid out as float columns. Unset (None)
+# values are stored as NaN.
+FLOAT_FIELDS = (
+    'ram_allocation_ratio',
+    'cpu_allocation_ratio',
+    'disk_allocation_ratio',
+)
+
+# Keys of the HostState.service dict which can be laid out as boolean columns.
+SERVICE_FIELDS = (
+    'disabled',
+    'forced_down',
+)
+
+
+def is_available():
+    """Return True if the vectorized filtering dependencies are installed."""
+    return np is not None
+
+
+class HostStateColumns(object):
+    """Numeric HostState attributes laid out as one array per attribute.
+
+    Row ``i`` of every column describes the HostState ``objs[i]``. Columns are
+    built lazily the first time they are accessed, so a request only pays for
+    the attributes its filters actually look at.
+    """
+
+    def __init__(self, host_states, columns=None):
+        self.objs = np.empty(len(host_states), dtype=object)
+        self.objs[:] = host_states
+        self._columns = columns or {}
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __getitem__(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            column = self._build_column(field)
+            self._columns[field] = column
+        return column
+
+    def _build_column(self, field):
+        count = len(self.objs)
+        if field in INT_FIELDS:
+            values = (getattr(host_state, field) or 0
+                      for host_state in self.objs)
+            return np.fromiter(values, dtype=np.int64, count=count)
+        if field in FLOAT_FIELDS:
+            values = (getattr(host_state, field) for host_state in self.objs)
+            return np.fromiter(
+                (np.nan if value is None else value for value in values),
+                dtype=np.float64, count=count)
+        if field in SERVICE_FIELDS:
+            values = (bool((getattr(host_state, 'service', None) or {})
+                           .get(field))
+                      for host_state in self.objs)
+            return np.fromiter(values, dtype=bool, count=count)
+        raise KeyError(field)
+
+    def full(self, value, dtype=bool):
+        """Return a column with every row set to value."""
+        return np.full(len(self.objs), value, dtype=dtype)
+
+    def map(self, func, dtype):
+        """Return a column holding func(host_state) for every row."""
+        return np.fromiter((func(host_state) for host_state in self.objs),
+                           dtype=dtype, count=len(self.objs))
+
+    def compress(self, mask):
+        """Return the columns of the rows selected by a boolean mask."""
+        mask = np.asarray(mask, dtype=bool)
+        columns = {field: column[mask]
+                   for field, column in self._columns.items()}
+        return HostStateColumns(self.objs[mask], columns)
+
+    def select(self, host_states):
+        """Return the columns of the given host states.
+
+        This is used to carry the columns over a filter which was run host by
+        host. Columns already built are kept if host_states is an ordered
+        subset of the current rows, otherwise they are rebuilt on demand.
+        """
+        keep = set(map(id, host_states))
+        mask = np.fromiter((id(host_state) in keep
+                            for host_state in self.objs),
+                           dtype=bool, count=len(self.objs))
+        if (int(mask.sum()) == len(host_states) and
+                all(a is b for a, b in zip(self.objs[mask], host_states))):
+            return self.compress(mask)
+        return HostStateColumns(host_states)
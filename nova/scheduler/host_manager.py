@@ -18,8 +18,12 @@ Manage hosts in the current zone.
 """
 
 import collections
+import copy
+import datetime
 import functools
+import sys
 import time
+import weakref
 
 import iso8601
 from oslo_log import log as logging
@@ -28,9 +32,14 @@ from oslo_utils import timeutils
 import nova.conf
 from nova import context as context_module
 from nova import exception
+from nova.i18n import _
 from nova import objects
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
+from nova.scheduler.filters import utils as filters_utils
+from nova.scheduler import host_columns
+from nova.scheduler import sharding
+from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -69,6 +78,104 @@ class ReadOnlyDict(collections.UserDict):
         raise TypeError()
 
 
+class InstanceInfo(object):
+    """Compact record of an instance tracked by the host manager.
+
+    The in-tree filters only use the UUIDs of the instances, and the image
+    properties weigher reads their image metadata, so the system metadata and
+    image reference are kept when the instance had them loaded. A few other
+    small fields are kept for the out-of-tree filters and weighers reading
+    them, any other field of the Instance object being lazy-loaded from the
+    database when needed.
+    """
+
+    FIELDS = ('project_id', 'instance_type_id', 'vm_state', 'task_state',
+              'image_ref', 'system_metadata')
+
+    __slots__ = ('uuid',) + FIELDS
+
+    def __init__(self, uuid, project_id=None, instance_type_id=None,
+                 vm_state=None, task_state=None, image_ref=None,
+                 system_metadata=None):
+        self.uuid = uuid
+        self.project_id = project_id
+        self.instance_type_id = instance_type_id
+        self.vm_state = vm_state
+        self.task_state = task_state
+        self.image_ref = image_ref
+        self.system_metadata = system_metadata
+
+    @classmethod
+    def from_instance(cls, instance):
+        fields = {field: getattr(instance, field) for field in cls.FIELDS
+                  if instance.obj_attr_is_set(field)}
+        if fields.get('project_id') is not None:
+            # Many instances share the same project
+            fields['project_id'] = sys.intern(fields['project_id'])
+        if fields.get('system_metadata') is not None:
+            # The coerced dict of the field references the whole Instance
+            fields['system_metadata'] = dict(fields['system_metadata'])
+        return cls(instance.uuid, **fields)
+
+    def to_instance(self, context, host):
+        fields = {field: getattr(self, field) for field in self.FIELDS
+                  if getattr(self, field) is not None}
+        instance = objects.Instance(context, uuid=self.uuid, host=host,
+                                    **fields)
+        instance.obj_reset_changes()
+        return instance
+
+
+class HostInstances(collections.abc.MutableMapping):
+    """Dict of the instances of a host, keyed by UUID.
+
+    The instances are stored as InstanceInfo records and an Instance object
+    is only built when a value is read, with the context given to lazy-load
+    its other fields. Membership tests and iterating over the UUIDs don't
+    build any Instance object.
+    """
+
+    __slots__ = ('context', 'host', '_records')
+
+    def __init__(self, context, host, instances=()):
+        self.context = context
+        self.host = host
+        self._records = {}
+        for instance in instances:
+            self[instance.uuid] = instance
+
+    @classmethod
+    def from_uuids(cls, context, host, uuids):
+        host_instances = cls(context, host)
+        host_instances._records = {uuid: InstanceInfo(uuid) for uuid in uuids}
+        return host_instances
+
+    def get_info(self, uuid):
+        """Return the InstanceInfo record of the instance."""
+        return self._records[uuid]
+
+    def __getitem__(self, uuid):
+        return self._records[uuid].to_instance(self.context, self.host)
+
+    def __setitem__(self, uuid, instance):
+        self._records[uuid] = InstanceInfo.from_instance(instance)
+
+    def __delitem__(self, uuid):
+        del self._records[uuid]
+
+    def __contains__(self, uuid):
+        return uuid in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self._records))
+
+
 @utils.expects_func_args('self', 'spec_obj')
 def set_update_time_on_success(function):
     """Set updated time of HostState when consuming succeed."""
@@ -117,6 +224,9 @@ class HostState(object):
         self.vcpus_used = 0
         self.pci_stats = None
         self.numa_topology = None
+        # The NUMA topology the cached fingerprint was computed for, and the
+        # fingerprint. See get_numa_topology_fingerprint().
+        self._numa_topology_fingerprint = (None, None)
 
         # Additional host information from the compute node stats:
         self.num_instances = 0
@@ -139,9 +249,15 @@ class HostState(object):
 
         # List of aggregates the host belongs to
         self.aggregates = []
+        # AggregatesMetadata of the aggregates, if computed by the host
+        # manager
+        self.aggregates_metadata = None
 
         # Instances on this host
         self.instances = {}
+        # ServerGroupIndex of the host manager, if it tracks the instances of
+        # this host
+        self.group_index = None
 
         # Allocation ratios for this host
         self.ram_allocation_ratio = None
@@ -171,6 +287,7 @@ class HostState(object):
             if aggregates is not None:
                 LOG.debug("Update host state with aggregates: %s", aggregates)
                 self.aggregates = aggregates
+                self.aggregates_metadata = None
             if service is not None:
                 LOG.debug("Update host state with service dict: %s", service)
                 self.service = ReadOnlyDict(service)
@@ -181,6 +298,58 @@ class HostState(object):
 
         return _locked_update(self, compute, service, aggregates, inst_dict)
 
+    def clone(self):
+        """Return a copy of this HostState for use by a single request.
+
+        Resources can be consumed from, and filters can set limits on, the
+        copy without affecting this HostState.
+        """
+        host_state = copy.copy(self)
+        host_state.limits = dict(self.limits)
+        host_state.allocation_candidates = []
+        # PCI stats without pools have nothing to consume, so they are shared
+        # as they are.
+        if self.pci_stats is not None and self.pci_stats.pools:
+            # The NUMA topology is never modified in place, it is replaced
+            # when consuming, and the device filter is built from the config,
+            # so they are shared rather than copied with the PCI stats
+            # referencing them.
+            dev_filter = self.pci_stats.dev_filter
+            host_state.pci_stats = copy.deepcopy(
+                self.pci_stats, {id(self.numa_topology): self.numa_topology,
+                                 id(dev_filter): dev_filter})
+        return host_state
+
+    def get_group_member_count(self, instance_group):
+        """Return the number of members of a server group on this host.
+
+        The count comes from the ServerGroupIndex of the host manager when it
+        tracks the instances of this host, which avoids walking the instances
+        of every host for every request.
+        """
+        if self.group_index is not None:
+            return self.group_index.get_member_counts(
+                instance_group).get(self.host, 0)
+        members = set(instance_group.members or [])
+        return len(members.intersection(self.instances))
+
+    def get_numa_topology_fingerprint(self):
+        """Return a string identifying the content of the NUMA topology of
+        the host, or None if the host has no NUMA topology.
+
+        The fingerprint is only computed again once numa_topology is replaced,
+        which is how it changes when the host is updated or resources are
+        consumed from it.
+        """
+        topology, fingerprint = self._numa_topology_fingerprint
+        if topology is not self.numa_topology:
+            topology = self.numa_topology
+            fingerprint = None
+            if topology is not None:
+                fingerprint = scheduler_utils.get_fingerprint(topology)
+            self._numa_topology_fingerprint = (topology, fingerprint)
+        return fingerprint
+
     def _update_from_compute_node(self, compute):
         """Update information about a host from a ComputeNode object."""
         # NOTE(jichenjc): if the compute record is just created but not updated
@@ -339,6 +508,363 @@ class HostState(object):
         )
 
 
+def _changed_at(record):
+    """Return the newest of the timestamps of a DB backed object."""
+    return max(ts for ts in (record.created_at, record.updated_at,
+                             record.deleted_at) if ts is not None)
+
+
+class _CachedCell(object):
+    """Compute nodes and services of a single cell."""
+
+    def __init__(self, loaded_at):
+        # Dict of ComputeNode objects keyed by their UUID
+        self.compute_nodes = {}
+        # Dict of Service objects keyed by their host
+        self.services = {}
+        # Dict of (HostState, Service) tuples keyed by the UUID of the
+        # compute node the HostState was built from, the Service being the
+        # one the HostState was last updated with
+        self.host_states = {}
+        # Newest timestamp of the records read from the cell
+        self.watermark = None
+        # Monotonic times of the last full load and of the last update
+        self.loaded_at = loaded_at
+        self.synced_at = loaded_at
+
+
+class HostStateCache(object):
+    """Compute nodes and services of the cells, kept between requests.
+
+    The records of a cell are loaded in full the first time the cell is
+    scheduled to, and then every ``[scheduler]
+    host_state_cache_full_refresh_interval`` seconds. In between, only the
+    records created, updated or deleted since the newest timestamp already
+    read from the cell are loaded, and only the HostStates of the compute
+    nodes which changed are rebuilt.
+    """
+
+    # Records are timestamped by the service writing them and only become
+    # visible once their transaction commits, so changes are looked for a bit
+    # before the newest timestamp read to not miss the slower writers.
+    CHANGED_SINCE_MARGIN = datetime.timedelta(seconds=5)
+
+    def __init__(self, host_state_cls):
+        self.host_state_cls = host_state_cls
+        # Dict of _CachedCell objects keyed by cell UUID
+        self._cells = {}
+        # Number of HostStates served without, and with, being rebuilt
+        self.hits = 0
+        self.misses = 0
+        self.full_loads = 0
+
+    def sync(self, context, cells):
+        """Load the changes of the given cells since their last update.
+
+        :param context: request context
+        :param cells: list of CellMapping objects
+        :returns: set of the UUIDs of the cells which could be updated
+        """
+        now = time.monotonic()
+        interval = CONF.scheduler.host_state_cache_full_refresh_interval
+        changed_since = {}
+        for cell in cells:
+            cached = self._cells.get(cell.uuid)
+            if (cached is None or cached.watermark is None or
+                    now - cached.loaded_at >= interval):
+                changed_since[cell.uuid] = None
+            else:
+                changed_since[cell.uuid] = (
+                    cached.watermark - self.CHANGED_SINCE_MARGIN)
+
+        def targeted_operation(cctxt):
+            since = changed_since[cctxt.cell_uuid]
+            if since is None:
+                services = objects.ServiceList.get_by_binary(
+                    cctxt, 'nova-compute', include_disabled=True)
+                return since, services, objects.ComputeNodeList.get_all(cctxt)
+            services = objects.ServiceList.get_by_binary_changed_since(
+                cctxt, 'nova-compute', since)
+            return since, services, (
+                objects.ComputeNodeList.get_all_changed_since(cctxt, since))
+
+        timeout = context_module.CELL_TIMEOUT
+        results = context_module.scatter_gather_cells(context, cells, timeout,
+                                                      targeted_operation)
+        synced = set()
+        for cell_uuid, result in results.items():
+            if isinstance(result, Exception):
+                LOG.warning('Failed to get computes for cell %s', cell_uuid)
+            elif result is context_module.did_not_respond_sentinel:
+                LOG.warning('Timeout getting computes for cell %s', cell_uuid)
+            else:
+                since, services, compute_nodes = result
+                self._update_cell(cell_uuid, now, since is None, services,
+                                  compute_nodes)
+                synced.add(cell_uuid)
+        return synced
+
+    def _update_cell(self, cell_uuid, now, full, services, compute_nodes):
+        cached = self._cells.get(cell_uuid)
+        if full or cached is None:
+            cached = self._cells[cell_uuid] = _CachedCell(now)
+            self.full_loads += 1
+        elif LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('Host state cache of cell %(cell)s: %(services)d '
+                      'services and %(computes)d compute nodes changed in '
+                      'the last %(staleness).1f seconds',
+                      {'cell': cell_uuid, 'services': len(services),
+                       'computes': len(compute_nodes),
+                       'staleness': now - cached.synced_at})
+        cached.synced_at = now
+
+        # Deleted records are handled first in case a record was deleted and
+        # then created again with the same host or UUID.
+        for service in sorted(services, key=lambda s: not s.deleted):
+            cached.watermark = max(filter(None, (cached.watermark,
+                                                 _changed_at(service))))
+            if service.deleted:
+                cached.services.pop(service.host, None)
+                continue
+            cached.services[service.host] = service
+
+        for compute in sorted(compute_nodes, key=lambda c: not c.deleted):
+            cached.watermark = max(filter(None, (cached.watermark,
+                                                 _changed_at(compute))))
+            if compute.deleted:
+                cached.compute_nodes.pop(compute.uuid, None)
+                cached.host_states.pop(compute.uuid, None)
+                continue
+            known = cached.compute_nodes.get(compute.uuid)
+            if known is not None and known.updated_at == compute.updated_at:
+                # Read again because of CHANGED_SINCE_MARGIN
+                continue
+            cached.compute_nodes[compute.uuid] = compute
+            cached.host_states.pop(compute.uuid, None)
+
+    def get_host_states(self, cell_uuid, compute_uuids=None):
+        """Return the cached compute nodes of a cell with their HostState.
+
+        HostStates are built for the compute nodes which are new or changed
+        since the previous call.
+
+        :param cell_uuid: UUID of a cell updated by sync()
+        :param compute_uuids: Optional list of ComputeNode UUIDs to restrict
+            the results to.
+        :returns: list of (ComputeNode, HostState) tuples
+        """
+        cached = self._cells[cell_uuid]
+        if compute_uuids is None:
+            compute_nodes = cached.compute_nodes.values()
+        else:
+            compute_nodes = (cached.compute_nodes[uuid]
+                             for uuid in compute_uuids
+                             if uuid in cached.compute_nodes)
+        results = []
+        for compute in compute_nodes:
+            service = cached.services.get(compute.host)
+            if not service:
+                LOG.warning(
+                    "No compute service record found for host %(host)s",
+                    {'host': compute.host})
+                continue
+            host_state, known_service = cached.host_states.get(
+                compute.uuid, (None, None))
+            if host_state is None:
+                self.misses += 1
+                host_state = self.host_state_cls(compute.host,
+                                                 compute.hypervisor_hostname,
+                                                 cell_uuid, compute=compute)
+                host_state.update(compute, dict(service))
+            else:
+                self.hits += 1
+                # Services are updated each time they report in, which does
+                # not warrant rebuilding the HostState of their nodes.
+                if known_service is not service:
+                    host_state.update(service=dict(service))
+            cached.host_states[compute.uuid] = (host_state, service)
+            results.append((compute, host_state))
+        return results
+
+    def discard(self, cell_uuid):
+        """Drop the cached compute nodes and services of a cell."""
+        self._cells.pop(cell_uuid, None)
+
+    def get_stats(self):
+        """Return the hit ratio and staleness figures of the cache."""
+        now = time.monotonic()
+        served = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': float(self.hits) / served if served else 0.0,
+            'full_loads': self.full_loads,
+            'staleness': {cell_uuid: now - cached.synced_at
+                          for cell_uuid, cached in self._cells.items()},
+        }
+
+
+class ShardedHostStates(list):
+    """List of the HostStates of the cells of this scheduler, which can load
+    the HostStates of the other cells when none of its own hosts fit.
+    """
+
+    def __init__(self, host_states, load_other_host_states):
+        super(ShardedHostStates, self).__init__(host_states)
+        self._load_other_host_states = load_other_host_states
+
+    def load_other_host_states(self):
+        """Returns a list of the HostStates of the other cells."""
+        return list(self._load_other_host_states())
+
+    def map(self, func):
+        """Returns a ShardedHostStates of the results of func for each
+        HostState, including the HostStates of the other cells once loaded.
+        """
+        load_other_host_states = self._load_other_host_states
+        return ShardedHostStates(
+            [func(host_state) for host_state in self],
+            lambda: [func(host_state)
+                     for host_state in load_other_host_states()])
+
+    def with_host_states(self, host_states):
+        """Returns a ShardedHostStates of other HostStates of the cells of
+        this scheduler, loading the same HostStates of the other cells.
+        """
+        return ShardedHostStates(host_states, self._load_other_host_states)
+
+
+class ServerGroupIndex(object):
+    """Index of the hosts of the instances tracked by the host manager.
+
+    Each instance is mapped to the hosts whose instance info lists it, from
+    the updates sent by the computes. The number of members of a server group
+    on each host is then computed once per request from the members of the
+    group, instead of intersecting the members with the instances of every
+    host.
+    """
+
+    def __init__(self):
+        # Set of host names keyed by instance UUID
+        self._hosts_by_instance = {}
+        # Incremented on every change, to invalidate the member counts
+        self._generation = 0
+        # (generation, number of members, Counter of the members per host)
+        # keyed by InstanceGroup. The InstanceGroup objects are owned by the
+        # requests, so the counts are dropped along with them.
+        self._member_counts = weakref.WeakKeyDictionary()
+
+    def clear(self):
+        self._hosts_by_instance = {}
+        self._generation += 1
+
+    def add(self, host, instance_uuids):
+        """Record that the instances are on the host."""
+        for uuid in instance_uuids:
+            self._hosts_by_instance.setdefault(uuid, set()).add(host)
+        self._generation += 1
+
+    def remove(self, host, instance_uuids):
+        """Record that the instances are no longer on the host."""
+        for uuid in instance_uuids:
+            hosts = self._hosts_by_instance.get(uuid)
+            if hosts is None:
+                continue
+            hosts.discard(host)
+            if not hosts:
+                del self._hosts_by_instance[uuid]
+        self._generation += 1
+
+    def get_member_counts(self, instance_group):
+        """Return a Counter of the members of the group keyed by host."""
+        members = instance_group.members or []
+        key = (self._generation, len(members))
+        cached = self._member_counts.get(instance_group)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        counts = collections.Counter()
+        for uuid in set(members):
+            counts.update(self._hosts_by_instance.get(uuid, ()))
+        self._member_counts[instance_group] = (key, counts)
+        return counts
+
+
+class AggregateMetadataIndex(object):
+    """Index of the aggregates of the host manager by metadata.
+
+    Answers the metadata lookups of the request filters from the aggregates
+    the host manager keeps up to date, rather than from the API database.
+    """
+
+    def __init__(self):
+        # Dict of aggregates keyed by their ID
+        self._aggs_by_id = {}
+        # Dict of set of aggregate IDs keyed by metadata key
+        self._ids_by_key = collections.defaultdict(set)
+
+    @staticmethod
+    def _get_metadata(aggregate):
+        return aggregate.metadata if 'metadata' in aggregate else {}
+
+    def update(self, aggregate):
+        self.delete(aggregate)
+        self._aggs_by_id[aggregate.id] = aggregate
+        for key in self._get_metadata(aggregate):
+            self._ids_by_key[key].add(aggregate.id)
+
+    def delete(self, aggregate):
+        old = self._aggs_by_id.pop(aggregate.id, None)
+        if old is None:
+            return
+        for key in self._get_metadata(old):
+            ids = self._ids_by_key.get(key)
+            if ids is not None:
+                ids.discard(aggregate.id)
+                if not ids:
+                    del self._ids_by_key[key]
+
+    def _get_aggregates(self, agg_ids):
+        return [self._aggs_by_id[agg_id] for agg_id in sorted(agg_ids)]
+
+    def get_by_metadata(self, key=None, value=None):
+        """Return the aggregates with a metadata key set to value.
+
+        Mirrors AggregateList.get_by_metadata(): if key is None, any metadata
+        key set to value qualifies, and if value is None, any value of the
+        key does.
+        """
+        assert key is not None or value is not None
+        if key is not None:
+            keys = [key]
+        else:
+            keys = list(self._ids_by_key)
+        agg_ids = set()
+        for key in keys:
+            for agg_id in self._ids_by_key.get(key, ()):
+                if (value is None or
+                        self._aggs_by_id[agg_id].metadata[key] == value):
+                    agg_ids.add(agg_id)
+        return self._get_aggregates(agg_ids)
+
+    def get_non_matching_by_metadata_keys(self, ignored_keys, key_prefix,
+                                          value):
+        """Return the aggregates with a metadata key starting with
+        key_prefix and not in ignored_keys, set to value.
+
+        Mirrors AggregateList.get_non_matching_by_metadata_keys().
+        """
+        if not key_prefix:
+            raise ValueError(_('key_prefix mandatory field.'))
+        ignored_keys = set(ignored_keys)
+        agg_ids = set()
+        for key, ids in self._ids_by_key.items():
+            if not key.startswith(key_prefix) or key in ignored_keys:
+                continue
+            agg_ids.update(agg_id for agg_id in ids
+                           if self._aggs_by_id[agg_id].metadata[key] == value)
+        return self._get_aggregates(agg_ids)
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -354,22 +880,46 @@ class HostManager(object):
         self.filter_cls_map = {cls.__name__: cls for cls in filter_classes}
         self.filter_obj_map = {}
         self.enabled_filters = self._choose_host_filters(self._load_filters())
+        self.vectorized_filtering = (
+            CONF.filter_scheduler.vectorized_filtering)
+        if self.vectorized_filtering and not host_columns.is_available():
+            LOG.warning("The [filter_scheduler] vectorized_filtering option "
+                        "is enabled but numpy could not be imported. Hosts "
+                        "will be filtered one at a time.")
+            self.vectorized_filtering = False
         self.weight_handler = weights.HostWeightHandler()
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.filter_scheduler.weight_classes)
         self.weighers = [cls() for cls in weigher_classes]
+        self.vectorized_weighing = CONF.filter_scheduler.vectorized_weighing
+        if self.vectorized_weighing and not host_columns.is_available():
+            LOG.warning("The [filter_scheduler] vectorized_weighing option "
+                        "is enabled but numpy could not be imported. Hosts "
+                        "will be weighed one at a time.")
+            self.vectorized_weighing = False
         # Dict of aggregates keyed by their ID
         self.aggs_by_id = {}
         # Dict of set of aggregate IDs keyed by the name of the host belonging
         # to those aggregates
         self.host_aggregates_map = collections.defaultdict(set)
+        # Dict of AggregatesMetadata keyed by host name, and keyed by the
+        # set of aggregate IDs they are computed from, to share them between
+        # the hosts in the same aggregates. Emptied when an aggregate changes.
+        self.host_aggregates_metadata = {}
+        self._aggregates_metadata = {}
+        # Aggregates indexed by metadata, for the request filters
+        self.aggregate_index = AggregateMetadataIndex()
         self._init_aggregates()
         self.track_instance_changes = (
                 CONF.filter_scheduler.track_instance_changes)
         # Dict of instances and status, keyed by host
         self._instance_info = {}
+        # Hosts of the instances of _instance_info
+        self.group_index = ServerGroupIndex()
         if self.track_instance_changes:
             self._init_instance_info()
+        # Partition of the hosts between the schedulers, if any
+        self.shards = sharding.get_shards()
 
     def _load_filters(self):
         return CONF.filter_scheduler.enabled_filters
@@ -379,6 +929,7 @@ class HostManager(object):
         aggs = objects.AggregateList.get_all(elevated)
         for agg in aggs:
             self.aggs_by_id[agg.id] = agg
+            self.aggregate_index.update(agg)
             for host in agg.hosts:
                 self.host_aggregates_map[host].add(agg.id)
 
@@ -390,8 +941,14 @@ class HostManager(object):
         else:
             self._update_aggregate(aggregates)
 
+    def _invalidate_aggregates_metadata(self):
+        self.host_aggregates_metadata = {}
+        self._aggregates_metadata = {}
+
     def _update_aggregate(self, aggregate):
         self.aggs_by_id[aggregate.id] = aggregate
+        self.aggregate_index.update(aggregate)
+        self._invalidate_aggregates_metadata()
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
         # Refreshing the mapping dict to remove all hosts that are no longer
@@ -406,6 +963,8 @@ class HostManager(object):
         """
         if aggregate.id in self.aggs_by_id:
             del self.aggs_by_id[aggregate.id]
+        self.aggregate_index.delete(aggregate)
+        self._invalidate_aggregates_metadata()
         for host in self.host_aggregates_map:
             if aggregate.id in self.host_aggregates_map[host]:
                 self.host_aggregates_map[host].remove(aggregate.id)
@@ -426,6 +985,7 @@ class HostManager(object):
             context = context_module.get_admin_context()
             LOG.debug("START:_async_init_instance_info")
             self._instance_info = {}
+            self.group_index.clear()
 
             count = 0
             if not computes_by_cell:
@@ -461,10 +1021,12 @@ class HostManager(object):
                     for instance in instances:
                         host = instance.host
                         if host not in self._instance_info:
-                            self._instance_info[host] = {"instances": {},
-                                                         "updated": False}
+                            self._instance_info[host] = {
+                                "instances": HostInstances(cctxt, host),
+                                "updated": False}
                         inst_dict = self._instance_info[host]
                         inst_dict["instances"][instance.uuid] = instance
+                        self.group_index.add(host, [instance.uuid])
                     # Call sleep() to cooperatively yield
                     time.sleep(0)
                 LOG.debug("END:_async_init_instance_info")
@@ -615,13 +1177,23 @@ class HostManager(object):
             hosts = name_to_cls_map.values()
 
         return self.filter_handler.get_filtered_objects(self.enabled_filters,
-                hosts, spec_obj, index)
+                hosts, spec_obj, index, vectorized=self.vectorized_filtering)
 
     def get_weighed_hosts(self, hosts, spec_obj):
         """Weigh the hosts."""
         return self.weight_handler.get_weighed_objects(self.weighers,
                 hosts, spec_obj)
 
+    def get_top_weighed_hosts(self, hosts, spec_obj, limit,
+                              include_ties=False):
+        """Weigh the hosts, only wrapping the best ones.
+
+        Returns a tuple of the sorted list of the ``limit`` best WeighedHost
+        objects and the sorted list of the remaining HostState objects.
+        """
+        return self.weight_handler.get_top_weighed_objects(self.weighers,
+                hosts, spec_obj, limit, include_ties=include_ties)
+
     def _get_computes_for_cells(self, context, cells, compute_uuids):
         """Get a tuple of compute node and service information.
 
@@ -763,6 +1335,11 @@ class HostManager(object):
         # Dict, keyed by host name, to cell UUID to be used to look up the
         # cell a particular host is in (used with self.cells).
         self.host_to_cell_uuid = {}
+        # Compute nodes and services cached between requests. It is rebuilt
+        # along with the cells cache as cells may have been added or removed.
+        self.host_state_cache = None
+        if CONF.scheduler.host_state_cache:
+            self.host_state_cache = HostStateCache(self.host_state_cls)
 
     def get_host_states_by_uuids(self, context, compute_uuids, spec_obj):
 
@@ -783,10 +1360,78 @@ class HostManager(object):
         else:
             cells = self.enabled_cells
 
+        if self.host_state_cache is not None:
+            if (self.shards is not None and
+                    self.shards.shard_by == sharding.SHARD_BY_CELL):
+                return self._get_sharded_host_states(context, cells,
+                                                     compute_uuids)
+            return self._get_cached_host_states(context, cells, compute_uuids)
+
         compute_nodes, services = self._get_computes_for_cells(
             context, cells, compute_uuids=compute_uuids)
         return self._get_host_states(context, compute_nodes, services)
 
+    def _get_cached_host_states(self, context, cells, compute_uuids):
+        """Returns an iterator over HostStates using the host state cache.
+
+        Each request gets its own copy of the cached HostStates so that the
+        resources it consumes, and the limits set by filters, do not leak
+        into other requests.
+        """
+        cache = self.host_state_cache
+        host_states = []
+        for cell_uuid in cache.sync(context, cells):
+            for compute, cached_state in cache.get_host_states(
+                    cell_uuid, compute_uuids):
+                host_state = cached_state.clone()
+                host_state.update(
+                    aggregates=self._get_aggregates_info(compute.host),
+                    inst_dict=self._get_instance_info(context, compute))
+                host_state.group_index = self._get_group_index(compute.host)
+                host_state.aggregates_metadata = (
+                    self._get_aggregates_metadata(compute.host))
+                host_states.append(host_state)
+
+        if LOG.isEnabledFor(logging.DEBUG):
+            stats = cache.get_stats()
+            LOG.debug('Host state cache: %(hits)d hits, %(misses)d misses '
+                      '(hit ratio %(hit_ratio).2f), %(full_loads)d full '
+                      'loads', stats)
+        return iter(host_states)
+
+    def _get_sharded_host_states(self, context, cells, compute_uuids):
+        """Returns the HostStates of the cells in the partition of this
+        scheduler, using the host state cache.
+
+        The hosts of the other cells are only used when none of the hosts of
+        this scheduler fit, so they are only loaded then, and without being
+        cached.
+        """
+        own_cells = []
+        other_cells = []
+        for cell in cells:
+            if self.shards.owns_cell(cell.uuid):
+                own_cells.append(cell)
+            else:
+                other_cells.append(cell)
+                # The cell may have been owned before the schedulers changed
+                self.host_state_cache.discard(cell.uuid)
+
+        host_states = self._get_cached_host_states(context, own_cells,
+                                                   compute_uuids)
+        if not other_cells:
+            return host_states
+
+        def load_other_host_states():
+            LOG.debug('None of the hosts of the cells of this scheduler fit, '
+                      'loading the hosts of %d other cells',
+                      len(other_cells))
+            compute_nodes, services = self._get_computes_for_cells(
+                context, other_cells, compute_uuids=compute_uuids)
+            return self._get_host_states(context, compute_nodes, services)
+
+        return ShardedHostStates(host_states, load_other_host_states)
+
     def _get_host_states(self, context, compute_nodes, services):
         """Returns a generator over HostStates given a list of computes.
 
@@ -821,6 +1466,9 @@ class HostManager(object):
                                   dict(service),
                                   self._get_aggregates_info(host),
                                   self._get_instance_info(context, compute))
+                host_state.group_index = self._get_group_index(host)
+                host_state.aggregates_metadata = (
+                    self._get_aggregates_metadata(host))
 
                 seen_nodes.add(state_key)
 
@@ -830,6 +1478,21 @@ class HostManager(object):
         return [self.aggs_by_id[agg_id] for agg_id in
                 self.host_aggregates_map[host]]
 
+    def _get_aggregates_metadata(self, host):
+        """Returns the AggregatesMetadata of the aggregates of the host,
+        computed again only once an aggregate changed.
+        """
+        metadata = self.host_aggregates_metadata.get(host)
+        if metadata is None:
+            agg_ids = frozenset(self.host_aggregates_map.get(host, ()))
+            metadata = self._aggregates_metadata.get(agg_ids)
+            if metadata is None:
+                metadata = self._aggregates_metadata[agg_ids] = (
+                    filters_utils.AggregatesMetadata(
+                        self.aggs_by_id[agg_id] for agg_id in agg_ids))
+            self.host_aggregates_metadata[host] = metadata
+        return metadata
+
     def _get_cell_mapping_for_host(self, context, host_name):
         """Finds the CellMapping for a particular host name
 
@@ -873,9 +1536,9 @@ class HostManager(object):
             return {}
         with context_module.target_cell(context, cm) as cctxt:
             uuids = objects.InstanceList.get_uuids_by_host(cctxt, host_name)
-            # Putting the context in the otherwise fake Instance object at
+            # Putting the context in the otherwise fake Instance objects at
             # least allows out of tree filters to lazy-load fields.
-            return {uuid: objects.Instance(cctxt, uuid=uuid) for uuid in uuids}
+            return HostInstances.from_uuids(cctxt, host_name, uuids)
 
     def _get_instance_info(self, context, compute):
         """Gets the host instance info from the compute host.
@@ -895,14 +1558,32 @@ class HostManager(object):
             inst_dict = self._get_instances_by_host(context, host_name)
         return inst_dict
 
+    def _get_group_index(self, host_name):
+        """Returns the ServerGroupIndex if it tracks the instances of the
+        host, which is the case when _get_instance_info() returns them from
+        the _instance_info dict.
+        """
+        host_info = self._instance_info.get(host_name)
+        if host_info and host_info.get("updated"):
+            return self.group_index
+        return None
+
+    def _set_host_instance_info(self, host_name, inst_dict, updated):
+        """Store the instances of the host in the _instance_info dict."""
+        host_info = self._instance_info.get(host_name)
+        if host_info:
+            self.group_index.remove(host_name, host_info["instances"])
+        host_info = self._instance_info[host_name] = {}
+        host_info["instances"] = inst_dict
+        host_info["updated"] = updated
+        self.group_index.add(host_name, inst_dict)
+
     def _recreate_instance_info(self, context, host_name):
         """Get the InstanceList for the specified host, and store it in the
         _instance_info dict.
         """
         inst_dict = self._get_instances_by_host(context, host_name)
-        host_info = self._instance_info[host_name] = {}
-        host_info["instances"] = inst_dict
-        host_info["updated"] = False
+        self._set_host_instance_info(host_name, inst_dict, False)
 
     @utils.synchronized(HOST_INSTANCE_SEMAPHORE)
     def update_instance_info(self, context, host_name, instance_info):
@@ -918,15 +1599,28 @@ class HostManager(object):
             for instance in instance_info.objects:
                 # Overwrite the entry (if any) with the new info.
                 inst_dict[instance.uuid] = instance
+            self.group_index.add(
+                host_name,
+                [instance.uuid for instance in instance_info.objects])
             host_info["updated"] = True
         else:
             instances = instance_info.objects
             if len(instances) > 1:
-                # This is a host sending its full instance list, so use it.
-                host_info = self._instance_info[host_name] = {}
-                host_info["instances"] = {instance.uuid: instance
-                                          for instance in instances}
-                host_info["updated"] = True
+                # This is a host sending its full instance list, so use it,
+                # with a context targeting the cell of the host to lazy-load
+                # the other fields of the instances.
+                try:
+                    cm = self._get_cell_mapping_for_host(context, host_name)
+                except exception.HostMappingNotFound:
+                    LOG.info('Host mapping not found for host %s. Not '
+                             'targeting its cell to load its instances.',
+                             host_name)
+                    cm = None
+                with context_module.target_cell(context, cm) as cctxt:
+                    self._set_host_instance_info(
+                        host_name,
+                        HostInstances(cctxt, host_name, instances),
+                        True)
             else:
                 self._recreate_instance_info(context, host_name)
                 LOG.info("Received an update from an unknown host '%s'. "
@@ -944,6 +1638,7 @@ class HostManager(object):
             inst_dict = host_info["instances"]
             # Remove the existing Instance object, if any
             inst_dict.pop(instance_uuid, None)
+            self.group_index.remove(host_name, [instance_uuid])
             host_info["updated"] = True
         else:
             self._recreate_instance_info(context, host_name)
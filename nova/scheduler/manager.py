@@ -40,11 +40,13 @@ from nova.objects import host_mapping as host_mapping_obj
 from nova.objects import service as obj_service
 from nova import quota
 from nova import rpc
+from nova.scheduler import batch
 from nova.scheduler.client import report
 from nova.scheduler import host_manager
 from nova.scheduler import request_filter
 from nova.scheduler import utils
 from nova import servicegroup
+from nova import utils as nova_utils
 
 CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
@@ -70,6 +72,11 @@ class SchedulerManager(manager.Manager):
         self.servicegroup_api = servicegroup.API()
         self.notifier = rpc.get_notifier('scheduler')
         self._placement_client = None
+        self._batcher = None
+        if CONF.scheduler.batch_window > 0:
+            self._batcher = batch.RequestBatcher(
+                self._schedule_batch, CONF.scheduler.batch_window,
+                CONF.scheduler.batch_max_requests)
 
         try:
             # Test our placement client during initialization
@@ -146,6 +153,13 @@ class SchedulerManager(manager.Manager):
             else:
                 LOG.debug(msg)
 
+    @periodic_task.periodic_task(
+        spacing=CONF.scheduler.shard_refresh_interval,
+        run_immediately=True)
+    def _refresh_shards(self, context):
+        if self.host_manager.shards is not None:
+            self.host_manager.shards.refresh(context)
+
     def reset(self):
         # NOTE(tssurya): This is a SIGHUP handler which will reset the cells
         # and enabled cells caches in the host manager. So every time an
@@ -197,7 +211,9 @@ class SchedulerManager(manager.Manager):
             = None, None, None
         if not is_rebuild:
             try:
-                request_filter.process_reqspec(context, spec_obj)
+                request_filter.process_reqspec(
+                    context, spec_obj,
+                    aggregates=self.host_manager.aggregate_index)
             except exception.RequestFilterFailed as e:
                 raise exception.NoValidHost(reason=e.message)
 
@@ -291,12 +307,23 @@ class SchedulerManager(manager.Manager):
             action=fields_obj.NotificationAction.SELECT_DESTINATIONS,
             phase=fields_obj.NotificationPhase.START)
 
+        selections = None
+        if (self._batcher is not None and instance_uuids is not None and
+                alloc_reqs_by_rp_uuid is not None):
+            # Requests which could not be scheduled as part of a batch get
+            # None and are scheduled on their own below.
+            selections = self._batcher.submit(
+                context, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, provider_summaries,
+                allocation_request_version, return_alternates)
+
         # Only return alternates if both return_objects and return_alternates
         # are True.
-        selections = self._schedule(
-            context, spec_obj, instance_uuids,
-            alloc_reqs_by_rp_uuid, provider_summaries,
-            allocation_request_version, return_alternates)
+        if selections is None:
+            selections = self._schedule(
+                context, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, provider_summaries,
+                allocation_request_version, return_alternates)
 
         self.notifier.info(
             context, 'scheduler.select_destinations.end',
@@ -345,14 +372,13 @@ class SchedulerManager(manager.Manager):
         # host, we virtually consume resources on it so subsequent
         # selections can adjust accordingly.
 
-        def hosts_with_alloc_reqs(hosts_gen):
-            """Extend the HostState objects returned by the generator with
-            the allocation requests of that host
+        def host_with_alloc_reqs(host):
+            """Extend the HostState object with the allocation requests of
+            that host
             """
-            for host in hosts_gen:
-                host.allocation_candidates = copy.deepcopy(
-                    alloc_reqs_by_rp_uuid[host.uuid])
-                yield host
+            host.allocation_candidates = copy.deepcopy(
+                alloc_reqs_by_rp_uuid[host.uuid])
+            return host
 
         # Note: remember, we are using a generator-iterator here. So only
         # traverse this list once. This can bite you if the hosts
@@ -366,7 +392,7 @@ class SchedulerManager(manager.Manager):
             # wrap the generator to extend the HostState objects with the
             # allocation requests for that given host. This is needed to
             # support scheduler filters filtering on allocation candidates.
-            hosts = hosts_with_alloc_reqs(hosts)
+            hosts = self._map_host_states(hosts, host_with_alloc_reqs)
 
         # NOTE(sbauza): The RequestSpec.num_instances field contains the number
         # of instances created when the RequestSpec was used to first boot some
@@ -511,6 +537,147 @@ class SchedulerManager(manager.Manager):
             claimed_alloc_reqs,
         )
 
+    def _schedule_batch(self, requests):
+        """Select and claim the hosts of a batch of requests.
+
+        The hosts of every instance of every request are selected first,
+        against a single snapshot of the host states shared by the requests.
+        The resources of each instance are consumed from the snapshot before
+        selecting the host of the next one, acting as optimistic claims. The
+        resources are then claimed in the placement API concurrently.
+
+        :param requests: list of tuples of the arguments of _schedule() for
+            each request of the batch
+        :returns: a list with, for each request, either the list of lists of
+            Selection objects _schedule() would have returned, or None if the
+            request could not be scheduled as part of the batch and has to be
+            scheduled on its own.
+        """
+        snapshot = {}
+        assignments = []
+        group_hosts = []
+        for request in requests:
+            spec_obj = request[1]
+            # The hosts selected are added to the server group of the request
+            # and have to be removed if the request is scheduled again.
+            group_hosts.append(
+                list(spec_obj.instance_group.hosts)
+                if spec_obj.instance_group is not None else None)
+            try:
+                assignment = self._assign_hosts(snapshot, *request)
+            except Exception:
+                LOG.exception('Failed to select hosts as part of a batch for '
+                              'instances %s', request[2])
+                assignment = None
+            if assignment is None:
+                self._reset_group_hosts(spec_obj, group_hosts[-1])
+            assignments.append(assignment)
+
+        futures = []
+        for request, assignment in zip(requests, assignments):
+            if assignment is None:
+                futures.append(None)
+                continue
+            context, spec_obj, instance_uuids = request[:3]
+            allocation_request_version = request[5]
+            elevated = context.elevated()
+            futures.append([
+                nova_utils.spawn(
+                    utils.claim_resources, elevated, self.placement_client,
+                    spec_obj, instance_uuid, alloc_req,
+                    allocation_request_version=allocation_request_version)
+                for instance_uuid, alloc_req in zip(
+                    instance_uuids, assignment['alloc_reqs'])
+            ])
+
+        results = []
+        for request, assignment, claims, hosts in zip(
+                requests, assignments, futures, group_hosts):
+            if assignment is None:
+                results.append(None)
+                continue
+            context, spec_obj, instance_uuids = request[:3]
+            claimed = []
+            for instance_uuid, claim in zip(instance_uuids, claims):
+                try:
+                    if claim.result():
+                        claimed.append(instance_uuid)
+                except Exception:
+                    LOG.debug('Failed to claim resources as part of a batch',
+                              exc_info=True, instance_uuid=instance_uuid)
+            if len(claimed) == len(instance_uuids):
+                results.append(assignment['selections'])
+                continue
+
+            LOG.debug('Unable to claim the hosts selected as part of a '
+                      'batch for instances %s, scheduling them again.',
+                      instance_uuids)
+            self._cleanup_allocations(context, claimed)
+            self._reset_group_hosts(spec_obj, hosts)
+            results.append(None)
+        return results
+
+    @staticmethod
+    def _reset_group_hosts(spec_obj, hosts):
+        if spec_obj.instance_group is not None:
+            spec_obj.instance_group.hosts = hosts
+            # hosts has to be not part of the updates when saving
+            spec_obj.instance_group.obj_reset_changes(['hosts'])
+
+    def _assign_hosts(
+        self, snapshot, context, spec_obj, instance_uuids,
+        alloc_reqs_by_rp_uuid, provider_summaries,
+        allocation_request_version=None, return_alternates=False,
+    ):
+        """Select the hosts of a request of a batch without claiming them.
+
+        :param snapshot: dict of the HostState objects shared by the requests
+            of the batch, keyed by (host, node)
+        :returns: a dict with the Selection objects to return and the
+            allocation request to claim for each instance, or None if no host
+            could be selected for one of the instances.
+        """
+        def snapshot_host(host):
+            host = snapshot.setdefault((host.host, host.nodename), host)
+            # The snapshot is shared by the requests of the batch but they
+            # are handled one at a time, so the allocation candidates of the
+            # request can be set on it.
+            host.allocation_candidates = copy.deepcopy(
+                alloc_reqs_by_rp_uuid[host.uuid])
+            return host
+
+        hosts = self._map_host_states(
+            self._get_all_host_states(
+                context.elevated(), spec_obj, provider_summaries),
+            snapshot_host)
+
+        num_alts = CONF.scheduler.max_attempts - 1 if return_alternates else 0
+        selected_hosts = []
+        alloc_reqs = []
+        for num, instance_uuid in enumerate(instance_uuids):
+            spec_obj.instance_uuid = instance_uuid
+            spec_obj.obj_reset_changes(['instance_uuid'])
+
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num)
+            selected_host = next(
+                (host for host in hosts if host.allocation_candidates), None)
+            if selected_host is None:
+                return None
+
+            alloc_req = selected_host.allocation_candidates[0]
+            for request_group in spec_obj.requested_resources:
+                request_group.provider_uuids = alloc_req[
+                    'mappings'][request_group.requester_id]
+            self._consume_selected_host(
+                selected_host, spec_obj, instance_uuid=instance_uuid)
+            selected_hosts.append(selected_host)
+            alloc_reqs.append(alloc_req)
+
+        selections = self._get_alternate_hosts(
+            selected_hosts, spec_obj, hosts, num, num_alts,
+            alloc_reqs_by_rp_uuid, allocation_request_version, alloc_reqs)
+        return {'selections': selections, 'alloc_reqs': alloc_reqs}
+
     def _ensure_sufficient_hosts(
         self, context, hosts, required_count, claimed_uuids=None,
     ):
@@ -617,6 +784,9 @@ class SchedulerManager(manager.Manager):
                 # about the keys.
                 selected_host.instances[instance_uuid] = objects.Instance(
                     uuid=instance_uuid)
+                if selected_host.group_index is not None:
+                    selected_host.group_index.add(
+                        selected_host.host, [instance_uuid])
 
     def _get_alternate_hosts(
         self, selected_hosts, spec_obj, hosts, index, num_alts,
@@ -717,14 +887,46 @@ class SchedulerManager(manager.Manager):
         filtered_hosts = self.host_manager.get_filtered_hosts(host_states,
             spec_obj, index)
 
+        # The hosts of the cells of the other schedulers are only loaded when
+        # none of the hosts of this scheduler fit.
+        sharded_host_states = None
+        if isinstance(host_states, host_manager.ShardedHostStates):
+            if filtered_hosts:
+                sharded_host_states = host_states
+            else:
+                filtered_hosts = self.host_manager.get_filtered_hosts(
+                    host_states.load_other_host_states(), spec_obj, index)
+
         LOG.debug("Filtered %(hosts)s", {'hosts': filtered_hosts})
 
         if not filtered_hosts:
             return []
 
-        weighed_hosts = self.host_manager.get_weighed_hosts(
-            filtered_hosts, spec_obj)
-        if CONF.filter_scheduler.shuffle_best_same_weighed_hosts:
+        # The hosts of the other schedulers are only weighed when none of the
+        # hosts of this scheduler fit, and are otherwise kept as alternates.
+        shard_hosts = []
+        if self.host_manager.shards is not None:
+            filtered_hosts, shard_hosts = (
+                self.host_manager.shards.split_hosts(filtered_hosts))
+            if not filtered_hosts:
+                filtered_hosts, shard_hosts = shard_hosts, []
+
+        host_subset_size = CONF.filter_scheduler.host_subset_size
+        shuffle_best = CONF.filter_scheduler.shuffle_best_same_weighed_hosts
+        if self.host_manager.vectorized_weighing:
+            # Only the hosts we may pick from, and possibly use as alternates,
+            # need to be wrapped and logged with their weight. The others are
+            # kept sorted as they may still be tried if claiming fails.
+            weighed_hosts, other_hosts = (
+                self.host_manager.get_top_weighed_hosts(
+                    filtered_hosts, spec_obj,
+                    host_subset_size + CONF.scheduler.max_attempts,
+                    include_ties=shuffle_best))
+        else:
+            weighed_hosts = self.host_manager.get_weighed_hosts(
+                filtered_hosts, spec_obj)
+            other_hosts = []
+        if shuffle_best:
             # NOTE(pas-ha) Randomize best hosts, relying on weighed_hosts
             # being already sorted by weight in descending order.
             # This decreases possible contention and rescheduling attempts
@@ -746,7 +948,6 @@ class SchedulerManager(manager.Manager):
         # We randomize the first element in the returned list to alleviate
         # congestion where the same host is consistently selected among
         # numerous potential hosts for similar request specs.
-        host_subset_size = CONF.filter_scheduler.host_subset_size
         if host_subset_size < len(weighed_hosts):
             weighed_subset = weighed_hosts[0:host_subset_size]
         else:
@@ -754,7 +955,23 @@ class SchedulerManager(manager.Manager):
 
         chosen_host = random.choice(weighed_subset)
         weighed_hosts.remove(chosen_host)
-        return [chosen_host] + weighed_hosts
+        sorted_hosts = ([chosen_host] + weighed_hosts + other_hosts +
+                        shard_hosts)
+        if sharded_host_states is not None:
+            # The hosts of the other cells may still be needed by the next
+            # instances of the request.
+            return sharded_host_states.with_host_states(sorted_hosts)
+        return sorted_hosts
+
+    @staticmethod
+    def _map_host_states(host_states, func):
+        """Returns an iterable over the results of func for each HostState,
+        which keeps loading the HostStates of the other cells lazily if the
+        hosts are partitioned by cell.
+        """
+        if isinstance(host_states, host_manager.ShardedHostStates):
+            return host_states.map(func)
+        return (func(host_state) for host_state in host_states)
 
     def _get_all_host_states(self, context, spec_obj, provider_summaries):
         """Template method, so a subclass can implement caching."""
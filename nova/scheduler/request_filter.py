@@ -20,6 +20,7 @@ import nova.conf
 from nova import context as nova_context
 from nova import exception
 from nova.i18n import _
+from nova import instrumentation
 from nova.network import neutron
 from nova import objects
 from nova.scheduler.client import report
@@ -33,24 +34,33 @@ TENANT_METADATA_KEY = 'filter_tenant_id'
 
 def trace_request_filter(fn):
     @functools.wraps(fn)
-    def wrapper(ctxt, request_spec):
+    def wrapper(ctxt, request_spec, **kwargs):
         timer = timeutils.StopWatch()
         ran = False
         with timer:
             try:
-                ran = fn(ctxt, request_spec)
+                ran = fn(ctxt, request_spec, **kwargs)
             finally:
                 if ran:
                     # Only log info if the filter was enabled and not
                     # excluded for some reason
                     LOG.debug('Request filter %r took %.1f seconds',
                         fn.__name__, timer.elapsed())
+                    instrumentation.record(
+                        instrumentation.REQUEST_FILTER, fn.__name__,
+                        timer.elapsed())
         return ran
     return wrapper
 
 
+def _get_aggregates_by_metadata(ctxt, aggregates, **kwargs):
+    if aggregates is not None:
+        return aggregates.get_by_metadata(**kwargs)
+    return objects.AggregateList.get_by_metadata(ctxt, **kwargs)
+
+
 @trace_request_filter
-def isolate_aggregates(ctxt, request_spec):
+def isolate_aggregates(ctxt, request_spec, aggregates=None):
     """Prepare list of aggregates that should be isolated.
 
     This filter will prepare the list of aggregates that should be
@@ -63,6 +73,9 @@ def isolate_aggregates(ctxt, request_spec):
     flavor and unions them. Then it accumulates the set of aggregates that
     request traits are "non_matching_by_metadata_keys" and uses that to
     produce the list of isolated aggregates.
+
+    The aggregates are looked up in the AggregateMetadataIndex of the
+    scheduler given as aggregates, or in the database if it is None.
     """
 
     if not CONF.scheduler.enable_isolated_aggregate_filtering:
@@ -74,9 +87,13 @@ def isolate_aggregates(ctxt, request_spec):
 
     keys = ['trait:%s' % trait for trait in required_traits]
 
-    isolated_aggregates = (
-        objects.aggregate.AggregateList.get_non_matching_by_metadata_keys(
-            ctxt, keys, 'trait:', value='required'))
+    if aggregates is not None:
+        isolated_aggregates = aggregates.get_non_matching_by_metadata_keys(
+            keys, 'trait:', value='required')
+    else:
+        isolated_aggregates = (
+            objects.aggregate.AggregateList.get_non_matching_by_metadata_keys(
+                ctxt, keys, 'trait:', value='required'))
 
     # Set list of isolated aggregates to destination object of request_spec
     if isolated_aggregates:
@@ -92,7 +109,7 @@ def isolate_aggregates(ctxt, request_spec):
 
 
 @trace_request_filter
-def require_tenant_aggregate(ctxt, request_spec):
+def require_tenant_aggregate(ctxt, request_spec, aggregates=None):
     """Require hosts in an aggregate based on tenant id.
 
     This will modify request_spec to request hosts in an aggregate
@@ -107,12 +124,13 @@ def require_tenant_aggregate(ctxt, request_spec):
     if not enabled:
         return False
 
-    aggregates = objects.AggregateList.get_by_metadata(
-        ctxt, value=request_spec.project_id)
+    tenant_aggregates = _get_aggregates_by_metadata(
+        ctxt, aggregates, value=request_spec.project_id)
     aggregate_uuids_for_tenant = set([])
-    for agg in aggregates:
+    for agg in tenant_aggregates:
         for key, value in agg.metadata.items():
-            if key.startswith(TENANT_METADATA_KEY):
+            if (key.startswith(TENANT_METADATA_KEY) and
+                    value == request_spec.project_id):
                 aggregate_uuids_for_tenant.add(agg.uuid)
                 break
 
@@ -136,7 +154,7 @@ def require_tenant_aggregate(ctxt, request_spec):
 
 
 @trace_request_filter
-def map_az_to_placement_aggregate(ctxt, request_spec):
+def map_az_to_placement_aggregate(ctxt, request_spec, aggregates=None):
     """Map requested nova availability zones to placement aggregates.
 
     This will modify request_spec to request hosts in an aggregate that
@@ -147,14 +165,13 @@ def map_az_to_placement_aggregate(ctxt, request_spec):
     if not az_hint:
         return False
 
-    aggregates = objects.AggregateList.get_by_metadata(ctxt,
-                                                       key='availability_zone',
-                                                       value=az_hint)
-    if aggregates:
+    az_aggregates = _get_aggregates_by_metadata(
+        ctxt, aggregates, key='availability_zone', value=az_hint)
+    if az_aggregates:
         if ('requested_destination' not in request_spec or
                 request_spec.requested_destination is None):
             request_spec.requested_destination = objects.Destination()
-        agg_uuids = [agg.uuid for agg in aggregates]
+        agg_uuids = [agg.uuid for agg in az_aggregates]
         request_spec.requested_destination.require_aggregates(agg_uuids)
         LOG.debug('map_az_to_placement_aggregate request filter added '
                   'aggregates %s for az %r',
@@ -480,12 +497,24 @@ ALL_REQUEST_FILTERS = [
     virtio_sound_filter
 ]
 
+# The request filters looking up aggregates by metadata
+AGGREGATE_REQUEST_FILTERS = (
+    require_tenant_aggregate,
+    map_az_to_placement_aggregate,
+    isolate_aggregates,
+)
+
 
-def process_reqspec(ctxt, request_spec):
+def process_reqspec(ctxt, request_spec, aggregates=None):
     """Process an objects.ReqestSpec before calling placement.
 
     :param ctxt: A RequestContext
     :param request_spec: An objects.RequestSpec to be inspected/modified
+    :param aggregates: An optional AggregateMetadataIndex the filters look
+                       up aggregates in, instead of the database
     """
     for filter in ALL_REQUEST_FILTERS:
-        filter(ctxt, request_spec)
+        if aggregates is not None and filter in AGGREGATE_REQUEST_FILTERS:
+            filter(ctxt, request_spec, aggregates=aggregates)
+        else:
+            filter(ctxt, request_spec)
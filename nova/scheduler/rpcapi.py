@@ -23,6 +23,7 @@ from nova import exception as exc
 from nova.objects import base as objects_base
 from nova import profiler
 from nova import rpc
+from nova.scheduler import sharding
 
 CONF = nova.conf.CONF
 RPC_TOPIC = "scheduler"
@@ -128,6 +129,20 @@ class SchedulerAPI(object):
         serializer = objects_base.NovaObjectSerializer()
         self.client = rpc.get_client(target, version_cap=version_cap,
                                      serializer=serializer)
+        # Partition of the hosts between the schedulers, if any
+        self.shards = sharding.get_shards(include_self=False)
+
+    def _get_shard_server(self, ctxt, spec_obj):
+        """Returns the host of the scheduler owning the hosts the request is
+        restricted to, or None if it can go to any scheduler.
+        """
+        if self.shards is None:
+            return None
+        key = self.shards.get_request_key(spec_obj)
+        if key is None:
+            return None
+        self.shards.maybe_refresh(ctxt.elevated())
+        return self.shards.get_owner(key)
 
     def select_destinations(self, ctxt, spec_obj, instance_uuids,
             return_objects=False, return_alternates=False):
@@ -154,9 +169,13 @@ class SchedulerAPI(object):
             msg_args['filter_properties'
                      ] = spec_obj.to_legacy_filter_properties_dict()
             version = '4.0'
+        prepare_kwargs = {}
+        server = self._get_shard_server(ctxt, spec_obj)
+        if server is not None:
+            prepare_kwargs['server'] = server
         cctxt = self.client.prepare(
             version=version, call_monitor_timeout=CONF.rpc_response_timeout,
-            timeout=CONF.long_rpc_timeout)
+            timeout=CONF.long_rpc_timeout, **prepare_kwargs)
         return cctxt.call(ctxt, 'select_destinations', **msg_args)
 
     def update_aggregates(self, ctxt, aggregates):
@@ -0,0 +1,155 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Partition of the hosts between the schedulers.
+
+The cells, or the availability zones, are spread over the nova-scheduler
+services which are up with a consistent hash ring, so that adding or removing
+a scheduler only moves the partitions of that scheduler.
+"""
+
+import time
+
+from oslo_log import log as logging
+from tooz import hashring
+
+import nova.conf
+from nova import objects
+from nova.scheduler.filters import utils as filters_utils
+from nova import servicegroup
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+SHARD_BY_CELL = 'cell'
+SHARD_BY_AGGREGATE = 'aggregate'
+
+
+def get_shards(include_self=True):
+    """Return the SchedulerShards for [scheduler]shard_by, or None if the
+    hosts are not partitioned.
+
+    :param include_self: Whether this service is one of the schedulers the
+        hosts are partitioned between, which is the case of nova-scheduler.
+    """
+    if CONF.scheduler.shard_by == 'none':
+        return None
+    return SchedulerShards(CONF.scheduler.shard_by, include_self=include_self)
+
+
+class SchedulerShards(object):
+    """Consistent hash partition of the hosts between the schedulers."""
+
+    def __init__(self, shard_by, include_self=True):
+        self.shard_by = shard_by
+        self.include_self = include_self
+        self.servicegroup_api = servicegroup.API()
+        self.schedulers = set()
+        self._ring = None
+        self._refreshed_at = None
+        if include_self:
+            self._set_schedulers({CONF.host})
+
+    def _set_schedulers(self, schedulers):
+        self.schedulers = schedulers
+        self._ring = hashring.HashRing(schedulers) if schedulers else None
+
+    def refresh(self, context):
+        """Look up the schedulers which are up, and partition the hosts again
+        if they changed.
+        """
+        services = objects.ServiceList.get_by_binary(
+            context, 'nova-scheduler')
+        schedulers = {service.host for service in services
+                      if self.servicegroup_api.service_is_up(service)}
+        if self.include_self:
+            # This scheduler may not have reported in yet
+            schedulers.add(CONF.host)
+        self._refreshed_at = time.monotonic()
+        if schedulers != self.schedulers:
+            LOG.info('Partitioning the hosts by %(shard_by)s between the '
+                     'schedulers %(schedulers)s',
+                     {'shard_by': self.shard_by,
+                      'schedulers': ', '.join(sorted(schedulers))})
+            self._set_schedulers(schedulers)
+
+    def maybe_refresh(self, context):
+        """Refresh the schedulers if they were last looked up more than
+        [scheduler]shard_refresh_interval seconds ago.
+        """
+        if (self._refreshed_at is None or
+                time.monotonic() - self._refreshed_at >=
+                CONF.scheduler.shard_refresh_interval):
+            self.refresh(context)
+
+    def get_owner(self, key):
+        """Return the host of the scheduler owning the partition key, or None
+        if there is no scheduler.
+        """
+        if self._ring is None:
+            return None
+        return next(iter(self._ring.get_nodes(key.encode('utf-8'))))
+
+    def get_host_key(self, host_state):
+        """Return the partition key of a HostState."""
+        if self.shard_by == SHARD_BY_CELL:
+            return host_state.cell_uuid
+        zones = filters_utils.aggregate_values_from_key(
+            host_state, 'availability_zone')
+        # A host is in a single availability zone
+        return min(zones) if zones else CONF.default_availability_zone
+
+    def get_request_key(self, spec_obj):
+        """Return the partition key of the hosts a request is restricted to,
+        or None if it can be scheduled to the hosts of any partition.
+        """
+        if self.shard_by == SHARD_BY_CELL:
+            if ('requested_destination' in spec_obj and
+                    spec_obj.requested_destination and
+                    'cell' in spec_obj.requested_destination and
+                    spec_obj.requested_destination.cell and
+                    not spec_obj.requested_destination.allow_cross_cell_move):
+                return spec_obj.requested_destination.cell.uuid
+            return None
+        if 'availability_zone' in spec_obj:
+            return spec_obj.availability_zone
+        return None
+
+    def owns_host(self, host_state):
+        """Whether the HostState is in the partition of this scheduler."""
+        return self.get_owner(self.get_host_key(host_state)) == CONF.host
+
+    def owns_cell(self, cell_uuid):
+        """Whether the cell is in the partition of this scheduler, when the
+        hosts are partitioned by cell.
+        """
+        return (self.shard_by == SHARD_BY_CELL and
+                self.get_owner(cell_uuid) == CONF.host)
+
+    def split_hosts(self, host_states):
+        """Split HostStates between the ones in the partition of this
+        scheduler and the others.
+
+        :returns: tuple of the list of the HostStates of this scheduler and of
+            the list of the other HostStates, both in their original order
+        """
+        own_hosts = []
+        other_hosts = []
+        owners = {}
+        for host_state in host_states:
+            key = self.get_host_key(host_state)
+            owned = owners.get(key)
+            if owned is None:
+                owned = owners[key] = self.get_owner(key) == CONF.host
+            (own_hosts if owned else other_hosts).append(host_state)
+        return own_hosts, other_hosts
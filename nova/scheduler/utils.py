@@ -15,6 +15,7 @@
 """Utility methods for scheduling."""
 
 import collections
+import hashlib
 import re
 import sys
 import typing as ty
@@ -1323,6 +1324,32 @@ def claim_resources(ctx, client, spec_obj, instance_uuid, alloc_req,
             consumer_generation=None)
 
 
+def _canonicalize(value):
+    if isinstance(value, (obj_base.NovaObject, obj_base.ObjectListBase)):
+        value = obj_base.obj_to_primitive(value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _canonicalize(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_canonicalize(v) for v in value), key=repr))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonicalize(v) for v in value)
+    return value
+
+
+def get_fingerprint(value):
+    """Return a string identifying the content of the specified value.
+
+    Two values with the same content, e.g. two NUMA topologies with the same
+    cells and usage, have the same fingerprint even if they are distinct
+    objects.
+
+    :param value: A NovaObject, or a (nested) structure of dicts, lists, sets
+                  and scalars.
+    """
+    return hashlib.sha256(
+        repr(_canonicalize(value)).encode('utf-8')).hexdigest()
+
+
 def get_weight_multiplier(host_state, multiplier_name, multiplier_config):
     """Given a HostState object, multplier_type name and multiplier_config,
     returns the weight multiplier.
@@ -17,6 +17,7 @@
 Scheduler host weights
 """
 
+from nova.scheduler import host_columns
 from nova import weights
 
 
@@ -33,7 +34,28 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    # Set to True in a subclass if weight_multiplier() only depends on the
+    # aggregates of the host, so that it is only called once per distinct set
+    # of aggregates when weighing all the hosts at once.
+    weight_multiplier_from_aggregates = False
+
+    def weight_multipliers(self, host_columns):
+        if not self.weight_multiplier_from_aggregates:
+            return super(BaseHostWeigher, self).weight_multipliers(
+                host_columns)
+
+        # HostManager hands out the same Aggregate objects to every host, so
+        # their identities are enough to tell sets of aggregates apart.
+        multipliers = {}
+
+        def _get_multiplier(host_state):
+            key = tuple(id(agg) for agg in host_state.aggregates)
+            if key not in multipliers:
+                multipliers[key] = self.weight_multiplier(host_state)
+            return multipliers[key]
+
+        return host_columns.map(_get_multiplier, dtype=float)
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -42,6 +64,11 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_columns(self, objs):
+        if not host_columns.is_available():
+            return None
+        return host_columns.HostStateColumns(objs)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
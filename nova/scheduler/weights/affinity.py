@@ -46,15 +46,12 @@ class _SoftAffinityWeigherBase(weights.BaseHostWeigher):
         if self.policy_name != policy:
             return 0
 
-        instances = set(host_state.instances.keys())
-        members = set(request_spec.instance_group.members)
-        member_on_host = instances.intersection(members)
-
-        return len(member_on_host)
+        return host_state.get_group_member_count(request_spec.instance_group)
 
 
 class ServerGroupSoftAffinityWeigher(_SoftAffinityWeigherBase):
     policy_name = 'soft-affinity'
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         return utils.get_weight_multiplier(
@@ -64,6 +61,7 @@ class ServerGroupSoftAffinityWeigher(_SoftAffinityWeigherBase):
 
 class ServerGroupSoftAntiAffinityWeigher(_SoftAffinityWeigherBase):
     policy_name = 'soft-anti-affinity'
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         return utils.get_weight_multiplier(
@@ -23,6 +23,8 @@ CONF = nova.conf.CONF
 
 
 class BuildFailureWeigher(weights.BaseHostWeigher):
+    weight_multiplier_from_aggregates = True
+
     def weight_multiplier(self, host_state):
         """Override the weight multiplier. Note this is negated."""
         return -1 * utils.get_weight_multiplier(
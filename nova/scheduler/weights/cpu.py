@@ -31,6 +31,7 @@ CONF = nova.conf.CONF
 
 class CPUWeigher(weights.BaseHostWeigher):
     minval = 0
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         """Override the weight multiplier."""
@@ -44,3 +45,8 @@ class CPUWeigher(weights.BaseHostWeigher):
             host_state.vcpus_total * host_state.cpu_allocation_ratio -
             host_state.vcpus_used)
         return vcpus_free
+
+    def weigh_all(self, host_columns, weight_properties):
+        return (host_columns['vcpus_total'] *
+                host_columns['cpu_allocation_ratio'] -
+                host_columns['vcpus_used'])
@@ -24,6 +24,7 @@ CONF = conf.CONF
 
 
 class CrossCellWeigher(weights.BaseHostWeigher):
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         """How weighted this weigher should be."""
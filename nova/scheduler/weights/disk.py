@@ -30,6 +30,7 @@ CONF = nova.conf.CONF
 
 class DiskWeigher(weights.BaseHostWeigher):
     minval = 0
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         """Override the weight multiplier."""
@@ -40,3 +41,6 @@ class DiskWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_disk_mb
+
+    def weigh_all(self, host_columns, weight_properties):
+        return host_columns['free_disk_mb']
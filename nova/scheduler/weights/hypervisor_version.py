@@ -26,6 +26,7 @@ CONF = nova.conf.CONF
 
 
 class HypervisorVersionWeigher(weights.BaseHostWeigher):
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         """Override the weight multiplier."""
@@ -30,6 +30,8 @@ CONF = nova.conf.CONF
 
 
 class ImagePropertiesWeigher(weights.BaseHostWeigher):
+    weight_multiplier_from_aggregates = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -30,6 +30,7 @@ CONF = nova.conf.CONF
 
 class IoOpsWeigher(weights.BaseHostWeigher):
     minval = 0
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         """Override the weight multiplier."""
@@ -42,3 +43,6 @@ class IoOpsWeigher(weights.BaseHostWeigher):
         to be the default.
         """
         return host_state.num_io_ops
+
+    def weigh_all(self, host_columns, weight_properties):
+        return host_columns['num_io_ops']
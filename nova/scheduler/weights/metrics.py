@@ -26,6 +26,8 @@ in the configuration file as follows:
     The final weight would be name1.value * 1.0 + name2.value * -1.0.
 """
 
+from oslo_utils import importutils
+
 import nova.conf
 from nova import exception
 from nova.scheduler import utils
@@ -34,8 +36,12 @@ from nova.scheduler import weights
 
 CONF = nova.conf.CONF
 
+np = importutils.try_import('numpy')
+
 
 class MetricsWeigher(weights.BaseHostWeigher):
+    weight_multiplier_from_aggregates = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -75,3 +81,38 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def weigh_all(self, host_columns, weight_properties):
+        if not self.setting:
+            return host_columns.full(0.0, dtype=float)
+
+        metrics_by_host = [{m.name: m.value for m in host_state.metrics or []}
+                           for host_state in host_columns.objs]
+        # One row per configured metric and one column per host, holding NaN
+        # where the host does not report the metric.
+        values = np.array([[metrics.get(name, np.nan)
+                            for metrics in metrics_by_host]
+                           for name, ratio in self.setting], dtype=float)
+        missing = np.isnan(values)
+
+        if CONF.metrics.required:
+            missing_hosts = missing.any(axis=0).nonzero()[0]
+            if len(missing_hosts):
+                idx = missing_hosts[0]
+                host_state = host_columns.objs[idx]
+                name = self.setting[missing[:, idx].nonzero()[0][0]][0]
+                raise exception.ComputeHostMetricNotFound(
+                        host=host_state.host,
+                        node=host_state.nodename,
+                        name=name)
+
+        ratios = np.array([ratio for name, ratio in self.setting])
+        value = (np.where(missing, 0.0, values) * ratios[:, None]).sum(axis=0)
+
+        # We treat the unavailable metric as the most negative factor, unless
+        # its ratio or the weight multiplier is 0.
+        multipliers = self.weight_multipliers(host_columns)
+        unavailable = (missing &
+                       (ratios[:, None] * multipliers != 0)).any(axis=0)
+        value[unavailable] = CONF.metrics.weight_of_unavailable
+        return value
@@ -27,6 +27,7 @@ CONF = nova.conf.CONF
 
 
 class NumInstancesWeigher(weights.BaseHostWeigher):
+    weight_multiplier_from_aggregates = True
 
     def weight_multiplier(self, host_state):
         """Override the weight multiplier."""
@@ -39,3 +40,6 @@ class NumInstancesWeigher(weights.BaseHostWeigher):
            as the default, hence the negative value of the multiplier.
         """
         return host_state.num_instances
+
+    def weigh_all(self, host_columns, weight_properties):
+        return host_columns['num_instances']
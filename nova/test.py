@@ -60,6 +60,7 @@ from nova import context
 import nova.crypto
 from nova.db.main import api as db_api
 from nova import exception
+from nova import instrumentation
 from nova import objects
 from nova.objects import base as objects_base
 from nova.pci import request
@@ -248,6 +249,7 @@ class TestCase(base.BaseTestCase):
         api.CELLS = []
         context.CELL_CACHE = {}
         context.CELLS = []
+        instrumentation.LATENCY = {}
 
         self.computes = {}
         self.cell_mappings = {}
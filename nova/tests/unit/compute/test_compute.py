@@ -7872,6 +7872,50 @@ class ComputeTestCase(BaseTestCase,
         self._heal_instance_info_cache(_require_nw_info_update=True,
                                        _task_state_not_none=True)
 
+    @mock.patch('nova.network.neutron.API.get_instances_nw_info')
+    @mock.patch('nova.network.neutron.API.setup_instance_network_on_host')
+    @mock.patch('nova.network.neutron.API.list_ports')
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_heal_instance_info_cache_batch(self, mock_get_by_host,
+                                            mock_list_ports, mock_setup,
+                                            mock_get_nw_info):
+        self.flags(heal_instance_info_cache_batch_size=3)
+        ctxt = context.get_admin_context()
+        instances = [
+            objects.Instance(uuid=getattr(uuids, 'instance%d' % x),
+                             host=self.compute.host, vm_state=vm_states.ACTIVE,
+                             task_state=None)
+            for x in range(5)]
+        instances[0].vm_state = vm_states.BUILDING
+        mock_get_by_host.return_value = instances
+        mock_list_ports.return_value = {'ports': [
+            {'device_id': uuids.instance1, 'binding:host_id': 'not-me',
+             'binding:vif_type': 'ovs'},
+            {'device_id': uuids.instance2,
+             'binding:host_id': self.compute.host,
+             'binding:vif_type': 'ovs'},
+        ]}
+        mock_get_nw_info.return_value = {
+            uuids.instance1: network_model.NetworkInfo(),
+            uuids.instance2: exception.InstanceNotFound(
+                instance_id=uuids.instance2),
+            uuids.instance3: network_model.NetworkInfo(),
+        }
+
+        self.compute._heal_instance_info_cache(ctxt)
+
+        # The ports of the whole batch are listed at once, and the network
+        # info of the batch is refreshed at once.
+        mock_list_ports.assert_called_once_with(
+            ctxt, device_id=[uuids.instance1, uuids.instance2,
+                             uuids.instance3],
+            fields=['device_id', 'binding:host_id', 'binding:vif_type'])
+        mock_setup.assert_called_once_with(ctxt, instances[1],
+                                           self.compute.host)
+        mock_get_nw_info.assert_called_once_with(ctxt, instances[1:4])
+        self.assertEqual([uuids.instance4],
+                         self.compute._instance_uuids_to_heal)
+
     @mock.patch('nova.objects.InstanceList.get_by_filters')
     @mock.patch('nova.compute.api.API.unrescue')
     def test_poll_rescued_instances(self, unrescue, get):
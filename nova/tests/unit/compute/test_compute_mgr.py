@@ -1291,6 +1291,69 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
             self.context, {active_instance.uuid, evacuating_instance.uuid},
             mock_get_nodes.return_value.keys())
 
+    @mock.patch('nova.compute.manager.ComputeManager._init_instance')
+    def test_init_instances_one_at_a_time(self, mock_init_instance):
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid=getattr(uuids, 'instance%d' % i))
+            for i in range(3)]
+        mock_init_instance.side_effect = [None, test.TestingException]
+
+        # A failure aborts the initialization of the remaining instances
+        self.assertRaises(test.TestingException,
+                          self.compute._init_instances,
+                          self.context, instances)
+
+        mock_init_instance.assert_has_calls([
+            mock.call(self.context, instances[0]),
+            mock.call(self.context, instances[1])])
+        self.assertEqual(2, mock_init_instance.call_count)
+
+    @mock.patch.object(manager.LOG, 'error')
+    @mock.patch('nova.compute.manager.ComputeManager._init_instance')
+    def test_init_instances_concurrently(self, mock_init_instance,
+                                         mock_log_error):
+        self.flags(max_concurrent_init_instances=2)
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid=getattr(uuids, 'instance%d' % i))
+            for i in range(3)]
+        error = test.TestingException()
+
+        def fake_init_instance(context, instance):
+            if instance.uuid == uuids.instance1:
+                raise error
+        mock_init_instance.side_effect = fake_init_instance
+
+        self.compute._init_instances(self.context, instances)
+
+        # The failure is logged and the other instances are initialized
+        mock_init_instance.assert_has_calls([
+            mock.call(self.context, instance) for instance in instances],
+            any_order=True)
+        self.assertEqual(3, mock_init_instance.call_count)
+        mock_log_error.assert_called_once_with(
+            'Failed to initialize instance', instance=instances[1],
+            exc_info=error)
+
+    def test_run_on_instances_concurrently(self):
+        self.flags(max_concurrent_init_instances=3)
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid=getattr(uuids, 'instance%d' % i))
+            for i in range(5)]
+        error = test.TestingException()
+        called = []
+
+        def func(context, instance):
+            called.append(instance.uuid)
+            if instance.uuid in (uuids.instance0, uuids.instance3):
+                raise error
+
+        errors = self.compute._run_on_instances(func, self.context, instances)
+
+        self.assertEqual({uuids.instance0: error, uuids.instance3: error},
+                         errors)
+        self.assertEqual(sorted(instance.uuid for instance in instances),
+                         sorted(called))
+
     @mock.patch.object(objects.ComputeNodeList, 'get_all_by_uuids')
     @mock.patch.object(fake_driver.FakeDriver, 'get_nodenames_by_uuid')
     def test_get_nodes(self, mock_driver_get_nodes, mock_get_by_uuid):
@@ -4064,8 +4127,10 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
         self.assertTrue(mock_begin.called)
         self.assertTrue(mock_end.called)
 
+    @mock.patch('nova.virt.fake.FakeDriver.get_power_states',
+                side_effect=NotImplementedError)
     @mock.patch.object(objects.InstanceList, 'get_by_host')
-    def test_sync_power_states(self, mock_get):
+    def test_sync_power_states(self, mock_get, mock_power_states):
         instance = mock.Mock()
         mock_get.return_value = [instance]
         with mock.patch('nova.utils.spawn_on') as mock_spawn:
@@ -4076,6 +4141,68 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
             mock_spawn.assert_called_once_with(
                 self.compute._sync_power_executor, mock.ANY, instance)
 
+    @mock.patch('nova.virt.fake.FakeDriver.get_info',
+                new_callable=mock.NonCallableMock)
+    @mock.patch('nova.virt.fake.FakeDriver.get_power_states')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get, mock_power_states,
+                                    mock_get_info):
+        in_sync = self._get_sync_instance(power_state.RUNNING,
+                                          vm_states.ACTIVE)
+        in_sync.uuid = uuids.in_sync
+        changed = self._get_sync_instance(power_state.RUNNING,
+                                          vm_states.ACTIVE)
+        changed.uuid = uuids.changed
+        missing = self._get_sync_instance(power_state.SHUTDOWN,
+                                          vm_states.STOPPED)
+        missing.uuid = uuids.missing
+        busy = self._get_sync_instance(power_state.RUNNING, vm_states.ACTIVE,
+                                       task_state=task_states.REBOOTING)
+        busy.uuid = uuids.busy
+        mock_get.return_value = [in_sync, changed, missing, busy]
+        mock_power_states.return_value = {
+            uuids.in_sync: power_state.RUNNING,
+            uuids.changed: power_state.SHUTDOWN,
+            uuids.busy: power_state.SHUTDOWN,
+        }
+
+        with mock.patch('nova.utils.spawn_on') as mock_spawn:
+            self.compute._sync_power_states(mock.sentinel.context)
+
+        # Only the instances whose power state changed, or which are not
+        # found on the hypervisor, are checked one by one.
+        mock_power_states.assert_called_once_with()
+        self.assertEqual(2, mock_spawn.call_count)
+        mock_spawn.assert_has_calls([
+            mock.call(self.compute._sync_power_executor, mock.ANY, changed),
+            mock.call(self.compute._sync_power_executor, mock.ANY, missing)])
+
+    def test_is_power_state_in_sync(self):
+        in_sync = self.compute._is_power_state_in_sync
+        self.assertTrue(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                power_state.RUNNING))
+        self.assertFalse(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                 power_state.SHUTDOWN))
+        for ps in (power_state.SHUTDOWN, power_state.CRASHED,
+                   power_state.SUSPENDED, power_state.PAUSED,
+                   power_state.NOSTATE):
+            self.assertFalse(in_sync(vm_states.ACTIVE, ps, ps))
+        for ps in (power_state.NOSTATE, power_state.SHUTDOWN,
+                   power_state.CRASHED):
+            self.assertTrue(in_sync(vm_states.STOPPED, ps, ps))
+        self.assertFalse(in_sync(vm_states.STOPPED, power_state.RUNNING,
+                                 power_state.RUNNING))
+        self.assertTrue(in_sync(vm_states.PAUSED, power_state.PAUSED,
+                                power_state.PAUSED))
+        self.assertFalse(in_sync(vm_states.PAUSED, power_state.CRASHED,
+                                 power_state.CRASHED))
+        self.assertTrue(in_sync(vm_states.SOFT_DELETED, power_state.SHUTDOWN,
+                                power_state.SHUTDOWN))
+        self.assertFalse(in_sync(vm_states.SOFT_DELETED, power_state.RUNNING,
+                                 power_state.RUNNING))
+        self.assertTrue(in_sync(vm_states.ERROR, power_state.CRASHED,
+                                power_state.CRASHED))
+
     @mock.patch('nova.objects.InstanceList.get_by_host', new=mock.Mock())
     @mock.patch('nova.compute.manager.ComputeManager.'
                 '_query_driver_power_state_and_sync',
@@ -9895,6 +10022,92 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
         mock_prepspawn.assert_called_once_with(self.instance)
         mock_failedspawn.assert_called_once_with(self.instance)
 
+    @mock.patch.object(virt_driver.ComputeDriver, 'prepare_for_spawn')
+    @mock.patch.object(objects.Instance, 'save')
+    @mock.patch.object(manager.ComputeManager, '_build_networks_for_instance')
+    @mock.patch.object(manager.ComputeManager, '_prep_block_device')
+    @mock.patch.object(fake_driver.FakeDriver, 'cache_image')
+    def test_build_resources_prefetches_image(
+            self, mock_cache_image, mock_prep, mock_build, mock_save,
+            mock_prepspawn):
+        self.flags(prefetch_on_build=True, group='image_cache')
+        self.instance.image_ref = uuids.image
+        mock_build.return_value = self.network_info
+
+        def fake_prep_block_device(context, instance, bdms):
+            # The image is downloaded while the block devices are prepared
+            mock_cache_image.assert_called_once_with(
+                self.context, self.instance.image_ref)
+            return self.block_device_info
+        mock_prep.side_effect = fake_prep_block_device
+
+        with self.compute._build_resources(self.context, self.instance,
+                self.requested_networks, self.security_groups,
+                self.image, self.block_device_mapping,
+                self.resource_provider_mapping, self.accel_uuids):
+            pass
+
+        mock_prep.assert_called_once_with(self.context, self.instance,
+                                          self.block_device_mapping)
+
+    @mock.patch.object(manager.LOG, 'warning')
+    @mock.patch.object(virt_driver.ComputeDriver, 'prepare_for_spawn')
+    @mock.patch.object(objects.Instance, 'save')
+    @mock.patch.object(manager.ComputeManager, '_build_networks_for_instance')
+    @mock.patch.object(manager.ComputeManager, '_prep_block_device')
+    @mock.patch.object(fake_driver.FakeDriver, 'cache_image',
+                       side_effect=test.TestingException)
+    def test_build_resources_prefetch_image_failure(
+            self, mock_cache_image, mock_prep, mock_build, mock_save,
+            mock_prepspawn, mock_warning):
+        self.flags(prefetch_on_build=True, group='image_cache')
+        self.instance.image_ref = uuids.image
+        mock_build.return_value = self.network_info
+        mock_prep.return_value = self.block_device_info
+
+        # The image is downloaded on spawn instead
+        with self.compute._build_resources(self.context, self.instance,
+                self.requested_networks, self.security_groups,
+                self.image, self.block_device_mapping,
+                self.resource_provider_mapping, self.accel_uuids):
+            pass
+
+        mock_cache_image.assert_called_once_with(
+            self.context, self.instance.image_ref)
+        mock_warning.assert_called_once()
+
+    @mock.patch('nova.utils.spawn')
+    def test_prefetch_image(self, mock_spawn):
+        # Disabled
+        self.assertIsNone(self.compute._prefetch_image(
+            self.context, self.instance, self.block_device_mapping))
+
+        self.flags(prefetch_on_build=True, group='image_cache')
+        self.instance.image_ref = uuids.image
+        # Volume-backed
+        bdms = [objects.BlockDeviceMapping(
+            boot_index=0, source_type='volume', destination_type='volume')]
+        self.assertIsNone(self.compute._prefetch_image(
+            self.context, self.instance, bdms))
+        mock_spawn.assert_not_called()
+
+        # Image-backed
+        bdms = [objects.BlockDeviceMapping(
+            boot_index=0, source_type='image', destination_type='local')]
+        # With trusted certificates, the image is verified on spawn
+        self.instance.trusted_certs = objects.TrustedCerts(ids=['fake-id'])
+        self.assertIsNone(self.compute._prefetch_image(
+            self.context, self.instance, bdms))
+        mock_spawn.assert_not_called()
+
+        self.instance.trusted_certs = None
+        self.assertEqual(mock_spawn.return_value,
+                         self.compute._prefetch_image(
+                             self.context, self.instance, bdms))
+        mock_spawn.assert_called_once_with(
+            self.compute.driver.cache_image, self.context,
+            self.instance.image_ref)
+
     @mock.patch('nova.virt.block_device.attach_block_devices',
                 side_effect=exception.VolumeNotCreated('oops!'))
     def test_prep_block_device_maintain_original_error_message(self,
@@ -21,6 +21,7 @@ from nova import exception
 from nova import objects
 from nova import test
 from nova.tests import fixtures
+from nova.tests.unit import fake_instance
 
 
 FAKE_CELLS = [objects.CellMapping(), objects.CellMapping()]
@@ -164,6 +165,38 @@ class TestInstanceList(test.NoDBTestCase):
         mock_cm.assert_not_called()
         mock_lc.assert_called_once_with()
 
+    @mock.patch('nova.context.CELLS', new=FAKE_CELLS)
+    @mock.patch('nova.context.load_cells')
+    @mock.patch('nova.compute.instance_list.get_instances_sorted')
+    def test_get_instance_objects_sorted_generator(self, mock_gi, mock_lc):
+        db_insts = [fake_instance.fake_db_instance(uuid=getattr(uuids, name))
+                    for name in ('inst0', 'inst1')]
+        consumed = []
+
+        def db_generator():
+            for db_inst in db_insts:
+                consumed.append(db_inst['uuid'])
+                yield db_inst
+
+        lister = instance_list.InstanceLister(None, None)
+        mock_gi.return_value = lister, db_generator()
+
+        res_lister, insts = (
+            instance_list.get_instance_objects_sorted_generator(
+                self.context, {}, None, None, ['fault'], None, None))
+
+        self.assertIs(lister, res_lister)
+        # Instances are built as the records are generated.
+        inst = next(insts)
+        self.assertIsInstance(inst, objects.Instance)
+        self.assertEqual(uuids.inst0, inst.uuid)
+        self.assertEqual([uuids.inst0], consumed)
+        self.assertEqual([uuids.inst1], [inst.uuid for inst in insts])
+        mock_gi.assert_called_once_with(
+            self.context, {}, None, None, ['fault'], None, None,
+            cell_mappings=FAKE_CELLS, batch_size=100,
+            cell_down_support=False)
+
     @mock.patch('nova.context.scatter_gather_cells')
     def test_get_instances_with_down_cells(self, mock_sg):
         inst_cell0 = self.insts[uuids.cell0]
@@ -171,7 +204,9 @@ class TestInstanceList(test.NoDBTestCase):
         uuid_initial = [inst['uuid'] for inst in inst_cell0]
 
         def wrap(thing):
-            return multi_cell_list.RecordWrapper(ctx, self.context, thing)
+            return multi_cell_list.RecordWrapper(ctx, sort_ctx, thing)
+
+        sort_ctx = multi_cell_list.RecordSortContext([], [])
 
         ctx = nova_context.RequestContext()
         instances = [wrap(inst) for inst in inst_cell0]
@@ -197,7 +232,9 @@ class TestInstanceList(test.NoDBTestCase):
         inst_cell0 = self.insts[uuids.cell0]
 
         def wrap(thing):
-            return multi_cell_list.RecordWrapper(ctx, self.context, thing)
+            return multi_cell_list.RecordWrapper(ctx, sort_ctx, thing)
+
+        sort_ctx = multi_cell_list.RecordSortContext([], [])
 
         ctx = nova_context.RequestContext()
         instances = [wrap(inst) for inst in inst_cell0]
@@ -225,7 +262,9 @@ class TestInstanceList(test.NoDBTestCase):
         uuid_initial = [inst['uuid'] for inst in inst_cell0]
 
         def wrap(thing):
-            return multi_cell_list.RecordWrapper(ctx, self.context, thing)
+            return multi_cell_list.RecordWrapper(ctx, sort_ctx, thing)
+
+        sort_ctx = multi_cell_list.RecordSortContext([], [])
 
         ctx = nova_context.RequestContext()
         instances = [wrap(inst) for inst in inst_cell0]
@@ -13,6 +13,7 @@
 from contextlib import contextmanager
 import copy
 import datetime
+import functools
 from unittest import mock
 
 from oslo_utils.fixture import uuidsentinel as uuids
@@ -80,6 +81,25 @@ class TestUtils(test.NoDBTestCase):
                                                 ['asc', 'desc'])
         self.assertEqual(1, ctx.compare_records(inst1, inst2))
 
+    def test_sort_key(self):
+        dt1 = datetime.datetime(2015, 11, 5, 20, 30, 00)
+        dt2 = datetime.datetime(1955, 10, 25, 1, 21, 00)
+        insts = [
+            {'key0': 'foo', 'key1': 'd', 'key2': 456, 'key4': dt1},
+            {'key0': 'foo', 'key1': 's', 'key2': 123, 'key4': dt2},
+            {'key0': 'bar', 'key1': 's', 'key2': 123, 'key4': dt1},
+            {'key0': 'foo', 'key1': 'd', 'key2': 789, 'key4': dt2},
+            {'key0': 'bar', 'key1': 'd', 'key2': 456, 'key4': dt2},
+        ]
+
+        for sort_dirs in (['asc', 'asc', 'asc'], ['desc', 'desc', 'desc'],
+                          ['asc', 'desc', 'asc'], ['desc', 'asc', 'desc']):
+            ctx = multi_cell_list.RecordSortContext(['key0', 'key4', 'key2'],
+                                                    sort_dirs)
+            self.assertEqual(
+                sorted(insts, key=functools.cmp_to_key(ctx.compare_records)),
+                sorted(insts, key=ctx.sort_key))
+
     def test_wrapper(self):
         inst1 = {'key0': 'foo', 'key1': 'd', 'key2': 456}
         inst2 = {'key0': 'foo', 'key1': 's', 'key2': 123}
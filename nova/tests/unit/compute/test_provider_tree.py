@@ -726,3 +726,49 @@ class TestProviderTree(test.NoDBTestCase):
         self.assertTrue(pt.update_resources(cn.uuid, cn_resources))
         # resources not changed
         self.assertFalse(pt.update_resources(cn.uuid, cn_resources))
+
+    def test_content_hashes(self):
+        cn = self.compute_node1
+        pt = self._pt_with_cns()
+        pt.new_child('numa1', cn.uuid, uuid=uuids.numa1)
+        pt.new_child('numa2', cn.uuid, uuid=uuids.numa2)
+        inv = {'VCPU': {'total': 8, 'allocation_ratio': 16.0}}
+
+        hashes = pt.get_content_hashes()
+        self.assertEqual(
+            {cn.uuid, self.compute_node2.uuid, uuids.numa1, uuids.numa2},
+            set(hashes))
+        self.assertEqual({uuids.numa1}, set(pt.get_content_hashes('numa1')))
+
+        # The generation is not part of the hashes
+        pt.update_inventory(uuids.numa1, {}, generation=3)
+        self.assertEqual(hashes, pt.get_content_hashes())
+
+        # A change in a child changes its hash and the subtree hash of its
+        # ancestors, but not the hashes of its siblings.
+        pt.update_inventory(uuids.numa1, inv)
+        new_hashes = pt.get_content_hashes()
+        self.assertNotEqual(hashes[uuids.numa1], new_hashes[uuids.numa1])
+        self.assertEqual(hashes[cn.uuid][0], new_hashes[cn.uuid][0])
+        self.assertNotEqual(hashes[cn.uuid][1], new_hashes[cn.uuid][1])
+        self.assertEqual(hashes[uuids.numa2], new_hashes[uuids.numa2])
+        self.assertEqual(hashes[self.compute_node2.uuid],
+                         new_hashes[self.compute_node2.uuid])
+
+        # Another tree with the same data has the same hashes
+        pt2 = self._pt_with_cns()
+        pt2.new_child('numa2', cn.uuid, uuid=uuids.numa2)
+        pt2.new_child('numa1', cn.uuid, uuid=uuids.numa1, generation=5)
+        pt2.update_inventory(uuids.numa1, inv)
+        self.assertEqual(new_hashes, pt2.get_content_hashes())
+
+        # Traits, aggregates and children are part of the hashes
+        pt2.add_traits(uuids.numa2, 'HW_NUMA_ROOT')
+        self.assertNotEqual(new_hashes[uuids.numa2],
+                            pt2.get_content_hashes()[uuids.numa2])
+        pt.add_aggregates(self.compute_node2.uuid, uuids.agg)
+        self.assertNotEqual(new_hashes[self.compute_node2.uuid],
+                            pt.get_content_hashes()[self.compute_node2.uuid])
+        pt.remove(uuids.numa2)
+        self.assertNotEqual(new_hashes[cn.uuid][1],
+                            pt.get_content_hashes()[cn.uuid][1])
@@ -34,6 +34,7 @@ from nova.compute import utils as compute_utils
 from nova.compute import vm_states
 from nova import context
 from nova import exception as exc
+from nova import instrumentation
 from nova import objects
 from nova.objects import base as obj_base
 from nova.objects import fields as obj_fields
@@ -1285,6 +1286,65 @@ class TestUpdateAvailableResources(BaseTestCase):
         self.assertRaises(exc.AssignedResourceNotFound,
                           self._update_available_resources, startup=True)
 
+    @mock.patch('nova.compute.utils.is_volume_backed_instance',
+                new=mock.Mock(return_value=False))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                new=mock.Mock(return_value=objects.PciDeviceList()))
+    @mock.patch('nova.objects.ComputeNode.get_by_uuid')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_claim_on_other_node_during_update(self, mock_get_instances,
+                                               mock_get_migrations,
+                                               mock_get_cn):
+        # With the node lock scope a claim on another node of the host can
+        # happen while the resources of this node are updated, and must
+        # survive the update.
+        self.flags(resource_tracker_lock_scope='node', group='compute')
+        self._setup_rt()
+        other_cn = objects.ComputeNode(
+            uuid=uuids.other_cn, hypervisor_hostname='other-node',
+            **{field: getattr(self.compute, field)
+               for field in self.compute.fields
+               if self.compute.obj_attr_is_set(field) and
+               field not in ('uuid', 'hypervisor_hostname')})
+        self.rt.compute_nodes['other-node'] = other_cn
+        other_resource = objects.Resource(provider_uuid=other_cn.uuid,
+                                          resource_class="CUSTOM_RESOURCE_0",
+                                          identifier="bar")
+        other_migration = objects.Migration(
+            instance_uuid=uuids.other_migrating, source_compute=_HOSTNAME,
+            dest_compute='other-host', source_node='other-node',
+            dest_node='some-node')
+        self.rt.tracked_migrations[uuids.other_migrating] = other_migration
+
+        inst = _INSTANCE_FIXTURES[0]
+        inst.resources = objects.ResourceList(objects=[self.resource_0])
+        other_inst = _INSTANCE_FIXTURES[1].obj_clone()
+        other_inst.resources = objects.ResourceList(objects=[other_resource])
+        mock_get_instances.return_value = [inst]
+        mock_get_migrations.return_value = []
+        mock_get_cn.return_value = self.compute
+
+        def claim_on_other_node(*args, **kwargs):
+            self.rt._update_usage_from_instance(
+                mock.sentinel.ctx, other_inst, 'other-node')
+            self.rt._add_assigned_resources(other_inst.resources)
+
+        # Claim on the other node after the instances of this node have
+        # been tracked again but before the assigned resources are.
+        with mock.patch.object(self.rt, '_ensure_compute_id_for_instances',
+                               side_effect=claim_on_other_node):
+            self._update_available_resources()
+
+        self.assertEqual({inst.uuid: _NODENAME, other_inst.uuid: 'other-node'},
+                         self.rt.tracked_instances)
+        self.assertEqual({uuids.other_migrating: other_migration},
+                         self.rt.tracked_migrations)
+        self.assertEqual(
+            {self.compute.uuid: {"CUSTOM_RESOURCE_0": {self.resource_0}},
+             other_cn.uuid: {"CUSTOM_RESOURCE_0": {other_resource}}},
+            self.rt.assigned_resources)
+
 
 class TestInitComputeNode(BaseTestCase):
 
@@ -3006,7 +3066,7 @@ class TestResize(BaseTestCase):
                 return_value=False)
     @mock.patch('nova.pci.stats.PciDeviceStats.support_requests',
                 return_value=True)
-    @mock.patch('nova.objects.PciDevice.save')
+    @mock.patch('nova.objects.PciDeviceList.save_devices')
     @mock.patch('nova.pci.manager.PciDevTracker.claim_instance')
     @mock.patch('nova.pci.request.get_pci_requests_from_flavor')
     @mock.patch('nova.objects.PciDeviceList.get_by_compute_node')
@@ -3696,7 +3756,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         # Stub out the is_bfv cache to make sure we remove the instance
         # from it after updating usage.
         self.rt.is_bfv[self.instance.uuid] = False
-        self.rt.tracked_instances = set([self.instance.uuid])
+        self.rt.tracked_instances = {self.instance.uuid: _NODENAME}
         self.rt._update_usage_from_instance(mock.sentinel.ctx, self.instance,
                                             _NODENAME)
         # The instance should have been removed from the is_bfv cache.
@@ -3724,7 +3784,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
     def test_deleted(self, mock_update_usage, mock_check_bfv):
         mock_check_bfv.return_value = False
         self.instance.vm_state = vm_states.DELETED
-        self.rt.tracked_instances = set([self.instance.uuid])
+        self.rt.tracked_instances = {self.instance.uuid: _NODENAME}
         self.rt._update_usage_from_instance(mock.sentinel.ctx,
                                             self.instance, _NODENAME, True)
 
@@ -3876,7 +3936,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         given node do not have their allocations removed.
         """
         rc = self.rt.reportclient
-        self.rt.tracked_instances = set([uuids.known])
+        self.rt.tracked_instances = {uuids.known: _NODENAME}
         allocs = report.ProviderAllocInfo(
             allocations={
                 uuids.known: {
@@ -4424,6 +4484,94 @@ class ResourceTrackerTestCase(test.NoDBTestCase):
         self.assertEqual(123, rt.service_ref.id)
         self.assertEqual(_HOSTNAME, rt.service_ref.host)
 
+    @mock.patch('oslo_concurrency.lockutils.internal_fair_lock')
+    def test_lock_host_scope(self, mock_fair_lock):
+        rt = resource_tracker.ResourceTracker(
+            _HOSTNAME, mock.sentinel.driver, mock.sentinel.reportclient)
+
+        with rt._lock(_NODENAME):
+            pass
+
+        mock_fair_lock.assert_called_once_with(
+            resource_tracker.COMPUTE_RESOURCE_SEMAPHORE)
+        mock_fair_lock.return_value.write_lock.assert_called_once_with()
+        mock_fair_lock.return_value.read_lock.assert_not_called()
+        self.assertEqual(
+            [resource_tracker.COMPUTE_RESOURCE_SEMAPHORE],
+            list(instrumentation.get_stats()[instrumentation.LOCK]))
+
+    @mock.patch('oslo_concurrency.lockutils.internal_fair_lock')
+    def test_lock_node_scope(self, mock_fair_lock):
+        self.flags(resource_tracker_lock_scope='node', group='compute')
+        host_lock = mock.MagicMock()
+        node_lock = mock.MagicMock()
+        mock_fair_lock.side_effect = lambda name: (
+            host_lock if name == resource_tracker.COMPUTE_RESOURCE_SEMAPHORE
+            else node_lock)
+        rt = resource_tracker.ResourceTracker(
+            _HOSTNAME, mock.sentinel.driver, mock.sentinel.reportclient)
+
+        # The operations on a node share the lock of the host
+        with rt._lock(_NODENAME):
+            pass
+
+        mock_fair_lock.assert_has_calls([
+            mock.call(resource_tracker.COMPUTE_RESOURCE_SEMAPHORE),
+            mock.call('%s-%s' % (resource_tracker.COMPUTE_RESOURCE_SEMAPHORE,
+                                 _NODENAME))])
+        host_lock.read_lock.assert_called_once_with()
+        host_lock.write_lock.assert_not_called()
+        node_lock.write_lock.assert_called_once_with()
+
+        # The operations on the host do not
+        with rt._lock():
+            pass
+
+        host_lock.write_lock.assert_called_once_with()
+        stats = instrumentation.get_stats()[instrumentation.LOCK]
+        self.assertEqual(
+            {resource_tracker.COMPUTE_RESOURCE_SEMAPHORE,
+             '%s-%s' % (resource_tracker.COMPUTE_RESOURCE_SEMAPHORE,
+                        _NODENAME)},
+            set(stats))
+        for lock_stats in stats.values():
+            self.assertEqual(1, lock_stats['count'])
+
+        # The PCI devices are shared by the nodes
+        host_lock.reset_mock()
+        rt.pci_tracker = mock.Mock(pci_devs=[mock.sentinel.pci_dev])
+        with rt._lock(_NODENAME):
+            pass
+
+        host_lock.write_lock.assert_called_once_with()
+        host_lock.read_lock.assert_not_called()
+
+    def test_synchronized(self):
+        rt = resource_tracker.ResourceTracker(
+            _HOSTNAME, mock.sentinel.driver, mock.sentinel.reportclient)
+        instance = objects.Instance(uuid=uuids.instance, old_flavor=None)
+        migration = objects.Migration(source_node='src-node',
+                                      dest_node='dest-node')
+
+        with mock.patch.object(rt, '_lock') as mock_lock:
+            rt.update_usage(mock.sentinel.ctx, instance, _NODENAME)
+            mock_lock.assert_called_once_with(
+                _NODENAME, 'ResourceTracker.update_usage')
+
+            mock_lock.reset_mock()
+            with mock.patch.object(rt, '_drop_move_claim'), \
+                    mock.patch.object(instance, 'drop_migration_context'), \
+                    mock.patch.object(migration, 'save'):
+                rt.drop_move_claim_at_source(
+                    mock.sentinel.ctx, instance, migration=migration)
+            mock_lock.assert_called_once_with(
+                'src-node', 'ResourceTracker.drop_move_claim_at_source')
+
+            mock_lock.reset_mock()
+            rt.clean_compute_node_cache([])
+            mock_lock.assert_called_once_with(
+                None, 'ResourceTracker.clean_compute_node_cache')
+
 
 class ProviderConfigTestCases(BaseTestCase):
     def setUp(self):
@@ -3096,6 +3096,28 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                             include_disabled=True)
         self._assertEqualListsOfObjects(expected, real)
 
+    def test_service_get_all_by_binary_changed_since(self):
+        now = datetime.datetime(2024, 1, 1, 0, 0, 0)
+        time_fixture = self.useFixture(utils_fixture.TimeFixture(now))
+        old = self._create_service({'host': 'host1', 'binary': 'b1'})
+        deleted = self._create_service({'host': 'host2', 'binary': 'b1'})
+        updated = self._create_service({'host': 'host3', 'binary': 'b1'})
+        time_fixture.advance_time_seconds(60)
+        changed_since = timeutils.utcnow().replace(tzinfo=iso8601.UTC)
+        new = self._create_service({'host': 'host4', 'binary': 'b1'})
+        self._create_service({'host': 'host5', 'binary': 'b2'})
+        db.service_destroy(self.ctxt, deleted['id'])
+        db.service_update(self.ctxt, updated['id'], {'report_count': 1})
+
+        real = db.service_get_all_by_binary_changed_since(
+            self.ctxt, 'b1', changed_since)
+        self.assertEqual({new['id'], deleted['id'], updated['id']},
+                         {service['id'] for service in real})
+        self.assertNotIn(old['id'], {service['id'] for service in real})
+        self.assertTrue(
+            [service for service in real if service['id'] == deleted['id']][0]
+            ['deleted'])
+
     def test_service_get_all_computes_by_hv_type(self):
         values = [
             {'host': 'host1', 'binary': 'nova-compute'},
@@ -6733,6 +6755,31 @@ class PciDeviceDBApiTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                                 self.compute_node['id'])
         self._assertEqualListsOfObjects(results, [v2], self.ignored_keys)
 
+    def test_pci_device_update_all(self):
+        v1, v2 = self._create_fake_pci_devs()
+        v2['status'] = fields.PciDeviceStatus.ALLOCATED
+        v3 = dict(v1, id=3357, uuid=uuidsentinel.pci_device3,
+                  address='0000:0f:04.7', dev_id='pci_0000:0f:04.7')
+        result = db.pci_device_update_all(
+            self.admin_context, 1,
+            {v2['address']: v2, v3['address']: v3}, [v1['address']])
+
+        self.assertEqual({v2['address'], v3['address']}, set(result))
+        self._assertEqualObjects(v2, result[v2['address']], self.ignored_keys)
+        results = db.pci_device_get_all_by_node(self.admin_context, 1)
+        self._assertEqualListsOfObjects(results, [v2, v3], self.ignored_keys)
+
+    def test_pci_device_update_all_not_found(self):
+        v1, v2 = self._create_fake_pci_devs()
+        v1['status'] = fields.PciDeviceStatus.ALLOCATED
+        self.assertRaises(exception.PciDeviceNotFound,
+                          db.pci_device_update_all, self.admin_context, 1,
+                          {v1['address']: v1}, ['0000:0f:04.7'])
+        # Nothing was updated.
+        result = db.pci_device_get_by_addr(self.admin_context, 1,
+                                           v1['address'])
+        self.assertEqual(fields.PciDeviceStatus.AVAILABLE, result['status'])
+
     def test_pci_device_destroy_exception(self):
         v1, v2 = self._get_fake_pci_devs()
         self.assertRaises(exception.PciDeviceNotFound,
@@ -15,6 +15,7 @@
 #
 
 import collections
+import contextlib
 import copy
 from unittest import mock
 
@@ -1173,8 +1174,7 @@ class TestAPI(TestAPIBase):
         self.assertEqual('my_mac%s' % id_suffix, nw_inf[0]['address'])
         self.assertEqual(0, len(nw_inf[0]['network']['subnets']))
 
-        mock_get_client.assert_has_calls([mock.call(mock.ANY, admin=True)] * 2,
-                                         any_order=True)
+        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
         mock_cache_update.assert_called_once_with(
             mock.ANY, self.instance['uuid'], mock.ANY)
         mock_cache_get.assert_called_once_with(mock.ANY, self.instance['uuid'])
@@ -1752,9 +1752,6 @@ class TestAPI(TestAPIBase):
             mock.call(self.context, admin=True),
             mock.call(self.context, admin=True),
         ]
-        if number == 2:
-            expected_get_client_calls.append(mock.call(self.context,
-                                                       admin=True))
         mock_get_client.assert_has_calls(expected_get_client_calls,
                                          any_order=True)
         mocked_client.list_ports.assert_called_once_with(
@@ -3331,8 +3328,7 @@ class TestAPI(TestAPIBase):
         self.assertFalse(nw_infos[4]['preserve_on_delete'])
         self.assertTrue(nw_infos[5]['preserve_on_delete'])
 
-        mock_get_client.assert_has_calls([
-            mock.call(self.context, admin=True)] * 7, any_order=True)
+        mock_get_client.assert_called_once_with(self.context, admin=True)
         mocked_client.list_ports.assert_called_once_with(
             tenant_id=uuids.fake, device_id=uuids.instance)
         mock_get_floating.assert_has_calls(expected_get_floating_calls)
@@ -10105,3 +10101,98 @@ class TestGetInstanceNetworkInfo(test.NoDBTestCase):
                self.context, self.instance, current_neutron_ports)
             self.assertEqual(expected_port_list,
                              port_list)
+
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    @mock.patch.object(neutronapi, 'update_instance_cache_with_nw_info')
+    @mock.patch.object(neutronapi.API, '_get_instance_nw_info')
+    def test_get_instances_nw_info(self, mock_get_nw_info, mock_update_cache,
+                                   mock_lock):
+        lock_calls = []
+
+        @contextlib.contextmanager
+        def fake_lock(name):
+            lock_calls.append(('acquire', name))
+            yield
+            lock_calls.append(('release', name))
+
+        mock_lock.side_effect = fake_lock
+        self.client.list_ports.side_effect = lambda **kw: (
+            lock_calls.append('list_ports') or {'ports': ports})
+        instance2 = fake_instance.fake_instance_obj(self.context)
+        ports = [dict(self._get_fake_port(uuids.port1),
+                      device_id=self.instance.uuid),
+                 dict(self._get_fake_port(uuids.port2),
+                      device_id=instance2.uuid)]
+        fip = {'id': uuids.fip, 'port_id': uuids.port2,
+               'fixed_ip_address': '10.0.0.2'}
+        self.client.list_floatingips.return_value = {'floatingips': [fip]}
+        nw_info = model.NetworkInfo([model.VIF(uuids.port1)])
+        error = exception.InstanceNotFound(instance_id=instance2.uuid)
+        mock_get_nw_info.side_effect = [nw_info, error]
+
+        results = self.api.get_instances_nw_info(
+            self.context, [self.instance, instance2])
+
+        self.assertEqual({self.instance.uuid: nw_info,
+                          instance2.uuid: error}, results)
+        self.client.list_ports.assert_called_once_with(
+            device_id=[self.instance.uuid, instance2.uuid])
+        self.client.list_floatingips.assert_called_once_with(
+            port_id=[uuids.port1, uuids.port2])
+        batch_client = mock_get_nw_info.call_args[1]['admin_client']
+        self.assertIsInstance(batch_client, neutronapi.BatchClientWrapper)
+        mock_get_nw_info.assert_has_calls([
+            mock.call(self.context, self.instance, admin_client=batch_client,
+                      force_refresh=True),
+            mock.call(self.context, instance2, admin_client=batch_client,
+                      force_refresh=True)])
+        mock_update_cache.assert_called_once_with(
+            self.api, self.context, self.instance, nw_info=nw_info)
+        # The ports are listed while the caches of the instances are locked
+        lock_names = sorted('refresh_cache-%s' % inst.uuid
+                            for inst in (self.instance, instance2))
+        self.assertEqual(
+            [('acquire', name) for name in lock_names] + ['list_ports'] +
+            [('release', name) for name in reversed(lock_names)],
+            lock_calls)
+
+    def test_batch_client_wrapper(self):
+        ports = [dict(self._get_fake_port(uuids.port1),
+                      device_id=uuids.instance1, tenant_id=uuids.project_id),
+                 dict(self._get_fake_port(uuids.port2),
+                      device_id=uuids.instance2, tenant_id=uuids.project_id)]
+        fip = {'id': uuids.fip, 'port_id': uuids.port2,
+               'fixed_ip_address': '10.0.0.2'}
+        self.client.list_networks.return_value = {
+            'networks': [{'id': uuids.network_id}]}
+        batch_client = neutronapi.BatchClientWrapper(self.client, ports, [fip])
+
+        # The prefetched ports and floating IPs are served from memory
+        self.assertEqual({'ports': [ports[1]]}, batch_client.list_ports(
+            tenant_id=uuids.project_id, device_id=uuids.instance2))
+        self.assertEqual({'ports': []}, batch_client.list_ports(
+            tenant_id=uuids.other_project, device_id=uuids.instance2))
+        self.assertEqual({'floatingips': [fip]},
+                         batch_client.list_floatingips(
+                             fixed_ip_address='10.0.0.2',
+                             port_id=uuids.port2))
+        self.assertEqual({'floatingips': []},
+                         batch_client.list_floatingips(
+                             fixed_ip_address='10.0.0.1',
+                             port_id=uuids.port1))
+        self.client.list_ports.assert_not_called()
+        self.client.list_floatingips.assert_not_called()
+
+        # The other queries are only sent once for the same parameters
+        for network_ids in ([uuids.network_id], [uuids.network_id]):
+            networks = batch_client.list_networks(id=network_ids)
+            self.assertEqual({'networks': [{'id': uuids.network_id}]},
+                             networks)
+            # The results returned to the callers are copies
+            networks['networks'].append({'id': uuids.other_network})
+        self.client.list_networks.assert_called_once_with(
+            id=[uuids.network_id])
+
+        # Anything else goes to the client
+        batch_client.show_port(uuids.port1)
+        self.client.show_port.assert_called_once_with(uuids.port1)
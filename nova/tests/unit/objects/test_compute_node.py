@@ -18,6 +18,7 @@ from unittest import mock
 import netaddr
 from oslo_db import exception as db_exc
 from oslo_serialization import jsonutils
+from oslo_utils import fixture as utils_fixture
 from oslo_utils.fixture import uuidsentinel
 from oslo_utils import timeutils
 from oslo_versionedobjects import base as ovo_base
@@ -744,6 +745,33 @@ class _TestComputeNodeObject(object):
         self.assertEqual(3, len(nodes))
         self.assertEqual([0, 1, 1], sorted([x.mapped for x in nodes]))
 
+    def test_get_all_changed_since(self):
+        time_fixture = self.useFixture(utils_fixture.TimeFixture())
+        computes = []
+        for _ in range(3):
+            compute = fake_compute_with_resources.obj_clone()
+            compute._context = self.context
+            compute.create()
+            computes.append(compute)
+        time_fixture.advance_time_seconds(60)
+        changed_since = timeutils.utcnow()
+
+        updated, deleted = computes[1:]
+        updated.vcpus_used = 2
+        updated.save()
+        deleted.destroy()
+        created = fake_compute_with_resources.obj_clone()
+        created._context = self.context
+        created.create()
+
+        nodes = compute_node.ComputeNodeList.get_all_changed_since(
+            self.context, changed_since)
+        self.assertEqual(
+            sorted([updated.id, deleted.id, created.id]),
+            sorted(node.id for node in nodes))
+        self.assertEqual(
+            [deleted.id], [node.id for node in nodes if node.deleted])
+
 
 class TestComputeNodeObject(test_objects._LocalTest,
                             _TestComputeNodeObject):
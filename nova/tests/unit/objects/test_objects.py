@@ -1086,7 +1086,7 @@ object_data = {
     'CellMapping': '1.1-5d652928000a5bc369d79d5bde7e497d',
     'CellMappingList': '1.1-496ef79bb2ab41041fff8bcb57996352',
     'ComputeNode': '1.19-af6bd29a6c3b225da436a0d8487096f2',
-    'ComputeNodeList': '1.17-52f3b0962b1c86b98590144463ebb192',
+    'ComputeNodeList': '1.18-2493898460e7c712b27a6540f463e87b',
     'ConsoleAuthToken': '1.3-64803f4ab6b1bf92af587bbf21793390',
     'CpuDiagnostics': '1.0-d256f2e442d1b837735fd17dfe8e3d47',
     'Destination': '1.4-3b440d29459e2c98987ad5b25ad1cb2c',
@@ -1148,7 +1148,7 @@ object_data = {
     'NUMATopologyLimits': '1.1-4235c5da7a76c7e36075f0cd2f5cf922',
     'PciDevice': '1.7-680e4c590aae154958ccf9677774413b',
     'PCIDeviceBus': '1.0-2b891cb77e42961044689f3dc2718995',
-    'PciDeviceList': '1.3-52ff14355491c8c580bdc0ba34c26210',
+    'PciDeviceList': '1.4-1d3ac62c13949604735b0fde7df8b56c',
     'PciDevicePool': '1.1-3f5ddc3ff7bfa14da7f6c7e9904cc000',
     'PciDevicePoolList': '1.1-15ecf022a68ddbb8c2a6739cfc9f8f5e',
     'Quotas': '1.3-3b2b91371f60e788035778fc5f87797d',
@@ -1167,7 +1167,7 @@ object_data = {
     'SecurityGroupList': '1.1-c655ed13298e630f4d398152f7d08d71',
     'Selection': '1.1-548e3c2f04da2a61ceaf9c4e1589f264',
     'Service': '1.22-8a740459ab9bf258a19c8fcb875c2d9a',
-    'ServiceList': '1.19-5325bce13eebcbf22edc9678285270cc',
+    'ServiceList': '1.20-ef81c7334296f04babfd882c16db35ad',
     'ShareMapping': '1.2-ae6ba712dc8022d08c4de34fb8b6e015',
     'ShareMappingList': '1.0-634980d5efdf3656e28c8dec3d862ab9',
     'ShareMetadata': '1.0-09f69ac0bd47371417b5477a277e43af',
@@ -576,6 +576,40 @@ class _TestPciDeviceListObject(object):
         self.assertEqual(devs[1].vendor_id, 'v')
         mock_get.assert_called_once_with(ctxt, '1')
 
+    @mock.patch.object(db, 'pci_device_update_all')
+    def test_save_devices(self, mock_update_all):
+        ctxt = context.get_admin_context()
+        allocated = pci_device.PciDevice._from_db_object(
+            ctxt, pci_device.PciDevice(), dict(fake_db_dev, address='a1'))
+        removed = pci_device.PciDevice._from_db_object(
+            ctxt, pci_device.PciDevice(), dict(fake_db_dev, address='a2'))
+        unchanged = pci_device.PciDevice._from_db_object(
+            ctxt, pci_device.PciDevice(), dict(fake_db_dev, address='a3'))
+        allocated.status = fields.PciDeviceStatus.ALLOCATED
+        allocated.instance_uuid = uuids.instance
+        removed.status = fields.PciDeviceStatus.REMOVED
+        mock_update_all.return_value = {
+            'a1': dict(fake_db_dev, address='a1',
+                       status=fields.PciDeviceStatus.ALLOCATED,
+                       instance_uuid=uuids.instance)}
+
+        devs = pci_device.PciDeviceList.save_devices(
+            ctxt, 1, [allocated, removed, unchanged])
+
+        mock_update_all.assert_called_once_with(
+            ctxt, 1,
+            {'a1': {'status': fields.PciDeviceStatus.ALLOCATED,
+                    'instance_uuid': uuids.instance}},
+            ['a2'])
+        self.assertEqual(['a1', 'a2', 'a3'], [dev.address for dev in devs])
+        self.assertEqual(
+            [fields.PciDeviceStatus.ALLOCATED, fields.PciDeviceStatus.DELETED,
+             fields.PciDeviceStatus.AVAILABLE],
+            [dev.status for dev in devs])
+        self.assertEqual(uuids.instance, devs[0].instance_uuid)
+        for dev in devs:
+            self.assertEqual(set(), dev.obj_what_changed())
+
 
 class TestPciDeviceListObject(test_objects._LocalTest,
                                   _TestPciDeviceListObject):
@@ -240,6 +240,18 @@ class _TestServiceObject(object):
                                          'fake-binary',
                                          include_disabled=True)
 
+    @mock.patch('nova.db.main.api.service_get_all_by_binary_changed_since')
+    def test_get_by_binary_changed_since(self, mock_get):
+        mock_get.return_value = [_fake_service(),
+                                 _fake_service(deleted=True)]
+        changed_since = timeutils.utcnow()
+        services = service.ServiceList.get_by_binary_changed_since(
+            self.context, 'fake-binary', changed_since)
+        self.assertEqual(2, len(services))
+        self.assertTrue(services[1].deleted)
+        mock_get.assert_called_once_with(self.context, 'fake-binary',
+                                         changed_since)
+
     @mock.patch.object(db, 'service_get_all_by_host',
                        return_value=[fake_service])
     def test_get_by_host(self, mock_service_get):
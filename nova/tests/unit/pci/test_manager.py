@@ -147,6 +147,13 @@ class PciDevTrackerTestCase(test.NoDBTestCase):
     def _fake_pci_device_destroy(self, ctxt, node_id, address):
         self.destroy_called += 1
 
+    def _fake_pci_device_update_all(self, ctxt, node_id, updates, destroyed):
+        for address in destroyed:
+            self._fake_pci_device_destroy(ctxt, node_id, address)
+        return {address: self._fake_pci_device_update(
+                    ctxt, node_id, address, values)
+                for address, values in updates.items()}
+
     def _create_pci_requests_object(self, requests,
                                     instance_uuid=None):
         instance_uuid = instance_uuid or uuidsentinel.instance1
@@ -860,8 +867,8 @@ class PciDevTrackerTestCase(test.NoDBTestCase):
                        return_value=False)
     def test_save(self, migrate_mock):
         self.stub_out(
-                'nova.db.main.api.pci_device_update',
-                self._fake_pci_device_update)
+                'nova.db.main.api.pci_device_update_all',
+                self._fake_pci_device_update_all)
         fake_pci_v3 = dict(fake_pci, address='0000:00:00.2', vendor_id='v3')
         fake_pci_devs = [fake_pci, fake_pci_2, fake_pci_v3]
         self.tracker._set_hvdevs(copy.deepcopy(fake_pci_devs))
@@ -871,11 +878,8 @@ class PciDevTrackerTestCase(test.NoDBTestCase):
 
     def test_save_removed(self):
         self.stub_out(
-                'nova.db.main.api.pci_device_update',
-                self._fake_pci_device_update)
-        self.stub_out(
-                'nova.db.main.api.pci_device_destroy',
-                self._fake_pci_device_destroy)
+                'nova.db.main.api.pci_device_update_all',
+                self._fake_pci_device_update_all)
         self.destroy_called = 0
         self.assertEqual(len(self.tracker.pci_devs), 3)
         dev = self.tracker.pci_devs[0]
@@ -885,6 +889,39 @@ class PciDevTrackerTestCase(test.NoDBTestCase):
         self.assertEqual(len(self.tracker.pci_devs), 2)
         self.assertEqual(self.destroy_called, 1)
 
+    @mock.patch('nova.objects.PciDeviceList.save_devices')
+    def test_save_remote(self, mock_save):
+        # Ensure the devices we track, which are referenced by the claims and
+        # pools as well, get the results of a save made by the conductor.
+        def fake_save_devices(ctxt, node_id, devs):
+            saved = []
+            for dev in devs:
+                saved_dev = dev.obj_clone()
+                if saved_dev.status == fields.PciDeviceStatus.REMOVED:
+                    saved_dev.status = fields.PciDeviceStatus.DELETED
+                saved_dev.label = 'saved'
+                saved.append(saved_dev)
+            return objects.PciDeviceList(objects=saved)
+
+        mock_save.side_effect = fake_save_devices
+        removed, changed, unchanged = self.tracker.pci_devs
+        removed.remove()
+        changed.label = 'changed'
+
+        self.tracker.save(self.fake_context)
+
+        mock_save.assert_called_once_with(
+            self.fake_context, self.tracker.node_id, [removed, changed])
+        self.assertEqual([changed, unchanged], self.tracker.pci_devs.objects)
+        self.assertEqual('saved', changed.label)
+        self.assertEqual(set(), changed.obj_what_changed())
+        self.assertNotEqual('saved', unchanged.label)
+
+        # Nothing is saved without changes.
+        mock_save.reset_mock()
+        self.tracker.save(self.fake_context)
+        mock_save.assert_not_called()
+
     def test_clean_usage(self):
         inst_2 = copy.copy(self.inst)
         inst_2.uuid = uuidsentinel.instance2
@@ -182,6 +182,69 @@ class PciDeviceStatsTestCase(test.NoDBTestCase):
         self.assertEqual(len(self.pci_stats.pools), 4)
         self.assertEqual([d['count'] for d in self.pci_stats], [1, 1, 1, 1])
 
+    def test_support_requests_does_not_copy_devices(self):
+        copies = []
+
+        def fake_apply_requests(pci_stats, *args):
+            copies.append(pci_stats)
+
+        with mock.patch.object(
+            stats.PciDeviceStats, 'apply_requests', new=fake_apply_requests,
+        ):
+            self.assertTrue(self.pci_stats.support_requests(pci_requests, {}))
+
+        copied, = copies
+        self.assertIsNot(self.pci_stats, copied)
+        self.assertEqual(self.pci_stats.pools, copied.pools)
+        for pool, copied_pool in zip(self.pci_stats.pools, copied.pools):
+            self.assertIsNot(pool, copied_pool)
+            self.assertIs(pool['devices'], copied_pool['devices'])
+        self.assertIs(self.pci_stats.dev_filter, copied.dev_filter)
+
+    def test_indexes_follow_the_pools(self):
+        # pools are found through the index
+        dev = objects.PciDevice.create(
+            None, dict(fake_pci_1, address='0000:00:00.5'))
+        self.pci_stats.add_device(dev)
+        self.assertEqual(5, len(self.pci_stats.pools))
+        self.assertTrue(self.pci_stats._is_free_dev(dev))
+        with mock.patch.object(
+            self.pci_stats, '_equal_properties',
+            new=mock.NonCallableMock(),
+        ):
+            pool = self.pci_stats._find_pool(
+                self.pci_stats._create_pool_keys_from_dev(dev))
+        self.assertEqual([dev], pool['devices'])
+
+        # the spec index only returns the pools of the requested device
+        req = objects.InstancePCIRequest(
+            count=1, spec=[{'vendor_id': 'V2', 'product_id': 'P2'}])
+        with mock.patch(
+            'nova.pci.utils.pci_device_prop_match', return_value=True,
+        ) as mock_match:
+            pools = self.pci_stats._filter_pools_for_spec(
+                self.pci_stats.pools, req)
+        self.assertEqual(1, mock_match.call_count)
+        self.assertEqual(['v2'], [pool['vendor_id'] for pool in pools])
+
+        # removed devices and emptied pools are dropped from the indexes
+        self.pci_stats.remove_device(self.fake_dev_2)
+        self.assertFalse(self.pci_stats._is_free_dev(self.fake_dev_2))
+        self.assertEqual(
+            [], self.pci_stats._filter_pools_for_spec(
+                self.pci_stats.pools, req))
+        self.assertRaises(exception.PciDevicePoolEmpty,
+                          self.pci_stats.remove_device, self.fake_dev_2)
+
+        # the indexes are rebuilt if the pools are changed from outside
+        self.pci_stats.pools.pop()
+        self.assertEqual(
+            len(self.pci_stats.pools), len(self.pci_stats._get_pool_index()))
+
+        self.pci_stats.clear()
+        self.assertFalse(self.pci_stats._is_free_dev(dev))
+        self.assertEqual({}, self.pci_stats._get_pool_index())
+
     def test_support_requests_numa(self):
         cells = [
             objects.InstanceNUMACell(
@@ -25,6 +25,7 @@ from oslo_utils.fixture import uuidsentinel as uuids
 import nova.conf
 from nova import context
 from nova import exception
+from nova import instrumentation
 from nova import objects
 from nova.scheduler.client import report
 from nova.scheduler import utils as scheduler_utils
@@ -2190,6 +2191,10 @@ class TestProviderOperations(SchedulerReportClientTestCase):
             global_request_id=self.context.global_id)
         self.assertEqual(mock.sentinel.alloc_reqs, alloc_reqs)
         self.assertEqual(mock.sentinel.p_sums, p_sums)
+        # the latency of the GET is recorded without the query string
+        self.assertEqual(
+            ['GET /allocation_candidates'],
+            list(instrumentation.get_stats()[instrumentation.PLACEMENT]))
 
     def test_get_ac_no_trait_bogus_group_policy_custom_limit(self):
         self.flags(max_placement_results=42, group='scheduler')
@@ -2265,6 +2270,218 @@ class TestProviderOperations(SchedulerReportClientTestCase):
         self.assertEqual(expected_query, query)
         self.assertIsNone(res[0])
 
+    def _get_cached_candidates_client(self):
+        self.flags(allocation_candidates_cache_ttl=5, group='scheduler')
+        client = report.SchedulerReportClient(self.ks_adap_mock)
+        resp_mock = mock.Mock(status_code=200)
+        resp_mock.json.return_value = {
+            'allocation_requests': [
+                {'allocations': {
+                    rp_uuid: {'resources': {'VCPU': 1, 'MEMORY_MB': 512}}}}
+                for rp_uuid in (uuids.cn1, uuids.cn2)],
+            'provider_summaries': {
+                uuids.cn1: {'resources': {
+                    'VCPU': {'capacity': 8, 'used': 0},
+                    'MEMORY_MB': {'capacity': 1024, 'used': 0}}},
+                uuids.cn2: {'resources': {
+                    'VCPU': {'capacity': 8, 'used': 0},
+                    'MEMORY_MB': {'capacity': 2048, 'used': 0}}},
+            },
+        }
+        self.ks_adap_mock.get.return_value = resp_mock
+        flavor = objects.Flavor(
+            vcpus=1, memory_mb=512, root_gb=0, ephemeral_gb=0, swap=0)
+        req_spec = objects.RequestSpec(flavor=flavor, is_bfv=False)
+        resources = scheduler_utils.ResourceRequest.from_request_spec(req_spec)
+        return client, resources
+
+    @mock.patch('time.monotonic')
+    def test_get_allocation_candidates_cached(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        client, resources = self._get_cached_candidates_client()
+
+        alloc_reqs, p_sums, version = client.get_allocation_candidates(
+            self.context, resources)
+        self.assertEqual(2, len(alloc_reqs))
+        # Modifying the candidates does not modify the cached ones.
+        alloc_reqs.pop()
+        p_sums.pop(uuids.cn1)
+
+        mock_monotonic.return_value = 104
+        alloc_reqs, p_sums, version = client.get_allocation_candidates(
+            self.context, resources)
+        self.assertEqual(2, len(alloc_reqs))
+        self.assertEqual({uuids.cn1, uuids.cn2}, set(p_sums))
+        self.assertEqual('1.36', version)
+        self.ks_adap_mock.get.assert_called_once()
+
+        # The cached candidates expire.
+        mock_monotonic.return_value = 105
+        client.get_allocation_candidates(self.context, resources)
+        self.assertEqual(2, self.ks_adap_mock.get.call_count)
+
+    def test_get_allocation_candidates_cache_consumed(self):
+        client, resources = self._get_cached_candidates_client()
+        candidates_resp_mock = self.ks_adap_mock.get.return_value
+        alloc_reqs, _, version = client.get_allocation_candidates(
+            self.context, resources)
+        get_resp_mock = mock.Mock(status_code=200)
+        get_resp_mock.json.return_value = {'allocations': {}}
+        self.ks_adap_mock.get.return_value = get_resp_mock
+        self.ks_adap_mock.put.return_value = mock.Mock(status_code=204)
+
+        for consumer_uuid in (uuids.consumer1, uuids.consumer2):
+            self.assertTrue(client.claim_resources(
+                self.context, consumer_uuid, alloc_reqs[0], uuids.project_id,
+                uuids.user_id, allocation_request_version=version))
+
+        # The memory of cn1 is exhausted so only cn2 is left.
+        alloc_reqs, p_sums, _ = client.get_allocation_candidates(
+            self.context, resources)
+        self.assertEqual([uuids.cn2],
+                         [rp_uuid for ar in alloc_reqs
+                          for rp_uuid in ar['allocations']])
+        self.assertEqual(2, p_sums[uuids.cn1]['resources']['VCPU']['used'])
+        self.assertEqual(0, p_sums[uuids.cn2]['resources']['VCPU']['used'])
+        # Placement was only queried for the candidates once, the other GET
+        # requests being made by the claims.
+        self.assertEqual(3, self.ks_adap_mock.get.call_count)
+
+        # A conflict invalidates the cache.
+        self.ks_adap_mock.put.return_value = fake_requests.FakeResponse(
+            409, content=jsonutils.dumps(
+                {'errors': [{'code': 'placement.undefined_code',
+                             'detail': 'Unable to allocate inventory'}]}))
+        self.assertFalse(client.claim_resources(
+            self.context, uuids.consumer3, alloc_reqs[0], uuids.project_id,
+            uuids.user_id, allocation_request_version=version))
+        self.ks_adap_mock.get.return_value = candidates_resp_mock
+        alloc_reqs, _, _ = client.get_allocation_candidates(
+            self.context, resources)
+        self.assertEqual(2, len(alloc_reqs))
+        self.assertEqual(5, self.ks_adap_mock.get.call_count)
+
+    def test_get_allocation_candidates_cache_generation_changed(self):
+        client, resources = self._get_cached_candidates_client()
+        client.get_allocation_candidates(self.context, resources)
+        self.ks_adap_mock.put.return_value = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps(
+                {'aggregates': [uuids.agg],
+                 'resource_provider_generation': 2}))
+
+        # Changing a provider which is not involved keeps the cache.
+        client.set_aggregates_for_provider(
+            self.context, uuids.other, [uuids.agg], use_cache=False,
+            generation=1)
+        client.get_allocation_candidates(self.context, resources)
+        self.ks_adap_mock.get.assert_called_once()
+
+        client.set_aggregates_for_provider(
+            self.context, uuids.cn2, [uuids.agg], use_cache=False,
+            generation=1)
+        client.get_allocation_candidates(self.context, resources)
+        self.assertEqual(2, self.ks_adap_mock.get.call_count)
+
+    @mock.patch.object(report.SchedulerReportClient, 'set_traits_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_aggregates_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_inventory_for_provider')
+    def test_update_from_provider_tree_skips_unchanged(
+            self, mock_set_inv, mock_set_aggs, mock_set_traits):
+        ptree = self.client._provider_tree
+        ptree.new_root('cn1', uuids.cn1, generation=1)
+        ptree.new_child('pgpu1', uuids.cn1, uuid=uuids.pgpu1, generation=1)
+        ptree.new_child('pgpu2', uuids.cn1, uuid=uuids.pgpu2, generation=1)
+        ptree.new_root('cn2', uuids.cn2, generation=1)
+        new_tree = copy.deepcopy(ptree)
+
+        # Nothing changed
+        self.client.update_from_provider_tree(self.context, new_tree)
+        mock_set_inv.assert_not_called()
+        mock_set_aggs.assert_not_called()
+        mock_set_traits.assert_not_called()
+        self.assertEqual({'updated': 0, 'skipped': 4},
+                         self.client.provider_sync_stats)
+
+        # Only the changed provider is flushed
+        vgpu = {orc.VGPU: {'total': 4}}
+        new_tree.update_inventory(uuids.pgpu2, vgpu)
+        self.client.update_from_provider_tree(self.context, new_tree)
+        mock_set_inv.assert_called_once_with(self.context, uuids.pgpu2, vgpu)
+        mock_set_aggs.assert_called_once_with(
+            self.context, uuids.pgpu2, set())
+        mock_set_traits.assert_called_once_with(
+            self.context, uuids.pgpu2, set())
+        self.assertEqual({'updated': 1, 'skipped': 7},
+                         self.client.provider_sync_stats)
+
+    def _tree_with_vgpus(self, count):
+        ptree = self.client._provider_tree
+        ptree.new_root('cn1', uuids.cn1, generation=1)
+        for i in range(count):
+            ptree.new_child('pgpu%d' % i, uuids.cn1,
+                            uuid=getattr(uuids, 'pgpu%d' % i), generation=1)
+        new_tree = copy.deepcopy(ptree)
+        for i in range(count):
+            new_tree.update_inventory(getattr(uuids, 'pgpu%d' % i),
+                                      {orc.VGPU: {'total': i + 1}})
+        return new_tree
+
+    @mock.patch.object(report.SchedulerReportClient, '_refresh_associations')
+    @mock.patch.object(report.SchedulerReportClient, 'set_traits_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_aggregates_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_inventory_for_provider')
+    def test_update_from_provider_tree_concurrent(
+            self, mock_set_inv, mock_set_aggs, mock_set_traits,
+            mock_refresh):
+        self.flags(resource_provider_sync_workers=2, group='compute')
+        new_tree = self._tree_with_vgpus(3)
+        # The first flush of pgpu1 hits a generation conflict
+        conflict = exception.ResourceProviderUpdateConflict(
+            uuid=uuids.pgpu1, generation=1, error='conflict')
+        calls = []
+
+        def set_inv(context, rp_uuid, inv):
+            calls.append(rp_uuid)
+            if rp_uuid == uuids.pgpu1 and calls.count(rp_uuid) == 1:
+                raise conflict
+        mock_set_inv.side_effect = set_inv
+
+        self.client.update_from_provider_tree(self.context, new_tree)
+
+        self.assertEqual(
+            sorted([uuids.pgpu0, uuids.pgpu1, uuids.pgpu1, uuids.pgpu2]),
+            sorted(calls))
+        mock_refresh.assert_called_once_with(
+            self.context, uuids.pgpu1, force=True, refresh_sharing=False)
+        self.assertEqual(3, mock_set_aggs.call_count)
+        self.assertEqual(3, mock_set_traits.call_count)
+        self.assertEqual({'updated': 3, 'skipped': 1},
+                         self.client.provider_sync_stats)
+
+    @mock.patch.object(report.SchedulerReportClient, 'set_traits_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_aggregates_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_inventory_for_provider')
+    def test_update_from_provider_tree_concurrent_fails(
+            self, mock_set_inv, mock_set_aggs, mock_set_traits):
+        self.flags(resource_provider_sync_workers=2, group='compute')
+        new_tree = self._tree_with_vgpus(3)
+        mock_set_inv.side_effect = exception.ResourceProviderUpdateFailed(
+            url='url', error='error')
+
+        self.assertRaises(
+            exception.ResourceProviderSyncFailed,
+            self.client.update_from_provider_tree, self.context, new_tree)
+        # No more provider is flushed once one failed, and the cache of the
+        # tree is cleared.
+        self.assertLess(mock_set_inv.call_count, 3)
+        self.assertFalse(self.client._provider_tree.exists(uuids.cn1))
+
     def test_get_resource_provider_found(self):
         # Ensure _get_resource_provider() returns a dict of resource provider
         # if it finds a resource provider record from the placement API
@@ -16,6 +16,7 @@ from oslo_utils.fixture import uuidsentinel as uuids
 
 from nova import objects
 from nova.scheduler.filters import affinity_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -213,6 +214,23 @@ class TestGroupAffinityFilter(test.NoDBTestCase):
             {"max_server_per_host": 2}, [uuids.inst1])
         self.assertTrue(result)
 
+    def test_group_anti_affinity_filter_with_group_index(self):
+        filt_cls = affinity_filter.ServerGroupAntiAffinityFilter()
+        spec_obj = objects.RequestSpec(
+            instance_group=objects.InstanceGroup(policy='anti-affinity',
+                                                 hosts=['host1'],
+                                                 members=[uuids.inst1],
+                                                 rules={}),
+            instance_uuid=uuids.fake)
+        group_index = host_manager.ServerGroupIndex()
+        group_index.add('host1', [uuids.inst1])
+        host1 = fakes.FakeHostState('host1', 'node1', {})
+        host1.group_index = group_index
+        host2 = fakes.FakeHostState('host2', 'node2', {})
+        host2.group_index = group_index
+        self.assertFalse(filt_cls.host_passes(host1, spec_obj))
+        self.assertTrue(filt_cls.host_passes(host2, spec_obj))
+
     def test_group_anti_affinity_filter_allows_instance_to_same_host(self):
         fake_uuid = uuids.fake
         mock_instance = objects.Instance(uuid=fake_uuid)
@@ -14,6 +14,7 @@ from unittest import mock
 
 from nova import objects
 from nova.scheduler.filters import compute_filter
+from nova.scheduler import host_columns
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -52,3 +53,19 @@ class TestComputeFilter(test.NoDBTestCase):
         service_up_mock.return_value = False
         self.assertFalse(filt_cls.host_passes(host, spec_obj))
         service_up_mock.assert_called_once_with(service)
+
+    def test_compute_filter_hosts_pass(self, service_up_mock):
+        filt_cls = compute_filter.ComputeFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024))
+        services = [{'disabled': True}, {'disabled': False},
+                    {'disabled': False}]
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'service': service})
+                 for i, service in enumerate(services)]
+        service_up_mock.side_effect = [False, True]
+        columns = host_columns.HostStateColumns(hosts)
+        self.assertEqual([False, False, True],
+                         list(filt_cls.hosts_pass(columns, spec_obj)))
+        service_up_mock.assert_has_calls([mock.call(services[1]),
+                                          mock.call(services[2])])
@@ -15,6 +15,7 @@ from unittest import mock
 
 from nova import objects
 from nova.scheduler.filters import io_ops_filter
+from nova.scheduler import host_columns
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -60,3 +61,39 @@ class TestIoOpsFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_io_ops_per_host')
+
+    def test_filter_num_iops_hosts_pass(self):
+        self.flags(max_io_ops_per_host=8, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'num_io_ops': num_io_ops})
+                 for i, num_io_ops in enumerate([7, 8, 9, 0])]
+        spec_obj = objects.RequestSpec()
+        columns = host_columns.HostStateColumns(hosts)
+        self.assertEqual([True, False, False, True],
+                         list(self.filt_cls.hosts_pass(columns, spec_obj)))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_filter_num_iops_hosts_pass(self, agg_mock):
+        self.flags(max_io_ops_per_host=7, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.AggregateIoOpsFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'num_io_ops': 7})
+                 for i in range(2)]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        # Only the second host has an aggregate value defined.
+        agg_mock.side_effect = [set([]), set(['8'])]
+        columns = host_columns.HostStateColumns(hosts)
+        self.assertEqual([False, True],
+                         list(self.filt_cls.hosts_pass(columns, spec_obj)))
+
+    def test_filter_num_iops_vectorized_rebuild(self):
+        self.flags(max_io_ops_per_host=8, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host1', 'node1', {'num_io_ops': 8})]
+        spec_obj = objects.RequestSpec(
+            scheduler_hints={'_nova_check_type': ['rebuild']})
+        columns = host_columns.HostStateColumns(hosts)
+        self.assertEqual(
+            [True],
+            list(self.filt_cls.filter_all_vectorized(columns, spec_obj)))
@@ -14,6 +14,7 @@ from unittest import mock
 
 from nova import objects
 from nova.scheduler.filters import num_instances_filter
+from nova.scheduler import host_columns
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -60,3 +61,31 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         agg_mock.return_value = set(['XXX'])
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_instances_per_host')
+
+    def test_filter_num_instances_hosts_pass(self):
+        self.flags(max_instances_per_host=5, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'num_instances': num_instances})
+                 for i, num_instances in enumerate([4, 5, 0])]
+        spec_obj = objects.RequestSpec()
+        columns = host_columns.HostStateColumns(hosts)
+        self.assertEqual([True, False, True],
+                         list(self.filt_cls.hosts_pass(columns, spec_obj)))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_filter_aggregate_num_instances_hosts_pass(self, agg_mock):
+        self.flags(max_instances_per_host=4, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'num_instances': 5})
+                 for i in range(2)]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        # Only the second host has an aggregate value defined.
+        agg_mock.side_effect = [set([]), set(['6'])]
+        columns = host_columns.HostStateColumns(hosts)
+        self.assertEqual([False, True],
+                         list(self.filt_cls.hosts_pass(columns, spec_obj)))
+        agg_mock.assert_has_calls([
+            mock.call(hosts[0], 'max_instances_per_host'),
+            mock.call(hosts[1], 'max_instances_per_host')])
@@ -416,3 +416,64 @@ class TestNUMATopologyFilter(test.NoDBTestCase):
         self.assertEqual(1, len(mock_numa_fit.mock_calls))
         # and also it made the candidates list empty in the host state
         self.assertEqual(0, len(host.allocation_candidates))
+
+    def _get_host_state(self, name, numa_topology):
+        return fakes.FakeHostState(
+            name, name,
+            {
+                "numa_topology": numa_topology,
+                "pci_stats": None,
+                "cpu_allocation_ratio": 16.0,
+                "ram_allocation_ratio": 1.5,
+                "allocation_candidates": [{"mappings": {}}],
+            },
+        )
+
+    @mock.patch("nova.virt.hardware.numa_fit_instance_to_host")
+    def test_fit_cache(self, mock_numa_fit):
+        self.flags(numa_fit_cache_size=10, group='filter_scheduler')
+        filt_cls = numa_topology_filter.NUMATopologyFilter()
+        instance_topology = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(
+                id=0, cpuset=set([1]), pcpuset=set(), memory=512),
+        ])
+        spec_obj = self._get_spec_obj(numa_topology=instance_topology)
+        # Two hosts with distinct topology objects in the same state
+        host1 = self._get_host_state(
+            'host1', fakes.NUMA_TOPOLOGY.obj_clone())
+        host2 = self._get_host_state(
+            'host2', fakes.NUMA_TOPOLOGY.obj_clone())
+        mock_numa_fit.return_value = mock.sentinel.fitted
+
+        self.assertTrue(filt_cls.host_passes(host1, spec_obj))
+        self.assertTrue(filt_cls.host_passes(host2, spec_obj))
+        mock_numa_fit.assert_called_once()
+        self.assertEqual(1, filt_cls._fit_cache.hits)
+
+        # Once the topology of the host changes, the fit is done again
+        mock_numa_fit.return_value = None
+        host2.numa_topology = fakes.NUMA_TOPOLOGIES_W_HT[0]
+        self.assertFalse(filt_cls.host_passes(host2, spec_obj))
+        self.assertEqual(2, mock_numa_fit.call_count)
+        # And for other requirements
+        spec_obj.numa_topology = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(
+                id=0, cpuset=set([1]), pcpuset=set(), memory=1024),
+        ])
+        self.assertFalse(filt_cls.host_passes(host1, spec_obj))
+        self.assertEqual(3, mock_numa_fit.call_count)
+        # Negative results are cached too
+        self.assertFalse(filt_cls.host_passes(host1, spec_obj))
+        self.assertEqual(3, mock_numa_fit.call_count)
+
+    def test_fit_cache_lru(self):
+        cache = numa_topology_filter._NUMAFitCache(2)
+        cache.set('a', True)
+        cache.set('b', False)
+        self.assertTrue(cache.get('a'))
+        cache.set('c', True)
+        # 'b' was the least recently used result
+        self.assertIsNone(cache.get('b'))
+        self.assertTrue(cache.get('a'))
+        self.assertTrue(cache.get('c'))
+        self.assertEqual((3, 1), (cache.hits, cache.misses))
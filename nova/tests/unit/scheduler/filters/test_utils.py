@@ -87,6 +87,25 @@ class TestUtils(test.NoDBTestCase):
 
         self.assertEqual({}, metadata)
 
+    def test_aggregates_metadata(self):
+        host_state = fakes.FakeHostState(
+            'fake', 'node', {'aggregates': _AGGREGATE_FIXTURES})
+        host_state.aggregates_metadata = utils.AggregatesMetadata(
+            _AGGREGATE_FIXTURES)
+        # The aggregates are not read anymore
+        host_state.aggregates = []
+
+        self.assertEqual(
+            set(['1', '3', '6,7']),
+            utils.aggregate_values_from_key(host_state, key_name='k1'))
+        self.assertEqual(
+            set(), utils.aggregate_values_from_key(host_state, key_name='k3'))
+        metadata = utils.aggregate_metadata_get_by_host(host_state)
+        self.assertEqual({'k1': set(['1', '3', '7', '6']),
+                          'k2': set(['9', '8', '2', '4'])}, metadata)
+        self.assertIs(
+            metadata, utils.aggregate_metadata_get_by_host(host_state))
+
     def test_validate_num_values(self):
         f = utils.validate_num_values
 
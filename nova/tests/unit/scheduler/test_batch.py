@@ -0,0 +1,72 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the pooling of scheduling requests into batches
+"""
+
+import threading
+from unittest import mock
+
+from nova.scheduler import batch
+from nova import test
+
+
+class RequestBatcherTestCase(test.NoDBTestCase):
+
+    def _submit_concurrently(self, batcher, values):
+        results = {}
+
+        def submit(value):
+            results[value] = batcher.submit(value)
+
+        threads = [threading.Thread(target=submit, args=(value,))
+                   for value in values]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_submit_single(self):
+        process = mock.Mock(side_effect=lambda requests: [
+            args[0] * 2 for args in requests])
+        batcher = batch.RequestBatcher(process, 0.01, 10)
+
+        self.assertEqual(2, batcher.submit(1))
+        process.assert_called_once_with([(1,)])
+
+        # A new batch is started by the next request.
+        self.assertEqual(4, batcher.submit(2))
+        self.assertEqual(2, process.call_count)
+
+    def test_submit_concurrent(self):
+        process = mock.Mock(side_effect=lambda requests: [
+            args[0] * 2 for args in requests])
+        # The window is long enough for the batch to only be processed once
+        # it is full.
+        batcher = batch.RequestBatcher(process, 60, 3)
+
+        results = self._submit_concurrently(batcher, [1, 2, 3])
+
+        self.assertEqual({1: 2, 2: 4, 3: 6}, results)
+        process.assert_called_once_with(mock.ANY)
+        self.assertEqual([(1,), (2,), (3,)],
+                         sorted(process.call_args[0][0]))
+
+    def test_submit_process_fails(self):
+        process = mock.Mock(side_effect=ValueError)
+        batcher = batch.RequestBatcher(process, 60, 2)
+
+        results = self._submit_concurrently(batcher, [1, 2])
+
+        self.assertEqual({1: None, 2: None}, results)
+        process.assert_called_once_with(mock.ANY)
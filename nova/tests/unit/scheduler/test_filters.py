@@ -21,8 +21,10 @@ from unittest import mock
 from oslo_utils.fixture import uuidsentinel as uuids
 
 from nova import filters
+from nova import instrumentation
 from nova import loadables
 from nova import objects
+from nova.scheduler import host_columns
 from nova import test
 
 
@@ -233,3 +235,94 @@ class FiltersTestCase(test.NoDBTestCase):
             cargs = mock_log.call_args[0][0]
             self.assertIn("with instance ID '%s'" % fake_uuid, cargs)
             self.assertIn(exp_output, cargs)
+
+    def test_get_filtered_objects_vectorized(self):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        spec_obj = objects.RequestSpec()
+
+        class FilterA(filters.BaseFilter):
+            def filter_all_vectorized(self, columns, spec_obj):
+                # drop the first object
+                return [False] + [True] * (len(columns) - 1)
+
+        class FilterB(filters.BaseFilter):
+            def filter_all(self, list_objs, spec_obj):
+                # drop the last object
+                return list_objs[:-1]
+
+        self.filter_handler.get_columns = host_columns.HostStateColumns
+        with mock.patch.object(FilterA, 'filter_all') as mock_filter_all:
+            result = self.filter_handler.get_filtered_objects(
+                [FilterA(), FilterB()], filter_objs_initial, spec_obj,
+                vectorized=True)
+            mock_filter_all.assert_not_called()
+        self.assertEqual(['filter1'], result)
+
+    def test_get_filtered_objects_vectorized_fallback(self):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        filter_objs_second = ['filter1', 'objects1']
+        spec_obj = objects.RequestSpec()
+
+        filt1_mock = mock.Mock(Filter1)
+        filt1_mock.run_filter_for_index.return_value = True
+        filt1_mock.filter_all_vectorized.return_value = None
+        filt1_mock.filter_all.return_value = filter_objs_second
+
+        self.filter_handler.get_columns = host_columns.HostStateColumns
+        result = self.filter_handler.get_filtered_objects(
+            [filt1_mock], filter_objs_initial, spec_obj, vectorized=True)
+        self.assertEqual(filter_objs_second, result)
+        filt1_mock.filter_all.assert_called_once_with(filter_objs_initial,
+                                                      spec_obj)
+
+    def test_get_filtered_objects_not_vectorized(self):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        spec_obj = objects.RequestSpec()
+
+        filt1_mock = mock.Mock(Filter1)
+        filt1_mock.run_filter_for_index.return_value = True
+        filt1_mock.filter_all.return_value = filter_objs_initial
+
+        with mock.patch.object(self.filter_handler,
+                               'get_columns') as mock_columns:
+            result = self.filter_handler.get_filtered_objects(
+                [filt1_mock], filter_objs_initial, spec_obj)
+            mock_columns.assert_not_called()
+        self.assertEqual(filter_objs_initial, result)
+        filt1_mock.filter_all_vectorized.assert_not_called()
+
+    def test_get_filtered_objects_records_latency(self):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        spec_obj = objects.RequestSpec()
+
+        class FilterA(filters.BaseFilter):
+            def filter_all(self, list_objs, spec_obj):
+                # drop the last object
+                return list_objs[:-1]
+
+        for _ in range(2):
+            self.filter_handler.get_filtered_objects(
+                [FilterA()], filter_objs_initial, spec_obj)
+
+        stats = instrumentation.get_stats()[instrumentation.FILTER]['FilterA']
+        self.assertEqual(2, stats['count'])
+        self.assertEqual(6, stats['objs_in'])
+        self.assertEqual(4, stats['objs_out'])
+
+    def test_get_filtered_objects_records_latency_when_stopping(self):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        spec_obj = objects.RequestSpec()
+
+        class FilterA(filters.BaseFilter):
+            def filter_all(self, list_objs, spec_obj):
+                # stop filtering
+                return None
+
+        result = self.filter_handler.get_filtered_objects(
+            [FilterA()], filter_objs_initial, spec_obj)
+
+        self.assertIsNone(result)
+        stats = instrumentation.get_stats()[instrumentation.FILTER]['FilterA']
+        self.assertEqual(1, stats['count'])
+        self.assertEqual(3, stats['objs_in'])
+        self.assertEqual(0, stats['objs_out'])
@@ -0,0 +1,87 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import math
+
+from nova.scheduler import host_columns
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class HostStateColumnsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(HostStateColumnsTestCase, self).setUp()
+        self.hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1024, 'num_io_ops': 2,
+                 'ram_allocation_ratio': 1.5,
+                 'service': {'disabled': True}}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': -512, 'num_io_ops': 0,
+                 'service': {'disabled': False, 'forced_down': True}}),
+            fakes.FakeHostState('host3', 'node3',
+                {'free_ram_mb': None, 'num_io_ops': 7}),
+        ]
+        self.columns = host_columns.HostStateColumns(self.hosts)
+
+    def test_int_column(self):
+        self.assertEqual([1024, -512, 0], list(self.columns['free_ram_mb']))
+        self.assertEqual([2, 0, 7], list(self.columns['num_io_ops']))
+
+    def test_float_column(self):
+        ratios = self.columns['ram_allocation_ratio']
+        self.assertEqual(1.5, ratios[0])
+        self.assertTrue(math.isnan(ratios[1]))
+        self.assertTrue(math.isnan(ratios[2]))
+
+    def test_service_column(self):
+        self.assertEqual([True, False, False],
+                         list(self.columns['disabled']))
+        self.assertEqual([False, True, False],
+                         list(self.columns['forced_down']))
+
+    def test_unknown_column(self):
+        self.assertRaises(KeyError, self.columns.__getitem__, 'host')
+
+    def test_columns_are_built_once(self):
+        column = self.columns['num_io_ops']
+        self.assertIs(column, self.columns['num_io_ops'])
+
+    def test_compress(self):
+        self.columns['num_io_ops']
+        columns = self.columns.compress([True, False, True])
+        self.assertEqual(2, len(columns))
+        self.assertEqual([self.hosts[0], self.hosts[2]], list(columns.objs))
+        self.assertEqual([2, 7], list(columns['num_io_ops']))
+        self.assertEqual([1024, 0], list(columns['free_ram_mb']))
+
+    def test_select_ordered_subset(self):
+        self.columns['num_io_ops']
+        columns = self.columns.select([self.hosts[1], self.hosts[2]])
+        self.assertEqual([self.hosts[1], self.hosts[2]], list(columns.objs))
+        self.assertIn('num_io_ops', columns._columns)
+        self.assertEqual([0, 7], list(columns['num_io_ops']))
+
+    def test_select_reordered(self):
+        self.columns['num_io_ops']
+        columns = self.columns.select([self.hosts[2], self.hosts[0]])
+        self.assertEqual([self.hosts[2], self.hosts[0]], list(columns.objs))
+        self.assertNotIn('num_io_ops', columns._columns)
+        self.assertEqual([7, 2], list(columns['num_io_ops']))
+
+    def test_map(self):
+        column = self.columns.map(lambda h: len(h.host), dtype=int)
+        self.assertEqual([5, 5, 5], list(column))
+
+    def test_full(self):
+        self.assertEqual([True, True, True], list(self.columns.full(True)))
@@ -35,6 +35,7 @@ from nova.objects import base as obj_base
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
 from nova.scheduler import host_manager
+from nova.scheduler import sharding
 from nova import test
 from nova.tests import fixtures
 from nova.tests.unit import fake_instance
@@ -300,6 +301,54 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual({'fake-host': set([])},
                          self.host_manager.host_aggregates_map)
 
+    def test_get_aggregates_metadata(self):
+        agg1 = objects.Aggregate(id=1, hosts=['host1', 'host2'],
+                                 metadata={'k1': '1'})
+        agg2 = objects.Aggregate(id=2, hosts=['host1', 'host2', 'host3'],
+                                 metadata={'k1': '2, 3'})
+        self.host_manager.update_aggregates([agg1, agg2])
+
+        metadata = self.host_manager._get_aggregates_metadata('host1')
+        self.assertEqual({'k1': {'1', '2, 3'}}, metadata.values)
+        self.assertEqual({'k1': {'1', '2', '3'}}, metadata.split_values)
+        # Shared by the hosts in the same aggregates
+        self.assertIs(metadata,
+                      self.host_manager._get_aggregates_metadata('host2'))
+        self.assertEqual({'k1': {'2, 3'}}, self.host_manager.
+                         _get_aggregates_metadata('host3').values)
+        self.assertEqual({}, self.host_manager.
+                         _get_aggregates_metadata('host4').values)
+
+        agg1.metadata = {'k1': '4'}
+        self.host_manager.update_aggregates([agg1])
+        new_metadata = self.host_manager._get_aggregates_metadata('host1')
+        self.assertIsNot(metadata, new_metadata)
+        self.assertEqual({'k1': {'4', '2, 3'}}, new_metadata.values)
+
+        self.host_manager.delete_aggregate(agg2)
+        self.assertEqual({'k1': {'4'}}, self.host_manager.
+                         _get_aggregates_metadata('host1').values)
+
+    def test_aggregate_index_follows_aggregates(self):
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={'availability_zone': 'az1'})
+        self.host_manager.update_aggregates([fake_agg])
+        index = self.host_manager.aggregate_index
+        self.assertEqual(
+            [fake_agg], index.get_by_metadata(key='availability_zone'))
+
+        new_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                    metadata={'availability_zone': 'az2'})
+        self.host_manager.update_aggregates(new_agg)
+        self.assertEqual([], index.get_by_metadata(
+            key='availability_zone', value='az1'))
+        self.assertEqual([new_agg], index.get_by_metadata(
+            key='availability_zone', value='az2'))
+
+        self.host_manager.delete_aggregate(new_agg)
+        self.assertEqual(
+            [], index.get_by_metadata(key='availability_zone'))
+
     def test_choose_host_filters_not_found(self):
         self.assertRaises(exception.SchedulerHostFilterNotFound,
                           self.host_manager._choose_host_filters,
@@ -346,6 +395,64 @@ class HostManagerTestCase(test.NoDBTestCase):
                 fake_properties)
         self._verify_result(info, result)
 
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def test_get_filtered_hosts_vectorized(self, mock_init_agg,
+                                           mock_init_inst):
+        self.flags(vectorized_filtering=True, group='filter_scheduler')
+        hm = host_manager.HostManager()
+        self.assertTrue(hm.vectorized_filtering)
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=[],
+                                              force_nodes=[])
+
+        info = {'expected_objs': self.fake_hosts,
+                'expected_fprops': fake_properties}
+
+        self._mock_get_filtered_hosts(info)
+
+        with mock.patch.object(hm.filter_handler, 'get_columns',
+                               wraps=hm.filter_handler.get_columns) as m_cols:
+            result = hm.get_filtered_hosts(self.fake_hosts, fake_properties)
+            m_cols.assert_called_once_with(self.fake_hosts)
+        self._verify_result(info, result)
+
+    @mock.patch.object(host_manager.host_columns, 'is_available',
+                       return_value=False)
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def test_vectorized_filtering_unavailable(self, mock_init_agg,
+                                              mock_init_inst, mock_avail):
+        self.flags(vectorized_filtering=True, group='filter_scheduler')
+        with mock.patch.object(host_manager.LOG, 'warning') as mock_warn:
+            hm = host_manager.HostManager()
+        self.assertFalse(hm.vectorized_filtering)
+        mock_warn.assert_called_once()
+
+    @mock.patch.object(host_manager.host_columns, 'is_available',
+                       return_value=False)
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def test_vectorized_weighing_unavailable(self, mock_init_agg,
+                                             mock_init_inst, mock_avail):
+        self.flags(vectorized_weighing=True, group='filter_scheduler')
+        with mock.patch.object(host_manager.LOG, 'warning') as mock_warn:
+            hm = host_manager.HostManager()
+        self.assertFalse(hm.vectorized_weighing)
+        mock_warn.assert_called_once()
+
+    def test_get_top_weighed_hosts(self):
+        with mock.patch.object(
+                self.host_manager.weight_handler,
+                'get_top_weighed_objects') as mock_top:
+            result = self.host_manager.get_top_weighed_hosts(
+                self.fake_hosts, mock.sentinel.spec, 3, include_ties=True)
+        self.assertEqual(mock_top.return_value, result)
+        mock_top.assert_called_once_with(
+            self.host_manager.weighers, self.fake_hosts, mock.sentinel.spec,
+            3, include_ties=True)
+
     def test_get_filtered_hosts_with_requested_destination(self):
         dest = objects.Destination(host='fake_host1', node='fake-node')
         fake_properties = objects.RequestSpec(requested_destination=dest,
@@ -926,6 +1033,27 @@ class HostManagerTestCase(test.NoDBTestCase):
             {}, self.host_manager._instance_info['host1']['instances'])
         get_by_host.assert_called_once_with(ctxt, 'host1')
 
+    @mock.patch('nova.objects.HostMapping.get_by_host')
+    def test_update_instance_info_full_list_targets_cell(self, get_by_host):
+        cell = objects.CellMapping(uuid=uuids.cell1,
+                                   database_connection='fake:///db1',
+                                   transport_url='fake:///mq1')
+        get_by_host.return_value = objects.HostMapping(cell_mapping=cell)
+        ctxt = nova_context.RequestContext()
+        inst1 = fake_instance.fake_instance_obj(ctxt, uuid=uuids.instance_1)
+        inst2 = fake_instance.fake_instance_obj(ctxt, uuid=uuids.instance_2)
+
+        with mock.patch('nova.context.target_cell') as mock_target:
+            self.host_manager.update_instance_info(
+                ctxt, 'host1', objects.InstanceList(objects=[inst1, inst2]))
+
+        # The instances are lazy-loaded from the cell of the host
+        instances = self.host_manager._instance_info['host1']['instances']
+        mock_target.assert_called_once_with(ctxt, cell)
+        self.assertIs(mock_target.return_value.__enter__.return_value,
+                      instances.context)
+        get_by_host.assert_called_once_with(ctxt, 'host1')
+
     def test_delete_instance_info(self):
         host_name = 'fake_host'
         inst1 = fake_instance.fake_instance_obj('fake_context',
@@ -970,6 +1098,43 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual(len(new_info['instances']), len(orig_inst_dict))
         self.assertFalse(new_info['updated'])
 
+    def test_group_index_follows_instance_info(self):
+        inst1 = fake_instance.fake_instance_obj('fake_context',
+                                                uuid=uuids.instance_1)
+        inst2 = fake_instance.fake_instance_obj('fake_context',
+                                                uuid=uuids.instance_2)
+        inst3 = fake_instance.fake_instance_obj('fake_context',
+                                                uuid=uuids.instance_3)
+        group = objects.InstanceGroup(
+            members=[uuids.instance_1, uuids.instance_2, uuids.instance_3])
+        # A host sending its full instance list
+        with mock.patch.object(
+                self.host_manager, '_get_cell_mapping_for_host',
+                side_effect=exception.HostMappingNotFound(name='host1')):
+            self.host_manager.update_instance_info(
+                nova_context.RequestContext(), 'host1', objects.InstanceList(
+                    objects=[inst1, inst2]))
+        self.host_manager.update_instance_info(
+            'fake_context', 'host1', objects.InstanceList(objects=[inst3]))
+        self.assertIsInstance(
+            self.host_manager._instance_info['host1']['instances'],
+            host_manager.HostInstances)
+        index = self.host_manager._get_group_index('host1')
+        self.assertIs(self.host_manager.group_index, index)
+        self.assertEqual({'host1': 3}, index.get_member_counts(group))
+
+        self.host_manager.delete_instance_info(
+            'fake_context', 'host1', uuids.instance_2)
+        self.assertEqual({'host1': 2}, index.get_member_counts(group))
+
+        with mock.patch.object(self.host_manager, '_get_instances_by_host',
+                               return_value={inst1.uuid: inst1}):
+            self.host_manager.sync_instance_info(
+                'fake_context', 'host1', [uuids.instance_1])
+        self.assertEqual({'host1': 1}, index.get_member_counts(group))
+        # The recreated instance info is not used until the host reports in
+        self.assertIsNone(self.host_manager._get_group_index('host1'))
+
     def test_sync_instance_info(self):
         self.host_manager._recreate_instance_info = mock.MagicMock()
         host_name = 'fake_host'
@@ -1408,6 +1573,194 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         mock_get_host_states.assert_called_once_with(
             ctxt, mock.sentinel.compute_nodes, mock.sentinel.services)
 
+    @staticmethod
+    def _cached_record(record, minutes, **updates):
+        record = record.obj_clone()
+        changed_at = datetime.datetime(2015, 11, 11, 11, minutes, 0,
+                                       tzinfo=datetime.timezone.utc)
+        record.created_at = datetime.datetime(
+            2015, 11, 11, 10, 0, 0, tzinfo=datetime.timezone.utc)
+        record.updated_at = changed_at
+        record.deleted_at = None
+        record.deleted = False
+        for field, value in updates.items():
+            setattr(record, field, value)
+        if record.deleted:
+            record.deleted_at = changed_at
+        return record
+
+    def _enable_host_state_cache(self):
+        self.flags(host_state_cache=True, group='scheduler')
+        self.host_manager.refresh_cells_caches()
+        return self.host_manager.host_state_cache
+
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_host_states_by_uuids_cached(
+            self, mock_services, mock_computes, mock_changed_services,
+            mock_changed_computes, mock_get_by_host):
+        cache = self._enable_host_state_cache()
+        ctxt = nova_context.get_admin_context()
+        cn1, cn2 = [self._cached_record(cn, 0)
+                    for cn in fakes.COMPUTE_NODES[:2]]
+        svc1, svc2 = [self._cached_record(svc, 1)
+                      for svc in fakes.SERVICES[:2]]
+        mock_services.return_value = [svc1, svc2]
+        mock_computes.return_value = [cn1, cn2]
+
+        # The first request loads the cell in full.
+        hosts = self.host_manager.get_host_states_by_uuids(
+            ctxt, [cn1.uuid, cn2.uuid], objects.RequestSpec())
+        self.assertEqual({'host1': 512, 'host2': 1024},
+                         {h.host: h.free_ram_mb for h in hosts})
+        self.assertEqual(1, mock_computes.call_count)
+        mock_changed_computes.assert_not_called()
+
+        # The second one only reads the changes since the newest timestamp
+        # seen, less the margin, and rebuilds the changed compute node.
+        changed_cn2 = self._cached_record(cn2, 2, free_ram_mb=256)
+        changed_svc1 = self._cached_record(svc1, 3, disabled=True)
+        mock_changed_computes.return_value = [changed_cn2]
+        mock_changed_services.return_value = [changed_svc1]
+        hosts = self.host_manager.get_host_states_by_uuids(
+            ctxt, [cn1.uuid, cn2.uuid], objects.RequestSpec())
+        self.assertEqual({'host1': (512, True), 'host2': (256, True)},
+                         {h.host: (h.free_ram_mb, h.service['disabled'])
+                          for h in hosts})
+        since = svc1.updated_at - cache.CHANGED_SINCE_MARGIN
+        mock_changed_computes.assert_called_once_with(mock.ANY, since)
+        mock_changed_services.assert_called_once_with(
+            mock.ANY, 'nova-compute', since)
+        self.assertEqual(1, mock_computes.call_count)
+
+        # Deleted compute nodes are evicted, and records read again because
+        # of the margin are not rebuilt.
+        mock_changed_computes.return_value = [
+            changed_cn2, self._cached_record(cn1, 4, deleted=True)]
+        mock_changed_services.return_value = []
+        hosts = self.host_manager.get_host_states_by_uuids(
+            ctxt, None, objects.RequestSpec())
+        self.assertEqual(['host2'], [h.host for h in hosts])
+
+        stats = cache.get_stats()
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(3, stats['misses'])
+        self.assertEqual(0.4, stats['hit_ratio'])
+        self.assertEqual(1, stats['full_loads'])
+        self.assertEqual([self.host_manager.enabled_cells[0].uuid],
+                         list(stats['staleness']))
+
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since',
+                return_value=[])
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since',
+                return_value=[])
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_host_states_by_uuids_cached_full_refresh(
+            self, mock_services, mock_computes, mock_changed_services,
+            mock_changed_computes, mock_get_by_host):
+        cache = self._enable_host_state_cache()
+        ctxt = nova_context.get_admin_context()
+        mock_services.return_value = [
+            self._cached_record(fakes.SERVICES[0], 0)]
+        mock_computes.return_value = [
+            self._cached_record(fakes.COMPUTE_NODES[0], 0)]
+
+        hosts = list(self.host_manager.get_host_states_by_uuids(
+            ctxt, None, objects.RequestSpec()))
+        hosts[0].consume_from_request(objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=256,
+                                  vcpus=1),
+            numa_topology=None,
+            pci_requests=objects.InstancePCIRequests(requests=[])))
+        hosts = list(self.host_manager.get_host_states_by_uuids(
+            ctxt, None, objects.RequestSpec()))
+        # Resources consumed by a request are not seen by the next one.
+        self.assertEqual(512, hosts[0].free_ram_mb)
+        self.assertEqual(1, mock_computes.call_count)
+        self.assertEqual(1, mock_changed_computes.call_count)
+
+        for cached in cache._cells.values():
+            cached.loaded_at -= 300
+        self.host_manager.get_host_states_by_uuids(
+            ctxt, None, objects.RequestSpec())
+        self.assertEqual(2, mock_computes.call_count)
+        self.assertEqual(1, mock_changed_computes.call_count)
+        self.assertEqual(2, cache.get_stats()['full_loads'])
+
+    @mock.patch('nova.context.scatter_gather_cells')
+    def test_get_host_states_by_uuids_cached_failures(self, mock_sg):
+        cache = self._enable_host_state_cache()
+        mock_sg.return_value = {
+            uuids.cell1: nova_context.did_not_respond_sentinel,
+            uuids.cell2: exception.ComputeHostNotFound(host='c'),
+        }
+        hosts = self.host_manager.get_host_states_by_uuids(
+            nova_context.get_admin_context(), None, objects.RequestSpec())
+        self.assertEqual([], list(hosts))
+        self.assertEqual({}, cache._cells)
+
+    @mock.patch('nova.scheduler.host_manager.HostManager._get_host_states')
+    @mock.patch('nova.scheduler.host_manager.HostManager.'
+                '_get_computes_for_cells')
+    @mock.patch('nova.scheduler.host_manager.HostManager.'
+                '_get_cached_host_states')
+    def test_get_host_states_by_uuids_sharded_by_cell(
+            self, mock_get_cached, mock_get_computes, mock_get_host_states):
+        self.flags(host='sched1')
+        cache = self._enable_host_state_cache()
+        self.host_manager.shards = sharding.SchedulerShards(
+            sharding.SHARD_BY_CELL)
+        self.host_manager.shards._set_schedulers({'sched1', 'sched2'})
+        cells = [objects.CellMapping(uuid=getattr(uuids, 'cell%d' % i))
+                 for i in range(10)]
+        self.host_manager.enabled_cells = cells
+        own_cells = [cell for cell in cells
+                     if self.host_manager.shards.owns_cell(cell.uuid)]
+        other_cells = [cell for cell in cells if cell not in own_cells]
+        self.assertTrue(own_cells)
+        self.assertTrue(other_cells)
+        cache._cells[other_cells[0].uuid] = mock.sentinel.cached
+        mock_get_cached.return_value = iter([mock.sentinel.own_host])
+        mock_get_computes.return_value = (
+            mock.sentinel.compute_nodes, mock.sentinel.services)
+        mock_get_host_states.return_value = iter([mock.sentinel.other_host])
+        ctxt = nova_context.get_admin_context()
+
+        hosts = self.host_manager.get_host_states_by_uuids(
+            ctxt, None, objects.RequestSpec())
+
+        # Only the cells of this scheduler are cached, the others are only
+        # loaded when asked for.
+        self.assertIsInstance(hosts, host_manager.ShardedHostStates)
+        self.assertEqual([mock.sentinel.own_host], hosts)
+        mock_get_cached.assert_called_once_with(ctxt, own_cells, None)
+        mock_get_computes.assert_not_called()
+        self.assertEqual([mock.sentinel.other_host],
+                         hosts.load_other_host_states())
+        mock_get_computes.assert_called_once_with(
+            ctxt, other_cells, compute_uuids=None)
+        mock_get_host_states.assert_called_once_with(
+            ctxt, mock.sentinel.compute_nodes, mock.sentinel.services)
+        self.assertNotIn(other_cells[0].uuid, cache._cells)
+
+    @mock.patch('nova.scheduler.host_manager.HostManager.'
+                '_get_computes_for_cells')
+    def test_get_host_states_by_uuids_cache_disabled(self, mock_get_computes):
+        self.assertIsNone(self.host_manager.host_state_cache)
+        mock_get_computes.return_value = ({}, {})
+        self.host_manager.get_host_states_by_uuids(
+            mock.sentinel.ctxt, None, objects.RequestSpec())
+        mock_get_computes.assert_called_once_with(
+            mock.sentinel.ctxt, self.host_manager.enabled_cells,
+            compute_uuids=None)
+
 
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
@@ -1631,6 +1984,58 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual(0, len(host.pci_stats.pools))
         self.assertIsNotNone(host.updated)
 
+    def test_clone(self):
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.free_ram_mb = 1024
+        host.limits = {'memory_mb': 1024}
+        host.allocation_candidates = [mock.sentinel.candidate]
+        host.numa_topology = fakes.NUMA_TOPOLOGY
+        host.pci_stats = pci_stats.PciDeviceStats(
+            host.numa_topology,
+            [objects.PciDevicePool(vendor_id='8086', product_id='15ed',
+                                   numa_node=1, count=1)])
+
+        clone = host.clone()
+        clone.limits['vcpu'] = 2
+        clone.pci_stats.pools.pop()
+        clone.consume_from_request(objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=256,
+                                  vcpus=1),
+            numa_topology=None,
+            pci_requests=objects.InstancePCIRequests(requests=[])))
+
+        self.assertEqual(1024, host.free_ram_mb)
+        self.assertEqual(768, clone.free_ram_mb)
+        self.assertEqual({'memory_mb': 1024}, host.limits)
+        self.assertEqual([mock.sentinel.candidate],
+                         host.allocation_candidates)
+        self.assertEqual([], clone.allocation_candidates)
+        self.assertEqual(1, len(host.pci_stats.pools))
+        self.assertIs(host.numa_topology, clone.pci_stats.numa_topology)
+        self.assertIs(host.pci_stats.dev_filter, clone.pci_stats.dev_filter)
+        self.assertIsNone(host.updated)
+
+    def test_clone_without_pci_pools(self):
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.pci_stats = pci_stats.PciDeviceStats(None)
+
+        clone = host.clone()
+
+        self.assertIs(host.pci_stats, clone.pci_stats)
+
+    def test_get_group_member_count(self):
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.instances = {uuids.instance_1: mock.sentinel.instance_1,
+                          uuids.instance_2: mock.sentinel.instance_2}
+        group = objects.InstanceGroup(
+            members=[uuids.instance_1, uuids.instance_3])
+        self.assertEqual(1, host.get_group_member_count(group))
+
+        host.group_index = host_manager.ServerGroupIndex()
+        host.group_index.add('fakehost', [uuids.instance_1, uuids.instance_3])
+        host.group_index.add('otherhost', [uuids.instance_3])
+        self.assertEqual(2, host.get_group_member_count(group))
+
     def test_stat_consumption_from_instance_with_pci_exception(self):
         fake_requests = [{'request_id': uuids.request_id, 'count': 3,
                           'spec': [{'vendor_id': '8086'}]}]
@@ -1709,3 +2114,178 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual(0, host.free_ram_mb)
         # same with failed_builds
         self.assertEqual(0, host.failed_builds)
+
+
+class ServerGroupIndexTestCase(test.NoDBTestCase):
+    """Test case for ServerGroupIndex class."""
+
+    def setUp(self):
+        super(ServerGroupIndexTestCase, self).setUp()
+        self.index = host_manager.ServerGroupIndex()
+        self.group = objects.InstanceGroup(
+            members=[uuids.instance_1, uuids.instance_2, uuids.instance_3])
+
+    def test_get_member_counts(self):
+        self.index.add('host1', [uuids.instance_1, uuids.instance_2])
+        self.index.add('host2', [uuids.instance_3, uuids.other])
+        self.assertEqual({'host1': 2, 'host2': 1},
+                         self.index.get_member_counts(self.group))
+
+    def test_get_member_counts_cached(self):
+        self.index.add('host1', [uuids.instance_1])
+        counts = self.index.get_member_counts(self.group)
+        self.assertIs(counts, self.index.get_member_counts(self.group))
+        # Another request for the same group
+        group = objects.InstanceGroup(members=list(self.group.members))
+        self.assertIsNot(counts, self.index.get_member_counts(group))
+
+        self.index.add('host2', [uuids.instance_2])
+        self.assertEqual({'host1': 1, 'host2': 1},
+                         self.index.get_member_counts(self.group))
+        self.group.members.append(uuids.instance_4)
+        self.index._hosts_by_instance[uuids.instance_4] = {'host2'}
+        self.assertEqual({'host1': 1, 'host2': 2},
+                         self.index.get_member_counts(self.group))
+
+    def test_instance_on_several_hosts(self):
+        # An instance moving to another host is reported by the new host
+        # before being removed by the old one.
+        self.index.add('host1', [uuids.instance_1])
+        self.index.add('host2', [uuids.instance_1])
+        self.assertEqual({'host1': 1, 'host2': 1},
+                         self.index.get_member_counts(self.group))
+        self.index.remove('host1', [uuids.instance_1])
+        self.assertEqual({'host2': 1},
+                         self.index.get_member_counts(self.group))
+        self.index.remove('host2', [uuids.instance_1, uuids.unknown])
+        self.assertEqual({}, self.index.get_member_counts(self.group))
+        self.assertEqual({}, self.index._hosts_by_instance)
+
+    def test_clear(self):
+        self.index.add('host1', [uuids.instance_1])
+        self.assertEqual({'host1': 1},
+                         self.index.get_member_counts(self.group))
+        self.index.clear()
+        self.assertEqual({}, self.index.get_member_counts(self.group))
+
+
+class HostInstancesTestCase(test.NoDBTestCase):
+    """Test case for HostInstances class."""
+
+    def setUp(self):
+        super(HostInstancesTestCase, self).setUp()
+        self.context = nova_context.get_admin_context()
+        self.inst1 = fake_instance.fake_instance_obj(
+            self.context, uuid=uuids.instance_1, host='host1',
+            project_id='project1', instance_type_id=2,
+            vm_state=vm_states.ACTIVE, task_state=None)
+        self.instances = host_manager.HostInstances(
+            self.context, 'host1', [self.inst1])
+
+    def test_stores_records(self):
+        info = self.instances.get_info(uuids.instance_1)
+        self.assertIsInstance(info, host_manager.InstanceInfo)
+        self.assertEqual('project1', info.project_id)
+        self.assertEqual(2, info.instance_type_id)
+        self.assertEqual(vm_states.ACTIVE, info.vm_state)
+        self.assertIsNone(info.task_state)
+        self.assertRaises(AttributeError, setattr, info, 'flavor', None)
+
+    def test_getitem(self):
+        inst = self.instances[uuids.instance_1]
+        self.assertIsInstance(inst, objects.Instance)
+        self.assertEqual(uuids.instance_1, inst.uuid)
+        self.assertEqual('host1', inst.host)
+        self.assertEqual('project1', inst.project_id)
+        self.assertEqual(2, inst.instance_type_id)
+        self.assertIs(self.context, inst._context)
+        self.assertFalse(inst.obj_what_changed())
+        self.assertFalse(inst.obj_attr_is_set('flavor'))
+        self.assertRaises(KeyError, self.instances.__getitem__, uuids.other)
+
+    def test_mapping(self):
+        # A stub as added by the scheduler for a multi-create request
+        self.instances[uuids.instance_2] = objects.Instance(
+            uuid=uuids.instance_2)
+        self.assertIn(uuids.instance_2, self.instances)
+        self.assertEqual(2, len(self.instances))
+        self.assertEqual({uuids.instance_1, uuids.instance_2},
+                         set(self.instances))
+        self.assertIsNone(self.instances.get_info(uuids.instance_2).vm_state)
+
+        self.assertIsNotNone(self.instances.pop(uuids.instance_1))
+        self.assertIsNone(self.instances.pop(uuids.instance_1, None))
+        self.assertEqual([uuids.instance_2], list(self.instances.keys()))
+        self.assertEqual([uuids.instance_2],
+                         [inst.uuid for inst in self.instances.values()])
+
+    def test_keeps_image_metadata(self):
+        self.inst1.system_metadata = {'image_hw_machine_type': 'q35'}
+        self.inst1.image_ref = uuids.image
+        self.instances[uuids.instance_1] = self.inst1
+        inst = self.instances[uuids.instance_1]
+        # The image properties weigher does not have to load them
+        self.assertEqual({'image_hw_machine_type': 'q35'},
+                         inst.system_metadata)
+        self.assertEqual('q35', inst.image_meta.properties.hw_machine_type)
+        self.assertEqual(uuids.image, inst.image_meta.id)
+        self.assertFalse(inst.obj_what_changed())
+
+    def test_from_uuids(self):
+        instances = host_manager.HostInstances.from_uuids(
+            self.context, 'host1', [uuids.instance_1, uuids.instance_2])
+        self.assertEqual({uuids.instance_1, uuids.instance_2},
+                         set(instances))
+        self.assertEqual('host1', instances[uuids.instance_2].host)
+
+
+class AggregateMetadataIndexTestCase(test.NoDBTestCase):
+    """Test case for AggregateMetadataIndex class."""
+
+    def setUp(self):
+        super(AggregateMetadataIndexTestCase, self).setUp()
+        self.index = host_manager.AggregateMetadataIndex()
+        self.agg1 = objects.Aggregate(
+            id=1, metadata={'availability_zone': 'az1',
+                            'trait:CUSTOM_FOO': 'required'})
+        self.agg2 = objects.Aggregate(
+            id=2, metadata={'filter_tenant_id': 'az1',
+                            'trait:CUSTOM_BAR': 'required'})
+        self.agg3 = objects.Aggregate(
+            id=3, metadata={'availability_zone': 'az2',
+                            'trait:CUSTOM_FOO': 'forbidden'})
+        # An aggregate without metadata
+        self.agg4 = objects.Aggregate(id=4)
+        for agg in (self.agg3, self.agg2, self.agg1, self.agg4):
+            self.index.update(agg)
+
+    def test_get_by_metadata(self):
+        self.assertEqual([self.agg1, self.agg3], self.index.get_by_metadata(
+            key='availability_zone'))
+        self.assertEqual([self.agg1], self.index.get_by_metadata(
+            key='availability_zone', value='az1'))
+        self.assertEqual([self.agg1, self.agg2], self.index.get_by_metadata(
+            value='az1'))
+        self.assertEqual([], self.index.get_by_metadata(key='unknown'))
+
+    def test_get_non_matching_by_metadata_keys(self):
+        self.assertEqual(
+            [self.agg2], self.index.get_non_matching_by_metadata_keys(
+                ['trait:CUSTOM_FOO'], 'trait:', 'required'))
+        self.assertEqual(
+            [self.agg1, self.agg2],
+            self.index.get_non_matching_by_metadata_keys(
+                [], 'trait:', 'required'))
+        self.assertRaises(ValueError,
+                          self.index.get_non_matching_by_metadata_keys,
+                          [], '', 'required')
+
+    def test_delete(self):
+        self.index.delete(self.agg1)
+        self.index.delete(self.agg4)
+        self.assertEqual([self.agg3], self.index.get_by_metadata(
+            key='availability_zone'))
+        self.index.delete(self.agg3)
+        self.assertNotIn('availability_zone', self.index._ids_by_key)
+        # Deleting an unknown aggregate is a noop
+        self.index.delete(objects.Aggregate(id=5))
@@ -17,6 +17,7 @@
 Tests For Scheduler
 """
 
+import collections
 from unittest import mock
 
 from keystoneauth1 import exceptions as ks_exc
@@ -33,10 +34,12 @@ from nova.objects import service
 from nova.scheduler import filters
 from nova.scheduler import host_manager
 from nova.scheduler import manager
+from nova.scheduler import sharding
 from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
 from nova import servicegroup
 from nova import test
+from nova.tests import fixtures as nova_fixtures
 from nova.tests.unit import fake_server_actions
 from nova.tests.unit.scheduler import fakes
 
@@ -102,7 +105,9 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
         ) as select_destinations:
             self.manager.select_destinations(self.context, spec_obj=fake_spec,
                     instance_uuids=[fake_spec.instance_uuid])
-            mock_process.assert_called_once_with(self.context, fake_spec)
+            mock_process.assert_called_once_with(
+                self.context, fake_spec,
+                aggregates=self.manager.host_manager.aggregate_index)
             select_destinations.assert_called_once_with(
                 self.context, fake_spec,
                 [fake_spec.instance_uuid], expected_alloc_reqs_by_rp_uuid,
@@ -151,7 +156,9 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                     return_objects=True, return_alternates=True)
             sel_host = dests[0][0]
             self.assertIsInstance(sel_host, objects.Selection)
-            mock_process.assert_called_once_with(None, fake_spec)
+            mock_process.assert_called_once_with(
+                None, fake_spec,
+                aggregates=self.manager.host_manager.aggregate_index)
             # Since both return_objects and return_alternates are True, the
             # method should have been called with True for return_alternates.
             select_destinations.assert_called_once_with(None, fake_spec,
@@ -193,7 +200,9 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                     spec_obj=fake_spec,
                     instance_uuids=[fake_spec.instance_uuid])
             select_destinations.assert_not_called()
-            mock_process.assert_called_once_with(self.context, fake_spec)
+            mock_process.assert_called_once_with(
+                self.context, fake_spec,
+                aggregates=self.manager.host_manager.aggregate_index)
             mock_get_ac.assert_called_once_with(
                 self.context, mock_rfrs.return_value)
 
@@ -264,7 +273,9 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             self.manager, '_select_destinations',
         ) as select_destinations:
             self.manager.select_destinations(self.context, spec_obj=fake_spec)
-            mock_process.assert_called_once_with(self.context, fake_spec)
+            mock_process.assert_called_once_with(
+                self.context, fake_spec,
+                aggregates=self.manager.host_manager.aggregate_index)
             select_destinations.assert_called_once_with(self.context,
                 fake_spec, None, expected_alloc_reqs_by_rp_uuid,
                 mock_p_sums, "42.0", False)
@@ -316,7 +327,9 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                 fake_spec, None, expected_alloc_reqs_by_rp_uuid,
                 mock_p_sums, "42.0", False)
 
-        mock_process.assert_called_once_with(self.context, fake_spec)
+        mock_process.assert_called_once_with(
+            self.context, fake_spec,
+            aggregates=self.manager.host_manager.aggregate_index)
         mock_log.assert_called_with(
             'Requesting fallback allocation candidates with VCPU instead of '
             'PCPU')
@@ -367,7 +380,9 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                 self.context, request_spec='fake_spec',
                 filter_properties='fake_props',
                 instance_uuids=[fake_spec.instance_uuid])
-            mock_process.assert_called_once_with(self.context, fake_spec)
+            mock_process.assert_called_once_with(
+                self.context, fake_spec,
+                aggregates=self.manager.host_manager.aggregate_index)
             select_destinations.assert_called_once_with(
                 self.context, fake_spec,
                 [fake_spec.instance_uuid], expected_alloc_reqs_by_rp_uuid,
@@ -939,6 +954,7 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             instances={},
             aggregates=[],
             allocation_candidates=[],
+            group_index=None,
         )
         hs2 = mock.Mock(
             spec=host_manager.HostState,
@@ -950,6 +966,7 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             instances={},
             aggregates=[],
             allocation_candidates=[],
+            group_index=None,
         )
         all_host_states = [hs1, hs2]
         mock_get_all_states.return_value = all_host_states
@@ -1024,6 +1041,98 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
         self.assertEqual(0, len(spec_obj.obj_what_changed()),
                          spec_obj.obj_what_changed())
 
+    @mock.patch('random.choice', side_effect=lambda x: x[0])
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_filtered_hosts')
+    def test_get_sorted_hosts_sharded(self, mock_filt, mock_weighed,
+                                      mock_rand):
+        shards = mock.Mock(spec=sharding.SchedulerShards)
+        self.manager.host_manager.shards = shards
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                        cell_uuid=uuids.cell1)
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                        cell_uuid=uuids.cell2)
+        mock_filt.return_value = [hs1, hs2]
+        mock_weighed.side_effect = lambda hosts, spec_obj: [
+            weights.WeighedHost(host, 1.0) for host in hosts]
+
+        # Only the hosts of this scheduler are weighed, the others are kept
+        # as alternates.
+        shards.split_hosts.return_value = ([hs2], [hs1])
+        results = self.manager._get_sorted_hosts(mock.sentinel.spec,
+            [hs1, hs2], mock.sentinel.index)
+        self.assertEqual([hs2, hs1], results)
+        shards.split_hosts.assert_called_once_with([hs1, hs2])
+        mock_weighed.assert_called_once_with([hs2], mock.sentinel.spec)
+
+        # All the hosts are weighed when none of this scheduler fit.
+        mock_weighed.reset_mock()
+        shards.split_hosts.return_value = ([], [hs1, hs2])
+        results = self.manager._get_sorted_hosts(mock.sentinel.spec,
+            [hs1, hs2], mock.sentinel.index)
+        self.assertEqual([hs1, hs2], results)
+        mock_weighed.assert_called_once_with([hs1, hs2], mock.sentinel.spec)
+
+    @mock.patch('random.choice', side_effect=lambda x: x[0])
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_filtered_hosts')
+    def test_get_sorted_hosts_sharded_by_cell(self, mock_filt, mock_weighed,
+                                              mock_rand):
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                        cell_uuid=uuids.cell1)
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                        cell_uuid=uuids.cell2)
+        load_other_host_states = mock.Mock(return_value=[hs2])
+        host_states = host_manager.ShardedHostStates(
+            [hs1], load_other_host_states)
+        mock_weighed.side_effect = lambda hosts, spec_obj: [
+            weights.WeighedHost(host, 1.0) for host in hosts]
+
+        # The hosts of the other cells are not loaded while the hosts of
+        # this scheduler fit, but are kept for the next instances.
+        mock_filt.side_effect = lambda hosts, spec_obj, index: list(hosts)
+        results = self.manager._get_sorted_hosts(mock.sentinel.spec,
+            host_states, mock.sentinel.index)
+        self.assertEqual([hs1], results)
+        self.assertIsInstance(results, host_manager.ShardedHostStates)
+        load_other_host_states.assert_not_called()
+
+        # They are loaded and filtered when none of them fit.
+        mock_filt.side_effect = lambda hosts, spec_obj, index: [
+            host for host in hosts if host is not hs1]
+        results = self.manager._get_sorted_hosts(mock.sentinel.spec,
+            results, mock.sentinel.index)
+        self.assertEqual([hs2], results)
+        self.assertNotIsInstance(results, host_manager.ShardedHostStates)
+        load_other_host_states.assert_called_once_with()
+        mock_filt.assert_called_with([hs2], mock.sentinel.spec,
+                                     mock.sentinel.index)
+
+    def test_map_host_states(self):
+        hs1 = mock.Mock(spec=host_manager.HostState)
+        hs2 = mock.Mock(spec=host_manager.HostState)
+        self.assertEqual(
+            [(hs1,)],
+            list(self.manager._map_host_states(iter([hs1]),
+                                               lambda h: (h,))))
+
+        host_states = self.manager._map_host_states(
+            host_manager.ShardedHostStates([hs1], lambda: [hs2]),
+            lambda h: (h,))
+        self.assertEqual([(hs1,)], host_states)
+        self.assertEqual([(hs2,)], host_states.load_other_host_states())
+
+    @mock.patch.object(sharding.SchedulerShards, 'refresh')
+    def test_refresh_shards(self, mock_refresh):
+        self.assertIsNone(self.manager.host_manager.shards)
+        self.manager._refresh_shards(self.context)
+        mock_refresh.assert_not_called()
+
+        self.manager.host_manager.shards = sharding.SchedulerShards(
+            sharding.SHARD_BY_CELL)
+        self.manager._refresh_shards(self.context)
+        mock_refresh.assert_called_once_with(self.context)
+
     @mock.patch('nova.scheduler.manager.LOG.debug')
     @mock.patch('random.choice', side_effect=lambda x: x[1])
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -1171,6 +1280,40 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
         # (as the host_subset_size is 1) and the tail should stay the same.
         self.assertEqual([hs2, hs1, hs3, hs4], results)
 
+    @mock.patch('random.choice', side_effect=lambda x: x[1])
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
+    @mock.patch(
+        'nova.scheduler.host_manager.HostManager.get_top_weighed_hosts')
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_filtered_hosts')
+    def test_get_sorted_hosts_vectorized(self, mock_filt, mock_top_weighed,
+                                         mock_weighed, mock_rand):
+        """Tests that only the best hosts are weighed into WeighedHost objects
+        when vectorized weighing is enabled, and that the other hosts are
+        kept at the end of the returned list.
+        """
+        self.flags(host_subset_size=2, group='filter_scheduler')
+        self.flags(max_attempts=3, group='scheduler')
+        self.manager.host_manager.vectorized_weighing = True
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1')
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2')
+        hs3 = mock.Mock(spec=host_manager.HostState, host='host3')
+        all_host_states = [hs1, hs2, hs3]
+
+        mock_top_weighed.return_value = (
+            [weights.WeighedHost(hs1, 1.0), weights.WeighedHost(hs2, 0.5)],
+            [hs3])
+
+        results = self.manager._get_sorted_hosts(mock.sentinel.spec,
+            all_host_states, mock.sentinel.index)
+
+        mock_top_weighed.assert_called_once_with(
+            mock_filt.return_value, mock.sentinel.spec, 5,
+            include_ties=False)
+        mock_weighed.assert_not_called()
+        # We override random.choice() to pick the **second** element of the
+        # best weighed hosts, which must come before the remaining hosts.
+        self.assertEqual([hs2, hs1, hs3], results)
+
     @mock.patch(
         'nova.scheduler.client.report.SchedulerReportClient'
         '.delete_allocation_for_instance')
@@ -1581,6 +1724,138 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                 ),
             ])
 
+    @mock.patch('nova.compute.utils.notify_about_scheduler_action')
+    @mock.patch.object(manager.SchedulerManager, '_schedule')
+    def test_select_destinations_batched(self, mock_schedule, mock_notify):
+        self.manager._batcher = mock.Mock()
+        spec_obj = objects.RequestSpec(
+            num_instances=1, instance_uuid=uuids.instance,
+            flavor=objects.Flavor(memory_mb=512, root_gb=512,
+                                  ephemeral_gb=0, swap=0, vcpus=1))
+        alloc_reqs_by_rp_uuid = {uuids.cn1: [mock.sentinel.alloc_req]}
+
+        # A request scheduled as part of a batch is not scheduled again.
+        self.manager._batcher.submit.return_value = mock.sentinel.selections
+        with mock.patch.object(self.manager.notifier, 'info'):
+            selections = self.manager._select_destinations(
+                self.context, spec_obj, [uuids.instance],
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+        self.assertEqual(mock.sentinel.selections, selections)
+        self.manager._batcher.submit.assert_called_once_with(
+            self.context, spec_obj, [uuids.instance], alloc_reqs_by_rp_uuid,
+            mock.sentinel.provider_summaries, None, False)
+        mock_schedule.assert_not_called()
+
+        # A request which could not be, is scheduled on its own.
+        self.manager._batcher.submit.return_value = None
+        with mock.patch.object(self.manager.notifier, 'info'):
+            selections = self.manager._select_destinations(
+                self.context, spec_obj, [uuids.instance],
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+        self.assertEqual(mock_schedule.return_value, selections)
+        mock_schedule.assert_called_once_with(
+            self.context, spec_obj, [uuids.instance], alloc_reqs_by_rp_uuid,
+            mock.sentinel.provider_summaries, None, False)
+
+        # Rebuilds are never batched.
+        self.manager._batcher.submit.reset_mock()
+        with mock.patch.object(self.manager.notifier, 'info'):
+            self.manager._select_destinations(
+                self.context, spec_obj, [uuids.instance], None, None)
+        self.manager._batcher.submit.assert_not_called()
+
+    def _get_batch_host_states(self):
+        host_states = []
+        for host, free_ram_mb in (('host1', 1024), ('host2', 768)):
+            host_state = host_manager.HostState(host, 'node', uuids.cell)
+            host_state.uuid = getattr(uuids, host)
+            host_state.free_ram_mb = free_ram_mb
+            host_states.append(host_state)
+        return host_states
+
+    def _get_batch_request(self, instance_uuids, instance_group=None):
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=512, root_gb=0, ephemeral_gb=0,
+                                  swap=0, vcpus=1),
+            project_id=uuids.project_id, numa_topology=None,
+            pci_requests=None, instance_group=instance_group,
+            requested_resources=[])
+        alloc_reqs_by_rp_uuid = {
+            uuids.host1: [{'allocations': {uuids.host1: {}}}],
+            uuids.host2: [{'allocations': {uuids.host2: {}}}],
+        }
+        return (self.context, spec_obj, instance_uuids, alloc_reqs_by_rp_uuid,
+                mock.sentinel.provider_summaries, fake_alloc_version, True)
+
+    @mock.patch('nova.scheduler.utils.claim_resources', return_value=True)
+    @mock.patch('nova.scheduler.manager.SchedulerManager._get_all_host_states')
+    @mock.patch('nova.scheduler.manager.SchedulerManager._get_sorted_hosts')
+    def test_schedule_batch(self, mock_sorted, mock_get_all, mock_claim):
+        """Tests that the requests of a batch are placed against the same
+        host states, seeing the resources consumed by the previous requests,
+        and that all of their instances are claimed.
+        """
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        self.flags(max_attempts=2, group='scheduler')
+        mock_get_all.side_effect = lambda *a: self._get_batch_host_states()
+        mock_sorted.side_effect = lambda spec, hosts, num: sorted(
+            hosts, key=lambda h: h.free_ram_mb, reverse=True)
+        requests = [self._get_batch_request([uuids.inst1]),
+                    self._get_batch_request([uuids.inst2])]
+
+        results = self.manager._schedule_batch(requests)
+
+        self.assertEqual(
+            [[['host1', 'host2']], [['host2', 'host1']]],
+            [[[sel.service_host for sel in selections]
+              for selections in result] for result in results])
+        self.assertEqual(2, mock_get_all.call_count)
+        mock_claim.assert_has_calls([
+            mock.call(mock.ANY, self.manager.placement_client,
+                      requests[0][1], uuids.inst1,
+                      {'allocations': {uuids.host1: {}}},
+                      allocation_request_version=fake_alloc_version),
+            mock.call(mock.ANY, self.manager.placement_client,
+                      requests[1][1], uuids.inst2,
+                      {'allocations': {uuids.host2: {}}},
+                      allocation_request_version=fake_alloc_version),
+        ], any_order=True)
+
+    @mock.patch('nova.scheduler.manager.SchedulerManager._cleanup_allocations')
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.manager.SchedulerManager._get_all_host_states')
+    @mock.patch('nova.scheduler.manager.SchedulerManager._get_sorted_hosts')
+    def test_schedule_batch_failures(
+        self, mock_sorted, mock_get_all, mock_claim, mock_cleanup,
+    ):
+        """Tests that requests which cannot be placed or claimed as part of a
+        batch get None, with their allocations and server group cleaned up.
+        """
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        mock_get_all.side_effect = lambda *a: self._get_batch_host_states()
+        mock_sorted.side_effect = lambda spec, hosts, num: sorted(
+            hosts, key=lambda h: h.free_ram_mb, reverse=True)
+        mock_claim.side_effect = [True, False, True]
+        group = objects.InstanceGroup(hosts=['host3'])
+        requests = [
+            self._get_batch_request([uuids.inst1, uuids.inst2], group),
+            self._get_batch_request([uuids.inst3]),
+            self._get_batch_request([uuids.inst4]),
+        ]
+        # The last request finds no host with allocation candidates.
+        requests[2] = requests[2][:3] + (
+            collections.defaultdict(list),) + requests[2][4:]
+
+        results = self.manager._schedule_batch(requests)
+
+        self.assertIsNone(results[0])
+        self.assertIsNotNone(results[1])
+        self.assertIsNone(results[2])
+        self.assertEqual(3, mock_claim.call_count)
+        mock_cleanup.assert_called_once_with(self.context, [uuids.inst1])
+        self.assertEqual(['host3'], group.hosts)
+        self.assertNotIn('hosts', group.obj_what_changed())
+
     def test_get_all_host_states_provider_summaries_is_none(self):
         """Tests that HostManager.get_host_states_by_uuids is called with
         compute_uuids being None when the incoming provider_summaries is None.
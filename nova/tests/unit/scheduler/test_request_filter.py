@@ -18,8 +18,10 @@ from oslo_utils import timeutils
 
 from nova import context as nova_context
 from nova import exception
+from nova import instrumentation
 from nova.network import model as network_model
 from nova import objects
+from nova.scheduler import host_manager
 from nova.scheduler import request_filter
 from nova import test
 from nova.tests.unit import utils
@@ -47,6 +49,24 @@ class TestRequestFilter(test.NoDBTestCase):
             filter.assert_called_once_with(mock.sentinel.context,
                                            mock.sentinel.reqspec)
 
+    def test_process_reqspec_aggregates(self):
+        fake_filters = [mock.MagicMock(), mock.MagicMock()]
+        with test.nested(
+            mock.patch('nova.scheduler.request_filter.ALL_REQUEST_FILTERS',
+                       new=fake_filters),
+            mock.patch(
+                'nova.scheduler.request_filter.AGGREGATE_REQUEST_FILTERS',
+                new=fake_filters[:1]),
+        ):
+            request_filter.process_reqspec(
+                mock.sentinel.context, mock.sentinel.reqspec,
+                aggregates=mock.sentinel.aggregates)
+        fake_filters[0].assert_called_once_with(
+            mock.sentinel.context, mock.sentinel.reqspec,
+            aggregates=mock.sentinel.aggregates)
+        fake_filters[1].assert_called_once_with(mock.sentinel.context,
+                                                mock.sentinel.reqspec)
+
     @mock.patch.object(timeutils, 'now')
     def test_log_timer(self, mock_now):
         mock_now.return_value = 123
@@ -69,6 +89,11 @@ class TestRequestFilter(test.NoDBTestCase):
                                               ' took %.1f seconds',
                                               'tester', 2.0)
 
+        # Only the run of the enabled filter is recorded
+        stats = instrumentation.get_stats()[instrumentation.REQUEST_FILTER]
+        self.assertEqual(1, stats['tester']['count'])
+        self.assertEqual(2.0, stats['tester']['total'])
+
     @mock.patch('nova.objects.AggregateList.get_by_metadata')
     def test_require_tenant_aggregate_disabled(self, getmd):
         self.flags(limit_tenants_to_placement_aggregate=False,
@@ -249,6 +274,56 @@ class TestRequestFilter(test.NoDBTestCase):
         self.assertNotIn('requested_destination', reqspec)
         self.assertFalse(getmd.called)
 
+    @mock.patch('nova.objects.aggregate.AggregateList.'
+                'get_non_matching_by_metadata_keys')
+    @mock.patch('nova.objects.AggregateList.get_by_metadata')
+    def test_with_tenant_and_az_and_traits_aggregate_index(
+            self, mock_getmd, mock_getnotmd):
+        aggregates = host_manager.AggregateMetadataIndex()
+        for agg in [
+            objects.Aggregate(
+                id=1, uuid=uuids.agg1,
+                metadata={'filter_tenant_id': 'owner',
+                          'trait:CUSTOM_WINDOWS_LICENSED_TRAIT': 'required'}),
+            objects.Aggregate(
+                id=2, uuid=uuids.agg2,
+                metadata={'filter_tenant_id:12': 'owner',
+                          'trait:HW_GPU_API_DXVA': 'required'}),
+            objects.Aggregate(
+                id=3, uuid=uuids.agg3,
+                metadata={'other_key': 'owner',
+                          'filter_tenant_id': 'other'}),
+            objects.Aggregate(
+                id=4, uuid=uuids.agg4,
+                metadata={'availability_zone': 'myaz'}),
+        ]:
+            aggregates.update(agg)
+
+        traits = set(['HW_GPU_API_DXVA', 'HW_NIC_DCB_ETS'])
+        fake_flavor = objects.Flavor(
+            vcpus=1, memory_mb=1024, root_gb=10, ephemeral_gb=5, swap=0,
+            extra_specs={'trait:' + trait: 'required' for trait in traits})
+        fake_image = objects.ImageMeta(
+            properties=objects.ImageMetaProps(
+                traits_required=[]))
+        reqspec = objects.RequestSpec(project_id='owner',
+                                      availability_zone='myaz',
+                                      flavor=fake_flavor,
+                                      image=fake_image)
+        request_filter.process_reqspec(self.context, reqspec,
+                                       aggregates=aggregates)
+        self.assertEqual(
+            ','.join(sorted([uuids.agg1, uuids.agg2])),
+            ','.join(sorted(
+                reqspec.requested_destination.aggregates[0].split(','))))
+        self.assertEqual(
+            uuids.agg4, reqspec.requested_destination.aggregates[1])
+        self.assertEqual(
+            {uuids.agg1}, reqspec.requested_destination.forbidden_aggregates)
+        # The database is not queried
+        mock_getmd.assert_not_called()
+        mock_getnotmd.assert_not_called()
+
     @mock.patch('nova.objects.AggregateList.get_by_metadata')
     def test_map_az_no_aggregates(self, getmd):
         getmd.return_value = []
@@ -18,6 +18,7 @@ Unit Tests for nova.scheduler.rpcapi
 
 from unittest import mock
 
+import fixtures
 from oslo_utils.fixture import uuidsentinel as uuids
 
 from nova import conf
@@ -120,6 +121,35 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 rpcapi.select_destinations, ctxt, fake_spec, ['fake_uuids'],
                 return_objects=True, return_alternates=False)
 
+    @mock.patch('nova.scheduler.sharding.SchedulerShards.maybe_refresh')
+    def test_select_destinations_sharded(self, mock_refresh):
+        self.flags(shard_by='aggregate', group='scheduler')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.useFixture(fixtures.MockPatchObject(
+            rpcapi.client, 'can_send_version', return_value=True))
+        rpcapi.shards._set_schedulers({'sched1', 'sched2'})
+        fake_spec = objects.RequestSpec(availability_zone='az1')
+        with mock.patch.object(rpcapi.client, 'prepare') as mock_prepare:
+            rpcapi.select_destinations(
+                ctxt, fake_spec, [uuids.instance], return_objects=True,
+                return_alternates=True)
+        mock_refresh.assert_called_once_with(mock.ANY)
+        mock_prepare.assert_called_once_with(
+            version='4.5', call_monitor_timeout=CONF.rpc_response_timeout,
+            timeout=CONF.long_rpc_timeout,
+            server=rpcapi.shards.get_owner('az1'))
+
+        # Requests not restricted to a partition go to any scheduler
+        fake_spec = objects.RequestSpec(availability_zone=None)
+        with mock.patch.object(rpcapi.client, 'prepare') as mock_prepare:
+            rpcapi.select_destinations(
+                ctxt, fake_spec, [uuids.instance], return_objects=True,
+                return_alternates=True)
+        mock_prepare.assert_called_once_with(
+            version='4.5', call_monitor_timeout=CONF.rpc_response_timeout,
+            timeout=CONF.long_rpc_timeout)
+
     @mock.patch.object(objects.RequestSpec, 'to_legacy_filter_properties_dict')
     @mock.patch.object(objects.RequestSpec, 'to_legacy_request_spec_dict')
     def test_select_destinations_with_old_manager(self, to_spec, to_props):
@@ -0,0 +1,161 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the partition of the hosts between the schedulers
+"""
+
+from unittest import mock
+
+from oslo_utils.fixture import uuidsentinel as uuids
+
+from nova import context
+from nova import objects
+from nova.scheduler import sharding
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class SchedulerShardsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SchedulerShardsTestCase, self).setUp()
+        self.flags(host='sched1')
+        self.context = context.get_admin_context()
+
+    def _get_services(self, *hosts):
+        return [objects.Service(host=host, binary='nova-scheduler')
+                for host in hosts]
+
+    def test_get_shards(self):
+        self.assertIsNone(sharding.get_shards())
+        self.flags(shard_by='cell', group='scheduler')
+        shards = sharding.get_shards()
+        self.assertEqual(sharding.SHARD_BY_CELL, shards.shard_by)
+        self.assertEqual({'sched1'}, shards.schedulers)
+        shards = sharding.get_shards(include_self=False)
+        self.assertEqual(set(), shards.schedulers)
+        self.assertIsNone(shards.get_owner(uuids.cell1))
+
+    @mock.patch('nova.servicegroup.API.service_is_up')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_refresh(self, mock_get_by_binary, mock_is_up):
+        mock_get_by_binary.return_value = self._get_services(
+            'sched2', 'sched3')
+        mock_is_up.side_effect = lambda service: service.host != 'sched3'
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_CELL)
+
+        shards.refresh(self.context)
+
+        mock_get_by_binary.assert_called_once_with(
+            self.context, 'nova-scheduler')
+        self.assertEqual({'sched1', 'sched2'}, shards.schedulers)
+        owners = {shards.get_owner(uuid) for uuid in (
+            uuids.cell1, uuids.cell2, uuids.cell3, uuids.cell4, uuids.cell5)}
+        self.assertTrue(owners <= {'sched1', 'sched2'})
+
+    @mock.patch('nova.servicegroup.API.service_is_up', return_value=True)
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_refresh_keeps_partitions(self, mock_get_by_binary, mock_is_up):
+        keys = ['az%d' % i for i in range(100)]
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_AGGREGATE,
+                                          include_self=False)
+        mock_get_by_binary.return_value = self._get_services(
+            'sched1', 'sched2')
+        shards.refresh(self.context)
+        before = {key: shards.get_owner(key) for key in keys}
+
+        mock_get_by_binary.return_value = self._get_services(
+            'sched1', 'sched2', 'sched3')
+        shards.refresh(self.context)
+        after = {key: shards.get_owner(key) for key in keys}
+
+        # Only the keys moved to the new scheduler changed of owner
+        for key in keys:
+            self.assertIn(after[key], (before[key], 'sched3'))
+        self.assertIn('sched3', after.values())
+
+    @mock.patch('time.monotonic')
+    @mock.patch.object(sharding.SchedulerShards, 'refresh')
+    def test_maybe_refresh(self, mock_refresh, mock_monotonic):
+        self.flags(shard_refresh_interval=60, group='scheduler')
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_CELL)
+
+        def refresh(context):
+            shards._refreshed_at = mock_monotonic.return_value
+        mock_refresh.side_effect = refresh
+
+        mock_monotonic.return_value = 1000
+        shards.maybe_refresh(self.context)
+        mock_monotonic.return_value = 1059
+        shards.maybe_refresh(self.context)
+        self.assertEqual(1, mock_refresh.call_count)
+        mock_monotonic.return_value = 1060
+        shards.maybe_refresh(self.context)
+        self.assertEqual(2, mock_refresh.call_count)
+
+    def test_get_host_key_cell(self):
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_CELL)
+        host_state = fakes.FakeHostState('host1', 'node1',
+                                         {'cell_uuid': uuids.cell1})
+        self.assertEqual(uuids.cell1, shards.get_host_key(host_state))
+
+    def test_get_host_key_aggregate(self):
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_AGGREGATE)
+        agg = objects.Aggregate(id=1, hosts=['host1'],
+                                metadata={'availability_zone': 'az1'})
+        host_state = fakes.FakeHostState('host1', 'node1',
+                                         {'aggregates': [agg]})
+        self.assertEqual('az1', shards.get_host_key(host_state))
+
+        self.flags(default_availability_zone='nova')
+        host_state = fakes.FakeHostState('host2', 'node2', {'aggregates': []})
+        self.assertEqual('nova', shards.get_host_key(host_state))
+
+    def test_get_request_key_cell(self):
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_CELL)
+        self.assertIsNone(shards.get_request_key(objects.RequestSpec()))
+
+        cell = objects.CellMapping(uuid=uuids.cell1)
+        destination = objects.Destination(cell=cell)
+        spec_obj = objects.RequestSpec(requested_destination=destination)
+        self.assertEqual(uuids.cell1, shards.get_request_key(spec_obj))
+
+        destination.allow_cross_cell_move = True
+        self.assertIsNone(shards.get_request_key(spec_obj))
+
+    def test_get_request_key_aggregate(self):
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_AGGREGATE)
+        self.assertIsNone(shards.get_request_key(objects.RequestSpec()))
+        spec_obj = objects.RequestSpec(availability_zone='az1')
+        self.assertEqual('az1', shards.get_request_key(spec_obj))
+
+    def test_split_hosts(self):
+        shards = sharding.SchedulerShards(sharding.SHARD_BY_CELL)
+        shards._set_schedulers({'sched1', 'sched2'})
+        cells = [getattr(uuids, 'cell%d' % i) for i in range(20)]
+        host_states = [
+            fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                {'cell_uuid': cells[i % len(cells)]})
+            for i in range(40)]
+
+        own_hosts, other_hosts = shards.split_hosts(host_states)
+
+        self.assertEqual(sorted(host_states, key=id),
+                         sorted(own_hosts + other_hosts, key=id))
+        self.assertTrue(own_hosts)
+        self.assertTrue(other_hosts)
+        for host_state in own_hosts:
+            self.assertTrue(shards.owns_host(host_state))
+            self.assertTrue(shards.owns_cell(host_state.cell_uuid))
+        for host_state in other_hosts:
+            self.assertFalse(shards.owns_host(host_state))
+            self.assertFalse(shards.owns_cell(host_state.cell_uuid))
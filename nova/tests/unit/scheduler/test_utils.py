@@ -2165,6 +2165,19 @@ class TestUtils(TestUtilsBase):
                 utils.get_aggregates_for_routed_subnet,
                 self.context, network_api, report_client, uuids.subnet1)
 
+    def test_get_fingerprint(self):
+        topology = fakes.NUMA_TOPOLOGY.obj_clone()
+        fingerprint = utils.get_fingerprint(topology)
+        # The same content in another object, built in another order
+        other = fakes.NUMA_TOPOLOGY.obj_clone()
+        other.cells[0].cpuset = set([1, 0])
+        self.assertEqual(fingerprint, utils.get_fingerprint(other))
+        other.cells[0].pinned_cpus = set([2])
+        self.assertNotEqual(fingerprint, utils.get_fingerprint(other))
+        self.assertEqual(
+            utils.get_fingerprint([{'a': topology, 'b': {1, 2}}]),
+            utils.get_fingerprint([{'b': {2, 1}, 'a': topology}]))
+
     def test_get_weight_multiplier(self):
         host_attr = {
             'vcpus_total': 4, 'vcpus_used': 6, 'cpu_allocation_ratio': 1.0,
@@ -241,3 +241,39 @@ class MetricsWeigherTestCase(test.NoDBTestCase):
 
         self.assertEqual(1.5, weighed_host.weight)
         self.assertEqual('host4', weighed_host.obj.host)
+
+    def _assert_vectorized_matches(self, setting):
+        self.flags(weight_setting=setting, group='metrics')
+        self.weighers[0]._parse_setting()
+        hostinfo_list = self._get_all_hosts()
+        expected = self.weight_handler.get_weighed_objects(
+            self.weighers, hostinfo_list, {})
+        top, others = self.weight_handler.get_top_weighed_objects(
+            self.weighers, hostinfo_list, {}, len(hostinfo_list))
+        self.assertEqual([], others)
+        self.assertEqual([(w.obj, w.weight) for w in expected],
+                         [(w.obj, w.weight) for w in top])
+
+    def test_weigh_all(self):
+        self._assert_vectorized_matches([idle + '=1'])
+        self._assert_vectorized_matches([idle + '=0.0001', kernel + '=1'])
+        self._assert_vectorized_matches([idle + '=-2', idle + '=1'])
+
+    def test_weigh_all_metric_not_found_required(self):
+        self.flags(weight_setting=[idle + '=1', user + '=2'], group='metrics')
+        self.weighers[0]._parse_setting()
+        hostinfo_list = self._get_all_hosts()
+        ex = self.assertRaises(exception.ComputeHostMetricNotFound,
+                               self.weight_handler.get_top_weighed_objects,
+                               self.weighers, hostinfo_list, {}, 1)
+        self.assertIn('host1', str(ex))
+        self.assertIn(user, str(ex))
+
+    def test_weigh_all_metric_not_found_non_required(self):
+        self.flags(required=False, group='metrics')
+        self._assert_vectorized_matches([idle + '=0.0001', user + '=-1'])
+
+    def test_weigh_all_metric_not_found_zero_multiplier(self):
+        self.flags(required=False, group='metrics')
+        self.flags(weight_multiplier=0.0, group='metrics')
+        self._assert_vectorized_matches([idle + '=0.0001', user + '=-1'])
@@ -25,6 +25,7 @@ from nova import context
 from nova import exception
 from nova import objects
 from nova import test
+from nova.tests import fixtures as nova_fixtures
 from nova import utils
 
 
@@ -397,6 +398,45 @@ class ContextTestCase(test.NoDBTestCase):
             {mock.sentinel.instances, context.did_not_respond_sentinel},
             set(results.values()))
         self.assertTrue(mock_log_warning.called)
+        # The cell which did not respond is accounted for.
+        stats = context.get_cell_latency_stats()
+        self.assertEqual(
+            [0, 1], sorted(cell['timeouts'] for cell in stats.values()))
+
+    @mock.patch('nova.context.time')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_scatter_gather_cells_latency(self, mock_get_inst, mock_time):
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        # Submitted, started and completed at those times for each call.
+        mock_time.monotonic.side_effect = [0, 0.02, 0.1, 0, 3, 10]
+        ctxt = context.get_context()
+        mapping0 = objects.CellMapping(database_connection='fake://db0',
+                                       transport_url='none:///',
+                                       uuid=objects.CellMapping.CELL0_UUID)
+        mapping1 = objects.CellMapping(database_connection='fake://db1',
+                                       transport_url='fake://mq1',
+                                       uuid=uuids.cell1)
+        mappings = objects.CellMappingList(objects=[mapping0, mapping1])
+        mock_get_inst.side_effect = [mock.sentinel.instances,
+                                     exception.NotFound()]
+
+        context.scatter_gather_cells(
+            ctxt, mappings, 30, objects.InstanceList.get_by_filters, {})
+
+        stats = context.get_cell_latency_stats()
+        self.assertEqual({mapping0.uuid, mapping1.uuid}, set(stats))
+        cell0 = stats[mapping0.uuid]
+        self.assertEqual(1, cell0['count'])
+        self.assertEqual(0, cell0['timeouts'])
+        self.assertEqual(1, cell0['queued']['0.05'])
+        self.assertEqual(1, cell0['run']['0.1'])
+        self.assertAlmostEqual(0.08, cell0['run_avg'])
+        # Failed calls are accounted for as well.
+        cell1 = stats[mapping1.uuid]
+        self.assertEqual(1, cell1['count'])
+        self.assertEqual(1, cell1['queued']['5'])
+        self.assertEqual(1, cell1['run']['10'])
+        self.assertEqual(7, cell1['run_max'])
 
     @mock.patch('nova.context.LOG.warning')
     def test_scatter_gather_cells_queued_task_cancelled(self, mock_warning):
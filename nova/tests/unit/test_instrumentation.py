@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_serialization import jsonutils
+
+from nova import instrumentation
+from nova import test
+
+
+class InstrumentationTestCase(test.NoDBTestCase):
+
+    def test_record(self):
+        instrumentation.record(instrumentation.FILTER, 'Filter', 0.002,
+                               objs_in=10, objs_out=4)
+        instrumentation.record(instrumentation.FILTER, 'Filter', 0.2,
+                               objs_in=4, objs_out=4)
+        instrumentation.record(instrumentation.PLACEMENT, 'GET /foo', 120)
+
+        stats = instrumentation.get_stats()
+        self.assertEqual(
+            {instrumentation.FILTER, instrumentation.PLACEMENT}, set(stats))
+        filter_stats = stats[instrumentation.FILTER]['Filter']
+        self.assertEqual(2, filter_stats['count'])
+        self.assertEqual(1, filter_stats['buckets']['0.005'])
+        self.assertEqual(1, filter_stats['buckets']['0.5'])
+        self.assertAlmostEqual(0.101, filter_stats['avg'])
+        self.assertEqual(0.2, filter_stats['max'])
+        self.assertEqual(14, filter_stats['objs_in'])
+        self.assertEqual(8, filter_stats['objs_out'])
+        placement_stats = stats[instrumentation.PLACEMENT]['GET /foo']
+        self.assertEqual(1, placement_stats['buckets']['+Inf'])
+        self.assertEqual(0, placement_stats['objs_in'])
+
+        self.assertEqual(stats, jsonutils.loads(instrumentation.dump()))
+
+        instrumentation.reset()
+        self.assertEqual({}, instrumentation.get_stats())
+
+    def test_report_section(self):
+        instrumentation.record(instrumentation.WEIGHER, 'Weigher', 0.002)
+
+        section = instrumentation.report_section()
+        section.set_current_view_type('text')
+
+        self.assertIn('Weigher', str(section))
@@ -18,7 +18,14 @@ Tests For weights.
 
 from unittest import mock
 
+import numpy as np
+
+from nova import instrumentation
 from nova.scheduler import weights as scheduler_weights
+from nova.scheduler.weights import cpu
+from nova.scheduler.weights import disk
+from nova.scheduler.weights import io_ops
+from nova.scheduler.weights import num_instances
 from nova.scheduler.weights import ram
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -72,3 +79,121 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    def test_normalize_array(self):
+        # weight_list, expected_result, minval, maxval
+        map_ = (
+            ((), (), None, None),
+            ((0.0, 0.0), (0.0, 0.0), None, None),
+            ((1.0, 1.0), (0.0, 0.0), None, None),
+
+            ((20.0, 50.0), (0.0, 1.0), None, None),
+            ((20.0, 50.0), (0.0, 0.375), None, 100.0),
+            ((20.0, 50.0), (0.4, 1.0), 0.0, None),
+            ((20.0, 50.0), (0.2, 0.5), 0.0, 100.0),
+        )
+        for seq, result, minval, maxval in map_:
+            ret = weights.normalize_array(
+                np.array(seq, dtype=float), minval=minval, maxval=maxval)
+            self.assertEqual(tuple(ret), result)
+
+
+class TestTopWeighedObjects(test.NoDBTestCase):
+    def setUp(self):
+        super(TestTopWeighedObjects, self).setUp()
+        self.weight_handler = scheduler_weights.HostWeightHandler()
+        self.weighers = [ram.RAMWeigher(), cpu.CPUWeigher(),
+                         disk.DiskWeigher(), io_ops.IoOpsWeigher(),
+                         num_instances.NumInstancesWeigher()]
+        self.hosts = [
+            fakes.FakeHostState('host%d' % i, 'node%d' % i, {
+                'free_ram_mb': (i * 7919) % 4096 - 512,
+                'free_disk_mb': (i * 104729) % 20480,
+                'vcpus_total': 16,
+                'vcpus_used': i % 20,
+                'cpu_allocation_ratio': 1.5,
+                'num_io_ops': i % 3,
+                'num_instances': i % 5,
+            })
+            for i in range(50)
+        ]
+
+    def _assert_same_order(self, limit, include_ties=False):
+        expected = self.weight_handler.get_weighed_objects(
+            self.weighers, self.hosts, {})
+        top, others = self.weight_handler.get_top_weighed_objects(
+            self.weighers, self.hosts, {}, limit, include_ties=include_ties)
+        self.assertEqual([(w.obj, w.weight) for w in expected[:len(top)]],
+                         [(w.obj, w.weight) for w in top])
+        self.assertEqual([w.obj for w in expected[len(top):]], others)
+        return top, others
+
+    def test_get_top_weighed_objects(self):
+        top, others = self._assert_same_order(3)
+        self.assertEqual(3, len(top))
+        self.assertEqual(47, len(others))
+        for weighed in top:
+            self.assertIsInstance(weighed, scheduler_weights.WeighedHost)
+
+    def test_get_top_weighed_objects_limit_greater_than_hosts(self):
+        top, others = self._assert_same_order(100)
+        self.assertEqual(50, len(top))
+        self.assertEqual([], others)
+
+    def test_get_top_weighed_objects_include_ties(self):
+        for host in self.hosts:
+            host.free_ram_mb = 1024
+        self.hosts[10].free_ram_mb = 2048
+        self.hosts[20].free_ram_mb = 2048
+        self.weighers = [ram.RAMWeigher()]
+        top, others = self._assert_same_order(1, include_ties=True)
+        self.assertEqual([self.hosts[10], self.hosts[20]],
+                         [w.obj for w in top])
+
+    def test_get_top_weighed_objects_weigher_fallback(self):
+        class FakeWeigher(scheduler_weights.BaseHostWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                return len(host_state.host)
+
+        self.weighers.append(FakeWeigher())
+        with mock.patch.object(FakeWeigher, 'weigh_objects',
+                               wraps=self.weighers[-1].weigh_objects) as m:
+            self._assert_same_order(5)
+            self.assertEqual(2, m.call_count)
+
+    def test_get_top_weighed_objects_records_latency(self):
+        self.weight_handler.get_top_weighed_objects(
+            self.weighers, self.hosts, {}, 5)
+        # the weighers are timed too when the hosts are not vectorized
+        with mock.patch.object(self.weight_handler, 'get_columns',
+                               return_value=None):
+            self.weight_handler.get_top_weighed_objects(
+                self.weighers, self.hosts, {}, 5)
+
+        stats = instrumentation.get_stats()[instrumentation.WEIGHER]
+        self.assertEqual(
+            {'RAMWeigher', 'CPUWeigher', 'DiskWeigher', 'IoOpsWeigher',
+             'NumInstancesWeigher'}, set(stats))
+        self.assertEqual(2, stats['RAMWeigher']['count'])
+        self.assertEqual(100, stats['RAMWeigher']['objs_in'])
+
+    @mock.patch.object(scheduler_weights.HostWeightHandler, 'get_columns',
+                       return_value=None)
+    def test_get_top_weighed_objects_no_columns(self, mock_columns):
+        with mock.patch.object(weights.BaseWeigher, 'weigh_all') as m:
+            self._assert_same_order(5)
+            m.assert_not_called()
+
+    @mock.patch('nova.scheduler.utils.get_weight_multiplier',
+                return_value=2.0)
+    def test_weight_multipliers_per_aggregates(self, mock_multiplier):
+        aggs = [mock.sentinel.agg1, mock.sentinel.agg2]
+        for host in self.hosts[:10]:
+            host.aggregates = aggs[:1]
+        for host in self.hosts[10:20]:
+            host.aggregates = aggs
+        columns = self.weight_handler.get_columns(self.hosts)
+        multipliers = self.weighers[0].weight_multipliers(columns)
+        self.assertEqual([2.0] * 50, list(multipliers))
+        # One call per distinct set of aggregates, including none at all.
+        self.assertEqual(3, mock_multiplier.call_count)
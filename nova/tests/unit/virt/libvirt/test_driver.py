@@ -29239,13 +29239,16 @@ class LibvirtDriverTestCase(test.NoDBTestCase, TraitsComparisonMixin):
             traits = self.drvr._get_cpu_arch_traits()
             self.assertTrue(traits.get('HW_ARCH_X86_64'))
 
+    @mock.patch('nova.utils.synchronized',
+                return_value=lambda f: f)
     @mock.patch('oslo_utils.fileutils.ensure_tree')
     @mock.patch('os.path.isdir')
     @mock.patch('os.path.exists')
     @mock.patch('os.utime')
     @mock.patch('nova.virt.images.fetch_to_raw')
     def test_cache_image_uncached(self, mock_fetch, mock_utime, mock_exists,
-                                  mock_isdir, mock_et, first_time=False):
+                                  mock_isdir, mock_et, mock_sync,
+                                  first_time=False):
         # NOTE(artom): This is not actually a path on the system, since we
         # are fully mocked out and are just testing string formatting in this
         # test.
@@ -29260,12 +29263,16 @@ class LibvirtDriverTestCase(test.NoDBTestCase, TraitsComparisonMixin):
         mock_fetch.assert_called_once_with(self.context, 'an-image',
                                            expected_fn)
         mock_utime.assert_not_called()
-        mock_exists.assert_called_once_with(expected_fn)
+        mock_exists.assert_has_calls([mock.call(expected_fn)] * 2)
         mock_isdir.assert_called_once_with('/nova/instances/cache')
         if first_time:
             mock_et.assert_called_once_with('/nova/instances/cache')
         else:
             mock_et.assert_not_called()
+        # The image is fetched under the lock used by the imagebackend
+        mock_sync.assert_called_once_with(
+            imagecache.get_cache_fname('an-image'), external=True,
+            lock_path='/nova/instances/locks')
 
     def test_cache_image_uncached_first_time(self):
         # Test the case where we do need to download the image,
@@ -29273,6 +29280,23 @@ class LibvirtDriverTestCase(test.NoDBTestCase, TraitsComparisonMixin):
         # been performed, so the directory structure has to be created.
         self.test_cache_image_uncached(first_time=True)
 
+    @mock.patch('nova.utils.synchronized',
+                return_value=lambda f: f)
+    @mock.patch('oslo_utils.fileutils.ensure_tree')
+    @mock.patch('os.path.isdir', return_value=True)
+    @mock.patch('os.path.exists', side_effect=[False, True])
+    @mock.patch('nova.privsep.path.utime')
+    @mock.patch('nova.virt.images.fetch_to_raw')
+    def test_cache_image_cached_concurrently(self, mock_fetch, mock_utime,
+                                             mock_exists, mock_isdir,
+                                             mock_et, mock_sync):
+        # The image got cached while waiting for the lock
+        self.assertFalse(self.drvr.cache_image(self.context, 'an-image'))
+        mock_fetch.assert_not_called()
+        mock_utime.assert_not_called()
+        self.assertEqual(2, mock_exists.call_count)
+        mock_sync.assert_called_once()
+
     @mock.patch('oslo_utils.fileutils.ensure_tree')
     @mock.patch('os.path.isdir')
     @mock.patch('os.path.exists')
@@ -26,6 +26,7 @@ from oslo_utils.fixture import uuidsentinel as uuids
 from oslo_utils import uuidutils
 import testtools
 
+from nova.compute import power_state
 from nova.compute import vm_states
 from nova import exception
 from nova import objects
@@ -595,6 +596,31 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(doms[2].name(), vm3.name())
         self.assertEqual(doms[3].name(), vm4.name())
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_instance_power_states(self, mock_stats):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        vm3 = FakeVirtDomain(id=17, name="instance00000003")
+        mock_stats.return_value = [
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING,
+                   'state.reason': 1}),
+            (vm2, {'state.state': fakelibvirt.VIR_DOMAIN_SHUTOFF,
+                   'state.reason': 1}),
+            (vm3, {'state.state': fakelibvirt.VIR_DOMAIN_PAUSED,
+                   'state.reason': 1}),
+        ]
+
+        power_states = self.host.get_instance_power_states()
+
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE,
+            fakelibvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE |
+            fakelibvirt.VIR_CONNECT_LIST_DOMAINS_INACTIVE)
+        self.assertEqual({vm1.UUIDString(): power_state.RUNNING,
+                          vm2.UUIDString(): power_state.SHUTDOWN,
+                          vm3.UUIDString(): power_state.PAUSED},
+                         power_states)
+
     @mock.patch.object(host.Host, "list_instance_domains")
     def test_list_guests(self, mock_list_domains):
         dom0 = mock.Mock(spec=fakelibvirt.virDomain)
@@ -0,0 +1,413 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Differential tests of the CPU pinning search against its previous, set-based,
+implementation.
+"""
+
+import collections
+import itertools
+import random
+import typing as ty
+
+from oslo_log import log as logging
+
+from nova import objects
+from nova.objects import fields
+from nova import test
+from nova.virt import hardware
+
+LOG = logging.getLogger(__name__)
+
+THREAD_POLICIES = (
+    None,
+    fields.CPUThreadAllocationPolicy.PREFER,
+    fields.CPUThreadAllocationPolicy.REQUIRE,
+    fields.CPUThreadAllocationPolicy.ISOLATE,
+)
+
+
+# NOTE: This is the implementation of hardware._pack_instance_onto_cores
+# before sibling sets were handled as lists and pinned CPUs as bitmasks. It is
+# kept as the reference the current implementation must give the same results
+# as. It also uses the previous implementations of NUMACell.free_siblings and
+# InstanceNUMACell.pin_vcpus, so that it can be benchmarked against the current
+# implementation.
+def _reference_free_siblings(host_cell):
+    return [sibling_set & host_cell.free_pcpus
+            for sibling_set in host_cell.siblings]
+
+
+def reference_pack_instance_onto_cores(host_cell, instance_cell,
+                                       num_cpu_reserved=0):
+    """Pack an instance onto a set of siblings.
+
+    Calculate the pinning for the given instance and its topology,
+    making sure that hyperthreads of the instance match up with those
+    of the host when the pinning takes effect. Also ensure that the
+    physical cores reserved for hypervisor on this host NUMA node do
+    not break any thread policies.
+
+    Currently the strategy for packing is to prefer siblings and try use
+    cores evenly by using emptier cores first. This is achieved by the
+    way we order cores in the sibling_sets structure, and the order in
+    which we iterate through it.
+
+    The main packing loop that iterates over the sibling_sets dictionary
+    will not currently try to look for a fit that maximizes number of
+    siblings, but will simply rely on the iteration ordering and picking
+    the first viable placement.
+
+    :param host_cell: objects.NUMACell instance - the host cell that
+                      the instance should be pinned to
+    :param instance_cell: An instance of objects.InstanceNUMACell
+                          describing the pinning requirements of the
+                          instance
+    :param num_cpu_reserved: number of pCPUs reserved for hypervisor
+
+    :returns: An instance of objects.InstanceNUMACell containing the
+              pinning information, the physical cores reserved and
+              potentially a new topology to be exposed to the
+              instance. None if there is no valid way to satisfy the
+              sibling requirements for the instance.
+    """
+    # get number of threads per core in host's cell
+    threads_per_core = max(map(len, host_cell.siblings)) or 1
+
+    LOG.debug('Packing an instance onto a set of siblings: '
+             '    host_cell_free_siblings: %(siblings)s'
+             '    instance_cell: %(cells)s'
+             '    host_cell_id: %(host_cell_id)s'
+             '    threads_per_core: %(threads_per_core)s'
+             '    num_cpu_reserved: %(num_cpu_reserved)s',
+                {'siblings': _reference_free_siblings(host_cell),
+                 'cells': instance_cell,
+                 'host_cell_id': host_cell.id,
+                 'threads_per_core': threads_per_core,
+                 'num_cpu_reserved': num_cpu_reserved})
+
+    # We build up a data structure that answers the question: 'Given the
+    # number of threads I want to pack, give me a list of all the available
+    # sibling sets (or groups thereof) that can accommodate it'
+    sibling_sets: ty.Dict[int, ty.List[ty.Set[int]]] = (
+        collections.defaultdict(list)
+    )
+    for sib in _reference_free_siblings(host_cell):
+        for threads_no in range(1, len(sib) + 1):
+            sibling_sets[threads_no].append(sib)
+    LOG.debug('Built sibling_sets: %(siblings)s', {'siblings': sibling_sets})
+
+    pinning = None
+    threads_no = 1
+
+    def _get_pinning(threads_no, sibling_set, instance_cores):
+        """Determines pCPUs/vCPUs mapping
+
+        Determines the pCPUs/vCPUs mapping regarding the number of
+        threads which can be used per cores.
+
+        :param threads_no: Number of host threads per cores which can
+                           be used to pin vCPUs according to the
+                           policies.
+        :param sibling_set: List of available threads per host cores
+                            on a specific host NUMA node.
+        :param instance_cores: Set of vCPUs requested.
+
+        NOTE: Depending on how host is configured (HT/non-HT) a thread can
+              be considered as an entire core.
+        """
+        if threads_no * len(sibling_set) < (len(instance_cores)):
+            return None
+
+        # Determines usable cores according the "threads number"
+        # constraint.
+        #
+        # For a sibling_set=[(0, 1, 2, 3), (4, 5, 6, 7)] and thread_no 1:
+        # usable_cores=[[0], [4]]
+        #
+        # For a sibling_set=[(0, 1, 2, 3), (4, 5, 6, 7)] and thread_no 2:
+        # usable_cores=[[0, 1], [4, 5]]
+        usable_cores = list(map(lambda s: list(s)[:threads_no], sibling_set))
+
+        # Determines the mapping vCPUs/pCPUs based on the sets of
+        # usable cores.
+        #
+        # For an instance_cores=[2, 3], usable_cores=[[0], [4]]
+        # vcpus_pinning=[(2, 0), (3, 4)]
+        vcpus_pinning = list(zip(sorted(instance_cores),
+                                 itertools.chain(*usable_cores)))
+        msg = ("Computed NUMA topology CPU pinning: usable pCPUs: "
+               "%(usable_cores)s, vCPUs mapping: %(vcpus_pinning)s")
+        msg_args = {
+            'usable_cores': usable_cores,
+            'vcpus_pinning': vcpus_pinning,
+        }
+        LOG.info(msg, msg_args)
+
+        return vcpus_pinning
+
+    def _get_reserved(sibling_set, vcpus_pinning, num_cpu_reserved=0,
+                      cpu_thread_isolate=False):
+        """Given available sibling_set, returns the pCPUs reserved
+        for hypervisor.
+
+        :param sibling_set: List of available threads per host cores
+                            on a specific host NUMA node.
+        :param vcpus_pinning: List of tuple of (pCPU, vCPU) mapping.
+        :param num_cpu_reserved: Number of additional host CPUs which
+                                 need to be reserved.
+        :param cpu_thread_isolate: True if CPUThreadAllocationPolicy
+                                   is ISOLATE.
+        """
+        if not vcpus_pinning:
+            return None
+
+        cpuset_reserved = None
+        usable_cores = list(map(lambda s: list(s), sibling_set))
+
+        if num_cpu_reserved:
+            # Updates the pCPUs used based on vCPUs pinned to.
+            # For the case vcpus_pinning=[(0, 0), (1, 2)] and
+            # usable_cores=[[0, 1], [2, 3], [4, 5]],
+            # if CPUThreadAllocationPolicy is isolated, we want
+            # to update usable_cores=[[4, 5]].
+            # If CPUThreadAllocationPolicy is *not* isolated,
+            # we want to update usable_cores=[[1],[3],[4, 5]].
+            for vcpu, pcpu in vcpus_pinning:
+                for sib in usable_cores:
+                    if pcpu in sib:
+                        if cpu_thread_isolate:
+                            usable_cores.remove(sib)
+                        else:
+                            sib.remove(pcpu)
+
+            # Determines the pCPUs reserved for hypervisor
+            #
+            # For usable_cores=[[1],[3],[4, 5]], num_cpu_reserved=1
+            # cpuset_reserved=set([1])
+            cpuset_reserved = set(list(
+                itertools.chain(*usable_cores))[:num_cpu_reserved])
+            msg = ("Computed NUMA topology reserved pCPUs: usable pCPUs: "
+                   "%(usable_cores)s, reserved pCPUs: %(cpuset_reserved)s")
+            msg_args = {
+                'usable_cores': usable_cores,
+                'cpuset_reserved': cpuset_reserved,
+            }
+            LOG.info(msg, msg_args)
+
+        return cpuset_reserved or None
+
+    if (instance_cell.cpu_thread_policy ==
+            fields.CPUThreadAllocationPolicy.REQUIRE):
+        LOG.debug("Requested 'require' thread policy for %d cores",
+                  len(instance_cell))
+    elif (instance_cell.cpu_thread_policy ==
+            fields.CPUThreadAllocationPolicy.PREFER):
+        LOG.debug("Requested 'prefer' thread policy for %d cores",
+                  len(instance_cell))
+    elif (instance_cell.cpu_thread_policy ==
+            fields.CPUThreadAllocationPolicy.ISOLATE):
+        LOG.debug("Requested 'isolate' thread policy for %d cores",
+                  len(instance_cell))
+    else:
+        LOG.debug("User did not specify a thread policy. Using default "
+                  "for %d cores", len(instance_cell))
+
+    if (instance_cell.cpu_thread_policy ==
+            fields.CPUThreadAllocationPolicy.ISOLATE):
+        # make sure we have at least one fully free core
+        if threads_per_core not in sibling_sets:
+            LOG.debug('Host does not have any fully free thread sibling sets.'
+                      'It is not possible to emulate a non-SMT behavior '
+                      'for the isolate policy without this.')
+            return
+
+        # TODO(stephenfin): Drop this when we drop support for 'vcpu_pin_set'
+        # NOTE(stephenfin): This is total hack. We're relying on the fact that
+        # the libvirt driver, which is the only one that currently supports
+        # pinned CPUs, will set cpuset and pcpuset to the same value if using
+        # legacy configuration, i.e. 'vcpu_pin_set', as part of
+        # '_get_host_numa_topology'. They can't be equal otherwise since
+        # 'cpu_dedicated_set' and 'cpu_shared_set' must be disjoint. Therefore,
+        # if these are equal, the host that this NUMA cell corresponds to is
+        # using legacy configuration and it's okay to use the old, "pin a core
+        # and reserve its siblings" implementation of the 'isolate' policy. If
+        # they're not, the host is using new-style configuration and we've just
+        # hit bug #1889633
+        if threads_per_core != 1 and host_cell.pcpuset != host_cell.cpuset:
+            LOG.warning(
+                "Host supports hyperthreads, but instance requested no "
+                "hyperthreads. This should have been rejected by the "
+                "scheduler but we likely got here due to the fallback VCPU "
+                "query. Consider setting '[workarounds] "
+                "disable_fallback_pcpu_query' to 'True' once hosts are no "
+                "longer using 'vcpu_pin_set'. Refer to bug #1889633 for more "
+                "information."
+            )
+            return
+
+        pinning = _get_pinning(
+            1,  # we only want to "use" one thread per core
+            sibling_sets[threads_per_core],
+            instance_cell.pcpuset)
+        cpuset_reserved = _get_reserved(
+            sibling_sets[1], pinning, num_cpu_reserved=num_cpu_reserved,
+            cpu_thread_isolate=True)
+        if not pinning or (num_cpu_reserved and not cpuset_reserved):
+            pinning, cpuset_reserved = (None, None)
+
+    else:  # REQUIRE, PREFER (explicit, implicit)
+        if (instance_cell.cpu_thread_policy ==
+                fields.CPUThreadAllocationPolicy.REQUIRE):
+            # make sure we actually have some siblings to play with
+            if threads_per_core <= 1:
+                LOG.info("Host does not support hyperthreading or "
+                         "hyperthreading is disabled, but 'require' "
+                         "threads policy was requested.")
+                return
+
+        # NOTE(ndipanov): We iterate over the sibling sets in descending order
+        # of cores that can be packed. This is an attempt to evenly distribute
+        # instances among physical cores
+        for threads_no, sibling_set in sorted(
+                (t for t in sibling_sets.items()), reverse=True):
+
+            # NOTE(sfinucan): The key difference between the require and
+            # prefer policies is that require will not settle for non-siblings
+            # if this is all that is available. Enforce this by ensuring we're
+            # using sibling sets that contain at least one sibling
+            if (instance_cell.cpu_thread_policy ==
+                    fields.CPUThreadAllocationPolicy.REQUIRE):
+                if threads_no <= 1:
+                    LOG.debug('Skipping threads_no: %s, as it does not satisfy'
+                              ' the require policy', threads_no)
+                    continue
+
+            pinning = _get_pinning(
+                threads_no, sibling_set,
+                instance_cell.pcpuset)
+            cpuset_reserved = _get_reserved(
+                sibling_sets[1], pinning, num_cpu_reserved=num_cpu_reserved)
+            if pinning is None or (num_cpu_reserved and not cpuset_reserved):
+                continue
+            break
+
+        # NOTE(sfinucan): If siblings weren't available and we're using PREFER
+        # (implicitly or explicitly), fall back to linear assignment across
+        # cores
+        if (instance_cell.cpu_thread_policy !=
+                fields.CPUThreadAllocationPolicy.REQUIRE and
+                not pinning):
+            # we create a fake sibling set by splitting all sibling sets and
+            # treating each core as if it has no siblings. This is necessary
+            # because '_get_pinning' will normally only take the same amount of
+            # cores ('threads_no' cores) from each sibling set. This is rather
+            # desirable when we're seeking to apply a thread policy but it is
+            # less desirable when we only care about resource usage as we do
+            # here. By treating each core as independent, as we do here, we
+            # maximize resource usage for almost-full nodes at the expense of a
+            # possible performance impact to the guest.
+            sibling_set = [set([x]) for x in itertools.chain(*sibling_sets[1])]
+            pinning = _get_pinning(
+                threads_no, sibling_set,
+                instance_cell.pcpuset)
+            cpuset_reserved = _get_reserved(
+                sibling_set, pinning, num_cpu_reserved=num_cpu_reserved)
+
+    if pinning is None or (num_cpu_reserved and not cpuset_reserved):
+        return
+    LOG.debug('Selected cores for pinning: %s, in cell %s', pinning,
+                                                            host_cell.id)
+
+    for vcpu, pcpu in pinning:
+        instance_cell.pin(vcpu, pcpu)
+    instance_cell.id = host_cell.id
+    instance_cell.cpuset_reserved = cpuset_reserved
+    return instance_cell
+
+
+def make_host_cell(cores, threads_per_core, pinned_ratio, rand,
+                   interleaved=True, legacy=False):
+    """Return a NUMACell with randomly pinned CPUs.
+
+    :param cores: Number of cores of the cell
+    :param threads_per_core: Number of threads of each core
+    :param pinned_ratio: Ratio of the CPUs of the cell which are pinned
+    :param rand: random.Random instance to use
+    :param interleaved: Number the threads of a core like Linux does on most
+                        hosts, i.e. thread N of core C is CPU C + N * cores,
+                        rather than C * threads_per_core + N.
+    :param legacy: Whether the CPUs are configured using 'vcpu_pin_set', in
+                   which case cpuset is the same as pcpuset.
+    """
+    if interleaved:
+        siblings = [set(core + thread * cores
+                        for thread in range(threads_per_core))
+                    for core in range(cores)]
+    else:
+        siblings = [set(range(core * threads_per_core,
+                              (core + 1) * threads_per_core))
+                    for core in range(cores)]
+    pcpus = set(itertools.chain.from_iterable(siblings))
+    pinned = set(rand.sample(sorted(pcpus), int(len(pcpus) * pinned_ratio)))
+    return objects.NUMACell(
+        id=0, cpuset=pcpus if legacy else set(), pcpuset=pcpus,
+        memory=2048, memory_usage=0, cpu_usage=0, pinned_cpus=pinned,
+        siblings=siblings, mempages=[])
+
+
+def make_instance_cell(vcpus, thread_policy):
+    return objects.InstanceNUMACell(
+        id=0, cpuset=set(), pcpuset=set(range(vcpus)), memory=512,
+        cpu_policy=fields.CPUAllocationPolicy.DEDICATED,
+        cpu_thread_policy=thread_policy)
+
+
+def generate_corpus(count, seed=0):
+    """Yield count random (host cell, vCPUs, thread policy, reserved CPUs)
+    cases.
+    """
+    rand = random.Random(seed)
+    for _ in range(count):
+        threads_per_core = rand.choice((1, 2, 4))
+        cores = rand.randint(1, 128 // threads_per_core)
+        host_cell = make_host_cell(
+            cores, threads_per_core, rand.choice((0, 0.1, 0.5, 0.9)), rand,
+            interleaved=rand.random() < 0.5, legacy=rand.random() < 0.5)
+        vcpus = rand.randint(1, cores * threads_per_core)
+        yield (host_cell, vcpus, rand.choice(THREAD_POLICIES),
+               rand.choice((0, 0, 1, 2)))
+
+
+class CPUPinningDifferentialTestCase(test.NoDBTestCase):
+
+    def _pin(self, func, host_cell, vcpus, thread_policy, num_cpu_reserved):
+        instance_cell = func(
+            host_cell, make_instance_cell(vcpus, thread_policy),
+            num_cpu_reserved=num_cpu_reserved)
+        if instance_cell is None:
+            return None
+        return (instance_cell.id, instance_cell.cpu_pinning,
+                instance_cell.cpuset_reserved)
+
+    def test_same_pinning_as_reference(self):
+        fitted = 0
+        for case in generate_corpus(1000):
+            expected = self._pin(reference_pack_instance_onto_cores, *case)
+            self.assertEqual(
+                expected, self._pin(hardware._pack_instance_onto_cores, *case),
+                'Different pinning for host cell %s, vCPUs %s, thread '
+                'policy %s and reserved CPUs %s' % case)
+            fitted += expected is not None
+        # Make sure the corpus covers both fitting and non fitting cases
+        self.assertGreater(fitted, 100)
+        self.assertLess(fitted, 900)
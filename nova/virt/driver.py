@@ -384,6 +384,18 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self):
+        """Get the power state of every instance known to the hypervisor.
+
+        This allows the power states of all the instances of the host to be
+        compared with the database with a single query to the hypervisor,
+        instead of one get_info() call per instance. It is optional.
+
+        :returns: A dict of power states, as defined in
+                  nova.compute.power_state, keyed by instance UUID
+        """
+        raise NotImplementedError()
+
     @classmethod
     def get_instance_driver_metadata(
         cls, instance: 'nova.objects.instance.Instance',
@@ -628,6 +628,14 @@ def _numa_cell_supports_pagesize_request(host_cell, inst_cell):
         return verify_pagesizes(host_cell, inst_cell, [inst_cell.pagesize])
 
 
+def _cpus_to_bitmask(cpus):
+    """Return the integer bitmask with the bits of the specified CPUs set."""
+    mask = 0
+    for cpu in cpus:
+        mask |= 1 << cpu
+    return mask
+
+
 def _pack_instance_onto_cores(host_cell, instance_cell,
                               num_cpu_reserved=0):
     """Pack an instance onto a set of siblings.
@@ -663,6 +671,7 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
     """
     # get number of threads per core in host's cell
     threads_per_core = max(map(len, host_cell.siblings)) or 1
+    free_siblings = host_cell.free_siblings
 
     LOG.debug('Packing an instance onto a set of siblings: '
              '    host_cell_free_siblings: %(siblings)s'
@@ -670,7 +679,7 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
              '    host_cell_id: %(host_cell_id)s'
              '    threads_per_core: %(threads_per_core)s'
              '    num_cpu_reserved: %(num_cpu_reserved)s',
-                {'siblings': host_cell.free_siblings,
+                {'siblings': free_siblings,
                  'cells': instance_cell,
                  'host_cell_id': host_cell.id,
                  'threads_per_core': threads_per_core,
@@ -679,10 +688,14 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
     # We build up a data structure that answers the question: 'Given the
     # number of threads I want to pack, give me a list of all the available
     # sibling sets (or groups thereof) that can accommodate it'
-    sibling_sets: ty.Dict[int, ty.List[ty.Set[int]]] = (
+    # Each sibling set is a list of the free threads of a core, in the
+    # iteration order of its set so that the threads picked don't depend on
+    # the representation.
+    sibling_sets: ty.Dict[int, ty.List[ty.List[int]]] = (
         collections.defaultdict(list)
     )
-    for sib in host_cell.free_siblings:
+    for sib in free_siblings:
+        sib = list(sib)
         for threads_no in range(1, len(sib) + 1):
             sibling_sets[threads_no].append(sib)
     LOG.debug('Built sibling_sets: %(siblings)s', {'siblings': sibling_sets})
@@ -717,7 +730,7 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
         #
         # For a sibling_set=[(0, 1, 2, 3), (4, 5, 6, 7)] and thread_no 2:
         # usable_cores=[[0, 1], [4, 5]]
-        usable_cores = list(map(lambda s: list(s)[:threads_no], sibling_set))
+        usable_cores = [sib[:threads_no] for sib in sibling_set]
 
         # Determines the mapping vCPUs/pCPUs based on the sets of
         # usable cores.
@@ -725,7 +738,7 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
         # For an instance_cores=[2, 3], usable_cores=[[0], [4]]
         # vcpus_pinning=[(2, 0), (3, 4)]
         vcpus_pinning = list(zip(sorted(instance_cores),
-                                 itertools.chain(*usable_cores)))
+                                 itertools.chain.from_iterable(usable_cores)))
         msg = ("Computed NUMA topology CPU pinning: usable pCPUs: "
                "%(usable_cores)s, vCPUs mapping: %(vcpus_pinning)s")
         msg_args = {
@@ -753,7 +766,6 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
             return None
 
         cpuset_reserved = None
-        usable_cores = list(map(lambda s: list(s), sibling_set))
 
         if num_cpu_reserved:
             # Updates the pCPUs used based on vCPUs pinned to.
@@ -763,20 +775,25 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
             # to update usable_cores=[[4, 5]].
             # If CPUThreadAllocationPolicy is *not* isolated,
             # we want to update usable_cores=[[1],[3],[4, 5]].
-            for vcpu, pcpu in vcpus_pinning:
-                for sib in usable_cores:
-                    if pcpu in sib:
-                        if cpu_thread_isolate:
-                            usable_cores.remove(sib)
-                        else:
-                            sib.remove(pcpu)
+            # The pinned pCPUs are tracked as a bitmask, so that this is
+            # linear in the number of pCPUs.
+            pinned = _cpus_to_bitmask(pcpu for vcpu, pcpu in vcpus_pinning)
+            if cpu_thread_isolate:
+                usable_cores = [
+                    sib for sib in sibling_set
+                    if not _cpus_to_bitmask(sib) & pinned]
+            else:
+                usable_cores = [
+                    [pcpu for pcpu in sib if not (pinned >> pcpu) & 1]
+                    for sib in sibling_set]
 
             # Determines the pCPUs reserved for hypervisor
             #
             # For usable_cores=[[1],[3],[4, 5]], num_cpu_reserved=1
             # cpuset_reserved=set([1])
-            cpuset_reserved = set(list(
-                itertools.chain(*usable_cores))[:num_cpu_reserved])
+            cpuset_reserved = set(itertools.islice(
+                itertools.chain.from_iterable(usable_cores),
+                num_cpu_reserved))
             msg = ("Computed NUMA topology reserved pCPUs: usable pCPUs: "
                    "%(usable_cores)s, reserved pCPUs: %(cpuset_reserved)s")
             msg_args = {
@@ -897,7 +914,8 @@ def _pack_instance_onto_cores(host_cell, instance_cell,
             # here. By treating each core as independent, as we do here, we
             # maximize resource usage for almost-full nodes at the expense of a
             # possible performance impact to the guest.
-            sibling_set = [set([x]) for x in itertools.chain(*sibling_sets[1])]
+            sibling_set = [
+                [x] for x in itertools.chain.from_iterable(sibling_sets[1])]
             pinning = _get_pinning(
                 threads_no, sibling_set,
                 instance_cell.pcpuset)
@@ -8119,6 +8119,9 @@ class LibvirtDriver(driver.ComputeDriver):
         # workaround, see libvirt/compat.py
         return guest.get_info(self._host)
 
+    def get_power_states(self):
+        return self._host.get_instance_power_states()
+
     def _create_domain_setup_lxc(self, context, instance, image_meta,
                                  block_device_info):
         inst_path = libvirt_utils.get_instance_path(instance)
@@ -12190,8 +12193,8 @@ class LibvirtDriver(driver.ComputeDriver):
     def cache_image(self, context, image_id):
         cache_dir = os.path.join(CONF.instances_path,
                                  CONF.image_cache.subdirectory_name)
-        path = os.path.join(cache_dir,
-                            imagecache.get_cache_fname(image_id))
+        filename = imagecache.get_cache_fname(image_id)
+        path = os.path.join(cache_dir, filename)
         if os.path.exists(path):
             LOG.info('Image %(image_id)s already cached; updating timestamp',
                      {'image_id': image_id})
@@ -12204,24 +12207,31 @@ class LibvirtDriver(driver.ComputeDriver):
             # silent ignore of the EACCESS.
             nova.privsep.path.utime(path)
             return False
-        else:
-            # NOTE(danms): In case we are running before the first boot, make
-            # sure the cache directory is created
-            if not os.path.isdir(cache_dir):
-                fileutils.ensure_tree(cache_dir)
+
+        # NOTE(danms): In case we are running before the first boot, make
+        # sure the cache directory is created
+        if not os.path.isdir(cache_dir):
+            fileutils.ensure_tree(cache_dir)
+
+        # The image can be cached concurrently by this method and by the
+        # imagebackend code called via spawn(), which holds this external
+        # lock on the image cache file while fetching it. Hold the same lock
+        # so that they do not write the same file at the same time.
+        @utils.synchronized(filename, external=True,
+                            lock_path=os.path.join(CONF.instances_path,
+                                                   'locks'))
+        def _fetch_image():
+            if os.path.exists(path):
+                LOG.info('Image %(image_id)s cached concurrently',
+                         {'image_id': image_id})
+                return False
             LOG.info('Caching image %(image_id)s by request',
                      {'image_id': image_id})
-            # NOTE(danms): The imagebackend code, as called via spawn() where
-            # images are normally cached, uses a lock on the root disk it is
-            # creating at the time, but relies on the
-            # compute_utils.disk_ops_semaphore for cache fetch mutual
-            # exclusion, which is grabbed in images.fetch() (which is called
-            # by images.fetch_to_raw() below). So, by calling fetch_to_raw(),
-            # we are sharing the same locking for the cache fetch as the
-            # rest of the code currently called only from spawn().
             images.fetch_to_raw(context, image_id, path)
             return True
 
+        return _fetch_image()
+
     def _get_disk_size_reserved_for_image_cache(self):
         """Return the amount of DISK_GB resource need to be reserved for the
         image cache.
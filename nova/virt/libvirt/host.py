@@ -701,6 +701,24 @@ class Host(object):
         domains = self.list_instance_domains(only_running=only_running)
         return [libvirt_guest.Guest(dom) for dom in domains]
 
+    def get_instance_power_states(self):
+        """Get the power state of every nova instance with a single query to
+        libvirt.
+
+        :returns: dict of power states, as defined in
+                  nova.compute.power_state, keyed by instance UUID
+        """
+        flags = (libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE |
+                 libvirt.VIR_CONNECT_LIST_DOMAINS_INACTIVE)
+        # getAllDomainStats() returns <list of (virDomain, dict)>, which
+        # tpool.Proxy's autowrap won't catch, but the UUID of a domain is
+        # known without calling libvirtd.
+        stats = self.get_connection().getAllDomainStats(
+            libvirt.VIR_DOMAIN_STATS_STATE, flags)
+        return {dom.UUIDString():
+                    libvirt_guest.LIBVIRT_POWER_STATE[record['state.state']]
+                for dom, record in stats}
+
     def list_instance_domains(self, only_running=True):
         """Get a list of libvirt.Domain objects for nova instances
 
@@ -20,9 +20,13 @@ Pluggable Weighing support
 import abc
 
 from oslo_log import log as logging
+from oslo_utils import importutils
+from oslo_utils import timeutils
 
+from nova import instrumentation
 from nova import loadables
 
+np = importutils.try_import('numpy')
 
 LOG = logging.getLogger(__name__)
 
@@ -56,6 +60,30 @@ def normalize(weight_list, minval=None, maxval=None):
     return ((i - minval) / range_ for i in weight_list)
 
 
+def normalize_array(weights, minval=None, maxval=None):
+    """Normalize the values of a numpy array between 0 and 1.0.
+
+    This is the array counterpart of normalize() and follows the same rules.
+    """
+    if not len(weights):
+        return weights
+
+    if maxval is None:
+        maxval = weights.max()
+
+    if minval is None:
+        minval = weights.min()
+
+    maxval = float(maxval)
+    minval = float(minval)
+
+    if minval == maxval:
+        return np.zeros(len(weights))
+
+    range_ = maxval - minval
+    return (weights - minval) / range_
+
+
 class WeighedObject(object):
     """Object with weight information."""
 
@@ -119,10 +147,37 @@ class BaseWeigher(metaclass=abc.ABCMeta):
 
         return weights
 
+    def weigh_all(self, columns, weight_properties):
+        """Weigh all the objects at once.
+
+        ``columns`` is the columnar view of the objects returned by the
+        handler's get_columns(). Return an array of raw weights, one per
+        object, or None, which is the default, if the weigher can't be
+        evaluated that way, in which case weigh_objects() is used instead.
+        The minval and maxval attributes are applied by the caller.
+        """
+        return None
+
+    def weight_multipliers(self, columns):
+        """Return an array of the weight multipliers of all the objects.
+
+        Override in a subclass if the multipliers can be computed without
+        calling weight_multiplier() for every object.
+        """
+        return columns.map(self.weight_multiplier, dtype=float)
+
 
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
+    def get_columns(self, objs):
+        """Return a columnar view of objs for vectorized weighing.
+
+        Return None if the objects can't be weighed that way. Override this
+        in a subclass.
+        """
+        return None
+
     def get_weighed_objects(self, weighers, obj_list, weighing_properties):
         """Return a sorted (descending), normalized list of WeighedObjects."""
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
@@ -131,6 +186,8 @@ class BaseWeightHandler(loadables.BaseLoader):
             return weighed_objs
 
         for weigher in weighers:
+            timer = timeutils.StopWatch()
+            timer.start()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
 
             LOG.debug(
@@ -168,5 +225,92 @@ class BaseWeightHandler(loadables.BaseLoader):
                 weigher.__class__.__name__,
                 {name: log for name, log in log_data.items()}
             )
+            instrumentation.record(
+                instrumentation.WEIGHER, weigher.__class__.__name__,
+                timer.elapsed(), objs_in=len(weighed_objs))
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def get_top_weighed_objects(self, weighers, obj_list, weighing_properties,
+                                limit, include_ties=False):
+        """Return the best weighed objects and the remaining ones.
+
+        Returns a tuple (weighed_objs, remaining_objs) where weighed_objs is
+        the sorted (descending), normalized list of WeighedObjects of the
+        ``limit`` best objects, and remaining_objs the list of the other
+        objects, sorted the same way but not wrapped. If include_ties is True,
+        weighed_objs also holds every object having the best weight.
+
+        The weights are computed, normalized and combined over arrays when the
+        handler can provide a columnar view of the objects, in which case only
+        the best objects are wrapped in a WeighedObject. Otherwise this is
+        equivalent to get_weighed_objects().
+        """
+        obj_list = list(obj_list)
+        columns = None
+        if len(obj_list) > 1:
+            columns = self.get_columns(obj_list)
+        if columns is None:
+            weighed_objs = self.get_weighed_objects(
+                weighers, obj_list, weighing_properties)
+            end = limit
+            if include_ties and weighed_objs:
+                best = weighed_objs[0].weight
+                end = max(end, len([obj for obj in weighed_objs
+                                    if obj.weight == best]))
+            return (weighed_objs[:end],
+                    [obj.obj for obj in weighed_objs[end:]])
+
+        debug = LOG.isEnabledFor(logging.DEBUG)
+        names = [(obj.host, obj.nodename) for obj in obj_list] if debug else []
+        # Only built if a weigher can't weigh all the objects at once.
+        weighed_objs = None
+        total = np.zeros(len(columns))
+        for weigher in weighers:
+            timer = timeutils.StopWatch()
+            timer.start()
+            weights = weigher.weigh_all(columns, weighing_properties)
+            if weights is None:
+                if weighed_objs is None:
+                    weighed_objs = [self.object_class(obj, 0.0)
+                                    for obj in obj_list]
+                weights = np.asarray(
+                    weigher.weigh_objects(weighed_objs, weighing_properties),
+                    dtype=float)
+            else:
+                weights = np.asarray(weights, dtype=float)
+                # don't let the weight go beyond the defined max/min
+                if weigher.minval is not None or weigher.maxval is not None:
+                    weights = np.clip(weights, weigher.minval, weigher.maxval)
+
+            if debug:
+                LOG.debug("%s: raw weights %s", weigher.__class__.__name__,
+                          dict(zip(names, weights.tolist())))
+
+            # Normalize the weights
+            weights = normalize_array(
+                weights, minval=weigher.minval, maxval=weigher.maxval)
+            multipliers = weigher.weight_multipliers(columns)
+            total += multipliers * weights
+
+            if debug:
+                LOG.debug(
+                    "%s: score (multiplier * weight) %s",
+                    weigher.__class__.__name__,
+                    {name: f"{multiplier} * {weight}"
+                     for name, multiplier, weight in zip(
+                         names, multipliers.tolist(), weights.tolist())})
+            instrumentation.record(
+                instrumentation.WEIGHER, weigher.__class__.__name__,
+                timer.elapsed(), objs_in=len(obj_list))
+
+        # A stable sort keeps the objects with the same weight in their
+        # original order, like sorted() does in get_weighed_objects().
+        order = np.argsort(-total, kind='stable')
+        end = limit
+        if include_ties:
+            end = max(end, int(np.count_nonzero(total == total[order[0]])))
+        top = order[:end]
+        return ([self.object_class(columns.objs[idx], float(total[idx]))
+                 for idx in top],
+                columns.objs[order[end:]].tolist())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Microbenchmark of the CPU pinning search.
+
+Compares the time taken by hardware._pack_instance_onto_cores to pin
+instances onto a large host NUMA cell with the time taken by its previous,
+set-based, implementation, for each CPU thread policy. Run from the root of
+the repository:
+
+    python tools/benchmarks/cpu_pinning.py --threads 256 --reserved 1
+"""
+
+import argparse
+import logging
+import random
+import timeit
+
+from nova import objects
+from nova.objects import fields
+from nova.tests.unit.virt import test_hardware_pinning
+from nova.virt import hardware
+
+THREAD_POLICIES = (
+    fields.CPUThreadAllocationPolicy.PREFER,
+    fields.CPUThreadAllocationPolicy.REQUIRE,
+    fields.CPUThreadAllocationPolicy.ISOLATE,
+)
+
+
+def _bench(func, host_cell, vcpus, thread_policy, reserved, number):
+    def pin():
+        func(host_cell,
+             test_hardware_pinning.make_instance_cell(vcpus, thread_policy),
+             num_cpu_reserved=reserved)
+    return min(timeit.repeat(pin, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=256,
+                        help='Number of host CPUs in the NUMA cell')
+    parser.add_argument('--threads-per-core', type=int, default=2)
+    parser.add_argument('--pinned', type=float, default=0.5,
+                        help='Ratio of the host CPUs already pinned')
+    parser.add_argument('--vcpus', type=int, default=16,
+                        help='Number of dedicated vCPUs of the instance')
+    parser.add_argument('--reserved', type=int, default=0,
+                        help='Number of host CPUs reserved for emulator '
+                             'threads')
+    parser.add_argument('--number', type=int, default=200,
+                        help='Number of pinnings timed per measure')
+    args = parser.parse_args()
+
+    # The pinning search logs its results, which is not what we measure.
+    logging.disable(logging.CRITICAL)
+    objects.register_all()
+
+    host_cell = test_hardware_pinning.make_host_cell(
+        args.threads // args.threads_per_core, args.threads_per_core,
+        args.pinned, random.Random(0))
+    print('%-8s %15s %15s %8s' % (
+        'policy', 'reference (us)', 'current (us)', 'speedup'))
+    for thread_policy in THREAD_POLICIES:
+        reference, current = (
+            _bench(func, host_cell, args.vcpus, thread_policy, args.reserved,
+                   args.number)
+            for func in (
+                test_hardware_pinning.reference_pack_instance_onto_cores,
+                hardware._pack_instance_onto_cores))
+        print('%-8s %15.1f %15.1f %7.2fx' % (
+            thread_policy, reference * 1e6, current * 1e6,
+            reference / current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Memory benchmark of the instance info kept by the scheduler.
+
+Measures the memory used by the instances of every host tracked by the host
+manager of the scheduler, as sent by the computes, when stored as Instance
+objects and when stored as HostInstances. Building the Instance objects of a
+whole cloud takes a lot of memory, so only a sample of them is kept as
+Instance objects and the figure is extrapolated. Run from the root of the
+repository:
+
+    python tools/benchmarks/instance_info.py --instances 500000 --hosts 5000
+"""
+
+import argparse
+import datetime
+import logging
+import time
+import tracemalloc
+
+from oslo_utils import uuidutils
+
+from nova.compute import power_state
+from nova.compute import vm_states
+from nova import objects
+from nova.scheduler import host_manager
+
+LAUNCHED_AT = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _make_flavor(flavorid):
+    return objects.Flavor(
+        id=flavorid, flavorid=str(flavorid), name='flavor%d' % flavorid,
+        memory_mb=2048 * flavorid, vcpus=flavorid, root_gb=20,
+        ephemeral_gb=0, swap=0, rxtx_factor=1.0, vcpu_weight=0,
+        disabled=False, is_public=True, description=None,
+        extra_specs={'hw:cpu_policy': 'shared'})
+
+
+def _make_instance(index, host, flavors):
+    flavor = flavors[index % len(flavors)]
+    uuid = uuidutils.generate_uuid()
+    return objects.Instance(
+        id=index, uuid=uuid, host=host, node=host,
+        project_id='project%d' % (index % 100),
+        user_id='user%d' % (index % 1000),
+        instance_type_id=flavor.id, flavor=flavor,
+        vm_state=vm_states.ACTIVE, task_state=None,
+        power_state=power_state.RUNNING,
+        hostname='server-%d' % index, display_name='server-%d' % index,
+        image_ref=uuidutils.generate_uuid(), kernel_id='', ramdisk_id='',
+        memory_mb=flavor.memory_mb, vcpus=flavor.vcpus,
+        root_gb=flavor.root_gb, ephemeral_gb=flavor.ephemeral_gb,
+        availability_zone='nova', launched_at=LAUNCHED_AT,
+        created_at=LAUNCHED_AT, updated_at=LAUNCHED_AT, deleted=False,
+        locked=False, metadata={}, system_metadata={
+            'image_base_image_ref': '', 'image_disk_format': 'qcow2',
+            'image_container_format': 'bare', 'image_min_ram': '0',
+            'image_min_disk': '20', 'image_hw_machine_type': 'q35',
+            'owner_user_name': 'user', 'owner_project_name': 'project',
+        })
+
+
+def _measure(build):
+    tracemalloc.start()
+    start = time.monotonic()
+    kept = build()
+    elapsed = time.monotonic() - start
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, used, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instances', type=int, default=500000)
+    parser.add_argument('--hosts', type=int, default=5000)
+    parser.add_argument('--sample', type=int, default=50000,
+                        help='Number of instances kept as Instance objects')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    objects.register_all()
+    hosts = ['compute%05d' % i for i in range(args.hosts)]
+    flavors = [_make_flavor(flavorid) for flavorid in range(1, 9)]
+
+    def build_instances(count):
+        instance_info = {}
+        for index in range(count):
+            host = hosts[index % len(hosts)]
+            instance = _make_instance(index, host, flavors)
+            instance_info.setdefault(host, {})[instance.uuid] = instance
+        return instance_info
+
+    def build_host_instances(count):
+        instance_info = {}
+        for index in range(count):
+            host = hosts[index % len(hosts)]
+            instance = _make_instance(index, host, flavors)
+            host_instances = instance_info.get(host)
+            if host_instances is None:
+                host_instances = instance_info[host] = (
+                    host_manager.HostInstances(None, host))
+            host_instances[instance.uuid] = instance
+        return instance_info
+
+    sample = min(args.sample, args.instances)
+    kept, used, elapsed = _measure(lambda: build_instances(sample))
+    del kept
+    full = used * args.instances / sample
+    print('Instance objects: %8.1f MiB (%d bytes per instance, '
+          'extrapolated from %d instances in %.1f s)' % (
+              full / 2 ** 20, used / sample, sample, elapsed))
+
+    kept, used, elapsed = _measure(
+        lambda: build_host_instances(args.instances))
+    print('HostInstances:    %8.1f MiB (%d bytes per instance, '
+          '%d instances in %.1f s)' % (
+              used / 2 ** 20, used / args.instances, args.instances,
+              elapsed))
+    print('Ratio: %.1fx' % (full / used))
+
+
+if __name__ == '__main__':
+    main()
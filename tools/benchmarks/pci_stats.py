@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Microbenchmark of the PCI device pools.
+
+Builds the PciDeviceStats of an SR-IOV host with thousands of VFs spread over
+hundreds of PFs of a few different models, and times the operations done on
+it by the resource tracker and by the scheduler. Run from the root of the
+repository:
+
+    python tools/benchmarks/pci_stats.py --vfs 5000 --vfs-per-pf 16
+"""
+
+import argparse
+import copy
+import logging
+import timeit
+
+from oslo_serialization import jsonutils
+from oslo_utils import uuidutils
+
+from nova import objects
+from nova.objects import fields
+from nova.pci import stats
+from nova.pci import whitelist
+
+# vendor_id, product_id, physical_network of the PF models of the host
+MODELS = (
+    ('8086', '154c', 'physnet1'),
+    ('15b3', '101e', 'physnet2'),
+    ('1137', '0072', 'physnet3'),
+    ('8086', '1889', 'physnet4'),
+)
+
+
+def _make_devices(vfs, vfs_per_pf, numa_nodes):
+    devices = []
+    for i in range(vfs):
+        pf = i // vfs_per_pf
+        vendor_id, product_id, _ = MODELS[pf % len(MODELS)]
+        devices.append(objects.PciDevice(
+            compute_node_id=1,
+            address='0000:%02x:%02x.%x' % (
+                pf // 32 + 1, pf % 32, i % vfs_per_pf % 8),
+            parent_addr='0000:%02x:%02x.0' % (pf // 32 + 1, pf % 32),
+            vendor_id=vendor_id,
+            product_id=product_id,
+            dev_type=fields.PciDeviceType.SRIOV_VF,
+            numa_node=pf % numa_nodes,
+            status=fields.PciDeviceStatus.AVAILABLE,
+            extra_info={},
+        ))
+    return devices
+
+
+def _make_requests(count):
+    return [
+        objects.InstancePCIRequest(
+            count=count, request_id=uuidutils.generate_uuid(),
+            spec=[{'vendor_id': vendor_id, 'product_id': product_id,
+                   'physical_network': physnet}])
+        for vendor_id, product_id, physnet in MODELS
+    ]
+
+
+def _make_stats(dev_filter, devices):
+    pci_stats = stats.PciDeviceStats(
+        objects.NUMATopology(cells=[]), dev_filter=dev_filter)
+    for dev in devices:
+        pci_stats.add_device(dev)
+    return pci_stats
+
+
+def _time(func, number, setup=None):
+    if setup is None:
+        return min(timeit.repeat(func, number=number, repeat=3)) / number
+    # a fresh state is needed for every call
+    return min(timeit.repeat(func, setup=setup, number=1, repeat=number))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vfs', type=int, default=5000,
+                        help='Number of VFs of the host')
+    parser.add_argument('--vfs-per-pf', type=int, default=16)
+    parser.add_argument('--numa-nodes', type=int, default=2)
+    parser.add_argument('--count', type=int, default=2,
+                        help='Number of VFs requested of each PF model')
+    parser.add_argument('--number', type=int, default=20,
+                        help='Number of calls timed for each operation')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    objects.register_all()
+
+    dev_filter = whitelist.Whitelist([
+        jsonutils.dumps({'vendor_id': vendor_id, 'product_id': product_id,
+                         'physical_network': physnet})
+        for vendor_id, product_id, physnet in MODELS
+    ])
+    devices = _make_devices(args.vfs, args.vfs_per_pf, args.numa_nodes)
+    requests = _make_requests(args.count)
+    pci_stats = _make_stats(dev_filter, devices)
+    # the scheduler only knows about the pools, not about their devices
+    sched_stats = stats.PciDeviceStats(
+        objects.NUMATopology(cells=[]),
+        stats=pci_stats.to_device_pools_obj(), dev_filter=dev_filter)
+    print('%d devices in %d pools' % (args.vfs, len(pci_stats.pools)))
+
+    fresh = []
+
+    def copy_sched_stats():
+        fresh[:] = [copy.deepcopy(sched_stats)]
+
+    def make_stats():
+        fresh[:] = [_make_stats(dev_filter, devices)]
+
+    results = [
+        ('add_device (all devices)',
+         _time(lambda: _make_stats(dev_filter, devices), 1)),
+        ('update_device (all devices)',
+         _time(lambda: [pci_stats.update_device(dev) for dev in devices], 1)),
+        ('support_requests (scheduler)',
+         _time(lambda: sched_stats.support_requests(requests, None),
+               args.number)),
+        ('support_requests (compute)',
+         _time(lambda: pci_stats.support_requests(requests, None),
+               args.number)),
+        ('apply_requests (scheduler)',
+         _time(lambda: fresh[0].apply_requests(requests, None),
+               args.number, setup=copy_sched_stats)),
+        ('consume_requests (compute)',
+         _time(lambda: fresh[0].consume_requests(requests),
+               3, setup=make_stats)),
+    ]
+    for name, seconds in results:
+        print('%-30s %10.3f ms' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
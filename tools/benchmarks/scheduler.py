@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Synthetic large-fleet benchmark of the scheduler.
+
+Builds cells of in-memory sqlite databases holding thousands of compute
+nodes, with NUMA topologies and PCI device pools, and replaces placement with
+a local stand-in returning every compute node as allocation candidate. It then
+drives SchedulerManager.select_destinations with a mix of flavors, server
+groups, NUMA and PCI requests, and reports the throughput and the latency of
+the requests, along with the time spent in each filter and weigher, for each
+set of filters and weighers. Run from the root of the repository:
+
+    python tools/benchmarks/scheduler.py --cells 2 --computes 1000
+
+The filters and weighers of a custom profile can be given with --filters and
+--weighers, e.g. --filters ComputeFilter,NUMATopologyFilter.
+"""
+
+import argparse
+import logging
+import random
+import time
+
+import oslo_messaging as messaging
+from oslo_utils import uuidutils
+
+import nova.conf
+from nova import context as nova_context
+from nova import exception
+from nova import instrumentation
+from nova import objects
+from nova.objects import fields
+from nova.scheduler.client import report
+from nova.scheduler import manager
+from nova.tests import fixtures as nova_fixtures
+from nova.virt import hardware
+
+CONF = nova.conf.CONF
+
+DEFAULT_FILTERS = [
+    'ComputeFilter',
+    'ComputeCapabilitiesFilter',
+    'ImagePropertiesFilter',
+    'ServerGroupAntiAffinityFilter',
+    'ServerGroupAffinityFilter',
+]
+
+# name: (enabled filters, weight classes)
+PROFILES = {
+    'minimal': (['ComputeFilter'], []),
+    'default': (DEFAULT_FILTERS, ['nova.scheduler.weights.all_weighers']),
+    'numa-pci': (
+        DEFAULT_FILTERS + ['NUMATopologyFilter', 'PciPassthroughFilter'],
+        ['nova.scheduler.weights.all_weighers']),
+}
+
+# name: (vcpus, memory_mb, root_gb)
+FLAVORS = {
+    'small': (1, 2048, 20),
+    'medium': (2, 4096, 40),
+    'large': (8, 16384, 160),
+}
+
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '154c'
+
+
+class PlacementStandIn(object):
+    """Local stand-in for the placement client of the scheduler.
+
+    Every compute node is an allocation candidate of every request, up to
+    [scheduler] max_placement_results of them, and every claim succeeds.
+    """
+
+    def __init__(self, compute_nodes):
+        self.compute_nodes = compute_nodes
+        self.claims = 0
+
+    def get_allocation_candidates(self, context, resources):
+        requested = resources.merged_resources()
+        nodes = random.sample(
+            self.compute_nodes,
+            min(CONF.scheduler.max_placement_results,
+                len(self.compute_nodes)))
+        alloc_reqs = []
+        summaries = {}
+        for node in nodes:
+            alloc_reqs.append({
+                'allocations': {node.uuid: {'resources': requested}},
+                'mappings': {'': [node.uuid]},
+            })
+            summaries[node.uuid] = {
+                'resources': {
+                    'VCPU': {'capacity': node.vcpus, 'used': 0},
+                    'MEMORY_MB': {'capacity': node.memory_mb, 'used': 0},
+                    'DISK_GB': {'capacity': node.local_gb, 'used': 0},
+                },
+                'traits': [],
+                'parent_provider_uuid': None,
+                'root_provider_uuid': node.uuid,
+            }
+        return alloc_reqs, summaries, report.SAME_SUBTREE_VERSION
+
+    def claim_resources(self, context, consumer_uuid, alloc_request,
+                        project_id, user_id, allocation_request_version,
+                        consumer_generation=None):
+        self.claims += 1
+        return True
+
+    def delete_allocation_for_instance(self, context, instance_uuid,
+                                       consumer_type='instance', force=False):
+        return True
+
+
+def _make_numa_topology(numa_nodes, cpus_per_node, memory_mb_per_node):
+    cells = []
+    for node in range(numa_nodes):
+        cpus = set(range(node * cpus_per_node, (node + 1) * cpus_per_node))
+        cells.append(objects.NUMACell(
+            id=node,
+            cpuset=set(),
+            pcpuset=cpus,
+            memory=memory_mb_per_node,
+            cpu_usage=0,
+            memory_usage=0,
+            pinned_cpus=set(),
+            siblings=[{cpu, cpu + 1} for cpu in sorted(cpus)[::2]],
+            mempages=[objects.NUMAPagesTopology(
+                size_kb=4, total=memory_mb_per_node * 256, used=0)],
+            network_metadata=objects.NetworkMetadata(
+                physnets=set(), tunneled=False),
+            socket=node))
+    return objects.NUMATopology(cells=cells)
+
+
+def _make_pci_pools(numa_nodes, count):
+    return objects.PciDevicePoolList(objects=[
+        objects.PciDevicePool(
+            vendor_id=PCI_VENDOR_ID, product_id=PCI_PRODUCT_ID,
+            numa_node=node, count=count,
+            tags={'dev_type': fields.PciDeviceType.SRIOV_VF,
+                  'physical_network': 'physnet1'})
+        for node in range(numa_nodes)
+    ])
+
+
+def build_fleet(ctxt, num_cells, computes_per_cell, pci_ratio):
+    """Create the cells, and the compute services and nodes in them."""
+    celldbs = nova_fixtures.CellDatabases()
+    cell_mappings = []
+    for i in range(num_cells + 1):
+        uuid = (objects.CellMapping.CELL0_UUID if i == 0
+                else uuidutils.generate_uuid())
+        cell = objects.CellMapping(
+            context=ctxt, uuid=uuid, name='cell%d' % i,
+            transport_url='fake://nowhere/', database_connection=uuid)
+        cell.create()
+        celldbs.add_cell_database(uuid, default=(i == 1))
+        cell_mappings.append(cell)
+    celldbs.setUp()
+
+    numa_topology = _make_numa_topology(2, 32, 131072)._to_json()
+    compute_nodes = []
+    for cell in cell_mappings[1:]:
+        with nova_context.target_cell(ctxt, cell) as cctxt:
+            for i in range(computes_per_cell):
+                host = '%s-compute%d' % (cell.name, i)
+                service = objects.Service(
+                    cctxt, host=host, binary='nova-compute',
+                    topic='compute', report_count=0)
+                service.create()
+                node = objects.ComputeNode(
+                    cctxt, host=host, hypervisor_hostname=host,
+                    uuid=uuidutils.generate_uuid(), service_id=service.id,
+                    vcpus=64, memory_mb=262144, local_gb=4096,
+                    vcpus_used=0, memory_mb_used=0, local_gb_used=0,
+                    free_ram_mb=262144, free_disk_gb=4096,
+                    disk_available_least=4096, current_workload=0,
+                    running_vms=0, hypervisor_type='fake',
+                    hypervisor_version=1, cpu_info='{}',
+                    cpu_allocation_ratio=4.0, ram_allocation_ratio=1.0,
+                    disk_allocation_ratio=1.0,
+                    numa_topology=numa_topology,
+                    pci_device_pools=_make_pci_pools(
+                        2, 16 if random.random() < pci_ratio else 0),
+                    supported_hv_specs=[], stats={})
+                node.create()
+                compute_nodes.append(node)
+                objects.HostMapping(
+                    ctxt, host=host, cell_mapping=cell).create()
+    return celldbs, compute_nodes
+
+
+def make_request(ctxt, args, hosts):
+    """Return the RequestSpec of a random request of the mix."""
+    name = random.choice(list(FLAVORS))
+    vcpus, memory_mb, root_gb = FLAVORS[name]
+    extra_specs = {}
+    if random.random() < args.numa_ratio:
+        extra_specs.update({'hw:numa_nodes': '1',
+                            'hw:cpu_policy': 'dedicated'})
+    flavor = objects.Flavor(
+        name=name, flavorid=name, vcpus=vcpus, memory_mb=memory_mb,
+        root_gb=root_gb, ephemeral_gb=0, swap=0, rxtx_factor=1.0,
+        vcpu_weight=0, disabled=False, is_public=True, description=None,
+        projects=[], extra_specs=extra_specs)
+    image = objects.ImageMeta.from_dict({'properties': {}})
+
+    pci_requests = objects.InstancePCIRequests(requests=[])
+    if random.random() < args.pci_ratio:
+        pci_requests.requests.append(objects.InstancePCIRequest(
+            count=1, request_id=uuidutils.generate_uuid(),
+            spec=[{'vendor_id': PCI_VENDOR_ID,
+                   'product_id': PCI_PRODUCT_ID}]))
+
+    instance_group = None
+    if random.random() < args.group_ratio:
+        policy = random.choice(['affinity', 'anti-affinity'])
+        instance_group = objects.InstanceGroup(
+            uuid=uuidutils.generate_uuid(), policy=policy,
+            policies=[policy], rules={},
+            members=[], hosts=random.sample(
+                hosts, 1 if policy == 'affinity' else 10))
+
+    spec_obj = objects.RequestSpec.from_components(
+        ctxt, uuidutils.generate_uuid(), image, flavor,
+        hardware.numa_get_constraints(flavor, image), pci_requests, {},
+        instance_group, None, project_id=ctxt.project_id,
+        user_id=ctxt.user_id)
+    spec_obj.num_instances = 1
+    return spec_obj
+
+
+def percentile(latencies, percent):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1,
+                         int(len(latencies) * percent / 100))]
+
+
+def run_profile(ctxt, args, name, filters, weighers, hosts):
+    CONF.set_override('enabled_filters', filters, group='filter_scheduler')
+    CONF.set_override('weight_classes', weighers, group='filter_scheduler')
+    scheduler = manager.SchedulerManager()
+    requests = [make_request(ctxt, args, hosts)
+                for _ in range(args.warmup + args.requests)]
+
+    for spec_obj in requests[:args.warmup]:
+        _select_destinations(ctxt, scheduler, spec_obj)
+    instrumentation.reset()
+
+    latencies = []
+    no_valid_host = 0
+    started = time.monotonic()
+    for spec_obj in requests[args.warmup:]:
+        request_started = time.monotonic()
+        if not _select_destinations(ctxt, scheduler, spec_obj):
+            no_valid_host += 1
+        latencies.append(time.monotonic() - request_started)
+    elapsed = time.monotonic() - started
+
+    print('%s: %.1f requests/s, p50 %.1f ms, p99 %.1f ms, %d NoValidHost'
+          % (name, len(latencies) / elapsed,
+             percentile(latencies, 50) * 1000,
+             percentile(latencies, 99) * 1000, no_valid_host))
+    stats = instrumentation.get_stats()
+    for kind in (instrumentation.FILTER, instrumentation.WEIGHER):
+        for op_name, op_stats in sorted(
+                stats.get(kind, {}).items(),
+                key=lambda item: item[1]['total'], reverse=True):
+            print('  %-8s %-36s avg %8.3f ms  max %8.3f ms'
+                  % (kind, op_name, op_stats['avg'] * 1000,
+                     op_stats['max'] * 1000))
+
+
+def _select_destinations(ctxt, scheduler, spec_obj):
+    try:
+        scheduler.select_destinations(
+            ctxt, spec_obj=spec_obj,
+            instance_uuids=[spec_obj.instance_uuid],
+            return_objects=True, return_alternates=True)
+    except (exception.NoValidHost, messaging.ExpectedException):
+        # select_destinations is an RPC endpoint method which wraps the
+        # NoValidHost it raises
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cells', type=int, default=2)
+    parser.add_argument('--computes', type=int, default=500,
+                        help='Number of compute nodes per cell')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Number of requests timed for each profile')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--numa-ratio', type=float, default=0.2,
+                        help='Ratio of the requests asking for dedicated '
+                             'CPUs on a NUMA node')
+    parser.add_argument('--pci-ratio', type=float, default=0.1,
+                        help='Ratio of the requests asking for a PCI device, '
+                             'which is also the ratio of the compute nodes '
+                             'having PCI devices')
+    parser.add_argument('--group-ratio', type=float, default=0.2,
+                        help='Ratio of the requests in a server group')
+    parser.add_argument('--profiles', default=','.join(PROFILES),
+                        help='Comma separated profiles to run, among %s'
+                             % ', '.join(PROFILES))
+    parser.add_argument('--filters',
+                        help='Comma separated filters of a custom profile')
+    parser.add_argument('--weighers', default='',
+                        help='Comma separated weighers of a custom profile')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.disable(logging.CRITICAL)
+    objects.register_all()
+    nova_fixtures.ConfFixture(CONF).setUp()
+    # building a large fleet takes longer than the default service_down_time,
+    # the compute services must not be seen down by the ComputeFilter
+    CONF.set_override('service_down_time', 24 * 3600)
+    nova_fixtures.RPCFixture('nova.test').setUp()
+    nova_fixtures.Database(database='api').setUp()
+
+    ctxt = nova_context.RequestContext(
+        user_id='benchmark', project_id='benchmark', is_admin=True)
+    _, compute_nodes = build_fleet(
+        ctxt, args.cells, args.computes, args.pci_ratio)
+    report.PLACEMENTCLIENT = PlacementStandIn(compute_nodes)
+    hosts = [node.host for node in compute_nodes]
+    print('%d compute nodes in %d cells' % (len(compute_nodes), args.cells))
+
+    profiles = {name: PROFILES[name]
+                for name in args.profiles.split(',') if name}
+    if args.filters:
+        profiles['custom'] = (args.filters.split(','),
+                              [w for w in args.weighers.split(',') if w])
+    for name, (filters, weighers) in profiles.items():
+        run_profile(ctxt, args, name, filters, weighers, hosts)
+
+
+if __name__ == '__main__':
+    main()